@@ -1,8 +1,14 @@
 from auth import create_user, authenticate_user, user_exists
-from flask import Flask, render_template, request, redirect, url_for, send_file, session, flash, abort, make_response
+from flask import Flask, render_template, request, redirect, url_for, send_file, session, flash, abort, make_response, Response
 from werkzeug.security import generate_password_hash, check_password_hash
 from dateutil.relativedelta import relativedelta
-from weasyprint import HTML
+from app.services.pdf import get_pdf_renderer
+from app.services.inspection_logs import get_inspection_log_store
+from app.services.equipment_ids import get_equipment_id_allocator, max_sequence
+from app.services.inspection_exports import (
+    ExportMemoryExceeded, export_fingerprint, find_stored_export, stored_export_path,
+    write_pdf_chunked, record_export, platform_user_id,
+)
 import csv
 import os
 import qrcode
@@ -11,6 +17,8 @@ from datetime import datetime
 from collections import defaultdict
 import uuid
 import re
+import threading
+import time
 
 # Load company settings
 SETTINGS_FILE = 'static/settings.json'
@@ -56,11 +64,17 @@ def inject_settings():
 
 # Other global constants
 DATA_FILE = 'equipment.csv'
-LOG_CSV = 'inspection_logs.csv'
+EQUIPMENT_IDS_DB = 'equipment_ids.sqlite3'  # per-client ID counters shared by all workers
+LOG_CSV = 'inspection_logs.csv'          # legacy flat file (imported once into LOG_DB)
+LOG_DB = 'inspection_logs.sqlite3'       # indexed, append-only inspection log store
 QR_FOLDER = 'static/qrcodes'
 USER_CSV = 'users.csv'
+EXPORT_DIR = 'static/exports/inspections'  # stored PDF exports, named by fingerprint
+PDF_CHUNK_ROWS = int(os.environ.get('INSPECTION_PDF_CHUNK_ROWS', 500))                 # rows per rendered part
+EXPORT_MEMORY_CEILING = int(os.environ.get('INSPECTION_EXPORT_MEMORY_CEILING_MB', 400)) * 1024 * 1024
 
 os.makedirs(QR_FOLDER, exist_ok=True)
+os.makedirs(EXPORT_DIR, exist_ok=True)
 
 # Custom filter to format timestamp
 @app.template_filter('format_datetime')
@@ -73,41 +87,51 @@ def format_datetime_filter(value):
         return value  # fallback if invalid
 
 
-if not os.path.exists(LOG_CSV):
-    with open(LOG_CSV, 'w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(['timestamp', 'equipment_id', 'name', 'client', 'inspector_pin', 'clean', 'damage', 'functional', 'notes'])
-    print("Created empty inspection_logs.csv with headers.")
+def inspection_logs():
+    return get_inspection_log_store(LOG_DB)
 
 
-def load_equipment():
-    equipment = []
-    if os.path.exists(DATA_FILE):
+# One-shot import of the old CSV (recorded in the store, so restarts don't duplicate rows)
+_imported = inspection_logs().import_csv(LOG_CSV)
+if _imported:
+    print(f"Imported {_imported} inspection log rows from {LOG_CSV} into {LOG_DB}.")
+
+
+_equipment_cache = {'stamp': None, 'rows': [], 'by_id': {}}
+
+def _equipment_index():
+    # equipment.csv is parsed once per change (mtime/size), then looked up by id in O(1)
+    if not os.path.exists(DATA_FILE):
+        _equipment_cache.update(stamp=None, rows=[], by_id={})
+        return _equipment_cache
+    st = os.stat(DATA_FILE)
+    stamp = (st.st_mtime_ns, st.st_size)
+    if _equipment_cache['stamp'] != stamp:
         with open(DATA_FILE, newline='') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                equipment.append(row)
-    return equipment
+            rows = list(csv.DictReader(csvfile))
+        by_id = {}
+        for row in rows:
+            by_id.setdefault(row['id'], row)  # first row wins, as with the old linear scan
+        _equipment_cache.update(stamp=stamp, rows=rows, by_id=by_id)
+    return _equipment_cache
+
+def load_equipment():
+    return [dict(row) for row in _equipment_index()['rows']]
 
 def get_equipment_by_id(equipment_id):
-    for eq in load_equipment():
-        if eq['id'] == equipment_id:
-            if 'created_by' not in eq:
-                eq['created_by'] = 'Unknown'
-            return eq
-    return None
+    eq = _equipment_index()['by_id'].get(equipment_id)
+    if eq is None:
+        return None
+    eq = dict(eq)
+    if 'created_by' not in eq:
+        eq['created_by'] = 'Unknown'
+    return eq
 
 def save_inspection_log(data):
-    file_exists = os.path.exists(LOG_CSV)
-    with open(LOG_CSV, 'a', newline='') as csvfile:
-        fieldnames = ['timestamp', 'equipment_id', 'name', 'client', 'inspector_pin', 'clean', 'damage', 'functional', 'notes']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        if not file_exists:
-            writer.writeheader()
-        writer.writerow(data)
+    inspection_logs().append(data)
 
     print("Inspection saved for ID:", data['equipment_id'])
-    print("Log saved to:", os.path.abspath(LOG_CSV))
+    print("Log saved to:", os.path.abspath(LOG_DB))
 
 @app.route('/')
 def index():
@@ -217,17 +241,16 @@ def inspect(equipment_id):
 
 @app.route('/logs')
 def view_logs():
-    logs = []
-    if os.path.exists(LOG_CSV):
-        with open(LOG_CSV, newline='') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                logs.append(row)
+    logs = inspection_logs().logs()
     return render_template('logs.html', logs=logs)
 
 @app.route('/download-logs')
 def download_logs():
-    return send_file(LOG_CSV, as_attachment=True)
+    return Response(
+        inspection_logs().iter_csv(),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={LOG_CSV}"}
+    )
 
 @app.route('/qrcodes')
 def view_qrcodes():
@@ -361,20 +384,8 @@ def contractor_interface(equipment_id):
     return render_template('contractor_interface.html', equipment=equipment, company=client, next_maintenance=current_next_date, allow_edit=allow_edit)
 
 def get_next_maintenance_date(equipment_id):
-    log_entries = []
-    if os.path.exists(LOG_CSV):
-        with open(LOG_CSV, newline='') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                if row['equipment_id'] == equipment_id and row['functional'].startswith("Next Maintenance:"):
-                    log_entries.append(row)
-
-    # Return the latest next maintenance date (if available)
-    if log_entries:
-        latest_entry = max(log_entries, key=lambda x: x['timestamp'])
-        return latest_entry['functional'].replace("Next Maintenance:", "").strip()
-
-    return None
+    # Latest "Next Maintenance:" entry for this equipment (index seek on equipment_id)
+    return inspection_logs().latest_next_maintenance(equipment_id)
 
 def save_next_maintenance_date(equipment_id, next_date):
     # This function logs the new date in a structured way so it can be retrieved later
@@ -410,13 +421,7 @@ def upload_media(equipment_id):
 
 @app.route('/report/client/<client_name>')
 def report_by_client(client_name):
-    logs = []
-    if os.path.exists(LOG_CSV):
-        with open(LOG_CSV, newline='') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                if row['client'].strip().lower() == client_name.strip().lower():
-                    logs.append(row)
+    logs = inspection_logs().logs(client_ci=client_name)
 
     equipment_ids = set(row['equipment_id'] for row in logs)
     equipment_list = [get_equipment_by_id(eid) for eid in equipment_ids if get_equipment_by_id(eid)]
@@ -425,13 +430,7 @@ def report_by_client(client_name):
 
 @app.route('/report/equipment/<equipment_id>')
 def report_by_equipment(equipment_id):
-    logs = []
-    if os.path.exists(LOG_CSV):
-        with open(LOG_CSV, newline='') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                if row['equipment_id'] == equipment_id:
-                    logs.append(row)
+    logs = inspection_logs().logs(equipment_id=equipment_id)
 
     equipment = get_equipment_by_id(equipment_id)
     return render_template('report_equipment.html', equipment=equipment, logs=logs)
@@ -614,95 +613,51 @@ def contractor_dashboard():
         return redirect(url_for('login'))
 
     contractor_name = session['user']['company']
-    logs = []
-
-    if os.path.exists(LOG_CSV):
-        with open(LOG_CSV, newline='') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                if f"Contractor: {contractor_name}" in row['inspector_pin']:
-                    logs.append(row)
+    logs = inspection_logs().logs(inspector_contains=f"Contractor: {contractor_name}")
 
     return render_template('contractor_dashboard.html', company=contractor_name, logs=logs)
 
-def get_clients_for_manager(manager_email):
-    clients = []
-    if os.path.exists('assignments.csv'):
+_assignments_cache = {'mtime': None, 'by_manager': {}}
+
+def _assignments_by_manager():
+    # assignments.csv is re-parsed only when the file changes
+    if not os.path.exists('assignments.csv'):
+        return {}
+    mtime = os.path.getmtime('assignments.csv')
+    if _assignments_cache['mtime'] != mtime:
+        by_manager = defaultdict(list)
         with open('assignments.csv', newline='') as f:
             reader = csv.DictReader(f)
             for row in reader:
-                if row['manager_email'].strip().lower() == manager_email.strip().lower():
-                    clients.append(row['client_name'].strip())
-    return clients
+                by_manager[row['manager_email'].strip().lower()].append(row['client_name'].strip())
+        _assignments_cache.update(mtime=mtime, by_manager=dict(by_manager))
+    return _assignments_cache['by_manager']
+
+def get_clients_for_manager(manager_email):
+    return list(_assignments_by_manager().get(manager_email.strip().lower(), []))
 
 def get_missed_inspections():
-    missed_alerts = []
+    # Parsed next_maintenance column is indexed; badly formatted dates are stored as NULL
     today = datetime.today().date()
-
-    if os.path.exists(LOG_CSV):
-        with open(LOG_CSV, newline='') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                if row['functional'].startswith("Next Maintenance:"):
-                    try:
-                        next_date = datetime.strptime(row['functional'].replace("Next Maintenance:", "").strip(), '%Y-%m-%d').date()
-                        if next_date < today:
-                            missed_alerts.append(row)
-                    except ValueError:
-                        continue  # Skip badly formatted dates
-    return missed_alerts
+    return inspection_logs().missed(today.isoformat())
 
 def get_missed_inspections_for_pm(pm_email):
     today = datetime.today().date()
-    missed_alerts = []
-
     assigned_clients = get_clients_for_manager(pm_email)
-
-    if os.path.exists(LOG_CSV):
-        with open(LOG_CSV, newline='') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                if row['client'] not in assigned_clients:
-                    continue
-                if row['functional'].startswith("Next Maintenance:"):
-                    try:
-                        next_date = datetime.strptime(
-                            row['functional'].replace("Next Maintenance:", "").strip(), "%Y-%m-%d"
-                        ).date()
-                        if next_date < today:
-                            missed_alerts.append(row)
-                    except ValueError:
-                        continue  # skip bad formats
-    return missed_alerts
+    return inspection_logs().missed(today.isoformat(), clients=assigned_clients)
 
 def get_upcoming_maintenance():
-    upcoming = []
     today = datetime.today().date()
-    seen_equipment = set()
-
-    if os.path.exists(LOG_CSV):
-        with open(LOG_CSV, newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                eq_id = row['equipment_id']
-                if row['functional'].startswith("Next Maintenance:") and eq_id not in seen_equipment:
-                    try:
-                        next_date = datetime.strptime(
-                            row['functional'].replace("Next Maintenance:", "").strip(), '%Y-%m-%d'
-                        ).date()
-                        if next_date >= today:
-                            upcoming.append({
-                                'equipment_id': eq_id,
-                                'client': row['client'],
-                                'name': row['name'],
-                                'next_date': next_date,
-                                'inspector': row['inspector_pin'],
-                            })
-                            seen_equipment.add(eq_id)
-                    except ValueError:
-                        continue
-
-    return sorted(upcoming, key=lambda x: x['next_date'])
+    return [
+        {
+            'equipment_id': row['equipment_id'],
+            'client': row['client'],
+            'name': row['name'],
+            'next_date': datetime.strptime(row['next_maintenance'], '%Y-%m-%d').date(),
+            'inspector': row['inspector_pin'],
+        }
+        for row in inspection_logs().upcoming(today.isoformat())
+    ]
 
 @app.route('/pm/alerts')
 def pm_alerts():
@@ -1212,13 +1167,7 @@ def pm_inspections():
     pm_email = session['user']['username']
     assigned_clients = get_clients_for_manager(pm_email)
 
-    logs = []
-    if os.path.exists(LOG_CSV):
-        with open(LOG_CSV, newline='') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                if row['client'] in assigned_clients:
-                    logs.append(row)
+    logs = inspection_logs().logs(clients=assigned_clients)
 
     return render_template('pm_inspections.html', logs=logs, clients=assigned_clients)
 
@@ -1668,18 +1617,15 @@ def download_inspection_log(equipment_id):
         flash("Unauthorized access", "danger")
         return redirect(url_for('login'))
 
-    logs = []
-    if os.path.exists(LOG_CSV):
-        with open(LOG_CSV, newline='', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if equipment_id == 'all' or row['equipment_id'] == equipment_id:
-                    logs.append(row)
-
-    if not logs:
+    filters = {} if equipment_id == 'all' else {'equipment_id': equipment_id}
+    if not inspection_logs().count(**filters):
         flash("No logs found.", "warning")
         return redirect(url_for('property_manager_dashboard'))
 
+    filename = 'all_inspection_logs' if equipment_id == 'all' else f'inspection_log_{equipment_id}'
+    if request.args.get('format') == 'csv':
+        return _inspection_csv_response(filters, f'{filename}.csv')
+
     if equipment_id == 'all':
         equipment = {'id': 'All Equipment', 'name': 'All Equipment'}
     else:
@@ -1688,16 +1634,11 @@ def download_inspection_log(equipment_id):
             flash("Equipment not found.", "warning")
             return redirect(url_for('property_manager_dashboard'))
 
-    rendered = render_template('inspection_log_pdf.html', logs=logs, equipment=equipment)
-
-    pdf = HTML(string=rendered).write_pdf()
-
-    response = make_response(pdf)
-    response.headers['Content-Type'] = 'application/pdf'
-    filename = 'all_inspection_logs.pdf' if equipment_id == 'all' else f'inspection_log_{equipment_id}.pdf'
-    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
-
-    return response
+    return _inspection_pdf_response(
+        filters, equipment, f'{filename}.pdf',
+        background=request.args.get('deliver') == 'background',
+        fallback_url=url_for('property_manager_dashboard'),
+    )
 
 @app.route('/export-inspections', methods=['GET', 'POST'])
 def filtered_inspection_export():
@@ -1722,40 +1663,121 @@ def filtered_inspection_export():
     start_date = request.form.get('start_date')
     end_date = request.form.get('end_date')
     add_watermark = request.form.get('add_watermark') == 'yes'
+    export_format = request.form.get('format', 'pdf')
 
-    logs = []
-    if os.path.exists(LOG_CSV):
-        with open(LOG_CSV, newline='', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                match = True
-                if selected_client and selected_client != row.get('client', ''):
-                    match = False
-                if start_date and row['timestamp'] < start_date:
-                    match = False
-                if end_date and row['timestamp'] > end_date + "T23:59:59":
-                    match = False
+    filters = {
+        'client': selected_client or None,
+        'start': start_date or None,
+        'end': (end_date + "T23:59:59") if end_date else None,
+    }
+    filters = {k: v for k, v in filters.items() if v}
 
-                if match:
-                    logs.append(row)
+    if export_format == 'csv':
+        return _inspection_csv_response(filters, 'filtered_inspections.csv')
 
     equipment = {'name': 'Filtered Inspections', 'id': 'Multiple'}
+    return _inspection_pdf_response(
+        filters, equipment, 'filtered_inspections.pdf',
+        add_watermark=add_watermark,
+        background=request.form.get('deliver') == 'background',
+        fallback_url=url_for('filtered_inspection_export'),
+    )
 
-    rendered = render_template(
-        'inspection_log_pdf.html',
-        logs=logs,
-        equipment=equipment,
-        now=datetime.now(),
-        add_watermark=add_watermark
+
+# ---------- Inspection log exports (streamed CSV, chunked PDF, stored artifacts) ----------
+
+_platform_sessions = None
+
+def _platform_session():
+    # ExportedFileLog lives in the platform database; one engine per process, no platform app needed
+    global _platform_sessions
+    if _platform_sessions is None:
+        import importlib
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from app.config import BaseConfig
+        importlib.import_module("app.models")  # maps every model ExportedFileLog relates to
+        engine = create_engine(BaseConfig.SQLALCHEMY_DATABASE_URI, **BaseConfig.SQLALCHEMY_ENGINE_OPTIONS)
+        _platform_sessions = sessionmaker(bind=engine)
+    return _platform_sessions()
+
+def _record_inspection_export(exported_by=None, **kwargs):
+    try:
+        with _platform_session() as db_session:
+            record_export(session=db_session, exported_by_id=platform_user_id(db_session, exported_by), **kwargs)
+    except Exception as e:
+        print(f"ExportedFileLog not recorded for {kwargs.get('file_name')}: {e}")
+
+def _inspection_csv_response(filters, filename):
+    return Response(
+        inspection_logs().iter_csv(**filters),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
 
-    pdf = HTML(string=rendered).write_pdf()
+def _build_inspection_pdf(filters, equipment, filename, add_watermark, logo_company, exported_by, path, fingerprint):
+    started = time.perf_counter()
+    generated_at = datetime.now()
 
-    response = make_response(pdf)
-    response.headers['Content-Type'] = 'application/pdf'
-    response.headers['Content-Disposition'] = 'attachment; filename=filtered_inspections.pdf'
+    def render_chunk(rows, part, parts):
+        return render_template(
+            'inspection_log_pdf.html',
+            logs=rows,
+            equipment=equipment,
+            now=generated_at,
+            add_watermark=add_watermark,
+            logo_company=logo_company,
+            part=part,
+            parts=parts,
+        )
 
-    return response
+    rows, _ = write_pdf_chunked(
+        inspection_logs(), path, filters, render_chunk, get_pdf_renderer(app.static_folder),
+        chunk_rows=PDF_CHUNK_ROWS, memory_ceiling=EXPORT_MEMORY_CEILING,
+    )
+    _record_inspection_export(
+        fingerprint=fingerprint, fmt='pdf', path=os.path.abspath(path), file_name=filename, rows=rows,
+        filters=dict(filters, exported_by=exported_by), duration_ms=int((time.perf_counter() - started) * 1000),
+        exported_by=exported_by,
+    )
+
+def _inspection_pdf_background(request_ctx_args, *args):
+    with app.test_request_context(**request_ctx_args):
+        try:
+            _build_inspection_pdf(*args)
+        except Exception as e:
+            print(f"Background inspection export failed: {e}")
+
+def _inspection_pdf_response(filters, equipment, filename, *, add_watermark=False, background=False, fallback_url=None):
+    logo_company = session['user']['company']
+    options = {'equipment': equipment, 'add_watermark': add_watermark, 'logo_company': logo_company}
+    fingerprint = export_fingerprint('pdf', filters, inspection_logs().watermark(), options)
+
+    # Identical export (same filters, no new inspections since) → serve the stored file
+    stored = find_stored_export(EXPORT_DIR, fingerprint, 'pdf')
+    if stored:
+        return send_file(os.path.abspath(stored), as_attachment=True, download_name=filename, mimetype='application/pdf')
+
+    path = stored_export_path(EXPORT_DIR, fingerprint, 'pdf')
+    exported_by = session['user'].get('email') or session['user'].get('username')
+    args = (filters, equipment, filename, add_watermark, logo_company, exported_by, path, fingerprint)
+    if background:
+        threading.Thread(
+            target=_inspection_pdf_background,
+            args=({'base_url': request.host_url},) + args,
+            daemon=True,
+        ).start()
+        flash("Your export is being prepared. Request the same export again in a minute to download it.", "info")
+        return redirect(fallback_url or url_for('index'))
+
+    try:
+        _build_inspection_pdf(*args)
+    except ExportMemoryExceeded as e:
+        print(f"Inspection export aborted: {e}")
+        flash("This export is too large to build on request. Use 'Prepare in background' instead.", "warning")
+        return redirect(fallback_url or url_for('index'))
+
+    return send_file(os.path.abspath(path), as_attachment=True, download_name=filename, mimetype='application/pdf')
 
 @app.route('/admin/upload-logo', methods=['GET', 'POST'])
 def upload_logo():
@@ -1834,31 +1856,13 @@ def contractor_settings():
 @app.route('/get-next-equipment-id', methods=['POST'])
 def get_next_equipment_id():
     client = request.form['client']
-    client_initials = ''.join(word[0] for word in client.split() if word).upper()
 
-    existing_ids = []
-    if os.path.exists(DATA_FILE):
-        with open(DATA_FILE, newline='', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if row['client'] == client:
-                    existing_ids.append(row['id'])
-
-    next_number = 1
-    if existing_ids:
-        numbers = []
-        for eq_id in existing_ids:
-            try:
-                parts = eq_id.split('-')
-                if len(parts) >= 2:
-                    num = int(parts[1])
-                    numbers.append(num)
-            except (ValueError, IndexError):
-                continue
-        if numbers:
-            next_number = max(numbers) + 1
-
-    new_id = f"EQP-{str(next_number).zfill(5)}-{client_initials}"
+    def seed(client_name):
+        # First allocation for this client: continue after the highest ID already in equipment.csv
+        return max_sequence(row['id'] for row in _equipment_index()['rows'] if row['client'] == client_name)
+
+    # Atomic per-client counter: concurrent requests (any worker) never get the same ID
+    new_id = get_equipment_id_allocator(EQUIPMENT_IDS_DB).allocate(client, seed=seed)
     return {'next_id': new_id}
 
 @app.route('/admin/capex')
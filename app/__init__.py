@@ -7,7 +7,7 @@ from datetime import datetime, timedelta
 from decimal import Decimal
 from builtins import hasattr as py_hasattr
 from flask_wtf.csrf import generate_csrf
-from flask import Flask, session, redirect, g, url_for
+from flask import Flask, session, redirect, has_request_context
 from flask_wtf import CSRFProtect
 from flask_babel import Babel
 from werkzeug.middleware.proxy_fix import ProxyFix
@@ -129,18 +129,8 @@ def create_app():
     _maybe_register("app.routes.capex", "capex_bp", None)
     _maybe_register("app.routes.tenant", "tenant_bp", "/tenant")
     _maybe_register("app.routes.super_admin.contracts", "super_admin_contracts_bp", None)
-
-    # ---- 🖌️ Settings + Theme injection (GLOBAL) ----
-    try:
-        from app.models.org.company_settings import CompanySettings  # type: ignore
-    except Exception:
-        CompanySettings = None  # type: ignore
-
-    # Also read Company branding as a fallback during onboarding
-    try:
-        from app.models.onboarding.company import Company  # type: ignore
-    except Exception:
-        Company = None  # type: ignore
+    _maybe_register("app.routes.api.dashboard", "api_dashboard_bp", None)
+    _maybe_register("app.routes.exports", "exports_bp", None)
 
     # Devtools
     try:
@@ -149,33 +139,10 @@ def create_app():
     except Exception as e:
         app.logger.info(f"Devtools not registered: {e}")
 
-    @app.before_request
-    def _load_company_settings():
-        """
-        Load CompanySettings row into g (if present).
-        Also stash a lightweight 'branding fallback' from Company when settings are absent.
-        This runs for ALL pages, including login/logout.
-        """
-        if CompanySettings is None:
-            g.company_settings = None
-        else:
-            try:
-                g.company_settings = CompanySettings.query.first()
-            except Exception as e:
-                app.logger.debug(f"CompanySettings load skipped: {e}")
-                g.company_settings = None
-
-        g.branding_fallback = None
-        if Company is not None:
-            try:
-                cid = session.get("onboarding_company_id")
-                q = Company.query
-                company = q.get(cid) if cid else None
-                if company is None:
-                    company = q.first()
-                g.branding_fallback = company
-            except Exception as e:
-                app.logger.debug(f"Branding fallback load skipped: {e}")
+    # ---- 🖌️ Settings + Theme injection (GLOBAL) ----
+    # Branding is resolved lazily (only when a template renders) from a per-company cache;
+    # see app/services/tenant_context.py. Saves call invalidate_tenant_context().
+    from app.services.tenant_context import current_tenant_context
 
     @app.context_processor
     def _inject_theme_vars():
@@ -188,80 +155,12 @@ def create_app():
         Also exposes auth-friendly BRAND_* aliases so login/logout can theme easily.
         Adds SHOW_ONBOARDING_BANNER flag for dashboards.
         """
-        S = getattr(g, "company_settings", None)
-        C = getattr(g, "branding_fallback", None)
-
-        def _norm_hex(h, default_hex):
-            if not h:
-                return default_hex
-            s = str(h).strip()
-            if not s.startswith("#"):
-                s = "#" + s
-            return s
-
-        # Colors
-        primary   = _norm_hex(getattr(S, "primary_hex", None) if S else None,
-                              _norm_hex(getattr(C, "brand_primary_color", None) if C else None, "#2152ff"))
-        secondary = _norm_hex(getattr(S, "secondary_hex", None) if S else None,
-                              _norm_hex(getattr(C, "brand_secondary_color", None) if C else None, "#2dce89"))
-        accent    = _norm_hex(getattr(S, "accent_hex", None) if S else None,
-                              _norm_hex(getattr(C, "brand_color", None) if C else None, "#f5365c"))
-        sidebar   = getattr(S, "sidebar_hex", None) if S and getattr(S, "sidebar_hex", None) else "#1f283e"
-        rounded   = bool(getattr(S, "rounded", True)) if S else True
-
-        # Logo URL resolve
-        if S and getattr(S, "logo_path", None):
-            logo_path = S.logo_path
-        elif C and getattr(C, "logo_path", None):
-            logo_path = C.logo_path
-        else:
-            logo_path = app.config.get("BRAND_LOGO_PATH", "assets/img/logo-ct-dark.png")
-
-        filename = str(logo_path).lstrip("/")
-        if filename.startswith("static/"):
-            filename = filename[len("static/"):]
-        try:
-            logo_url = url_for("static", filename=filename)
-        except Exception:
-            logo_url = f"/static/{filename}".replace("//", "/")
-
-        company_name = (getattr(C, "name", None)
-                        or getattr(S, "company_name", None)
-                        or app.config.get("BRAND_COMPANY_NAME", "LogixPM"))
-
-        # ✅ Compute whether onboarding banner should show
-        def _is_configured():
-            name_ok = bool(company_name and company_name.strip().lower() != "new company")
-            has_logo = bool((S and getattr(S, "logo_path", None)) or (C and getattr(C, "logo_path", None)))
-            has_primary = bool((S and getattr(S, "primary_hex", None)) or (C and getattr(C, "brand_primary_color", None)))
-            return name_ok and (has_logo or has_primary)
-
-        done_in_session = bool(session.get("onboarding_completed_at"))
-        show_onboarding_banner = (not done_in_session) and (not _is_configured())
-
-        # Return both THEME_* and BRAND_* (aliases for auth/public templates)
-        return dict(
-            # Theme vars (existing)
-            THEME_PRIMARY=primary,
-            THEME_SECONDARY=secondary,
-            THEME_ACCENT=accent,
-            THEME_SIDEBAR=sidebar,
-            THEME_ROUNDED=rounded,
-
-            # Branding vars (aliases, now safe on login/logout)
-            BRAND_PRIMARY_COLOR=primary,
-            BRAND_SECONDARY_COLOR=secondary,
-            BRAND_ACCENT_COLOR=accent,
-            BRAND_LOGO_URL=logo_url,
-            BRAND_COMPANY_NAME=company_name,
-
-            # New: flag the dashboard can use to hide the wizard banner
-            SHOW_ONBOARDING_BANNER=show_onboarding_banner,
-
-            # Raw objects (if anyone needs them)
-            COMPANY_SETTINGS=S,
-            COMPANY_BRANDING=C,
-        )
+        ctx = current_tenant_context()
+
+        done_in_session = has_request_context() and bool(session.get("onboarding_completed_at"))
+        show_onboarding_banner = (not done_in_session) and (not ctx.is_configured)
+
+        return dict(ctx.theme, SHOW_ONBOARDING_BANNER=show_onboarding_banner)
 
     # ---- Jinja filters & globals ----
     app.jinja_env.filters["json_prettify"] = json_prettify
@@ -340,6 +239,140 @@ def create_app():
         except Exception as e2:
             app.logger.info(f"Backfill CLI not registered: primary={e1}; fallback={e2}")
 
+    # --- Tenant KPI snapshots: invalidation hooks + CLI (flask kpi rebuild / worker) ---
+    try:
+        from app.services.dashboard.snapshots import register_snapshot_listeners
+        from app.cli.kpi import kpi as _kpi_cmd
+        register_snapshot_listeners()
+        app.cli.add_command(_kpi_cmd)
+    except Exception as e:
+        app.logger.warning(f"KPI snapshots unavailable: {e}")
+
+    # --- Contract PDF render worker CLI (flask contracts ...) ---
+    try:
+        from app.cli.contract_render import contracts as _contracts_cmd
+        app.cli.add_command(_contracts_cmd)
+    except Exception as e:
+        app.logger.info(f"Contracts render CLI not registered: {e}")
+
+    # --- Inspection log store CLI (flask inspections import-csv) ---
+    try:
+        from app.cli.inspection_logs import inspections as _inspections_cmd
+        app.cli.add_command(_inspections_cmd)
+    except Exception as e:
+        app.logger.info(f"Inspections CLI not registered: {e}")
+
+    # --- Report exports CLI (flask exports run ...) ---
+    try:
+        from app.cli.exports import exports as _exports_cmd
+        app.cli.add_command(_exports_cmd)
+    except Exception as e:
+        app.logger.info(f"Exports CLI not registered: {e}")
+
+    # --- Bank statement import CLI (flask statements import ...) ---
+    try:
+        from app.cli.statements import statements as _statements_cmd
+        app.cli.add_command(_statements_cmd)
+    except Exception as e:
+        app.logger.info(f"Statements CLI not registered: {e}")
+
+    # --- Aged debtors / creditors CLI (flask aging refresh|snapshot) ---
+    try:
+        from app.cli.aging import aging as _aging_cmd
+        app.cli.add_command(_aging_cmd)
+    except Exception as e:
+        app.logger.info(f"Aging CLI not registered: {e}")
+
+    # --- Late-fee accrual CLI (flask late-fees accrue) ---
+    try:
+        from app.cli.late_fees import late_fees as _late_fees_cmd
+        app.cli.add_command(_late_fees_cmd)
+    except Exception as e:
+        app.logger.info(f"Late-fees CLI not registered: {e}")
+
+    # --- Ledger period balances: posting hook + CLI (flask ledger ...) ---
+    try:
+        from app.utils.finance.period_balances import register_period_balance_listeners
+        from app.cli.ledger import ledger as _ledger_cmd
+        register_period_balance_listeners()
+        app.cli.add_command(_ledger_cmd)
+    except Exception as e:
+        app.logger.warning(f"Ledger period balances unavailable: {e}")
+
+    # --- Loan schedules CLI (flask loans schedule ...) ---
+    try:
+        from app.cli.loans import loans as _loans_cmd
+        app.cli.add_command(_loans_cmd)
+    except Exception as e:
+        app.logger.info(f"Loans CLI not registered: {e}")
+
+    # --- Billing runs CLI (flask billing run|rollback) ---
+    try:
+        from app.cli.billing import billing as _billing_cmd
+        app.cli.add_command(_billing_cmd)
+    except Exception as e:
+        app.logger.info(f"Billing CLI not registered: {e}")
+
+    # --- Tax rate index: drop the cached rates when TaxRate rows change ---
+    try:
+        from app.utils.finance.tax_rates import register_tax_rate_listeners
+        register_tax_rate_listeners()
+    except Exception as e:
+        app.logger.warning(f"Tax rate cache invalidation unavailable: {e}")
+
+    # --- Permission map: reload has_permission's cached role map when roles change ---
+    try:
+        from app.services.permissions import register_permission_listeners
+        register_permission_listeners()
+    except Exception as e:
+        app.logger.warning(f"Permission cache invalidation unavailable: {e}")
+
+    # --- Notification fan-out: unread-counter hook + CLI (flask notifications ...) ---
+    try:
+        from app.services.notifications import register_notification_listeners, current_user_unread_count
+        from app.cli.notifications import notifications as _notifications_cmd
+        register_notification_listeners()
+        app.jinja_env.globals["unread_notification_count"] = current_user_unread_count
+        app.cli.add_command(_notifications_cmd)
+    except Exception as e:
+        app.logger.warning(f"Notification counters unavailable: {e}")
+
+    # --- Audit sink: flush on request teardown, replay crash spool + CLI (flask audit replay) ---
+    try:
+        from app.services.audit_sink import init_audit_sink
+        from app.cli.audit import audit as _audit_cmd
+        init_audit_sink(app)
+        app.cli.add_command(_audit_cmd)
+    except Exception as e:
+        app.logger.warning(f"Audit sink replay/CLI unavailable: {e}")
+
+    # --- Outbound mail queue CLI (flask mail worker / status) ---
+    try:
+        from app.cli.mail_queue import mail_queue as _mail_cmd
+        app.cli.add_command(_mail_cmd)
+    except Exception as e:
+        app.logger.warning(f"Mail queue CLI not registered: {e}")
+
+    # --- Benchmarks CLI (flask bench ...) ---
+    try:
+        from app.cli.benchmarks import bench as _bench_cmd
+        app.cli.add_command(_bench_cmd)
+    except Exception as e:
+        app.logger.info(f"Benchmarks CLI not registered: {e}")
+
+    # --- Warm compiled contract templates (active versions) ---
+    if app.config.get("CONTRACT_TEMPLATE_WARMUP"):
+        try:
+            from app.services.contract.template_cache import warm_contract_templates
+            with app.app_context():
+                try:
+                    n = warm_contract_templates(app.config.get("CONTRACT_TEMPLATE_WARMUP_JURISDICTIONS") or None)
+                    app.logger.info(f"Warmed {n} contract template version(s)")
+                finally:
+                    db.session.remove()
+        except Exception as e:
+            app.logger.info(f"Contract template warm-up skipped: {e}")
+
     # --- DB safety net: rollback the session if a request ends with an error ---
     @app.teardown_request
     def _rollback_on_teardown(exc):
@@ -0,0 +1,56 @@
+# app/cli/aging.py
+from datetime import datetime
+
+from flask.cli import with_appcontext
+import click
+
+from app.utils.finance.aging_engine import (
+    refresh_aged_creditor_summaries,
+    refresh_aged_debtor_summaries,
+    snapshot_aging,
+)
+
+
+def _parse_day(ctx, param, value):
+    if value is None:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise click.BadParameter("expected YYYY-MM-DD")
+
+
+@click.group("aging")
+def aging():
+    """Aged debtor / creditor summaries and dated aging snapshots."""
+
+
+@aging.command("refresh")
+@click.option("--client-id", "client_ids", type=int, multiple=True, help="Limit to these clients (repeatable).")
+@click.option("--company-id", type=int, default=None, help="Limit to one company's clients.")
+@click.option("--incremental", is_flag=True, help="Only recompute units/contractors with changes since the last refresh.")
+@click.option("--side", type=click.Choice(["debtors", "creditors", "both"]), default="both", show_default=True)
+@with_appcontext
+def refresh_cmd(client_ids, company_id, incremental, side):
+    """Rebuild aged_debtor_summaries / aged_creditor_summaries."""
+    client_ids = list(client_ids) or None
+    if side in ("debtors", "both"):
+        r = refresh_aged_debtor_summaries(client_ids, company_id, incremental=incremental)
+        click.echo(f"✅ Debtors: {r['clients']} client(s), {r['units']} unit(s) — "
+                   f"{r['updated']} updated, {r['inserted']} inserted")
+    if side in ("creditors", "both"):
+        r = refresh_aged_creditor_summaries(client_ids, company_id, incremental=incremental)
+        click.echo(f"✅ Creditors: {r['clients']} client(s), {r['contractors']} contractor balance(s) — "
+                   f"{r['updated']} updated, {r['inserted']} inserted")
+
+
+@aging.command("snapshot")
+@click.option("--as-of", callback=_parse_day, required=True, help="Report date (YYYY-MM-DD).")
+@click.option("--client-id", "client_ids", type=int, multiple=True, help="Limit to these clients (repeatable).")
+@click.option("--company-id", type=int, default=None, help="Limit to one company's clients.")
+@click.option("--label", default=None, help="Snapshot label, e.g. 'Quarter End'.")
+@with_appcontext
+def snapshot_cmd(as_of, client_ids, company_id, label):
+    """Write dated aged_debtors / aged_creditors rows as at --as-of (replaces that date's rows)."""
+    r = snapshot_aging(as_of, list(client_ids) or None, company_id, label=label)
+    click.echo(f"✅ {as_of}: {r['debtors']} debtor row(s), {r['creditors']} creditor row(s)")
@@ -0,0 +1,19 @@
+# app/cli/audit.py
+from flask.cli import with_appcontext
+import click
+
+from app.services.audit_sink import audit_sink
+
+
+@click.group("audit")
+def audit():
+    """Audit log sink maintenance."""
+
+
+@audit.command("replay")
+@with_appcontext
+def replay_cmd():
+    """Write audit rows left in the spool by crashed workers or failed flushes."""
+    sink = audit_sink()
+    n = sink.replay()
+    click.echo(f"✅ Replayed {n} audit row(s) from {sink.spool_dir}")
@@ -0,0 +1,1513 @@
+# app/cli/benchmarks.py
+"""
+Benchmarks that run against the configured database.
+
+Every benchmark seeds its own rows inside a transaction and rolls it back at the end,
+so it is safe to point at a dev/staging database. Run with e.g.:
+
+    flask bench compliance-gaps --sizes 100,500,2000
+    flask bench pdf-render --pages 50 --runs 5
+    flask bench apportionment --clients 500 --units 200
+    flask bench reconciliation --lines 100000
+    flask bench statement-import --lines 200000
+    flask bench aging --clients 50 --units 200
+    flask bench late-fees --items 1000000
+    flask bench trial-balance --lines 5000000
+    flask bench amortization --loans 2000
+    flask bench billing --clients 100 --units 500
+    flask bench tax-rates --lookups 50000
+    flask bench audit --updates 10000
+    flask bench permissions --checks 20000
+    flask bench notifications --users 5000
+    flask bench email --messages 10000
+    flask bench log-pages --rows 200000
+"""
+from __future__ import annotations
+
+import time
+import uuid
+from contextlib import contextmanager
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import event
+
+from app.extensions import db
+
+
+@click.group("bench")
+def bench():
+    """Performance benchmarks (seed → measure → rollback)."""
+
+
+# ----------------------------
+# Helpers
+# ----------------------------
+
+class QueryCounter:
+    """Counts statements executed on the engine while active."""
+
+    def __init__(self):
+        self.count = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(db.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(db.engine, "before_cursor_execute", self._on_execute)
+        return False
+
+
+@contextmanager
+def _timed():
+    box = {}
+    t0 = time.perf_counter()
+    yield box
+    box["seconds"] = time.perf_counter() - t0
+
+
+def _sizes(raw: str):
+    return [int(x) for x in raw.split(",") if x.strip()]
+
+
+def _seed_company(tag: str):
+    from app.models.onboarding.company import Company
+
+    company = Company(name=f"bench-{tag}", subdomain=f"bench-{tag}", is_active=True)
+    db.session.add(company)
+    db.session.flush()
+    return company
+
+
+def _seed_role(name: str):
+    from app.models.core.role import Role
+
+    role = Role.query.filter_by(name=name).first()
+    if not role:
+        role = Role(name=name, is_active=True, is_assignable=True)
+        db.session.add(role)
+        db.session.flush()
+    return role
+
+
+# ----------------------------
+# Compliance gaps
+# ----------------------------
+
+@bench.command("compliance-gaps")
+@click.option("--sizes", default="50,200,800", show_default=True,
+              help="Comma-separated owner counts (clients and contractors each).")
+@with_appcontext
+def bench_compliance_gaps(sizes):
+    """Query count and latency of get_compliance_gaps as the tenant grows (must stay flat)."""
+    from app.models.client.client import Client
+    from app.models.core.user import User
+    from app.models.client.client_compliance_document import ClientComplianceDocument
+    from app.services.dashboard.compliance import get_compliance_gaps, REQUIRED_DOC_TYPES
+
+    required = sorted(REQUIRED_DOC_TYPES)
+    counts = []
+    try:
+        contractor_role = _seed_role("Contractor")
+        for n in _sizes(sizes):
+            tag = uuid.uuid4().hex[:8]
+            company = _seed_company(tag)
+
+            clients = [Client(company_id=company.id, name=f"bench-client-{tag}-{i}") for i in range(n)]
+            db.session.add_all(clients)
+            db.session.flush()
+            # Every other client holds the full set; the rest hold all but one type.
+            docs = []
+            for i, c in enumerate(clients):
+                held = required if i % 2 == 0 else required[:-1]
+                docs.extend(
+                    ClientComplianceDocument(client_id=c.id, document_name=t, document_type=t, file_path="bench")
+                    for t in held
+                )
+            db.session.add_all(docs)
+            db.session.add_all([
+                User(full_name=f"bench-{i}", email=f"bench-{tag}-{i}@example.invalid", password_hash="x",
+                     pin="0000", role_id=contractor_role.id, company_id=company.id)
+                for i in range(n)
+            ])
+            db.session.flush()
+
+            with QueryCounter() as qc, _timed() as t:
+                gaps = get_compliance_gaps(company_id=company.id)
+
+            expected_clients = n - (n + 1) // 2
+            if len(gaps["clients"]) != expected_clients or len(gaps["contractors"]) != n:
+                raise click.ClickException(
+                    f"n={n}: wrong result ({len(gaps['clients'])} clients, {len(gaps['contractors'])} contractors)"
+                )
+            counts.append(qc.count)
+            click.echo(f"n={n:>6}  queries={qc.count:>3}  {t['seconds'] * 1000:8.1f} ms")
+    finally:
+        db.session.rollback()
+
+    if len(set(counts)) > 1:
+        raise click.ClickException(f"Query count grew with N: {counts}")
+    click.echo("✅ Query count is flat across sizes.")
+
+
+# ----------------------------
+# PDF rendering
+# ----------------------------
+
+def _inspection_log_html(pages: int, logo_url: str) -> str:
+    """Synthetic inspection log: ~30 table rows per A4 page plus a logo on top."""
+    rows = "".join(
+        f"<tr><td>{i}</td><td>2024-01-{i % 28 + 1:02d}</td><td>Inspector {i % 7}</td>"
+        f"<td>{'Pass' if i % 5 else 'Fail'}</td><td>Routine check #{i}</td></tr>"
+        for i in range(pages * 30)
+    )
+    return (
+        "<html><head><meta charset='utf-8'></head><body>"
+        f"<img src='{logo_url}' style='height:40px'>"
+        "<h1>Inspection Log</h1>"
+        "<table><thead><tr><th>#</th><th>Date</th><th>Inspector</th><th>Result</th><th>Notes</th></tr></thead>"
+        f"<tbody>{rows}</tbody></table></body></html>"
+    )
+
+
+@bench.command("pdf-render")
+@click.option("--pages", default=50, show_default=True, help="Approximate pages per document.")
+@click.option("--runs", default=5, show_default=True, help="Documents rendered per mode.")
+@with_appcontext
+def bench_pdf_render(pages, runs):
+    """Cold (fresh HTML/CSS/fonts per render) vs warm (shared PdfRenderer) throughput."""
+    import os
+    from flask import current_app
+
+    try:
+        from weasyprint import CSS, HTML  # type: ignore
+    except Exception as e:
+        raise click.ClickException(f"WeasyPrint is not available: {e}")
+    from app.services.pdf import PdfRenderer
+
+    static_folder = current_app.static_folder
+    static_url_path = current_app.static_url_path or "/static"
+    css_rel = "css/pdf.css"
+    css_abs = os.path.join(static_folder, css_rel)
+    html = _inspection_log_html(pages, f"{static_url_path}/logo.png")
+
+    # Cold: what the routes did before — new CSS object and default fetcher every time.
+    with _timed() as cold:
+        for _ in range(runs):
+            sheets = [CSS(filename=css_abs)] if os.path.exists(css_abs) else []
+            HTML(string=html, base_url=static_folder).write_pdf(stylesheets=sheets)
+
+    # Warm: a dedicated renderer (not the process-wide one) so stats reflect this run only.
+    renderer = PdfRenderer(static_folder, static_url_path)
+    renderer.render(html, stylesheets=[css_rel])  # prime fonts, CSS, logo
+    with _timed() as warm:
+        for _ in range(runs):
+            renderer.render(html, stylesheets=[css_rel])
+
+    cold_ms = cold["seconds"] * 1000 / runs
+    warm_ms = warm["seconds"] * 1000 / runs
+    click.echo(f"pages≈{pages}  runs={runs}")
+    click.echo(f"cold  {cold_ms:8.1f} ms/doc  {runs / cold['seconds']:6.2f} docs/s")
+    click.echo(f"warm  {warm_ms:8.1f} ms/doc  {runs / warm['seconds']:6.2f} docs/s")
+    click.echo(f"speedup ×{cold_ms / warm_ms:.2f}")
+    for k, v in renderer.stats().items():
+        click.echo(f"  {k:18s} {v}")
+
+
+# ----------------------------
+# Inspection log store
+# ----------------------------
+
+@bench.command("inspection-log")
+@click.option("--rows", default=1_000_000, show_default=True, help="Inspection rows to generate.")
+@click.option("--equipment", default=5_000, show_default=True, help="Distinct equipment IDs.")
+@click.option("--clients", default=200, show_default=True, help="Distinct clients.")
+def bench_inspection_log(rows, equipment, clients):
+    """Full CSV scans (old app.py read paths) vs indexed InspectionLogStore queries."""
+    import csv
+    import os
+    import tempfile
+    from datetime import date, datetime, timedelta
+
+    from app.services.inspection_logs import FIELDNAMES, InspectionLogStore
+
+    start = datetime(2020, 1, 1)
+    today = date.today().isoformat()
+
+    def gen():
+        for i in range(rows):
+            ts = start + timedelta(minutes=i)
+            row = dict.fromkeys(FIELDNAMES, "")
+            row.update(timestamp=ts.isoformat(), equipment_id=f"EQ-{i % equipment:05d}", name="Lift",
+                       client=f"Client {i % clients}", inspector_pin="1234", clean="Yes", damage="No",
+                       functional="Yes", notes="bench")
+            if i % 10 == 0:
+                row["functional"] = f"Next Maintenance: {(ts + timedelta(days=180)).date().isoformat()}"
+            yield row
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "inspection_logs.csv")
+        with _timed() as t:
+            with open(csv_path, "w", newline="") as f:
+                w = csv.DictWriter(f, fieldnames=FIELDNAMES)
+                w.writeheader()
+                w.writerows(gen())
+        click.echo(f"generated {rows} rows in {t['seconds']:.1f} s")
+
+        store = InspectionLogStore(os.path.join(tmp, "inspection_logs.sqlite3"))
+        with _timed() as t:
+            store.import_csv(csv_path, batch_size=20_000)
+        click.echo(f"imported into store in {t['seconds']:.1f} s")
+
+        def scan(pred):
+            with open(csv_path, newline="") as f:
+                return [r for r in csv.DictReader(f) if pred(r)]
+
+        eq, cl = f"EQ-{equipment // 2:05d}", f"Client {clients // 2}"
+        lo, hi = (start + timedelta(days=100)).isoformat(), (start + timedelta(days=101)).isoformat()
+
+        def missed_scan(r):
+            nm = r["functional"]
+            return nm.startswith("Next Maintenance:") and nm.replace("Next Maintenance:", "").strip() < today
+
+        cases = [
+            ("per-equipment history", lambda: scan(lambda r: r["equipment_id"] == eq),
+             lambda: store.logs(equipment_id=eq)),
+            ("client report", lambda: scan(lambda r: r["client"] == cl),
+             lambda: store.logs(client=cl)),
+            ("one-day range", lambda: scan(lambda r: lo <= r["timestamp"] <= hi),
+             lambda: store.logs(start=lo, end=hi)),
+            ("latest next-maint.", lambda: scan(lambda r: r["equipment_id"] == eq and r["functional"].startswith("Next Maintenance:")),
+             lambda: store.latest_next_maintenance(eq)),
+            ("missed maintenance", lambda: scan(missed_scan),
+             lambda: store.missed(today)),
+        ]
+        click.echo(f"{'query':24s} {'csv scan':>10s} {'store':>10s} {'speedup':>8s}")
+        for label, old, new in cases:
+            with _timed() as t_old:
+                expected = old()
+            with _timed() as t_new:
+                got = new()
+            if isinstance(got, list) and len(got) != len(expected):
+                raise click.ClickException(f"{label}: {len(got)} rows from store, {len(expected)} from CSV")
+            click.echo(f"{label:24s} {t_old['seconds'] * 1000:8.1f}ms {t_new['seconds'] * 1000:8.1f}ms "
+                       f"×{t_old['seconds'] / max(t_new['seconds'], 1e-9):7.1f}")
+        store.close()
+
+
+# ----------------------------
+# Equipment ID allocation
+# ----------------------------
+
+def _sqlite_alloc_worker(args):
+    path, client, n = args
+    from app.services.equipment_ids import EquipmentIdAllocator
+
+    allocator = EquipmentIdAllocator(path)
+    return [allocator.allocate(client) for _ in range(n)]
+
+
+def _db_alloc_worker(args):
+    client_id, n = args
+    from app import create_app
+    from app.services.equipment_ids import allocate_equipment_sequence
+
+    app = create_app()
+    with app.app_context():
+        return [allocate_equipment_sequence(client_id) for _ in range(n)]
+
+
+@bench.command("equipment-ids")
+@click.option("--count", default=10_000, show_default=True, help="IDs to allocate in total.")
+@click.option("--processes", default=8, show_default=True, help="Parallel allocating processes.")
+@click.option("--backend", type=click.Choice(["sqlite", "db"]), default="sqlite", show_default=True,
+              help="sqlite: legacy app.py counter file; db: equipment_sequences in the platform database.")
+@with_appcontext
+def bench_equipment_ids(count, processes, backend):
+    """Allocate IDs from parallel processes and fail on any duplicate."""
+    import os
+    import tempfile
+    from concurrent.futures import ProcessPoolExecutor
+
+    per_proc = [count // processes + (1 if i < count % processes else 0) for i in range(processes)]
+    cleanup = None
+
+    if backend == "sqlite":
+        from app.services.equipment_ids import EquipmentIdAllocator
+
+        tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(tmp.name, "equipment_ids.sqlite3")
+        EquipmentIdAllocator(path).close()  # create the schema, then drop the connection before forking
+        jobs, worker, cleanup = [(path, "Bench Client", n) for n in per_proc], _sqlite_alloc_worker, tmp.cleanup
+    else:
+        from app.models.client.client import Client
+        from app.models.maintenance.equipment_sequence import EquipmentSequence
+
+        # Workers are separate processes, so the scratch tenant has to be committed (and removed after).
+        company = _seed_company(uuid.uuid4().hex[:8])
+        client = Client(company_id=company.id, name="Bench Client")
+        db.session.add(client)
+        db.session.commit()
+        client_id, company_id = client.id, company.id
+        jobs, worker = [(client_id, n) for n in per_proc], _db_alloc_worker
+
+        def cleanup():
+            from app.models.onboarding.company import Company
+            EquipmentSequence.query.filter_by(client_id=client_id).delete()
+            Client.query.filter_by(id=client_id).delete()
+            Company.query.filter_by(id=company_id).delete()
+            db.session.commit()
+
+        db.engine.dispose()  # don't share pooled connections with forked workers
+
+    try:
+        with _timed() as t, ProcessPoolExecutor(max_workers=processes) as pool:
+            allocated = [i for batch in pool.map(worker, jobs) for i in batch]
+    finally:
+        cleanup()
+
+    unique = set(allocated)
+    click.echo(f"{backend}: {len(allocated)} IDs from {processes} processes in {t['seconds']:.2f} s "
+               f"({len(allocated) / t['seconds']:.0f}/s)")
+    if len(unique) != len(allocated):
+        raise click.ClickException(f"{len(allocated) - len(unique)} duplicate ID(s) allocated")
+    click.echo("✅ No duplicates.")
+
+
+# ----------------------------
+# Apportionment
+# ----------------------------
+
+@bench.command("apportionment")
+@click.option("--clients", default=500, show_default=True, help="Developments to apportion.")
+@click.option("--units", default=200, show_default=True, help="Units (schedules) per development.")
+@with_appcontext
+def bench_apportionment(clients, units):
+    """Year-end batch apportionment: load, allocate, persist audit rows; every budget must balance to the cent."""
+    import random
+    from decimal import Decimal
+    from sqlalchemy import insert
+    from app.models.client.client import Client
+    from app.models.finance.lease_apportionment_schedule import LeaseApportionmentSchedule
+    from app.models.members.unit import Unit
+    from app.utils.finance.batch_apportionment import BatchApportionmentEngine
+
+    rng = random.Random(42)
+    methods = ("Equal", "Percentage", "UnitSize")
+    try:
+        tag = uuid.uuid4().hex[:8]
+        company = _seed_company(tag)
+        client_rows = [Client(company_id=company.id, name=f"bench-client-{tag}-{i}") for i in range(clients)]
+        db.session.add_all(client_rows)
+        db.session.flush()
+        client_ids = [c.id for c in client_rows]
+
+        with _timed() as seed_t:
+            unit_rows = db.session.execute(
+                insert(Unit).returning(Unit.id, Unit.client_id),
+                [{"client_id": cid, "company_id": company.id, "unit_label": f"U{n}",
+                  "square_meters": round(rng.uniform(35, 180), 2)}
+                 for cid in client_ids for n in range(units)],
+            ).all()
+            method_of = {cid: methods[i % len(methods)] for i, cid in enumerate(client_ids)}
+            db.session.execute(insert(LeaseApportionmentSchedule), [
+                {"client_id": cid, "unit_id": uid, "year": 2024, "method": method_of[cid], "is_active": True,
+                 "percentage": Decimal(rng.randint(1, 99999)) / 10000 if method_of[cid] == "Percentage" else None}
+                for uid, cid in unit_rows
+            ])
+        click.echo(f"seeded {len(unit_rows)} units/schedules in {seed_t['seconds']:.1f} s")
+
+        budgets = {cid: Decimal(rng.randint(1_000_000, 500_000_000)) / 100 for cid in client_ids}
+        with QueryCounter() as qc, _timed() as t:
+            engine = BatchApportionmentEngine(budgets, year=2024)
+            allocations = engine.run_allocation()
+        click.echo(f"allocate: {len(engine.ai_audit)} allocations, queries={qc.count}  {t['seconds'] * 1000:8.1f} ms")
+
+        with QueryCounter() as qc, _timed() as t:
+            written = engine.save_gar_audit_to_db(commit=False)
+        click.echo(f"persist:  {written} audit rows, statements={qc.count}  {t['seconds'] * 1000:8.1f} ms")
+    finally:
+        db.session.rollback()
+
+    unbalanced = [cid for cid, rows in allocations.items() if sum(r["amount"] for r in rows) != budgets[cid]]
+    if unbalanced:
+        raise click.ClickException(f"{len(unbalanced)} client(s) not allocated to the cent, e.g. {unbalanced[:5]}")
+    click.echo("✅ Every client's allocations sum exactly to its budget.")
+
+
+# ----------------------------
+# Journal posting
+# ----------------------------
+
+@bench.command("posting")
+@click.option("--journals", default=5_000, show_default=True, help="Draft journals to post.")
+@click.option("--lines", default=4, show_default=True, help="Debit + credit lines per journal.")
+@click.option("--unbalanced", default=0.02, show_default=True, help="Fraction of journals seeded out of balance.")
+@with_appcontext
+def bench_posting(journals, lines, unbalanced):
+    """Month-end batch posting throughput: journals/s, statement count, and a re-post that must be a no-op."""
+    import random
+    from sqlalchemy import insert
+    from app.models.finance.ledger_journal import LedgerJournal
+    from app.models.onboarding.bank_account import BankAccount
+    from app.utils.finance.posting_engine import post_journals
+
+    rng = random.Random(7)
+    half = max(1, lines // 2)
+    try:
+        company = _seed_company(uuid.uuid4().hex[:8])
+        accounts = [BankAccount(owner_type="company", owner_id=company.id, company_id=company.id,
+                                account_name=f"bench-{i}") for i in range(4)]
+        db.session.add_all(accounts)
+        db.session.flush()
+        account_ids = [a.id for a in accounts]
+
+        def _lines(balanced):
+            amounts = [rng.randint(100, 1_000_000) for _ in range(half)]
+            credit_total = sum(amounts) + (0 if balanced else rng.randint(1, 500))
+            credits = [credit_total // half] * half
+            credits[-1] += credit_total - sum(credits)
+            return ([{"account_id": rng.choice(account_ids), "type": "debit", "amount": str(a / 100)} for a in amounts]
+                    + [{"account_id": rng.choice(account_ids), "type": "credit", "amount": str(c / 100)} for c in credits])
+
+        journal_ids = db.session.execute(
+            insert(LedgerJournal).returning(LedgerJournal.id),
+            [{"journal_name": f"bench-{n}", "journal_type": "Adjustment", "status": "Draft",
+              "extracted_data": {"entries": _lines(rng.random() >= unbalanced)}} for n in range(journals)],
+        ).scalars().all()
+        db.session.flush()
+
+        with QueryCounter() as qc, _timed() as t:
+            results = post_journals(journal_ids, posted_by_id=None, commit=False)
+        by_status = {}
+        for r in results:
+            by_status[r["status"]] = by_status.get(r["status"], 0) + 1
+        click.echo(f"post:   {journals} journals in {t['seconds']:.2f} s ({journals / t['seconds']:.0f}/s), "
+                   f"statements={qc.count}  {by_status}")
+
+        with _timed() as t:
+            again = post_journals(journal_ids, posted_by_id=None, commit=False)
+        reposted = [r["journal_id"] for r in again if r["status"] == "posted"]
+        click.echo(f"repost: {t['seconds'] * 1000:.1f} ms, {len(reposted)} posted twice")
+    finally:
+        db.session.rollback()
+
+    if reposted:
+        raise click.ClickException(f"{len(reposted)} journal(s) posted twice")
+    click.echo("✅ Batch posted; re-run was a no-op.")
+
+
+
+# ----------------------------
+# Bank reconciliation
+# ----------------------------
+
+def _reconciliation_fixture(n, rng):
+    """n open invoices + n statement lines: half quote the reference, the rest drift in amount/date/text."""
+    from datetime import date
+    from app.utils.finance.reconciliation_matcher import OpenItem, StatementLine
+
+    base = date(2024, 1, 1).toordinal()
+    items, lines = [], []
+    for i in range(n):
+        cents, day, ref = rng.randint(1_000, 2_000_000), base + rng.randint(0, 365), f"INV-{i:07d}"
+        items.append(OpenItem("invoice", i, day, cents, "Debit", f"Plumbing works block {i % 50}", ref))
+        r = rng.random()
+        if r < 0.5:
+            lines.append(StatementLine(i, day + rng.randint(0, 10), cents, "Debit", f"PAYMENT {ref}", None))
+        elif r < 0.8:
+            lines.append(StatementLine(i, day + rng.randint(-3, 3), cents + rng.randint(-50, 50), "Debit", "TRANSFER", None))
+        elif r < 0.9:
+            lines.append(StatementLine(i, day + rng.randint(-20, 20), cents + rng.randint(-80, 80), "Debit",
+                                       f"plumbing works block {i % 50}", None))
+        else:
+            lines.append(StatementLine(i, day, rng.randint(1_000, 2_000_000), "Debit", "card payment", None))
+    return items, lines
+
+
+@bench.command("reconciliation")
+@click.option("--lines", "count", default=100_000, show_default=True, help="Statement lines (and open items).")
+@click.option("--db", "use_db", is_flag=True, help="Also seed invoices/bank transactions and run run_reconciliation().")
+@with_appcontext
+def bench_reconciliation(count, use_db):
+    """Multi-pass matching throughput; pass counts, success rate and accuracy against the seeded truth."""
+    import random
+    from collections import Counter
+    from app.utils.finance.reconciliation_matcher import ReconciliationMatcher
+
+    rng = random.Random(3)
+    items, lines = _reconciliation_fixture(count, rng)
+    with _timed() as t:
+        matches, unmatched = ReconciliationMatcher().match(lines, items)
+    correct = sum(1 for m in matches if m.item.id == m.line.id)
+    click.echo(f"match: {count} lines × {count} items in {t['seconds']:.2f} s  matched={len(matches)} "
+               f"({len(matches) / count:.1%}) correct={correct} {dict(Counter(m.match_pass for m in matches))}")
+
+    if not use_db:
+        return
+
+    from datetime import date
+    from decimal import Decimal
+    from sqlalchemy import insert
+    from app.models.finance.bank_transaction import BankTransaction
+    from app.models.finance.invoice import Invoice
+    from app.models.finance.reconciliation_engine import ReconciliationEngine
+    from app.models.onboarding.bank_account import BankAccount
+    from app.utils.finance.reconciliation_matcher import run_reconciliation
+
+    try:
+        tag = uuid.uuid4().hex[:8]
+        company = _seed_company(tag)
+        account = BankAccount(owner_type="company", owner_id=company.id, company_id=company.id, account_name="bench")
+        db.session.add(account)
+        db.session.flush()
+        invoice_ids = db.session.execute(insert(Invoice).returning(Invoice.id), [
+            {"invoice_number": f"{item.reference}-{tag}", "description": item.description, "company_id": company.id,
+             "amount": Decimal(item.amount_cents) / 100, "total_amount": Decimal(item.amount_cents) / 100,
+             "due_date": date.fromordinal(item.day), "status": "Approved"}
+            for item in items
+        ]).scalars().all()
+        db.session.execute(insert(BankTransaction), [
+            {"bank_account_id": account.id, "transaction_date": date.fromordinal(line.day),
+             "description": f"{line.description}-{tag}" if line.description.startswith("PAYMENT INV-") else line.description,
+             "transaction_type": line.direction, "amount": Decimal(line.amount_cents) / 100}
+            for line in lines
+        ])
+        engine = ReconciliationEngine(bank_account_id=account.id, matching_method="Multi-Pass AI")
+        db.session.add(engine)
+        db.session.flush()
+
+        with QueryCounter() as qc, _timed() as t:
+            summary = run_reconciliation(engine, commit=False)
+        click.echo(f"db:    {len(invoice_ids)} invoices, statements={qc.count}  {t['seconds']:.2f} s  {summary}")
+    finally:
+        db.session.rollback()
+
+
+# ----------------------------
+# Bank statement import
+# ----------------------------
+
+@bench.command("statement-import")
+@click.option("--lines", "count", default=200_000, show_default=True, help="Lines in the generated annual statement.")
+@click.option("--chunk-size", default=2000, show_default=True, help="Lines per transaction/checkpoint.")
+@with_appcontext
+def bench_statement_import(count, chunk_size):
+    """Import a generated CSV statement, then simulate a crash mid-way and resume; nothing may be inserted twice."""
+    import csv
+    import os
+    import random
+    import resource
+    import tempfile
+    from datetime import date, timedelta
+    from app.models.finance.bank_statement_import import BankStatementImport
+    from app.models.finance.bank_transaction import BankTransaction
+    from app.models.onboarding.bank_account import BankAccount
+    from app.models.onboarding.company import Company
+    from app.utils.finance.statement_importer import import_statement
+
+    rng = random.Random(11)
+    tmp = tempfile.TemporaryDirectory()
+    path = os.path.join(tmp.name, "statement.csv")
+    start = date(2024, 1, 1)
+    with open(path, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["Date", "Description", "Amount", "Reference"])
+        for i in range(count):
+            day = start + timedelta(days=i * 366 // count)
+            w.writerow([day.strftime("%d/%m/%Y"), f"Payment {rng.randint(1, 5000)}",
+                        f"{rng.randint(-200_000, 200_000) / 100:.2f}", f"REF{i}" if i % 3 else ""])
+
+    # The importer commits per chunk, so the scratch account is committed and deleted afterwards.
+    company = _seed_company(uuid.uuid4().hex[:8])
+    account = BankAccount(owner_type="company", owner_id=company.id, company_id=company.id, account_name="bench")
+    db.session.add(account)
+    db.session.commit()
+    account_id, company_id = account.id, company.id
+    try:
+        rss0 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        with _timed() as t:
+            imp = import_statement(path, account_id, chunk_size=chunk_size)
+        rss1 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        click.echo(f"import: {imp.rows_processed} lines in {t['seconds']:.1f} s ({imp.rows_processed / t['seconds']:.0f}/s), "
+                   f"inserted={imp.rows_inserted}, peak RSS +{(rss1 - rss0) // 1024} MB")
+
+        # Crash simulation: roll the state back to a checkpoint half-way through and resume.
+        checkpoint = (count // 2 // chunk_size) * chunk_size
+        tail_ids = [i for (i,) in db.session.query(BankTransaction.id)
+                    .filter_by(statement_import_id=imp.id).order_by(BankTransaction.id).offset(checkpoint)]
+        BankTransaction.query.filter(BankTransaction.id.in_(tail_ids)).delete(synchronize_session=False)
+        imp.rows_processed, imp.rows_inserted, imp.status = checkpoint, checkpoint, "Running"
+        db.session.commit()
+        with _timed() as t:
+            imp = import_statement(path, account_id, chunk_size=chunk_size)
+        click.echo(f"resume: from line {checkpoint} in {t['seconds']:.1f} s, inserted={imp.rows_inserted}")
+
+        again = import_statement(path, account_id, chunk_size=chunk_size)
+        total = BankTransaction.query.filter_by(bank_account_id=account_id).count()
+        click.echo(f"re-run: status={again.status}; {total} transactions for {count} lines")
+        if total != count or imp.rows_inserted != count:
+            raise click.ClickException(f"expected {count} transactions, found {total}")
+        click.echo("✅ Resumed without duplicates.")
+    finally:
+        db.session.rollback()
+        BankTransaction.query.filter_by(bank_account_id=account_id).delete()
+        BankStatementImport.query.filter_by(bank_account_id=account_id).delete()
+        BankAccount.query.filter_by(id=account_id).delete()
+        Company.query.filter_by(id=company_id).delete()
+        db.session.commit()
+        tmp.cleanup()
+
+
+# ----------------------------
+# Aged debtors
+# ----------------------------
+
+@bench.command("aging")
+@click.option("--clients", default=50, show_default=True, help="Developments.")
+@click.option("--units", default=200, show_default=True, help="Units per development.")
+@click.option("--charges", default=12, show_default=True, help="Service charges per unit.")
+@click.option("--touched", default=0.01, show_default=True, help="Fraction of charges paid before the incremental run.")
+@with_appcontext
+def bench_aging(clients, units, charges, touched):
+    """Full and incremental aged-debtor refresh; bucket totals are checked against a Python recount."""
+    import random
+    from collections import defaultdict
+    from datetime import date, datetime, timedelta
+    from decimal import Decimal
+    from sqlalchemy import insert, update
+    from app.models.client.client import Client
+    from app.models.finance.aged_debtor_summary import AgedDebtorSummary
+    from app.models.finance.service_charge import ServiceCharge
+    from app.models.members.unit import Unit
+    from app.utils.finance.aging_engine import BUCKETS, refresh_aged_debtor_summaries
+
+    rng = random.Random(7)
+    today = date.today()
+    try:
+        tag = uuid.uuid4().hex[:8]
+        company = _seed_company(tag)
+        client_rows = [Client(company_id=company.id, name=f"bench-client-{tag}-{i}") for i in range(clients)]
+        db.session.add_all(client_rows)
+        db.session.flush()
+        client_ids = [c.id for c in client_rows]
+
+        with _timed() as seed_t:
+            unit_rows = db.session.execute(
+                insert(Unit).returning(Unit.id, Unit.client_id),
+                [{"client_id": cid, "company_id": company.id, "unit_label": f"U{n}"}
+                 for cid in client_ids for n in range(units)],
+            ).all()
+            seeded_at = datetime.utcnow() - timedelta(days=1)
+            charge_rows = db.session.execute(insert(ServiceCharge).returning(ServiceCharge.id), [
+                {"client_id": cid, "unit_id": uid, "year": today.year, "amount_due": Decimal(rng.randint(5_000, 90_000)) / 100,
+                 "amount_paid": 0, "status": "Unpaid", "due_date": today - timedelta(days=rng.randint(-20, 400)),
+                 "created_at": seeded_at, "updated_at": seeded_at}
+                for uid, cid in unit_rows for _ in range(charges)
+            ]).scalars().all()
+        click.echo(f"seeded {len(unit_rows)} units, {len(charge_rows)} charges in {seed_t['seconds']:.1f} s")
+
+        with QueryCounter() as qc, _timed() as t:
+            full = refresh_aged_debtor_summaries(client_ids, commit=False)
+        click.echo(f"full:        {full['units']} units, queries={qc.count}  {t['seconds'] * 1000:8.1f} ms")
+
+        paid = rng.sample(charge_rows, max(1, int(len(charge_rows) * touched)))
+        db.session.execute(update(ServiceCharge), [
+            {"id": pk, "status": "Paid", "updated_at": datetime.utcnow() + timedelta(seconds=1)} for pk in paid
+        ])
+        with QueryCounter() as qc, _timed() as t:
+            inc = refresh_aged_debtor_summaries(client_ids, incremental=True, commit=False)
+        click.echo(f"incremental: {inc['units']} units, queries={qc.count}  {t['seconds'] * 1000:8.1f} ms")
+
+        expected = defaultdict(lambda: defaultdict(Decimal))
+        for cid, uid, due, amount, status in db.session.query(
+                ServiceCharge.client_id, ServiceCharge.unit_id, ServiceCharge.due_date,
+                ServiceCharge.amount_due, ServiceCharge.status).filter(ServiceCharge.client_id.in_(client_ids)):
+            if status == "Paid":
+                continue
+            days = (today - due).days
+            name = next(n for n, lo, hi in BUCKETS if (lo is None or days >= lo) and (hi is None or days < hi))
+            expected[(cid, uid)][name] += amount
+        mismatched = [
+            (s.client_id, s.unit_id) for s in AgedDebtorSummary.query.filter(AgedDebtorSummary.client_id.in_(client_ids))
+            if any(Decimal(getattr(s, n)) != expected[(s.client_id, s.unit_id)][n] for n, _, _ in BUCKETS)
+        ]
+    finally:
+        db.session.rollback()
+
+    if mismatched:
+        raise click.ClickException(f"{len(mismatched)} summary row(s) disagree with the recount, e.g. {mismatched[:5]}")
+    click.echo("✅ Summaries match a per-charge recount after the incremental refresh.")
+
+
+# ----------------------------
+# Late-fee accrual
+# ----------------------------
+
+@bench.command("late-fees")
+@click.option("--items", default=1_000_000, show_default=True, help="Overdue arrears to accrue.")
+@click.option("--clients", default=500, show_default=True, help="Developments (one policy set each).")
+@click.option("--chunk-size", default=5000, show_default=True, help="Arrears per chunk.")
+@with_appcontext
+def bench_late_fees(items, clients, chunk_size):
+    """Nightly accrual over N overdue items, then the same date again (must write nothing)."""
+    import random
+    from datetime import date, timedelta
+    from decimal import Decimal
+    from sqlalchemy import func, insert
+    from app.models.client.client import Client
+    from app.models.finance.arrears import Arrears
+    from app.models.finance.late_fee_interest_policy import LateFeeAndInterestPolicy
+    from app.models.finance.late_fee_transaction_log import LateFeeTransactionLog
+    from app.models.members.unit import Unit
+    from app.utils.finance.late_fee_accrual import accrue_late_fees
+
+    rng = random.Random(3)
+    as_of = date.today()
+    try:
+        tag = uuid.uuid4().hex[:8]
+        company = _seed_company(tag)
+        client_rows = [Client(company_id=company.id, name=f"bench-client-{tag}-{i}") for i in range(clients)]
+        db.session.add_all(client_rows)
+        db.session.flush()
+        client_ids = [c.id for c in client_rows]
+
+        with _timed() as seed_t:
+            unit_rows = db.session.execute(
+                insert(Unit).returning(Unit.id, Unit.client_id),
+                [{"client_id": cid, "company_id": company.id, "unit_label": f"U{n}"} for cid in client_ids for n in range(20)],
+            ).all()
+            db.session.execute(insert(LateFeeAndInterestPolicy), [
+                {"company_id": company.id, "client_id": cid, "applies_to": applies_to, "effective_date": date(2020, 1, 1),
+                 "grace_period_days": 14, "fixed_fee": Decimal("25.00"), "interest_rate_percent": 8.0 + i % 5,
+                 "interest_frequency": ("Daily", "Monthly", "Annually")[i % 3], "compound_interest": bool(i % 2),
+                 "maximum_fee": Decimal("500.00") if i % 4 == 0 else None, "min_fee_trigger_amount": Decimal("10.00")}
+                for i, cid in enumerate(client_ids) for applies_to in ("Both", "Levy")
+            ])
+            for start in range(0, items, 50_000):
+                db.session.execute(insert(Arrears), [
+                    {"unit_id": uid, "client_id": cid, "amount_due": Decimal(rng.randint(500, 500_000)) / 100,
+                     "due_date": as_of - timedelta(days=rng.randint(1, 1500)), "status": "Unpaid",
+                     "arrears_type": rng.choice(("Service Charge", "Levy")), "interest_waived": rng.random() < 0.02}
+                    for uid, cid in (rng.choice(unit_rows) for _ in range(min(50_000, items - start)))
+                ])
+        click.echo(f"seeded {items} arrears in {seed_t['seconds']:.1f} s")
+
+        with QueryCounter() as qc, _timed() as t:
+            first = accrue_late_fees(as_of, client_ids, chunk_size=chunk_size, commit=False)
+        click.echo(f"accrue: {first['scanned']} items ({first['accrued']} accruing), {first['logs']} logs, "
+                   f"statements={qc.count}  {t['seconds']:.1f} s ({first['scanned'] / t['seconds']:.0f}/s)")
+
+        with QueryCounter() as qc, _timed() as t:
+            again = accrue_late_fees(as_of, client_ids, chunk_size=chunk_size, commit=False)
+        click.echo(f"re-run: {again['logs']} logs, {again['updated']} updated, statements={qc.count}  {t['seconds']:.1f} s")
+
+        logged = db.session.query(func.coalesce(func.sum(LateFeeTransactionLog.total_penalty), 0)).filter(
+            LateFeeTransactionLog.client_id.in_(client_ids)).scalar()
+        accrued = db.session.query(func.coalesce(func.sum(Arrears.late_fee_accrued + Arrears.interest_accrued), 0)).filter(
+            Arrears.client_id.in_(client_ids)).scalar()
+    finally:
+        db.session.rollback()
+
+    if again["logs"] or again["updated"]:
+        raise click.ClickException("re-running the same date wrote rows again")
+    if Decimal(logged) != Decimal(accrued):
+        raise click.ClickException(f"log total {logged} != accrued total {accrued}")
+    click.echo("✅ Idempotent per date; logs add up to the accrued balances.")
+
+
+# ----------------------------
+# Trial balance
+# ----------------------------
+
+@bench.command("trial-balance")
+@click.option("--lines", "count", default=5_000_000, show_default=True, help="Ledger lines for the client.")
+@click.option("--accounts", default=200, show_default=True, help="Accounts in the client's chart.")
+@click.option("--years", default=5, show_default=True, help="Years of history the lines are spread over.")
+@with_appcontext
+def bench_trial_balance(count, accounts, years):
+    """Trial balance from period rollups + open month vs a brute-force sum over every ledger line."""
+    import random
+    from datetime import date, datetime, timedelta
+    from decimal import Decimal
+    from sqlalchemy import func, insert
+    from app.models.client.client import Client
+    from app.models.finance.account import Account
+    from app.models.finance.general_ledger_entry import GeneralLedgerEntry
+    from app.utils.finance.period_balances import post_ledger_entries, register_period_balance_listeners, trial_balance
+
+    register_period_balance_listeners()
+    rng = random.Random(5)
+    start = datetime(date.today().year - years, 1, 1)
+    span = (datetime.utcnow() - start).total_seconds()
+    types = ("asset", "liability", "equity", "income", "expense")
+    try:
+        tag = uuid.uuid4().hex[:8]
+        company = _seed_company(tag)
+        client = Client(company_id=company.id, name=f"bench-client-{tag}")
+        db.session.add(client)
+        db.session.flush()
+        account_ids = db.session.execute(insert(Account).returning(Account.id), [
+            {"client_id": client.id, "account_name": f"bench-{n}", "account_type": types[n % len(types)], "balance": 0}
+            for n in range(accounts)
+        ]).scalars().all()
+
+        with _timed() as seed_t:
+            for offset in range(0, count, 100_000):
+                rows = []
+                for _ in range(min(100_000, count - offset) // 2):
+                    amount = Decimal(rng.randint(1, 1_000_000)) / 100
+                    when = start + timedelta(seconds=rng.random() * span)
+                    debit, credit = rng.sample(account_ids, 2)
+                    rows.append({"account_id": debit, "entry_date": when, "description": "bench", "debit_amount": amount})
+                    rows.append({"account_id": credit, "entry_date": when, "description": "bench", "credit_amount": amount})
+                post_ledger_entries(rows, commit=False)
+        click.echo(f"posted {count} lines (with rollups) in {seed_t['seconds']:.1f} s")
+
+        # A few ORM-side postings/edits/deletes so the flush hook is exercised too.
+        edited = GeneralLedgerEntry.query.filter(GeneralLedgerEntry.account_id.in_(account_ids)).limit(3).all()
+        edited[0].debit_amount, edited[0].credit_amount = Decimal("10.00"), Decimal("10.00")
+        edited[1].entry_date = edited[1].entry_date - timedelta(days=40)
+        db.session.delete(edited[2])
+        db.session.add(GeneralLedgerEntry(account_id=account_ids[0], description="bench", debit_amount=Decimal("7.50"),
+                                          credit_amount=Decimal("7.50")))
+        db.session.flush()
+
+        as_of = date.today() - timedelta(days=3)
+        results = []
+        for _ in range(5):
+            with QueryCounter() as qc, _timed() as t:
+                tb = trial_balance(client.id, as_of)
+            results.append(t["seconds"])
+        click.echo(f"trial balance: {len(tb['accounts'])} accounts, queries={qc.count}, "
+                   f"best {min(results) * 1000:.1f} ms / worst {max(results) * 1000:.1f} ms")
+
+        with _timed() as t:
+            brute = {
+                a: d - c for a, d, c in db.session.query(
+                    GeneralLedgerEntry.account_id, func.sum(GeneralLedgerEntry.debit_amount),
+                    func.sum(GeneralLedgerEntry.credit_amount))
+                .filter(GeneralLedgerEntry.account_id.in_(account_ids),
+                        GeneralLedgerEntry.entry_date < datetime.combine(as_of + timedelta(days=1), datetime.min.time()))
+                .group_by(GeneralLedgerEntry.account_id)
+            }
+        click.echo(f"brute force:   {t['seconds'] * 1000:.1f} ms")
+    finally:
+        db.session.rollback()
+
+    wrong = [r["account_id"] for r in tb["accounts"] if r["debit"] - r["credit"] != brute.get(r["account_id"], 0)]
+    missing = {a for a, net in brute.items() if net} - {r["account_id"] for r in tb["accounts"]}
+    if wrong or missing or not tb["is_balanced"]:
+        raise click.ClickException(f"trial balance differs from the raw ledger: {wrong[:5]} {sorted(missing)[:5]}")
+    click.echo("✅ Matches the brute-force sum and balances.")
+
+
+# ----------------------------
+# Loan amortization
+# ----------------------------
+
+@bench.command("amortization")
+@click.option("--loans", "count", default=2_000, show_default=True, help="Loans in the company.")
+@click.option("--years", default=25, show_default=True, help="Term of each loan.")
+@with_appcontext
+def bench_amortization(count, years):
+    """Generate every schedule, pay two years, record a rate reset and regenerate; paid rows must not move."""
+    import random
+    from datetime import date, timedelta
+    from decimal import Decimal
+    from sqlalchemy import func, insert, update
+    from app.models.client.client import Client
+    from app.models.finance.loan import Loan
+    from app.models.finance.loan_interest_rate_history import LoanInterestRateHistory
+    from app.models.finance.loan_repayment_schedule import LoanRepaymentSchedule as S
+    from app.utils.finance.amortization import regenerate_schedules
+
+    rng = random.Random(9)
+    today = date.today()
+    try:
+        tag = uuid.uuid4().hex[:8]
+        company = _seed_company(tag)
+        client = Client(company_id=company.id, name=f"bench-client-{tag}")
+        db.session.add(client)
+        db.session.flush()
+        loan_rows = db.session.execute(insert(Loan).returning(Loan.id, Loan.loan_amount), [
+            {"company_id": company.id, "client_id": client.id, "lender_name": "bench",
+             "loan_amount": Decimal(rng.randint(50_000, 1_000_000)), "interest_rate": rng.choice((3.5, 4.25, 5.1)),
+             "start_date": today - timedelta(days=800), "end_date": today - timedelta(days=800) + timedelta(days=365 * years),
+             "repayment_frequency": rng.choice(("Monthly", "Monthly", "Quarterly")),
+             "is_interest_only": i % 10 == 0, "balloon_payment_due": i % 10 == 1,
+             "extracted_data": {"balloon_amount": "20000"} if i % 20 == 1 else None,
+             "grace_period_months": 6 if i % 4 == 0 else None}
+            for i in range(count)
+        ]).all()
+        amounts = dict(loan_rows)
+
+        with QueryCounter() as qc, _timed() as t:
+            first = regenerate_schedules(company_id=company.id, as_of=date(1900, 1, 1), commit=False)
+        click.echo(f"generate:   {first['loans']} loans, {first['instalments']} instalments, "
+                   f"statements={qc.count}  {t['seconds']:.2f} s")
+
+        db.session.execute(update(S).where(S.loan_id.in_(list(amounts)), S.due_date < today)
+                           .values(status="Paid", paid_amount=S.payment_amount))
+        paid_before = db.session.query(func.count(), func.sum(S.payment_amount)).filter(
+            S.loan_id.in_(list(amounts)), S.status == "Paid").one()
+        db.session.execute(insert(LoanInterestRateHistory), [
+            {"company_id": company.id, "client_id": client.id, "loan_id": loan_id, "old_rate": None,
+             "new_rate": Decimal("6.000"), "effective_date": today} for loan_id in amounts
+        ])
+
+        with QueryCounter() as qc, _timed() as t:
+            again = regenerate_schedules(company_id=company.id, commit=False)
+        click.echo(f"rate reset: {again['instalments']} future instalments rewritten, "
+                   f"statements={qc.count}  {t['seconds']:.2f} s")
+
+        paid_after = db.session.query(func.count(), func.sum(S.payment_amount)).filter(
+            S.loan_id.in_(list(amounts)), S.status == "Paid").one()
+        principal = dict(db.session.query(S.loan_id, func.sum(S.principal_amount))
+                         .filter(S.loan_id.in_(list(amounts))).group_by(S.loan_id).all())
+    finally:
+        db.session.rollback()
+
+    if tuple(paid_before) != tuple(paid_after):
+        raise click.ClickException(f"paid instalments changed: {tuple(paid_before)} → {tuple(paid_after)}")
+    off = [loan_id for loan_id, amount in amounts.items() if principal.get(loan_id) != amount]
+    if off:
+        raise click.ClickException(f"{len(off)} schedule(s) don't repay exactly the principal, e.g. {off[:5]}")
+    click.echo("✅ Paid instalments untouched; every schedule repays exactly its principal.")
+
+
+# ----------------------------
+# Billing run
+# ----------------------------
+
+@bench.command("billing")
+@click.option("--clients", default=100, show_default=True, help="Developments billed in the run.")
+@click.option("--units", default=500, show_default=True, help="Units per development.")
+@click.option("--chunk-size", default=2000, show_default=True, help="Units per transaction.")
+@with_appcontext
+def bench_billing(clients, units, chunk_size):
+    """Quarterly billing run over clients × units; re-run must bill nothing, numbers must be gap-free, rollback must undo."""
+    from datetime import date
+    from decimal import Decimal
+    from sqlalchemy import insert
+    from app.models.client.client import Client
+    from app.models.finance.finance_batch import FinanceBatch
+    from app.models.finance.invoice import Invoice
+    from app.models.finance.invoice_sequence import InvoiceSequence
+    from app.models.finance.lease_apportionment_schedule import LeaseApportionmentSchedule
+    from app.models.finance.service_charge import ServiceCharge
+    from app.models.members.unit import Unit
+    from app.models.onboarding.company import Company
+    from app.utils.finance.billing_run import rollback_billing_run, run_billing
+
+    # Billing commits per chunk, so the scratch tenant is committed and deleted afterwards.
+    year = date.today().year
+    company = _seed_company(uuid.uuid4().hex[:8])
+    client_rows = [Client(company_id=company.id, name=f"bench-client-{company.id}-{i}") for i in range(clients)]
+    db.session.add_all(client_rows)
+    db.session.flush()
+    client_ids = [c.id for c in client_rows]
+    unit_rows = db.session.execute(
+        insert(Unit).returning(Unit.id, Unit.client_id),
+        [{"client_id": cid, "company_id": company.id, "unit_label": f"U{n}"} for cid in client_ids for n in range(units)],
+    ).all()
+    db.session.execute(insert(LeaseApportionmentSchedule), [
+        {"client_id": cid, "unit_id": uid, "year": year, "method": "Equal", "is_active": True} for uid, cid in unit_rows
+    ])
+    db.session.commit()
+    company_id = company.id
+    budgets = {cid: Decimal(250_000 + cid % 997) for cid in client_ids}
+    try:
+        with QueryCounter() as qc, _timed() as t:
+            results = run_billing(client_ids, f"{year}/{year + 1}", "Quarterly", 2, budgets=budgets, chunk_size=chunk_size)
+        billed = sum(r["billed"] for r in results.values())
+        click.echo(f"run:      {billed} units billed, statements={qc.count}  {t['seconds']:.2f} s ({billed / t['seconds']:.0f}/s)")
+
+        with _timed() as t:
+            again = run_billing(client_ids, f"{year}/{year + 1}", "Quarterly", 2, budgets=budgets, chunk_size=chunk_size)
+        click.echo(f"re-run:   {sum(r['billed'] for r in again.values())} units billed  {t['seconds']:.2f} s")
+
+        numbers = sorted(int(n.rsplit("-", 1)[1]) for (n,) in
+                         db.session.query(Invoice.invoice_number).filter(Invoice.company_id == company_id))
+        last = db.session.get(InvoiceSequence, company_id).last_value
+        gap_free = numbers == list(range(1, last + 1))
+
+        batch_id = results[client_ids[0]]["batch_id"]
+        with _timed() as t:
+            removed = rollback_billing_run(batch_id)
+        left = ServiceCharge.query.filter_by(client_id=client_ids[0]).count()
+        click.echo(f"rollback: {removed} charges removed from one development  {t['seconds'] * 1000:.1f} ms")
+    finally:
+        db.session.rollback()
+        Invoice.query.filter_by(company_id=company_id).delete()
+        ServiceCharge.query.filter(ServiceCharge.client_id.in_(client_ids)).delete(synchronize_session=False)
+        FinanceBatch.query.filter(FinanceBatch.client_id.in_(client_ids)).delete(synchronize_session=False)
+        InvoiceSequence.query.filter_by(company_id=company_id).delete()
+        LeaseApportionmentSchedule.query.filter(LeaseApportionmentSchedule.client_id.in_(client_ids)).delete(
+            synchronize_session=False)
+        Unit.query.filter_by(company_id=company_id).delete()
+        Client.query.filter_by(company_id=company_id).delete()
+        Company.query.filter_by(id=company_id).delete()
+        db.session.commit()
+
+    if billed != clients * units or any(r["billed"] for r in again.values()):
+        raise click.ClickException(f"expected {clients * units} invoices once, got {billed} then a re-run billing more")
+    if not gap_free:
+        raise click.ClickException("invoice numbers are not a gap-free 1..n series")
+    if left:
+        raise click.ClickException(f"rollback left {left} charge(s) behind")
+    click.echo("✅ Billed once, gap-free numbering, rollback removes the batch.")
+
+
+# ----------------------------
+# Tax rate resolution
+# ----------------------------
+
+@bench.command("tax-rates")
+@click.option("--countries", default=30, show_default=True, help="Countries seeded.")
+@click.option("--regions", default=10, show_default=True, help="Regions per country with their own rates.")
+@click.option("--changes", default=8, show_default=True, help="Rate changes per jurisdiction.")
+@click.option("--lookups", default=50_000, show_default=True, help="(country, region, type, date) tuples resolved.")
+@with_appcontext
+def bench_tax_rates(countries, regions, changes, lookups):
+    """Resolve rates per row with a query vs. the cached interval index; both must agree."""
+    import random
+    from datetime import date, timedelta
+    from sqlalchemy import insert, or_
+    from app.models.finance.tax_rate import TaxRate
+    from app.utils.finance.tax_rates import invalidate_tax_rates, resolve_tax_rates
+
+    rng = random.Random(42)
+    tag = uuid.uuid4().hex[:8]
+    start = date(2015, 1, 1)
+    rows = []
+    for c in range(countries):
+        for region in [None] + [f"R{r}" for r in range(regions)]:
+            day = start
+            for n in range(changes):
+                end = day + timedelta(days=rng.randint(200, 500))
+                rows.append({"name": f"bench-{tag}", "rate": float(rng.randint(0, 25)), "tax_type": "VAT",
+                             "country": f"bench-{tag}-{c}", "region": region, "effective_from": day,
+                             "effective_to": end if n < changes - 1 else None})
+                day = end + timedelta(days=1)
+    keys = [(f"bench-{tag}-{rng.randrange(countries)}", rng.choice([None, f"R{rng.randrange(regions * 2)}"]), "VAT",
+             start + timedelta(days=rng.randrange(365 * 12))) for _ in range(lookups)]
+
+    def _query(country, region, tax_type, on):
+        # What a per-row caller would do: the regional rate, else the country-wide one.
+        for r in ([region, None] if region else [None]):
+            found = (TaxRate.query
+                     .filter(TaxRate.country == country, TaxRate.tax_type == tax_type,
+                             TaxRate.region.is_(None) if r is None else TaxRate.region == r,
+                             TaxRate.effective_from <= on,
+                             or_(TaxRate.effective_to.is_(None), TaxRate.effective_to >= on))
+                     .order_by(TaxRate.effective_from.desc()).first())
+            if found is not None:
+                return found.id
+        return None
+
+    try:
+        db.session.execute(insert(TaxRate), rows)
+        db.session.flush()
+        invalidate_tax_rates()
+        sample = keys[: min(len(keys), 2000)]
+
+        with QueryCounter() as qc, _timed() as t:
+            expected = [_query(*k) for k in sample]
+        per_row = t["seconds"] / len(sample)
+        click.echo(f"per-row query:  {len(sample)} lookups, {qc.count} queries  {t['seconds']:.2f} s "
+                   f"(~{per_row * lookups:.1f} s for {lookups})")
+
+        with QueryCounter() as qc, _timed() as t:
+            resolved = resolve_tax_rates(keys)
+        click.echo(f"interval index: {lookups} lookups, {qc.count} queries  {t['seconds'] * 1000:.1f} ms "
+                   f"(incl. loading {len(rows)} rates)")
+
+        with _timed() as t:
+            resolve_tax_rates(keys)
+        click.echo(f"warm index:     {lookups} lookups  {t['seconds'] * 1000:.1f} ms")
+        mismatches = sum(1 for k, e, r in zip(sample, expected, resolved) if e != (r.id if r else None))
+    finally:
+        db.session.rollback()
+        invalidate_tax_rates()
+
+    if mismatches:
+        raise click.ClickException(f"{mismatches} lookup(s) differ between the index and the query")
+    click.echo(f"✅ Index matches per-row queries on {len(sample)} sampled lookups.")
+
+
+# ----------------------------
+# Audit sink
+# ----------------------------
+
+@bench.command("audit")
+@click.option("--updates", default=10_000, show_default=True, help="Audited updates logged through the sink.")
+@click.option("--baseline", default=1000, show_default=True, help="Updates logged the old way (add + commit each).")
+@with_appcontext
+def bench_audit(updates, baseline):
+    """Throughput of log_audit_change via the batched sink vs. one commit per audit row."""
+    from app.models.audit import AuditLog
+    from app.models.audit.audit_log import log_audit_change
+    from app.models.onboarding.company import Company
+    from app.services.audit_sink import audit_sink, flush_audit_log
+
+    entity_type = f"bench-{uuid.uuid4().hex[:8]}"
+    before, after = Company(name="before", city="Dublin"), Company(name="after", city="Cork")
+    sink = audit_sink()
+    try:
+        with QueryCounter() as qc, _timed() as t:
+            for i in range(baseline):
+                db.session.add(AuditLog(entity_type=entity_type, entity_id=i, action="updated",
+                                        field_changes={"name": {"old": "before", "new": "after"}}))
+                db.session.commit()
+        click.echo(f"commit per row: {baseline} rows, {qc.count} statements  {t['seconds']:.2f} s "
+                   f"({baseline / t['seconds']:.0f}/s)")
+
+        written_before = sink.written
+        with _timed() as t_emit:
+            for i in range(updates):
+                log_audit_change(entity_type, baseline + i, "updated", old_obj=before, new_obj=after)
+        with _timed() as t_drain:
+            flush_audit_log()
+        total = t_emit["seconds"] + t_drain["seconds"]
+        click.echo(f"audit sink:     {updates} rows  emit {t_emit['seconds']:.2f} s + drain {t_drain['seconds']:.2f} s "
+                   f"({updates / total:.0f}/s)  written={sink.written - written_before}")
+        click.echo(f"sink stats: {sink.stats()}")
+
+        stored = AuditLog.query.filter_by(entity_type=entity_type).count()
+        sample = AuditLog.query.filter_by(entity_type=entity_type, entity_id=baseline).first()
+    finally:
+        db.session.rollback()
+        AuditLog.query.filter_by(entity_type=entity_type).delete()
+        db.session.commit()
+
+    if stored != baseline + updates:
+        raise click.ClickException(f"expected {baseline + updates} audit rows, found {stored}")
+    if not sample or (sample.field_changes or {}).get("city") != {"old": "Dublin", "new": "Cork"}:
+        raise click.ClickException("field changes were not recorded as before")
+    click.echo("✅ Every audited update was written, with the same field diffs.")
+
+
+# ----------------------------
+# Permission checks
+# ----------------------------
+
+@bench.command("permissions")
+@click.option("--roles", default=20, show_default=True, help="Roles seeded.")
+@click.option("--contexts", default=15, show_default=True, help="RolePermission contexts per role.")
+@click.option("--checks", default=20_000, show_default=True, help="Permission checks timed.")
+@with_appcontext
+def bench_permissions(roles, contexts, checks):
+    """has_permission lookups: two queries per check vs. the cached role map; edits must show up on commit."""
+    import random
+    from app.models.core.role import Role
+    from app.models.core.role_permissions import RolePermission
+    from app.services.permissions import _FLAG_ACTIONS, permissions_for_row, role_has_permissions
+
+    rng = random.Random(7)
+    tag = uuid.uuid4().hex[:8]
+    flags = [flag for flag, _ in _FLAG_ACTIONS]
+    role_rows = [Role(name=f"bench-{tag}-{r}") for r in range(roles)]
+    db.session.add_all(role_rows)
+    db.session.flush()
+    for role in role_rows:
+        db.session.add_all([RolePermission(role_id=role.id, context=f"Ctx{c}", **{f: rng.random() < 0.5 for f in flags})
+                            for c in range(contexts)])
+    db.session.commit()
+    role_names = [r.name for r in role_rows]
+    actions = [action for _, action in _FLAG_ACTIONS] + ["manage"]
+    probes = [(rng.choice(role_names), f"{rng.choice(actions)}_ctx{rng.randrange(contexts + 2)}") for _ in range(checks)]
+
+    def _query(role_name, permission):
+        # What the decorator used to do: load the role, then its permission rows.
+        role = Role.query.filter_by(name=role_name).first()
+        rows = RolePermission.query.filter_by(role_id=role.id).all()
+        return any(permission in permissions_for_row(r.context, {f: getattr(r, f) for f in flags}) for r in rows)
+
+    try:
+        sample = probes[: min(len(probes), 1000)]
+        with QueryCounter() as qc, _timed() as t:
+            expected = [_query(*p) for p in sample]
+        click.echo(f"per-check queries: {len(sample)} checks, {qc.count} queries  {t['seconds'] * 1000:.1f} ms "
+                   f"({len(sample) / t['seconds']:.0f}/s)")
+
+        role_has_permissions(role_names[0], "view_ctx0")  # load the map
+        with QueryCounter() as qc, _timed() as t:
+            resolved = [role_has_permissions(*p) for p in probes]
+        click.echo(f"cached map:        {checks} checks, {qc.count} queries  {t['seconds'] * 1000:.1f} ms "
+                   f"({checks / t['seconds']:.0f}/s)")
+        mismatches = sum(1 for e, r in zip(expected, resolved) if e != r)
+
+        row = RolePermission.query.filter_by(role_id=role_rows[0].id, context="Ctx0").first()
+        row.can_view = not row.can_view
+        db.session.commit()
+        invalidated = role_has_permissions(role_names[0], "view_ctx0") == bool(row.can_view)
+    finally:
+        db.session.rollback()
+        ids = [r.id for r in role_rows]
+        RolePermission.query.filter(RolePermission.role_id.in_(ids)).delete(synchronize_session=False)
+        Role.query.filter(Role.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+
+    if mismatches:
+        raise click.ClickException(f"{mismatches} check(s) differ between the cached map and the queries")
+    if not invalidated:
+        raise click.ClickException("a committed RolePermission change was not picked up")
+    click.echo("✅ Cached checks match the queries, add no queries, and follow committed edits.")
+
+
+# ----------------------------
+# Notification fan-out
+# ----------------------------
+
+@bench.command("notifications")
+@click.option("--users", default=5000, show_default=True, help="Residents in the tenant being alerted.")
+@click.option("--baseline", default=1000, show_default=True, help="Recipients notified the old way (ORM add per row).")
+@with_appcontext
+def bench_notifications(users, baseline):
+    """Tenant-wide alert via the fan-out engine vs. per-row ORM adds; re-send must dedupe, counters must agree."""
+    from sqlalchemy import func, insert
+    from app.models.core.notification import Notification
+    from app.models.core.notification_counter import NotificationCounter
+    from app.models.core.notification_fanout import NotificationFanout
+    from app.models.core.role import Role
+    from app.models.core.user import User
+    from app.models.onboarding.company import Company
+    from app.services.notifications import fan_out, mark_notifications_read, unread_count
+
+    tag = uuid.uuid4().hex[:8]
+    company = _seed_company(tag)
+    role = _seed_role(f"bench-resident-{tag}")
+    user_ids = db.session.execute(insert(User).returning(User.id), [
+        {"full_name": f"bench-{i}", "email": f"bench-{tag}-{i}@example.invalid", "password_hash": "x",
+         "role_id": role.id, "company_id": company.id, "is_active": True}
+        for i in range(users)
+    ]).scalars().all()
+    db.session.commit()
+    company_id, role_id = company.id, role.id
+    try:
+        sample = user_ids[:baseline]
+        with QueryCounter() as qc, _timed() as t:
+            for user in User.query.filter(User.id.in_(sample)).all():
+                db.session.add(Notification(recipient_id=user.id, message=f"bench {tag} baseline", type="alert"))
+            db.session.commit()
+        click.echo(f"ORM add per row: {len(sample)} recipients, {qc.count} statements  {t['seconds']:.2f} s "
+                   f"({len(sample) / t['seconds']:.0f}/s)")
+        Notification.query.filter(Notification.recipient_id.in_(user_ids)).delete(synchronize_session=False)
+        NotificationCounter.query.filter(NotificationCounter.user_id.in_(user_ids)).delete(synchronize_session=False)
+        db.session.commit()
+
+        with QueryCounter() as qc, _timed() as t:
+            job = fan_out(f"bench {tag}: water outage", type="alert", role_names=[role.name], company_id=company_id,
+                          background=False)
+        click.echo(f"fan-out engine:  {job.delivered} recipients, {qc.count} statements  {t['seconds']:.2f} s "
+                   f"({job.delivered / t['seconds']:.0f}/s)")
+
+        with _timed() as t:
+            again = fan_out(f"bench {tag}: water outage", type="alert", role_names=[role.name], company_id=company_id,
+                            background=False)
+        click.echo(f"re-send:         {again.delivered} delivered, {again.skipped} deduplicated  {t['seconds']:.2f} s")
+
+        with QueryCounter() as qc:
+            badge = unread_count(user_ids[0])
+        click.echo(f"badge read:      {badge} unread in {qc.count} query")
+        marked = mark_notifications_read(user_ids[0])
+        counters_ok = (unread_count(user_ids[0]) == 0 and marked == 1 and db.session.execute(
+            db.select(func.sum(NotificationCounter.unread)).where(NotificationCounter.user_id.in_(user_ids))
+        ).scalar() == users - 1)
+        delivered, skipped, total = job.delivered, again.skipped, job.total
+    finally:
+        db.session.rollback()
+        Notification.query.filter(Notification.recipient_id.in_(user_ids)).delete(synchronize_session=False)
+        NotificationCounter.query.filter(NotificationCounter.user_id.in_(user_ids)).delete(synchronize_session=False)
+        NotificationFanout.query.filter_by(company_id=company_id).delete()
+        User.query.filter(User.id.in_(user_ids)).delete(synchronize_session=False)
+        Role.query.filter_by(id=role_id).delete()
+        Company.query.filter_by(id=company_id).delete()
+        db.session.commit()
+
+    if delivered != users or total != users:
+        raise click.ClickException(f"expected {users} recipients, delivered {delivered} (resolved {total})")
+    if skipped != users:
+        raise click.ClickException(f"re-send should dedupe all {users} recipients, skipped {skipped}")
+    if not counters_ok:
+        raise click.ClickException("unread counters disagree with the notifications")
+    click.echo("✅ Delivered once per recipient, deduplicated on re-send, counters exact.")
+
+
+# ----------------------------
+# Outbound mail queue
+# ----------------------------
+
+@bench.command("email")
+@click.option("--messages", default=10000, show_default=True, help="Messages queued and delivered by the worker.")
+@click.option("--baseline", default=200, show_default=True, help="Messages sent the old way (mail.send per message).")
+@click.option("--batch-size", default=200, show_default=True, help="Messages per worker batch / SMTP connection.")
+@with_appcontext
+def bench_email(messages, baseline, batch_size):
+    """Queue + worker against a local SMTP sink vs. mail.send per message; every EmailLog must end up sent."""
+    try:
+        from aiosmtpd.controller import Controller
+    except ImportError:
+        raise click.ClickException("this benchmark needs a local SMTP sink: pip install aiosmtpd")
+    from flask import current_app
+    from flask_mail import Message
+    from app.extensions import mail
+    from app.models.audit.email_log import EmailLog
+    from app.models.communication.outbound_email import OutboundEmail
+    from app.services.mail_queue import enqueue_email, process_mail_queue
+
+    class _Sink:
+        received = 0
+
+        async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+            if address.startswith("reject-"):
+                return "550 5.1.1 no such user"
+            envelope.rcpt_tos.append(address)
+            return "250 OK"
+
+        async def handle_DATA(self, server, session, envelope):
+            self.received += len(envelope.rcpt_tos)
+            return "250 OK"
+
+    sink = _Sink()
+    controller = Controller(sink, hostname="127.0.0.1", port=0)
+    controller.start()
+    overrides = {"MAIL_SERVER": "127.0.0.1", "MAIL_PORT": controller.server.sockets[0].getsockname()[1],
+                 "MAIL_USE_TLS": False, "MAIL_USE_SSL": False, "MAIL_USERNAME": None, "MAIL_PASSWORD": None,
+                 "MAIL_SUPPRESS_SEND": False, "MAIL_DOMAIN_RATE": 0, "MAIL_DEFAULT_SENDER": "bench@example.invalid"}
+    saved = {k: current_app.config.get(k) for k in overrides}
+    current_app.config.update(overrides)
+    mail.init_app(current_app)
+    saved_limiter = current_app.extensions.pop("mail_rate_limiter", None)
+
+    tag = uuid.uuid4().hex[:8]
+    subject = f"bench {tag}"
+    try:
+        with _timed() as t:
+            for i in range(baseline):
+                mail.send(Message(subject, recipients=[f"base-{i}@example.invalid"], body="hello"))
+        click.echo(f"mail.send per message: {baseline} messages  {t['seconds']:.2f} s ({baseline / t['seconds']:.0f}/s)")
+        sink.received = 0
+
+        with _timed() as t:
+            ids = enqueue_email(subject, [f"user-{i}@example.invalid" for i in range(messages)]
+                                + [f"reject-{tag}@example.invalid"], body="hello", email_type="bench")
+        click.echo(f"enqueue:               {messages + 1} messages  {t['seconds']:.2f} s")
+
+        # Deliver only the rows seeded here: real mail queued on this database must not reach the sink.
+        totals = {"sent": 0, "failed": 0}
+        with QueryCounter() as qc, _timed() as t:
+            for lo in range(0, len(ids), batch_size):
+                stats = process_mail_queue(batch_size, ids=ids[lo:lo + batch_size])
+                totals["sent"] += stats["sent"]
+                totals["failed"] += stats["failed"]
+        click.echo(f"worker:                {totals['sent']} sent, {totals['failed']} rejected, {qc.count} statements  "
+                   f"{t['seconds']:.2f} s ({totals['sent'] / t['seconds']:.0f}/s)")
+
+        statuses = dict(db.session.execute(
+            db.select(EmailLog.delivery_status, db.func.count()).where(EmailLog.subject == subject)
+            .group_by(EmailLog.delivery_status)).all())
+        received = sink.received
+    finally:
+        db.session.rollback()
+        OutboundEmail.query.filter_by(subject=subject).delete()
+        EmailLog.query.filter_by(subject=subject).delete()
+        db.session.commit()
+        controller.stop()
+        current_app.config.update(saved)
+        mail.init_app(current_app)
+        current_app.extensions.pop("mail_rate_limiter", None)
+        if saved_limiter is not None:
+            current_app.extensions["mail_rate_limiter"] = saved_limiter
+
+    if received != messages or totals["sent"] != messages:
+        raise click.ClickException(f"expected {messages} delivered, sink received {received} (worker: {totals['sent']})")
+    if statuses != {"sent": messages, "failed": 1}:
+        raise click.ClickException(f"EmailLog statuses off: {statuses}")
+    click.echo("✅ Every message delivered once, the 550 failed without retry, EmailLog matches.")
+
+
+# ----------------------------
+# Log viewer pagination
+# ----------------------------
+
+@bench.command("log-pages")
+@click.option("--rows", default=200000, show_default=True, help="EmailLog rows seeded (timestamps repeat in bursts).")
+@click.option("--per-page", default=50, show_default=True)
+@click.option("--walk", default=200, show_default=True, help="Pages walked forward then back via cursors.")
+@with_appcontext
+def bench_log_pages(rows, per_page, walk):
+    """Deep page via OFFSET vs. keyset cursor; a cursor walk must visit every row once, in order, both ways."""
+    from datetime import datetime, timedelta
+    from sqlalchemy import insert
+    from app.models.audit.email_log import EmailLog
+    from app.utils.keyset import encode_cursor, estimate_count, exact_count, keyset_paginate
+
+    tag = f"bench-{uuid.uuid4().hex[:8]}"
+    start = datetime(2020, 1, 1)
+    for lo in range(0, rows, 10000):
+        db.session.execute(insert(EmailLog), [
+            {"email_type": tag, "recipient": f"r{i}@example.invalid", "subject": "bench",
+             "timestamp": start + timedelta(seconds=i // 5), "delivery_status": "sent"}   # 5 rows per second
+            for i in range(lo, min(lo + 10000, rows))
+        ])
+    db.session.commit()
+    base = EmailLog.query.filter(EmailLog.email_type == tag)
+    try:
+        depth = max(rows // per_page - 1, 0)
+        with QueryCounter() as qc, _timed() as t:
+            deep = (base.order_by(EmailLog.timestamp.desc(), EmailLog.id.desc())
+                    .offset(depth * per_page).limit(per_page).all())
+        click.echo(f"OFFSET page {depth}: {len(deep)} rows, {qc.count} query  {t['seconds'] * 1000:.1f} ms")
+
+        # The cursor a reader would hold after paging down to `depth`: the last row of the page before it.
+        last = (base.order_by(EmailLog.timestamp.desc(), EmailLog.id.desc()).offset(depth * per_page - 1).first()
+                if depth else None)
+        cursor = encode_cursor(last.timestamp, last.id) if last else None
+        with QueryCounter() as qc, _timed() as t:
+            seek = keyset_paginate(base, EmailLog.timestamp, EmailLog.id, after=cursor, per_page=per_page)
+        click.echo(f"keyset page {depth}:  {len(seek.items)} rows, {qc.count} query  {t['seconds'] * 1000:.1f} ms")
+        same_deep = [r.id for r in deep] == [r.id for r in seek.items]
+
+        expected = [i for (i,) in base.with_entities(EmailLog.id)
+                    .order_by(EmailLog.timestamp.desc(), EmailLog.id.desc()).limit(walk * per_page).all()]
+        seen, pages, page = [], [], keyset_paginate(base, EmailLog.timestamp, EmailLog.id, per_page=per_page)
+        with _timed() as t:
+            while True:
+                pages.append([r.id for r in page.items])
+                seen.extend(pages[-1])
+                if len(pages) >= walk or not page.has_next:
+                    break
+                page = keyset_paginate(base, EmailLog.timestamp, EmailLog.id, after=page.next_cursor, per_page=per_page)
+        click.echo(f"cursor walk:    {len(pages)} pages  {t['seconds'] / len(pages) * 1000:.2f} ms/page")
+        back_ok = True
+        for expected_page in reversed(pages[:-1]):
+            page = keyset_paginate(base, EmailLog.timestamp, EmailLog.id, before=page.prev_cursor, per_page=per_page)
+            back_ok = back_ok and [r.id for r in page.items] == expected_page
+        back_ok = back_ok and not page.has_prev
+
+        with _timed() as t:
+            exact = exact_count(base)
+        click.echo(f"exact count:    {exact}  {t['seconds'] * 1000:.1f} ms")
+        with _timed() as t:
+            approx, is_estimate = estimate_count(base)
+        click.echo(f"estimate count: {'~' if is_estimate else ''}{approx}  {t['seconds'] * 1000:.1f} ms")
+    finally:
+        db.session.rollback()
+        EmailLog.query.filter(EmailLog.email_type == tag).delete(synchronize_session=False)
+        db.session.commit()
+
+    if not same_deep:
+        raise click.ClickException("keyset page differs from the OFFSET page at the same position")
+    if seen != expected:
+        raise click.ClickException("cursor walk skipped or repeated rows")
+    if not back_ok:
+        raise click.ClickException("walking back with prev cursors did not return the same pages")
+    if exact != rows:
+        raise click.ClickException(f"exact count {exact} != {rows}")
+    click.echo("✅ Keyset pages match OFFSET, cursor walks are gap-free both ways, counts agree.")
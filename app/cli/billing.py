@@ -0,0 +1,49 @@
+# app/cli/billing.py
+from flask.cli import with_appcontext
+import click
+
+from app.utils.finance.billing_run import BILLING_PERIODS, CHARGE_TYPES, CHUNK_SIZE, rollback_billing_run, run_billing
+
+
+@click.group("billing")
+def billing():
+    """Service charge / levy billing runs."""
+
+
+@billing.command("run")
+@click.option("--client-id", "client_ids", type=int, multiple=True, help="Developments to bill (repeatable).")
+@click.option("--company-id", type=int, default=None, help="Bill every development of this company.")
+@click.option("--fiscal-year", required=True, help="Budget fiscal year, e.g. 2025/2026.")
+@click.option("--period", "billing_period", type=click.Choice(list(BILLING_PERIODS)), default="Annual", show_default=True)
+@click.option("--number", "period_number", type=int, default=1, show_default=True, help="Which period of the year.")
+@click.option("--type", "batch_type", type=click.Choice(list(CHARGE_TYPES)), default="service_charge", show_default=True)
+@click.option("--tax-type", default=None, help="Apply the development's TaxRate of this type (e.g. VAT).")
+@click.option("--chunk-size", type=int, default=CHUNK_SIZE, show_default=True, help="Units per transaction.")
+@click.option("--user-id", type=int, default=None, help="Recorded as created_by.")
+@with_appcontext
+def run_cmd(client_ids, company_id, fiscal_year, billing_period, period_number, batch_type, tax_type, chunk_size,
+            user_id):
+    """Issue one charge and invoice per unit; re-running resumes an interrupted run."""
+    from app.extensions import db
+    from app.models.client.client import Client
+
+    client_ids = list(client_ids)
+    if company_id is not None:
+        client_ids += db.session.execute(db.select(Client.id).where(Client.company_id == company_id)).scalars().all()
+    if not client_ids:
+        raise click.UsageError("pass --client-id or --company-id")
+    results = run_billing(client_ids, fiscal_year, billing_period, period_number, batch_type,
+                          tax_type=tax_type, created_by_id=user_id, chunk_size=chunk_size)
+    for client_id, r in sorted(results.items()):
+        click.echo(f"{'✅' if r['status'] == 'posted' else '⚠️'} client {client_id}: {r['status']} "
+                   f"(batch {r['batch_id']}) — {r['billed']} billed, {r['skipped']} skipped, {r['amount']}")
+
+
+@billing.command("rollback")
+@click.argument("batch_id", type=int)
+@click.option("--user-id", type=int, default=None)
+@with_appcontext
+def rollback_cmd(batch_id, user_id):
+    """Delete a billing run's charges and cancel its invoices."""
+    removed = rollback_billing_run(batch_id, modified_by_id=user_id)
+    click.echo(f"✅ Batch {batch_id} rolled back ({removed} charge(s) removed)")
@@ -0,0 +1,41 @@
+# app/cli/contract_render.py
+from flask import current_app
+from flask.cli import with_appcontext
+import click
+
+from app.services.contract.render_jobs import run_render_worker, enqueue_portfolio, batch_status
+
+
+@click.group("contracts")
+def contracts():
+    """Contract artifact rendering (PDF worker pool)."""
+
+
+@contracts.command("render-worker")
+@click.option("--workers", type=int, default=None, help="Renderer processes (default: CPU count).")
+@click.option("--batch-size", type=int, default=16, show_default=True, help="Jobs claimed per round.")
+@click.option("--poll-interval", type=float, default=2.0, show_default=True, help="Seconds to sleep when idle.")
+@click.option("--once", is_flag=True, help="Drain the queue and exit instead of polling forever.")
+@with_appcontext
+def render_worker(workers, batch_size, poll_interval, once):
+    """Render queued ContractRenderJob PDFs off the request path."""
+    click.echo("🖨️  Contract render worker started.")
+    handled = run_render_worker(workers=workers, batch_size=batch_size, poll_interval=poll_interval,
+                                once=once, log=click.echo)
+    click.echo(f"✅ Handled {handled} render job(s).")
+
+
+@contracts.command("render-portfolio")
+@click.option("--client-id", type=int, required=True, help="Render every contract of this client.")
+@click.option("--workers", type=int, default=None, help="Renderer processes (default: CPU count).")
+@with_appcontext
+def render_portfolio(client_id, workers):
+    """Queue and render all contracts of a client portfolio in parallel across cores."""
+    # HTML rendering uses url_for()/context processors, which need a request context.
+    with current_app.test_request_context("/"):
+        batch_key, queued, skipped = enqueue_portfolio(client_id)
+    click.echo(f"📦 Batch {batch_key}: {queued} queued, {skipped} unchanged (PDF already rendered).")
+    if queued:
+        run_render_worker(workers=workers, once=True, batch_key=batch_key, log=click.echo)
+    status = batch_status(batch_key)
+    click.echo(f"✅ {status['finished']}/{status['total']} finished: {status['counts']}")
@@ -0,0 +1,29 @@
+# app/cli/exports.py
+from datetime import datetime
+
+from flask.cli import with_appcontext
+import click
+
+from app.utils.export_engine import REPORTS, WRITERS, export_report
+
+
+@click.group("exports")
+def exports():
+    """Report exports (CSV / XLSX / PDF) logged in ExportedFileLog."""
+
+
+@exports.command("run")
+@click.argument("report", type=click.Choice(sorted(REPORTS)))
+@click.option("--format", "fmt", type=click.Choice(sorted(WRITERS), case_sensitive=False), default="PDF", show_default=True)
+@click.option("--client-id", type=int, default=None, help="Limit to one client.")
+@click.option("--report-date", default=None, help="YYYY-MM-DD cut-off for the report.")
+@click.option("--user-id", type=int, default=None, help="Recorded as exported_by.")
+@click.option("--force", is_flag=True, help="Rebuild even if an identical export is stored.")
+@with_appcontext
+def run(report, fmt, client_id, report_date, user_id, force):
+    """Export a named report, reusing the stored file when nothing changed."""
+    when = datetime.strptime(report_date, "%Y-%m-%d").date() if report_date else None
+    log = export_report(report, fmt, client_id=client_id, report_date=when, user_id=user_id, force=force)
+    tags = log.metadata_tags or {}
+    state = "reused" if log.reused else f"built in {tags.get('duration_ms')} ms"
+    click.echo(f"✅ {report}.{fmt.lower()}: {tags.get('rows')} row(s), {tags.get('size_bytes')} bytes, {state} → {log.file_path}")
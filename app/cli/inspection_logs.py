@@ -0,0 +1,23 @@
+# app/cli/inspection_logs.py
+import click
+
+from app.services.inspection_logs import get_inspection_log_store
+
+
+@click.group("inspections")
+def inspections():
+    """QR inspection log store (legacy app.py)."""
+
+
+@inspections.command("import-csv")
+@click.option("--csv", "csv_path", default="inspection_logs.csv", show_default=True, help="Legacy CSV log.")
+@click.option("--db", "db_path", default="inspection_logs.sqlite3", show_default=True, help="Indexed store file.")
+@click.option("--batch-size", type=int, default=5000, show_default=True, help="Rows per transaction.")
+def import_csv(csv_path, db_path, batch_size):
+    """One-shot import of inspection_logs.csv into the indexed store (re-running is a no-op)."""
+    store = get_inspection_log_store(db_path)
+    count = store.import_csv(csv_path, batch_size=batch_size)
+    if count:
+        click.echo(f"✅ Imported {count} row(s) into {store.path} ({store.count()} total).")
+    else:
+        click.echo(f"ℹ️  Nothing imported ({csv_path} missing or already imported); {store.count()} row(s) in store.")
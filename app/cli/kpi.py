@@ -0,0 +1,37 @@
+# app/cli/kpi.py
+from flask.cli import with_appcontext
+import click
+
+from app.services.dashboard.snapshots import rebuild_snapshot, rebuild_all_snapshots, run_kpi_worker
+
+
+@click.group("kpi")
+def kpi():
+    """Tenant KPI snapshot maintenance."""
+
+
+@kpi.command("rebuild")
+@click.option("--company-id", type=int, default=None, help="Rebuild a single tenant only.")
+@click.option("--only-dirty", is_flag=True, help="Skip tenants whose snapshot is already clean.")
+@click.option("--batch-size", type=int, default=50, show_default=True, help="Tenants per commit.")
+@with_appcontext
+def rebuild(company_id, only_dirty, batch_size):
+    """Rebuild TenantKpiSnapshot rows (schedule periodically, e.g. nightly + after deploys)."""
+    if company_id:
+        snap = rebuild_snapshot(company_id)
+        click.echo(f"✅ Rebuilt KPI snapshot for company {company_id} in {snap.build_ms} ms.")
+        return
+
+    count = rebuild_all_snapshots(batch_size=batch_size, only_dirty=only_dirty)
+    click.echo(f"✅ Rebuilt {count} tenant KPI snapshot(s).")
+
+
+@kpi.command("worker")
+@click.option("--poll-interval", type=float, default=30.0, show_default=True, help="Seconds between sweeps.")
+@click.option("--once", is_flag=True, help="Rebuild whatever is stale now and exit.")
+@with_appcontext
+def worker(poll_interval, once):
+    """Keep snapshots fresh: rebuild missing, dirty and expired ones ahead of dashboard reads."""
+    click.echo("📊 KPI snapshot worker started.")
+    n = run_kpi_worker(poll_interval=poll_interval, once=once, log=click.echo)
+    click.echo(f"✅ Rebuilt {n} tenant KPI snapshot(s).")
@@ -0,0 +1,30 @@
+# app/cli/late_fees.py
+from datetime import datetime
+
+from flask.cli import with_appcontext
+import click
+
+from app.utils.finance.late_fee_accrual import CHUNK_SIZE, accrue_late_fees
+
+
+@click.group("late-fees")
+def late_fees():
+    """Late-fee and interest accrual on arrears."""
+
+
+@late_fees.command("accrue")
+@click.option("--as-of", default=None, help="Accrual date (YYYY-MM-DD, default today).")
+@click.option("--client-id", "client_ids", type=int, multiple=True, help="Limit to these clients (repeatable).")
+@click.option("--company-id", type=int, default=None, help="Limit to one company's clients.")
+@click.option("--chunk-size", type=int, default=CHUNK_SIZE, show_default=True, help="Arrears per transaction.")
+@click.option("--user-id", type=int, default=None, help="Recorded as created_by on the log rows.")
+@with_appcontext
+def accrue_cmd(as_of, client_ids, company_id, chunk_size, user_id):
+    """Accrue fees/interest up to --as-of. Safe to re-run for the same date."""
+    try:
+        day = datetime.strptime(as_of, "%Y-%m-%d").date() if as_of else None
+    except ValueError:
+        raise click.BadParameter("expected YYYY-MM-DD", param_hint="--as-of")
+    s = accrue_late_fees(day, list(client_ids) or None, company_id, chunk_size=chunk_size, created_by_id=user_id)
+    click.echo(f"✅ {s['as_of']}: {s['scanned']} open arrears, {s['accrued']} accruing, {s['no_policy']} without policy — "
+               f"{s['logs']} log row(s), {s['updated']} updated (fees {s['fees']}, interest {s['interest']})")
@@ -0,0 +1,54 @@
+# app/cli/ledger.py
+from datetime import datetime
+
+from flask.cli import with_appcontext
+import click
+
+from app.utils.finance.period_balances import (
+    generate_balance_sheet,
+    generate_income_statement,
+    generate_trial_balance,
+    rebuild_period_balances,
+)
+
+
+def _parse_day(ctx, param, value):
+    if value is None:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise click.BadParameter("expected YYYY-MM-DD")
+
+
+@click.group("ledger")
+def ledger():
+    """General ledger period balances and financial statements."""
+
+
+@ledger.command("rebuild-balances")
+@click.option("--client-id", type=int, default=None, help="Only this client's accounts (default: all).")
+@with_appcontext
+def rebuild_cmd(client_id):
+    """Recompute account_period_balances from general_ledger_entries."""
+    rows = rebuild_period_balances(client_id)
+    click.echo(f"✅ Rebuilt {rows} account-period row(s)")
+
+
+@ledger.command("statements")
+@click.option("--client-id", type=int, required=True)
+@click.option("--as-of", callback=_parse_day, required=True, help="Report date (YYYY-MM-DD).")
+@click.option("--period-start", callback=_parse_day, default=None,
+              help="Income statement start (default: 1 January of --as-of's year).")
+@with_appcontext
+def statements_cmd(client_id, as_of, period_start):
+    """Generate the trial balance, balance sheet and income statement for a client."""
+    tb = generate_trial_balance(client_id, as_of, commit=False)
+    bs = generate_balance_sheet(client_id, as_of, commit=False)
+    pl = generate_income_statement(client_id, period_start or as_of.replace(month=1, day=1), as_of, commit=False)
+    from app.extensions import db
+    db.session.commit()
+    click.echo(f"✅ Trial balance {as_of}: Dr {tb.total_debits} / Cr {tb.total_credits} "
+               f"({'balanced' if tb.is_balanced else 'NOT balanced'})")
+    click.echo(f"   Balance sheet: assets {bs.total_assets}, liabilities {bs.total_liabilities}, equity {bs.total_equity}")
+    click.echo(f"   Income statement {pl.period_start}–{pl.period_end}: surplus {pl.net_surplus}")
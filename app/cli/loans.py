@@ -0,0 +1,34 @@
+# app/cli/loans.py
+from datetime import datetime
+
+from flask.cli import with_appcontext
+import click
+
+from app.utils.finance.amortization import CHUNK_SIZE, regenerate_schedules
+
+
+@click.group("loans")
+def loans():
+    """Loan repayment schedules."""
+
+
+@loans.command("schedule")
+@click.option("--company-id", type=int, default=None, help="Every loan of this company (e.g. after a rate reset).")
+@click.option("--loan-id", "loan_ids", type=int, multiple=True, help="Only these loans (repeatable).")
+@click.option("--as-of", default=None, help="Instalments due before this date are kept (YYYY-MM-DD, default today).")
+@click.option("--chunk-size", type=int, default=CHUNK_SIZE, show_default=True, help="Loans per transaction.")
+@click.option("--user-id", type=int, default=None, help="Recorded as last_modified_by.")
+@with_appcontext
+def schedule_cmd(company_id, loan_ids, as_of, chunk_size, user_id):
+    """Generate / regenerate amortization schedules (paid and past instalments are left untouched)."""
+    if company_id is None and not loan_ids:
+        raise click.UsageError("pass --company-id or --loan-id")
+    try:
+        day = datetime.strptime(as_of, "%Y-%m-%d").date() if as_of else None
+    except ValueError:
+        raise click.BadParameter("expected YYYY-MM-DD", param_hint="--as-of")
+    s = regenerate_schedules(company_id, list(loan_ids) or None, as_of=day, modified_by_id=user_id,
+                             chunk_size=chunk_size)
+    click.echo(f"✅ {s['loans']} loan(s): {s['instalments']} instalment(s) written, {s['deleted']} removed")
+    for loan_id, reason in sorted(s["skipped"].items()):
+        click.echo(f"   ⚠️ loan {loan_id} skipped: {reason}")
@@ -0,0 +1,33 @@
+# app/cli/mail_queue.py
+from flask import current_app
+from flask.cli import with_appcontext
+import click
+
+from app.services.mail_queue import DEFAULT_BATCH_SIZE, queue_status, run_mail_worker
+
+
+@click.group("mail")
+def mail_queue():
+    """Outbound email queue."""
+
+
+@mail_queue.command("worker")
+@click.option("--batch-size", type=int, default=None, help="Messages per batch / SMTP connection (default MAIL_WORKER_BATCH).")
+@click.option("--poll-interval", type=float, default=2.0, show_default=True, help="Seconds to sleep when idle.")
+@click.option("--once", is_flag=True, help="Send everything due and exit instead of polling forever.")
+@with_appcontext
+def worker_cmd(batch_size, poll_interval, once):
+    """Deliver queued emails."""
+    batch_size = batch_size or int(current_app.config.get("MAIL_WORKER_BATCH", DEFAULT_BATCH_SIZE))
+    click.echo("✉️  Mail worker started.")
+    totals = run_mail_worker(batch_size=batch_size, poll_interval=poll_interval, once=once, log=click.echo)
+    click.echo(f"✅ {totals['sent']} sent, {totals['retry']} to retry, {totals['failed']} failed, "
+               f"{totals['deferred']} deferred.")
+
+
+@mail_queue.command("status")
+@with_appcontext
+def status_cmd():
+    """Queue counts by status."""
+    for status, n in sorted(queue_status().items()):
+        click.echo(f"{status:>8}: {n}")
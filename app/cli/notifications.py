@@ -0,0 +1,43 @@
+# app/cli/notifications.py
+from flask.cli import with_appcontext
+import click
+
+from app.services.notifications import (
+    CHUNK_SIZE,
+    fanout_status,
+    rebuild_notification_counters,
+    run_notification_worker,
+)
+
+
+@click.group("notifications")
+def notifications():
+    """Notification fan-out jobs and unread counters."""
+
+
+@notifications.command("worker")
+@click.option("--chunk-size", type=int, default=CHUNK_SIZE, show_default=True, help="Recipients per transaction.")
+@click.option("--poll-interval", type=float, default=2.0, show_default=True, help="Seconds to sleep when idle.")
+@click.option("--once", is_flag=True, help="Drain the queue and exit instead of polling forever.")
+@with_appcontext
+def worker_cmd(chunk_size, poll_interval, once):
+    """Deliver queued notification fan-outs."""
+    click.echo("📣 Notification fan-out worker started.")
+    handled = run_notification_worker(chunk_size=chunk_size, poll_interval=poll_interval, once=once, log=click.echo)
+    click.echo(f"✅ Handled {handled} fan-out(s).")
+
+
+@notifications.command("status")
+@click.argument("fanout_id", type=int)
+@with_appcontext
+def status_cmd(fanout_id):
+    """Progress of one fan-out."""
+    click.echo(fanout_status(fanout_id))
+
+
+@notifications.command("rebuild-counters")
+@with_appcontext
+def rebuild_counters_cmd():
+    """Recount every user's unread notifications."""
+    n = rebuild_notification_counters()
+    click.echo(f"✅ Unread counters rebuilt for {n} user(s).")
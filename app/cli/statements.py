@@ -0,0 +1,33 @@
+# app/cli/statements.py
+from flask.cli import with_appcontext
+import click
+
+from app.utils.finance.statement_importer import FORMATS, import_statement
+
+
+@click.group("statements")
+def statements():
+    """Bank statement imports (CSV / CAMT.053 / OFX) into bank_transactions."""
+
+
+@statements.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--bank-account-id", type=int, required=True, help="BankAccount the statement belongs to.")
+@click.option("--format", "fmt", type=click.Choice(FORMATS, case_sensitive=False), default=None,
+              help="Statement format (detected from the file when omitted).")
+@click.option("--engine-id", type=int, default=None, help="ReconciliationEngine to attach the statement to.")
+@click.option("--user-id", type=int, default=None, help="Recorded as imported_by.")
+@click.option("--chunk-size", type=int, default=2000, show_default=True, help="Lines per transaction/checkpoint.")
+@with_appcontext
+def import_cmd(path, bank_account_id, fmt, engine_id, user_id, chunk_size):
+    """Stream a statement into bank_transactions; re-running resumes / skips already imported lines."""
+    from app.extensions import db
+    from app.models.finance.reconciliation_engine import ReconciliationEngine
+
+    engine = db.session.get(ReconciliationEngine, engine_id) if engine_id else None
+    if engine_id and engine is None:
+        raise click.ClickException(f"ReconciliationEngine {engine_id} not found")
+    result = import_statement(path, bank_account_id, file_format=fmt, engine=engine,
+                              imported_by_id=user_id, chunk_size=chunk_size)
+    click.echo(f"✅ {result.file_name} ({result.file_format}): {result.rows_processed} line(s), "
+               f"{result.rows_inserted} inserted, {result.rows_duplicate} duplicate(s) — {result.status}")
@@ -111,6 +111,60 @@ class BaseConfig:
     PAGINATION_PAGE_SIZE = env_int("PAGINATION_PAGE_SIZE", 25)
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 
+    # Dashboard KPI snapshots: max age (seconds) before a clean snapshot is rebuilt (by `flask kpi worker` or on read)
+    KPI_SNAPSHOT_MAX_AGE = env_int("KPI_SNAPSHOT_MAX_AGE", 15 * 60)
+
+    # Tenant branding/theme cache (per worker process)
+    TENANT_CONTEXT_TTL = env_int("TENANT_CONTEXT_TTL", 300)
+    TENANT_CONTEXT_MAX_ENTRIES = env_int("TENANT_CONTEXT_MAX_ENTRIES", 256)
+
+    # Compiled contract templates (per worker process)
+    CONTRACT_TEMPLATE_CACHE_SIZE = env_int("CONTRACT_TEMPLATE_CACHE_SIZE", 128)
+    CONTRACT_TEMPLATE_WARMUP = env_bool("CONTRACT_TEMPLATE_WARMUP", True)
+    CONTRACT_TEMPLATE_WARMUP_JURISDICTIONS = env_list("CONTRACT_TEMPLATE_WARMUP_JURISDICTIONS")  # empty = all
+
+    # Contract PDFs: render via `flask contracts render-worker` instead of inside the request
+    CONTRACT_PDF_ASYNC = env_bool("CONTRACT_PDF_ASYNC", False)
+    CONTRACT_RENDER_JOB_TIMEOUT = env_int("CONTRACT_RENDER_JOB_TIMEOUT", 10 * 60)  # reclaim stuck jobs after
+
+    # Shared WeasyPrint renderer: in-memory cache for /static assets (logos, branding uploads)
+    PDF_ASSET_CACHE_BYTES = env_int("PDF_ASSET_CACHE_BYTES", 32 * 1024 * 1024)
+
+    # Export engine (app/utils/export_engine.py)
+    EXPORT_DIR = os.getenv("EXPORT_DIR")                          # default: <instance>/exports (never under static)
+    EXPORT_YIELD_PER = env_int("EXPORT_YIELD_PER", 1000)          # rows fetched per server-side cursor batch
+    EXPORT_PDF_CHUNK_ROWS = env_int("EXPORT_PDF_CHUNK_ROWS", 500) # rows per rendered PDF part
+
+    # Tax rate interval index (per process); reloaded on every worker once a TaxRate commit bumps the
+    # shared version — the TTL is only a backstop
+    TAX_RATE_CACHE_TTL = env_int("TAX_RATE_CACHE_TTL", 300)
+
+    # Role → permission map for has_permission (per process); reloaded on every worker as soon as a
+    # Role/RolePermission commit bumps the shared version — the TTL is only a backstop
+    PERMISSION_CACHE_TTL = env_int("PERMISSION_CACHE_TTL", 300)
+
+    # Notification fan-out (app/services/notifications.py)
+    NOTIFICATION_INLINE_MAX = env_int("NOTIFICATION_INLINE_MAX", 500)        # more recipients → background delivery
+    NOTIFICATION_QUEUE_ASYNC = env_bool("NOTIFICATION_QUEUE_ASYNC", False)   # True: leave those to `flask notifications worker`
+    NOTIFICATION_DEDUP_WINDOW = env_int("NOTIFICATION_DEDUP_WINDOW", 60 * 60)  # same message_key, same user: skip
+    NOTIFICATION_JOB_TIMEOUT = env_int("NOTIFICATION_JOB_TIMEOUT", 10 * 60)    # reclaim stuck fan-outs after
+
+    # Audit sink (app/services/audit_sink.py): rows are spooled to disk, then inserted in batches
+    AUDIT_BATCH_SIZE = env_int("AUDIT_BATCH_SIZE", 500)          # flush as soon as this many are waiting
+    AUDIT_FLUSH_INTERVAL = env_int("AUDIT_FLUSH_INTERVAL", 2)    # seconds; background flush cadence
+    AUDIT_SPOOL_DIR = os.getenv("AUDIT_SPOOL_DIR")               # default: <instance>/audit_spool
+    AUDIT_SPOOL_FSYNC = env_bool("AUDIT_SPOOL_FSYNC", False)     # fsync each spooled row (survives power loss)
+
+    # Outbound mail queue (app/services/mail_queue.py); `flask mail worker` delivers it
+    MAIL_QUEUE_ASYNC = env_bool("MAIL_QUEUE_ASYNC", False)           # False: send_email() also delivers inline
+    MAIL_WORKER_BATCH = env_int("MAIL_WORKER_BATCH", 200)            # messages per claimed batch / SMTP connection
+    MAIL_MAX_ATTEMPTS = env_int("MAIL_MAX_ATTEMPTS", 6)              # transient failures before giving up
+    MAIL_RETRY_BASE_SECONDS = env_int("MAIL_RETRY_BASE_SECONDS", 30)  # backoff doubles per attempt…
+    MAIL_RETRY_MAX_SECONDS = env_int("MAIL_RETRY_MAX_SECONDS", 6 * 60 * 60)  # …up to this
+    MAIL_LOCK_TIMEOUT = env_int("MAIL_LOCK_TIMEOUT", 10 * 60)        # reclaim rows a dead worker left 'sending'
+    MAIL_DOMAIN_RATE = env_int("MAIL_DOMAIN_RATE", 50)               # messages/second per recipient domain
+    MAIL_DOMAIN_RATE_LIMITS = env_list("MAIL_DOMAIN_RATE_LIMITS", [])  # overrides, e.g. "gmail.com=20,outlook.com=10"
+
     # ---------- Branding defaults (paths are relative to app/static) ----------
     # Platform (LogixPM) logo displayed in platform-level areas and alongside tenant on login/logout.
     PLATFORM_LOGO_PATH = os.getenv("PLATFORM_LOGO_PATH", "static/assets/img/logixpm-logo.png")
@@ -1,15 +1,16 @@
 from functools import wraps
 from flask import session, redirect, url_for, flash
-from app.models.core.role import Role
-from app.models.core.role_permissions import RolePermission
+from app.services.permissions import SUPER_ADMIN, role_exists, role_has_permissions
 
 
-def has_permission(required_permission):
+def has_permission(*required_permissions, require_all=True):
     """
     🔐 Decorator to enforce role-based permission access.
 
     - Grants full access to Super Admins
-    - Checks RolePermission table for explicit permission match
+    - Checks the role's permissions (RolePermission flags + permissions_matrix) for a match;
+      with several permissions, all are required unless require_all=False
+    - Resolved from the cached role → permission map (app/services/permissions.py): no queries per request
     - Redirects to login with appropriate flash message if unauthorized
     """
 
@@ -23,21 +24,16 @@ def has_permission(required_permission):
                 return redirect(url_for('auth.login'))
 
             # 🔓 Super Admin bypasses all checks
-            if role_name == 'Super Admin':
+            if role_name == SUPER_ADMIN:
                 return f(*args, **kwargs)
 
-            role = Role.query.filter_by(name=role_name).first()
-            if not role:
+            if not role_exists(role_name):
                 flash("⚠️ Access denied: Role not found", "danger")
                 return redirect(url_for('auth.login'))
 
-            has_perm = RolePermission.query.filter_by(
-                role_id=role.id,
-                permission=required_permission
-            ).first()
-
-            if not has_perm:
-                flash(f"⛔ Access denied: Missing permission '{required_permission}'", "danger")
+            if not role_has_permissions(role_name, *required_permissions, require_all=require_all):
+                missing = "', '".join(required_permissions)
+                flash(f"⛔ Access denied: Missing permission '{missing}'", "danger")
                 return redirect(url_for('auth.login'))
 
             return f(*args, **kwargs)
@@ -19,9 +19,11 @@ serializer = URLSafeTimedSerializer("temporary-placeholder-key")  # This is over
 def register_login_loader(app):
     from app.models import User
 
+    # Flask-Login calls this at most once per request (the user is kept on g); session.get()
+    # returns the identity-mapped row without a query if the request has already loaded it.
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        return db.session.get(User, int(user_id))
 
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
@@ -1,30 +1,18 @@
-def notify_users(message, capex_id=None, roles_to_notify=None, additional_emails=None):
+def notify_users(message, capex_id=None, roles_to_notify=None, additional_emails=None, company_id=None):
+    """
+    Notify everyone holding one of `roles_to_notify`, plus `additional_emails` and (silently) admins.
+    Delivered by the fan-out engine: one recipient query and batched inserts, deduplicated per recipient;
+    large audiences are delivered in the background. Returns the NotificationFanout.
+    """
     # Delayed import to avoid circular import
-    from app import db
-    from app.models import User, Notification
+    from app.services.notifications import fan_out
 
-    recipients = set()
-
-    # Get emails by role
-    if roles_to_notify:
-        users = User.query.filter(User.role.in_(roles_to_notify)).all()
-        recipients.update(user.email for user in users)
-
-    # Add manually specified emails
-    if additional_emails:
-        recipients.update(additional_emails)
-
-    # Always notify admins silently
-    admins = User.query.filter(User.role == 'Admin').all()
-    recipients.update(admin.email for admin in admins)
-
-    # Create notification entries
-    for email in recipients:
-        new_note = Notification(
-            recipient_email=email,
-            message=message,
-            capex_id=capex_id
-        )
-        db.session.add(new_note)
-
-    db.session.commit()
+    return fan_out(
+        message,
+        type='capex' if capex_id else None,
+        role_names=roles_to_notify,
+        emails=additional_emails,
+        company_id=company_id,
+        include_admins=True,
+        extracted_data={'capex_id': capex_id} if capex_id else None,
+    )
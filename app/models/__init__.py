@@ -17,8 +17,12 @@ from app.models.core.user import User
 from app.models.core.role import Role
 from app.models.core.role_permissions import RolePermission
 from app.models.core.notification import Notification
+from app.models.core.notification_counter import NotificationCounter
+from app.models.core.notification_fanout import NotificationFanout
+from app.models.core.cache_version import CacheVersion
 from app.models.core.document import Document
 from app.models.core.media_file import MediaFile
+from app.models.core.tenant_kpi_snapshot import TenantKpiSnapshot
 from app.models.exports.exported_file_log import ExportedFileLog
 
 # ----------------------------
@@ -26,6 +30,7 @@ from app.models.exports.exported_file_log import ExportedFileLog
 # ----------------------------
 from app.models.members.unit import Unit
 from app.models.maintenance.equipment import Equipment
+from app.models.maintenance.equipment_sequence import EquipmentSequence
 from app.models.maintenance.inspection import Inspection
 from app.models.maintenance.inspection_schedule import InspectionSchedule
 
@@ -49,6 +54,7 @@ from app.models.client.meeting_integration import MeetingIntegration
 from app.models.contracts.template import ContractTemplate
 from app.models.contracts.template_version import ContractTemplateVersion
 from app.models.contracts.client_contract import ClientContract
+from app.models.contracts.render_job import ContractRenderJob
 
 # ----------------------------
 # Members
@@ -115,6 +121,7 @@ from app.models.hr.hr_audit_log import HRAuditLog
 # Finance / Accounting
 # ----------------------------
 from app.models.finance.account import Account
+from app.models.finance.account_period_balance import AccountPeriodBalance
 from app.models.finance.aged_creditor import AgedCreditor
 from app.models.finance.aged_creditor_summary import AgedCreditorSummary
 from app.models.finance.aged_debtor import AgedDebtor
@@ -126,6 +133,7 @@ from app.models.finance.area_type import AreaType
 from app.models.finance.balance_sheet import BalanceSheet
 from app.models.finance.bank_reconciliation import BankReconciliation
 from app.models.finance.bank_transaction import BankTransaction
+from app.models.finance.bank_statement_import import BankStatementImport
 from app.models.finance.budget import Budget
 from app.models.finance.budget_allocation_log import BudgetAllocationLog
 from app.models.finance.budget_approval import BudgetApproval
@@ -137,6 +145,7 @@ from app.models.finance.credit_note import CreditNote
 from app.models.finance.cross_border_tax_compliance import CrossBorderTaxCompliance
 from app.models.finance.debit_note import DebitNote
 from app.models.finance.invoice import Invoice
+from app.models.finance.invoice_sequence import InvoiceSequence
 from app.models.finance.transaction import Transaction
 from app.models.finance.payment import Payment
 from app.models.finance.payment_adjustment import PaymentAdjustment
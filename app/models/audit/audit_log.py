@@ -1,11 +1,21 @@
+from functools import lru_cache
+
 from flask_login import current_user
 from app.extensions import db
 from datetime import datetime
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.inspection import inspect
 
+from app.services.audit_sink import emit_audit_row
+
 class AuditLog(db.Model):
     __tablename__ = 'audit_logs'
+    __table_args__ = (
+        # Keyset pagination in the audit trail viewer: newest first, optionally per entity or actor
+        db.Index('ix_audit_logs_timestamp_id', 'timestamp', 'id'),
+        db.Index('ix_audit_logs_entity_timestamp_id', 'entity_type', 'entity_id', 'timestamp', 'id'),
+        db.Index('ix_audit_logs_performed_by_timestamp_id', 'performed_by_id', 'timestamp', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
@@ -47,6 +57,12 @@ class AuditLog(db.Model):
         return f"<AuditLog {self.entity_type}:{self.entity_id} action={self.action} at {self.timestamp}>"
 
 
+@lru_cache(maxsize=None)
+def tracked_columns(model_class):
+    """Column attribute keys of a mapped class (mapper introspection done once per class)."""
+    return tuple(c.key for c in inspect(model_class).mapper.column_attrs)
+
+
 # ✅ Global audit logger function
 def log_audit_change(
     entity_type,
@@ -70,13 +86,12 @@ def log_audit_change(
 ):
     """
     Logs a detailed audit event with optional field tracking, GAR reasoning, and source context.
+    The row is queued on the audit sink (app/services/audit_sink.py) rather than committed here.
     """
     field_changes = {}
 
     if old_obj and new_obj:
-        tracked_fields = fields_to_track or [
-            c.key for c in inspect(new_obj.__class__).mapper.column_attrs
-        ]
+        tracked_fields = fields_to_track or tracked_columns(new_obj.__class__)
         for field in tracked_fields:
             old_val = getattr(old_obj, field, None)
             new_val = getattr(new_obj, field, None)
@@ -86,7 +101,8 @@ def log_audit_change(
                     "new": str(new_val) if new_val is not None else None
                 }
 
-    log = AuditLog(
+    # Buffered and written in batches on a separate connection: no commit of the caller's session.
+    emit_audit_row("audit", dict(
         entity_type=entity_type,
         entity_id=entity_id,
         action=action,
@@ -104,7 +120,4 @@ def log_audit_change(
         company_id=company_id,
         performed_by_id=performed_by_id or getattr(current_user, "id", None),
         timestamp=datetime.utcnow()
-    )
-
-    db.session.add(log)
-    db.session.commit()
+    ))
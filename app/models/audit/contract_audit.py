@@ -107,6 +107,9 @@ class ContractAudit(db.Model):
     __table_args__ = (
         # Fast list views & timelines
         db.Index("ix_contract_audits_contract_happened_at", "contract_id", "happened_at"),
+        # Keyset pagination in the audits list: newest first, optionally per action
+        db.Index("ix_contract_audits_happened_at_id", "happened_at", "id"),
+        db.Index("ix_contract_audits_action_happened_at_id", "action", "happened_at", "id"),
     )
 
     # -------------------------
@@ -4,6 +4,12 @@ from sqlalchemy.dialects.postgresql import JSON
 
 class EmailLog(db.Model):
     __tablename__ = 'email_logs'
+    __table_args__ = (
+        # Keyset pagination in the log viewer: newest first, optionally narrowed by user or status
+        db.Index('ix_email_logs_timestamp_id', 'timestamp', 'id'),
+        db.Index('ix_email_logs_user_timestamp_id', 'user_id', 'timestamp', 'id'),
+        db.Index('ix_email_logs_status_timestamp_id', 'delivery_status', 'timestamp', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
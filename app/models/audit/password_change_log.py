@@ -3,6 +3,11 @@ from datetime import datetime
 
 class PasswordChangeLog(db.Model):
     __tablename__ = 'password_change_logs'
+    __table_args__ = (
+        # Keyset pagination in the log viewer: newest first, optionally for one user
+        db.Index('ix_password_change_logs_timestamp_id', 'timestamp', 'id'),
+        db.Index('ix_password_change_logs_user_timestamp_id', 'user_id', 'timestamp', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
@@ -1,2 +1,3 @@
 from .external_email_log import ExternalEmailLog
-from .email_attachment import EmailAttachment
\ No newline at end of file
+from .email_attachment import EmailAttachment
+from .outbound_email import OutboundEmail
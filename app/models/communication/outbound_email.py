@@ -0,0 +1,46 @@
+from app.extensions import db
+from datetime import datetime
+
+
+class OutboundEmail(db.Model):
+    """
+    Queue row for one outgoing message to one recipient, delivered by `flask mail worker` over a shared
+    SMTP connection. Transient failures are retried with exponential backoff via next_attempt_at; the
+    outcome is written back to the linked EmailLog.
+    """
+    __tablename__ = "outbound_emails"
+    __table_args__ = (
+        db.Index("ix_outbound_emails_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+    STATUS_QUEUED  = "queued"
+    STATUS_SENDING = "sending"
+    STATUS_SENT    = "sent"
+    STATUS_FAILED  = "failed"
+
+    id        = db.Column(db.Integer, primary_key=True)
+    status    = db.Column(db.String(16), nullable=False, default=STATUS_QUEUED)
+
+    # 📬 Message
+    sender    = db.Column(db.String(255), nullable=True)
+    recipient = db.Column(db.String(255), nullable=False)
+    recipient_domain = db.Column(db.String(255), nullable=False, index=True)
+    subject   = db.Column(db.String(255), nullable=False)
+    body      = db.Column(db.Text, nullable=True)
+    html      = db.Column(db.Text, nullable=True)
+    email_type = db.Column(db.String(100), nullable=False, default="generic")
+
+    # 🔗 Context
+    user_id      = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    email_log_id = db.Column(db.Integer, db.ForeignKey("email_logs.id", ondelete="SET NULL"), nullable=True)
+
+    # 🔁 Delivery
+    attempts        = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error      = db.Column(db.Text, nullable=True)
+    created_at      = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    locked_at       = db.Column(db.DateTime, nullable=True)
+    sent_at         = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<OutboundEmail {self.id} {self.status} → {self.recipient}>"
@@ -1,9 +1,11 @@
 from .template import ContractTemplate
 from .template_version import ContractTemplateVersion
 from .client_contract import ClientContract
+from .render_job import ContractRenderJob
 
 __all__ = [
     "ContractTemplate",
     "ContractTemplateVersion",
     "ClientContract",
+    "ContractRenderJob",
 ]
@@ -0,0 +1,45 @@
+from app.extensions import db
+from datetime import datetime
+
+
+class ContractRenderJob(db.Model):
+    """
+    Queue row for an HTML→PDF contract render, processed by `flask contracts render-worker`.
+    snapshot_hash identifies the rendered content, so unchanged contracts reuse the existing PDF.
+    """
+    __tablename__ = "contract_render_jobs"
+
+    STATUS_QUEUED  = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_DONE    = "done"
+    STATUS_FAILED  = "failed"
+
+    id          = db.Column(db.Integer, primary_key=True)
+    contract_id = db.Column(db.Integer, db.ForeignKey("client_contracts.id", ondelete="CASCADE"), nullable=False, index=True)
+    client_id   = db.Column(db.Integer, db.ForeignKey("clients.id"), nullable=True, index=True)
+
+    status        = db.Column(db.String(16), nullable=False, default=STATUS_QUEUED, index=True)
+    snapshot_hash = db.Column(db.String(64), nullable=False, index=True)
+    batch_key     = db.Column(db.String(64), nullable=True, index=True)   # groups a portfolio batch
+
+    # Outputs (relative to the static folder)
+    html_path = db.Column(db.String(500), nullable=True)
+    pdf_path  = db.Column(db.String(500), nullable=True)
+    renderer  = db.Column(db.String(32), nullable=True)   # weasyprint | wkhtmltopdf | cached
+    error     = db.Column(db.Text, nullable=True)
+    attempts  = db.Column(db.Integer, nullable=False, default=0)
+
+    requested_by_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
+    created_at  = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    started_at  = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    render_ms   = db.Column(db.Integer, nullable=True)
+
+    contract = db.relationship("ClientContract", backref=db.backref("render_jobs", lazy="dynamic", passive_deletes=True))
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (self.STATUS_DONE, self.STATUS_FAILED)
+
+    def __repr__(self) -> str:
+        return f"<ContractRenderJob {self.id} contract:{self.contract_id} {self.status} {self.snapshot_hash[:8]}>"
@@ -1,6 +1,10 @@
+from .cache_version import CacheVersion
 from .document import Document
 from .media_file import MediaFile
 from .notification import Notification
+from .notification_counter import NotificationCounter
+from .notification_fanout import NotificationFanout
 from .role import Role
 from .role_permissions import RolePermission
+from .tenant_kpi_snapshot import TenantKpiSnapshot
 from .user import User
\ No newline at end of file
@@ -0,0 +1,18 @@
+from app.extensions import db
+from datetime import datetime
+
+
+class CacheVersion(db.Model):
+    """
+    Shared version counter for one per-worker cache (e.g. 'permissions', 'tax_rates'). Bumped in the
+    same transaction as the writes that make the cache stale, so every worker sees the change together
+    with the data (app/services/cache_versions.py).
+    """
+    __tablename__ = "cache_versions"
+
+    name       = db.Column(db.String(64), primary_key=True)
+    version    = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<CacheVersion {self.name}={self.version}>"
@@ -3,6 +3,9 @@ from app.extensions import db
 
 class Notification(db.Model):
     __tablename__ = 'notifications'
+    __table_args__ = (
+        db.Index('ix_notifications_recipient_message_key', 'recipient_id', 'message_key', 'created_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
@@ -18,6 +21,7 @@ class Notification(db.Model):
 
     # 🔗 UI Routing Support
     link_url = db.Column(db.String(255), nullable=True)  # e.g., "/work_orders/123"
+    message_key = db.Column(db.String(128), nullable=True)  # dedup key for fan-outs (same alert, same user)
 
     # 🤖 AI Parsing (Phase 1)
     parsed_summary = db.Column(db.Text, nullable=True)            # AI-readable summary of message
@@ -0,0 +1,17 @@
+from app.extensions import db
+from datetime import datetime
+
+
+class NotificationCounter(db.Model):
+    """
+    Unread notifications per user, kept in step with the notifications table (ORM flush hook and the
+    fan-out engine), so navbar badges read one row instead of COUNT(*).
+    """
+    __tablename__ = "notification_counters"
+
+    user_id    = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    unread     = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<NotificationCounter user={self.user_id} unread={self.unread}>"
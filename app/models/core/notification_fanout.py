@@ -0,0 +1,55 @@
+from app.extensions import db
+from datetime import datetime
+
+
+class NotificationFanout(db.Model):
+    """
+    One notification sent to a set of users (roles / company / client / explicit ids and emails).
+    Large fan-outs are queued and delivered by `flask notifications worker` in chunks; last_user_id is
+    the resume point, delivered/skipped the progress.
+    """
+    __tablename__ = "notification_fanouts"
+
+    STATUS_QUEUED  = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_DONE    = "done"
+    STATUS_FAILED  = "failed"
+
+    id          = db.Column(db.Integer, primary_key=True)
+    status      = db.Column(db.String(16), nullable=False, default=STATUS_QUEUED, index=True)
+
+    # 💬 What is sent
+    message     = db.Column(db.Text, nullable=False)
+    type        = db.Column(db.String(50))
+    link_url    = db.Column(db.String(255), nullable=True)
+    message_key = db.Column(db.String(128), nullable=False)     # dedup key per recipient
+    priority_level = db.Column(db.String(20), default="Normal")
+    extracted_data = db.Column(db.JSON, nullable=True)          # copied onto every Notification
+
+    # 🎯 Who it is sent to
+    company_id  = db.Column(db.Integer, db.ForeignKey("companies.id"), nullable=True, index=True)
+    client_id   = db.Column(db.Integer, db.ForeignKey("clients.id"), nullable=True, index=True)
+    role_names  = db.Column(db.JSON, nullable=True)
+    user_ids    = db.Column(db.JSON, nullable=True)
+    emails      = db.Column(db.JSON, nullable=True)
+    include_admins = db.Column(db.Boolean, default=True)
+
+    # 📈 Progress
+    total        = db.Column(db.Integer, nullable=True)
+    delivered    = db.Column(db.Integer, nullable=False, default=0)
+    skipped      = db.Column(db.Integer, nullable=False, default=0)   # deduplicated
+    last_user_id = db.Column(db.Integer, nullable=False, default=0)
+    error        = db.Column(db.Text, nullable=True)
+    attempts     = db.Column(db.Integer, nullable=False, default=0)
+
+    requested_by_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
+    created_at  = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    started_at  = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (self.STATUS_DONE, self.STATUS_FAILED)
+
+    def __repr__(self) -> str:
+        return f"<NotificationFanout {self.id} {self.status} {self.delivered}/{self.total}>"
@@ -0,0 +1,42 @@
+# app/models/core/tenant_kpi_snapshot.py
+
+from datetime import datetime
+from app.extensions import db
+
+
+class TenantKpiSnapshot(db.Model):
+    """
+    One materialized row of dashboard KPIs per company.
+    Marked dirty by session events when source rows change; rebuilt by `flask kpi worker` / `flask kpi rebuild`,
+    or by the first dashboard read that finds it stale.
+    """
+    __tablename__ = 'tenant_kpi_snapshots'
+
+    id = db.Column(db.Integer, primary_key=True)
+    company_id = db.Column(db.Integer, db.ForeignKey('companies.id', ondelete='CASCADE'),
+                           nullable=False, unique=True, index=True)
+
+    # 📊 Payload (same shape as get_dashboard_metrics)
+    metrics = db.Column(db.JSON, nullable=False, default=dict)
+
+    # ⏱️ Freshness
+    generated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    build_ms = db.Column(db.Integer, nullable=True)
+    source_watermarks = db.Column(db.JSON, nullable=True)  # {"client_contracts": {"max_id": .., "count": ..}, ...}
+    is_dirty = db.Column(db.Boolean, nullable=False, default=False, index=True)
+    dirtied_at = db.Column(db.DateTime, nullable=True)
+
+    company = db.relationship('Company', backref=db.backref('kpi_snapshot', uselist=False, passive_deletes=True))
+
+    def freshness(self) -> dict:
+        return {
+            "generated_at": self.generated_at.isoformat() if self.generated_at else None,
+            "age_seconds": int((datetime.utcnow() - self.generated_at).total_seconds()) if self.generated_at else None,
+            "is_dirty": bool(self.is_dirty),
+            "dirtied_at": self.dirtied_at.isoformat() if self.dirtied_at else None,
+            "build_ms": self.build_ms,
+            "source_watermarks": self.source_watermarks or {},
+        }
+
+    def __repr__(self):
+        return f"<TenantKpiSnapshot company={self.company_id} dirty={self.is_dirty} at={self.generated_at}>"
@@ -1,5 +1,6 @@
 
 from .account import Account
+from .account_period_balance import AccountPeriodBalance
 from .aged_creditor import AgedCreditor
 from .aged_creditor_summary import AgedCreditorSummary
 from .aged_debtor import AgedDebtor
@@ -11,6 +12,7 @@ from .balance_sheet import BalanceSheet
 from app.models.onboarding.bank_account import BankAccount
 from .bank_reconciliation import BankReconciliation
 from .bank_transaction import BankTransaction
+from .bank_statement_import import BankStatementImport
 from .budget import Budget
 from .budget_approval import BudgetApproval
 from .budget_allocation_log import BudgetAllocationLog
@@ -32,6 +34,7 @@ from .generated_report_log import GeneratedReportLog
 from .income import Income
 from .income_statement import IncomeStatement
 from .invoice import Invoice
+from .invoice_sequence import InvoiceSequence
 from .journal_batch import JournalBatch
 from .journal_entry import JournalEntry
 from .late_fee_transaction_log import LateFeeTransactionLog
@@ -0,0 +1,33 @@
+from app.extensions import db
+from datetime import datetime
+
+
+class AccountPeriodBalance(db.Model):
+    """
+    Monthly debit/credit totals per account, rolled up from general_ledger_entries.
+    Kept current as entries are posted (see app/utils/finance/period_balances.py), so statements only
+    read the raw ledger for the month they end in.
+    """
+    __tablename__ = 'account_period_balances'
+    __table_args__ = (
+        db.UniqueConstraint('account_id', 'period_start', name='uq_account_period_balances_account_period'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    # 🔗 Account & Period
+    account_id = db.Column(db.Integer, db.ForeignKey('accounts.id'), nullable=False)
+    period_start = db.Column(db.Date, nullable=False)  # First day of the month
+
+    # 💰 Totals
+    debit_total = db.Column(db.Numeric(16, 2), nullable=False, default=0)
+    credit_total = db.Column(db.Numeric(16, 2), nullable=False, default=0)
+    entry_count = db.Column(db.Integer, nullable=False, default=0)
+
+    # 🕓 Timestamps
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    account = db.relationship('Account', backref=db.backref('period_balances', lazy='dynamic'))
+
+    def __repr__(self):
+        return f"<AccountPeriodBalance account={self.account_id} {self.period_start} Dr {self.debit_total} Cr {self.credit_total}>"
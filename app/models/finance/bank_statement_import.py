@@ -0,0 +1,43 @@
+from app.extensions import db
+from datetime import datetime
+
+
+class BankStatementImport(db.Model):
+    """
+    One uploaded bank statement file (CSV / CAMT.053 / OFX) being imported into bank_transactions.
+    `rows_processed` is the resume checkpoint: it is advanced in the same transaction as each chunk
+    of inserted transactions, so a crashed import restarts exactly after the last committed chunk.
+    """
+    __tablename__ = 'bank_statement_imports'
+    __table_args__ = (
+        db.UniqueConstraint('bank_account_id', 'file_sha256', name='uq_bank_statement_import_file'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    # 🔗 Context
+    bank_account_id = db.Column(db.Integer, db.ForeignKey('bank_accounts.id'), nullable=False, index=True)
+    reconciliation_engine_id = db.Column(db.Integer, db.ForeignKey('reconciliation_engine.id'), nullable=True)
+    imported_by_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+
+    # 📥 Source File
+    file_name = db.Column(db.String(255), nullable=False)
+    file_sha256 = db.Column(db.String(64), nullable=False)
+    file_format = db.Column(db.String(20), nullable=False)   # CSV, CAMT053, OFX
+
+    # 📊 Progress
+    status = db.Column(db.String(20), nullable=False, default='Running')  # Running, Completed, Failed
+    rows_processed = db.Column(db.Integer, nullable=False, default=0)
+    rows_inserted = db.Column(db.Integer, nullable=False, default=0)
+    rows_duplicate = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+
+    # 🕓 Timestamps
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    bank_account = db.relationship('BankAccount', backref='statement_imports')
+
+    def __repr__(self):
+        return f"<BankStatementImport {self.file_name} | {self.status} | {self.rows_processed} rows>"
@@ -4,6 +4,10 @@ from sqlalchemy.dialects.postgresql import JSONB
 
 class BankTransaction(db.Model):
     __tablename__ = 'bank_transactions'
+    __table_args__ = (
+        # Statement import de-duplication (NULLs — manually entered rows — never conflict)
+        db.Index('uq_bank_transactions_statement_fingerprint', 'bank_account_id', 'statement_fingerprint', unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
@@ -77,6 +81,8 @@ class BankTransaction(db.Model):
     # 🌐 Integration Metadata
     external_ref = db.Column(db.String(150), nullable=True)
     integration_status = db.Column(db.String(50), nullable=True)
+    statement_fingerprint = db.Column(db.String(64), nullable=True)  # sha256(account, date, amount, reference, n)
+    statement_import_id = db.Column(db.Integer, db.ForeignKey('bank_statement_imports.id'), nullable=True)
 
     # 🧑 Audit Info
     created_by_id = db.Column(
@@ -4,6 +4,9 @@ from sqlalchemy.dialects.postgresql import JSONB
 
 class GeneralLedgerEntry(db.Model):
     __tablename__ = 'general_ledger_entries'
+    __table_args__ = (
+        db.Index('ix_general_ledger_entries_account_entry_date', 'account_id', 'entry_date'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     entry_date = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
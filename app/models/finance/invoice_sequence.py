@@ -0,0 +1,17 @@
+from app.extensions import db
+from datetime import datetime
+
+
+class InvoiceSequence(db.Model):
+    """
+    Per-company counter behind issued invoice numbers. Billing runs bump it in the same transaction as
+    the invoices they insert, so a rolled-back chunk gives its numbers back and the series has no gaps.
+    """
+    __tablename__ = "invoice_sequences"
+
+    company_id = db.Column(db.Integer, db.ForeignKey("companies.id", ondelete="CASCADE"), primary_key=True)
+    last_value = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<InvoiceSequence company={self.company_id} last={self.last_value}>"
@@ -4,6 +4,9 @@ from sqlalchemy.dialects.postgresql import JSONB
 
 class LoanRepaymentSchedule(db.Model):
     __tablename__ = 'loan_repayment_schedules'
+    __table_args__ = (
+        db.UniqueConstraint('loan_id', 'instalment_number', name='uq_loan_repayment_schedules_loan_instalment'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
@@ -16,8 +19,12 @@ class LoanRepaymentSchedule(db.Model):
     loan_id = db.Column(db.Integer, db.ForeignKey('loans.id'), nullable=False)
 
     # 📅 Repayment Details
+    instalment_number = db.Column(db.Integer, nullable=True)  # 1-based; set by the amortization engine
     due_date = db.Column(db.Date, nullable=False)
     payment_amount = db.Column(db.Numeric(12, 2), nullable=False)
+    principal_amount = db.Column(db.Numeric(12, 2), nullable=True)
+    interest_amount = db.Column(db.Numeric(12, 2), nullable=True)
+    balance_after = db.Column(db.Numeric(12, 2), nullable=True)   # Outstanding principal once this instalment is paid
     paid_amount = db.Column(db.Numeric(12, 2), default=0.00)
     paid_date = db.Column(db.Date, nullable=True)
     status = db.Column(db.String(50), default='Pending')  # Pending, Paid, Partial, Overdue, Reversed
@@ -4,4 +4,5 @@ from .maintenance_request import MaintenanceRequest
 from .alert import Alert
 from .inspection import Inspection
 from .inspection_schedule import InspectionSchedule
-from .equipment import Equipment
\ No newline at end of file
+from .equipment import Equipment
+from .equipment_sequence import EquipmentSequence
@@ -0,0 +1,18 @@
+from app.extensions import db
+from datetime import datetime
+
+
+class EquipmentSequence(db.Model):
+    """
+    Per-client counter behind EQP-00001-XX style equipment / QR code IDs.
+    Bumped with a single INSERT … ON CONFLICT DO UPDATE … RETURNING, so concurrent workers never
+    hand out the same number.
+    """
+    __tablename__ = "equipment_sequences"
+
+    client_id  = db.Column(db.Integer, db.ForeignKey("clients.id", ondelete="CASCADE"), primary_key=True)
+    last_value = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<EquipmentSequence client={self.client_id} last={self.last_value}>"
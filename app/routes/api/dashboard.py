@@ -4,7 +4,7 @@ from flask import Blueprint, jsonify
 from flask_login import login_required, current_user
 
 from app.decorators import super_admin_required
-from app.services.dashboard.metrics import get_dashboard_metrics
+from app.services.dashboard.snapshots import get_tenant_kpis
 
 api_dashboard_bp = Blueprint("api_dashboard", __name__, url_prefix="/api/super-admin")
 
@@ -14,7 +14,8 @@ api_dashboard_bp = Blueprint("api_dashboard", __name__, url_prefix="/api/super-a
 def dashboard_metrics():
     """
     Returns the current tenant-scoped dashboard metrics as JSON.
+    Served from the tenant's KPI snapshot; freshness is reported under meta.snapshot.
     """
     company_id = getattr(current_user, "company_id", None)
-    data = get_dashboard_metrics(company_id=company_id)
+    data = get_tenant_kpis(company_id=company_id)
     return jsonify(data), 200
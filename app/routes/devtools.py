@@ -10,3 +10,24 @@ def list_routes():
         methods = ",".join(sorted(m for m in rule.methods if m not in ("HEAD","OPTIONS")))
         out.append(f"{rule.rule:40s} → {rule.endpoint:35s}   [{methods}]")
     return Response("\n".join(out), mimetype="text/plain")
+
+
+@devtools_bp.route("/__tenant-cache")
+def tenant_cache_stats():
+    from app.services.tenant_context import tenant_context_stats
+    stats = tenant_context_stats()
+    return Response("\n".join(f"{k:15s} {v}" for k, v in stats.items()), mimetype="text/plain")
+
+
+@devtools_bp.route("/__contract-template-cache")
+def contract_template_cache_stats():
+    from app.services.contract.template_cache import template_cache_stats
+    stats = template_cache_stats()
+    return Response("\n".join(f"{k:18s} {v}" for k, v in stats.items()), mimetype="text/plain")
+
+
+@devtools_bp.route("/__pdf-renderer")
+def pdf_renderer_stats():
+    from app.services.pdf import get_app_pdf_renderer
+    stats = get_app_pdf_renderer().stats()
+    return Response("\n".join(f"{k:18s} {v}" for k, v in stats.items()), mimetype="text/plain")
@@ -3,6 +3,7 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from werkzeug.utils import secure_filename
 from app import db
 from app.models import Equipment, Client
+from app.services.equipment_ids import allocate_equipment_id
 import qrcode
 from datetime import datetime
 
@@ -16,7 +17,14 @@ QR_FOLDER = 'static/qr_codes'
 def generate():
     if request.method == 'POST':
         client = request.form['client']
-        equipment_id = request.form['id']
+        equipment_id = (request.form.get('id') or '').strip()
+        if not equipment_id:
+            # No ID typed in: take the next one from the client's atomic sequence
+            client_row = Client.query.filter_by(name=client).first()
+            if client_row is None:
+                flash('Unknown client.', 'danger')
+                return redirect(url_for('equipment.generate'))
+            equipment_id = allocate_equipment_id(client_row)
         name = request.form['name']
         equipment_type = request.form['equipment_type']
         serial_number = request.form.get('serial_number')
@@ -0,0 +1,30 @@
+# app/routes/exports.py
+from __future__ import annotations
+
+import os
+
+from flask import Blueprint, abort, send_file
+from flask_login import current_user, login_required
+
+from app.extensions import db
+from app.models.exports.exported_file_log import ExportedFileLog
+from app.utils.export_engine import can_download
+
+exports_bp = Blueprint("exports", __name__, url_prefix="/exports")
+
+
+@exports_bp.get("/<int:log_id>/download")
+@login_required
+def download(log_id):
+    """
+    Serve a generated export. Files live outside /static, so this is the only way to fetch them;
+    anything the user may not see is a 404, so ids can't be probed.
+    """
+    log = db.session.get(ExportedFileLog, log_id)
+    if log is None or not can_download(log, current_user) or not os.path.isfile(log.file_path):
+        abort(404)
+    return send_file(
+        log.file_path,
+        as_attachment=True,
+        download_name=log.file_name or os.path.basename(log.file_path),
+    )
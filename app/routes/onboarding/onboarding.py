@@ -18,6 +18,7 @@ from app.decorators import super_admin_required
 
 # Adjust if your model lives elsewhere
 from app.models.onboarding.company import Company
+from app.services.tenant_context import invalidate_tenant_context
 
 try:
     from app.forms.company.company_onboarding_form import CompanyOnboardingForm
@@ -288,6 +289,7 @@ def branding_post():
     _attach_company_to_user(company)
 
     db.session.commit()
+    invalidate_tenant_context(company.id)
     flash("Branding saved.", "success")
     return redirect(url_for("onboarding.done"))
 
@@ -4,6 +4,7 @@ from app.extensions import db
 from app.models.onboarding import Company
 from app.forms.company.branding import CompanyBrandingForm
 from app.services.files import save_company_logo
+from app.services.tenant_context import invalidate_tenant_context
 from . import settings_bp
 
 def _company() -> Company:
@@ -42,5 +43,6 @@ def branding_save():
             flash(f"Logo upload failed: {e}", "danger")
 
     db.session.commit()
+    invalidate_tenant_context(company.id)
     flash("Branding saved.", "success")
     return redirect(url_for("settings.branding_view"))
@@ -6,6 +6,7 @@ from app.decorators import super_admin_required
 from app.extensions import db
 from app.models.org.company_settings import CompanySettings
 from app.forms.settings import CompanyProfileForm, BrandingThemeForm
+from app.services.tenant_context import invalidate_tenant_context
 
 @super_admin_bp.route("/settings/company-profile", endpoint="settings_company_profile")
 @super_admin_required
@@ -24,6 +25,7 @@ def company_profile_post():
     if form.validate_on_submit():
         form.populate_obj(settings)
         db.session.commit()
+        invalidate_tenant_context(everything=True)  # CompanySettings is platform-wide
         flash("Company profile saved.", "success")
         return redirect(url_for("super_admin.settings_company_profile"))
     return render_template("super_admin/settings/company_profile.html", form=form)
\ No newline at end of file
@@ -65,3 +65,6 @@ from app.routes.super_admin.client.capex import *            # noqa: E402,F401,F
 # NEW: Contract Audits (uses the SAME super_admin_bp)
 # Ensure your audits module routes look like: @super_admin_bp.route("/contracts/audits", ...)
 from app.routes.super_admin.contracts.audit import *        # noqa: E402,F401,F403
+
+# Log viewers: email, password-change and entity audit trails (keyset-paginated)
+from app.routes.super_admin.audit import *                  # noqa: E402,F401,F403
@@ -0,0 +1,2 @@
+from .email_log import *
+from .audit_logs import *
@@ -1,5 +1,122 @@
+# app/routes/super_admin/audit/audit_logs.py
+from __future__ import annotations
+
+from flask import render_template, request
+
+from app.decorators import super_admin_required
+from app.models.audit.audit_log import AuditLog
+from app.models.audit.password_change_log import PasswordChangeLog
+from app.routes.super_admin import super_admin_bp
+from app.routes.super_admin.audit.email_log import user_names_for
+from app.utils.keyset import filter_date_range, keyset_json, keyset_paginate, parse_day, per_page_arg
+
+
+def _common_filters(**extra):
+    filters = dict(extra)
+    filters.update({
+        'date_from': request.args.get('date_from') or None,
+        'date_to': request.args.get('date_to') or None,
+        'per_page': per_page_arg(request.args.get('per_page', type=int)),
+    })
+    return filters
+
+
+def _page(query, ts_col, id_col, filters):
+    query = filter_date_range(query, ts_col, parse_day(filters['date_from']), parse_day(filters['date_to']))
+    return keyset_paginate(
+        query, ts_col, id_col,
+        after=request.args.get('after'), before=request.args.get('before'),
+        per_page=filters['per_page'], count=request.args.get('count', 'estimate'),
+    )
+
+
+# ----------------------------
+# Password changes
+# ----------------------------
+
+def _password_log_page():
+    filters = _common_filters(
+        user_id=request.args.get('user_id', type=int),
+        change_type=request.args.get('change_type') or None,
+    )
+    query = PasswordChangeLog.query
+    if filters['user_id']:
+        query = query.filter(PasswordChangeLog.user_id == filters['user_id'])
+    if filters['change_type']:
+        query = query.filter(PasswordChangeLog.change_type == filters['change_type'])
+    return _page(query, PasswordChangeLog.timestamp, PasswordChangeLog.id, filters), filters
+
+
 @super_admin_bp.route('/audit/password-changes', methods=['GET'], endpoint='view_password_logs')
 @super_admin_required
 def view_password_logs():
-    logs = PasswordChangeLog.query.order_by(PasswordChangeLog.timestamp.desc()).all()
-    return render_template('super_admin/audit/password_logs.html', logs=logs)
+    page, filters = _password_log_page()
+    user_names = user_names_for([log.user_id for log in page.items] + [filters['user_id']])
+    return render_template('super_admin/audit/password_logs.html', page=page, logs=page.items,
+                           user_names=user_names, filters=filters)
+
+
+@super_admin_bp.route('/audit/password-changes.json', methods=['GET'], endpoint='password_logs_json')
+@super_admin_required
+def password_logs_json():
+    page, _ = _password_log_page()
+    return keyset_json(page, lambda log: {
+        'id': log.id,
+        'user_id': log.user_id,
+        'change_type': log.change_type,
+        'ip_address': log.ip_address,
+        'user_agent': log.user_agent,
+        'notes': log.notes,
+        'timestamp': log.timestamp.isoformat(),
+    })
+
+
+# ----------------------------
+# Entity audit trail (AuditLog)
+# ----------------------------
+
+def _audit_log_page():
+    filters = _common_filters(
+        entity_type=(request.args.get('entity_type') or '').strip() or None,
+        entity_id=request.args.get('entity_id', type=int),
+        action=(request.args.get('action') or '').strip() or None,
+        performed_by_id=request.args.get('performed_by_id', type=int),
+    )
+    # Rows are always written with a timestamp; the keyset ordering needs one.
+    query = AuditLog.query.filter(AuditLog.timestamp.isnot(None))
+    if filters['entity_type']:
+        query = query.filter(AuditLog.entity_type == filters['entity_type'])
+    if filters['entity_id']:
+        query = query.filter(AuditLog.entity_id == filters['entity_id'])
+    if filters['action']:
+        query = query.filter(AuditLog.action == filters['action'])
+    if filters['performed_by_id']:
+        query = query.filter(AuditLog.performed_by_id == filters['performed_by_id'])
+    return _page(query, AuditLog.timestamp, AuditLog.id, filters), filters
+
+
+@super_admin_bp.route('/audit/audit-logs', methods=['GET'], endpoint='view_audit_logs')
+@super_admin_required
+def view_audit_logs():
+    page, filters = _audit_log_page()
+    user_names = user_names_for([log.performed_by_id for log in page.items] + [filters['performed_by_id']])
+    return render_template('super_admin/audit/audit_logs.html', page=page, logs=page.items,
+                           user_names=user_names, filters=filters)
+
+
+@super_admin_bp.route('/audit/audit-logs.json', methods=['GET'], endpoint='audit_logs_json')
+@super_admin_required
+def audit_logs_json():
+    page, _ = _audit_log_page()
+    return keyset_json(page, lambda log: {
+        'id': log.id,
+        'entity_type': log.entity_type,
+        'entity_id': log.entity_id,
+        'action': log.action,
+        'performed_by_id': log.performed_by_id,
+        'client_id': log.client_id,
+        'company_id': log.company_id,
+        'field_changes': log.field_changes,
+        'reason': log.reason,
+        'timestamp': log.timestamp.isoformat(),
+    })
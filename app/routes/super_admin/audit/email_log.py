@@ -1,25 +1,72 @@
-@super_admin_bp.route('/audit/email-logs', methods=['GET'], endpoint='view_email_logs')
-@super_admin_required
-def view_email_logs():
-    from app.models.core.user import User  # 👈 Needed to resolve names
-    from app.models.audit.email_log import EmailLog
+# app/routes/super_admin/audit/email_log.py
+from __future__ import annotations
+
+from flask import render_template, request
 
+from app.decorators import super_admin_required
+from app.models.audit.email_log import EmailLog
+from app.models.core.user import User
+from app.routes.super_admin import super_admin_bp
+from app.utils.keyset import filter_date_range, keyset_json, keyset_paginate, parse_day, per_page_arg
+
+
+def _email_log_page():
+    """Filters pushed into SQL, then one keyset page (newest first)."""
     filters = {
         'user_id': request.args.get('user_id', type=int),
-        'email_type': request.args.get('email_type', type=str),
-        'delivery_status': request.args.get('delivery_status', type=str)
+        'email_type': (request.args.get('email_type') or '').strip() or None,
+        'delivery_status': request.args.get('delivery_status') or None,
+        'date_from': request.args.get('date_from') or None,
+        'date_to': request.args.get('date_to') or None,
+        'per_page': per_page_arg(request.args.get('per_page', type=int)),
     }
 
     query = EmailLog.query
-
     if filters['user_id']:
-        query = query.filter_by(user_id=filters['user_id'])
+        query = query.filter(EmailLog.user_id == filters['user_id'])
     if filters['email_type']:
-        query = query.filter_by(email_type=filters['email_type'])
+        query = query.filter(EmailLog.email_type == filters['email_type'])
     if filters['delivery_status']:
-        query = query.filter_by(delivery_status=filters['delivery_status'])
+        query = query.filter(EmailLog.delivery_status == filters['delivery_status'])
+    query = filter_date_range(query, EmailLog.timestamp, parse_day(filters['date_from']), parse_day(filters['date_to']))
+
+    page = keyset_paginate(
+        query, EmailLog.timestamp, EmailLog.id,
+        after=request.args.get('after'), before=request.args.get('before'),
+        per_page=filters['per_page'], count=request.args.get('count', 'estimate'),
+    )
+    return page, filters
 
-    logs = query.order_by(EmailLog.timestamp.desc()).all()
-    users = User.query.with_entities(User.id, User.full_name).all()
 
-    return render_template('super_admin/audit/email_logs.html', logs=logs, users=users, filters=filters)
+def user_names_for(user_ids):
+    """Names for the users on this page only (not every user in the system)."""
+    ids = {i for i in user_ids if i}
+    if not ids:
+        return {}
+    return dict(User.query.with_entities(User.id, User.full_name).filter(User.id.in_(ids)).all())
+
+
+@super_admin_bp.route('/audit/email-logs', methods=['GET'], endpoint='view_email_logs')
+@super_admin_required
+def view_email_logs():
+    page, filters = _email_log_page()
+    user_names = user_names_for([log.user_id for log in page.items] + [filters['user_id']])
+    return render_template('super_admin/audit/email_logs.html', page=page, logs=page.items,
+                           user_names=user_names, filters=filters)
+
+
+@super_admin_bp.route('/audit/email-logs.json', methods=['GET'], endpoint='email_logs_json')
+@super_admin_required
+def email_logs_json():
+    page, _ = _email_log_page()
+    return keyset_json(page, lambda log: {
+        'id': log.id,
+        'user_id': log.user_id,
+        'email_type': log.email_type,
+        'recipient': log.recipient,
+        'subject': log.subject,
+        'delivery_status': log.delivery_status,
+        'delivery_response': log.delivery_response,
+        'ip_address': log.ip_address,
+        'timestamp': log.timestamp.isoformat(),
+    })
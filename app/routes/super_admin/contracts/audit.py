@@ -2,13 +2,13 @@
 from __future__ import annotations
 
 from flask import request, render_template
-from sqlalchemy import desc
 
 from app import db
 from app.decorators import super_admin_required
 from app.models import ContractAudit, User
 from app.models.contracts import ClientContract
 from app.routes.super_admin import super_admin_bp
+from app.utils.keyset import filter_date_range, keyset_json, keyset_paginate, parse_day, per_page_arg
 
 # If you created app/utils/diff.py earlier, we’ll use it.
 # Otherwise, uncomment the fallback below.
@@ -21,15 +21,15 @@ except Exception:  # pragma: no cover
         keys = set(before.keys()) | set(after.keys())
         return sorted([k for k in keys if before.get(k) != after.get(k)])
 
-@super_admin_bp.route("/contracts/audits", methods=["GET"], endpoint="contract_audits_list")
-@super_admin_required
-def contract_audits_list():
-    page = request.args.get("page", 1, type=int)
-    per_page = min(request.args.get("per_page", 25, type=int), 100)
+def _contract_audit_page():
+    """Filters pushed into SQL, then one keyset page on (happened_at, id), newest first."""
+    per_page = per_page_arg(request.args.get("per_page", 25, type=int))
 
     contract_id = request.args.get("contract_id", type=int)
     action = (request.args.get("action") or "").strip() or None
     actor_id = request.args.get("actor_id", type=int)
+    date_from = request.args.get("date_from") or None
+    date_to = request.args.get("date_to") or None
 
     q = ContractAudit.query
     if contract_id:
@@ -38,8 +38,37 @@ def contract_audits_list():
         q = q.filter(ContractAudit.action == action)
     if actor_id:
         q = q.filter(ContractAudit.actor_id == actor_id)
+    q = filter_date_range(q, ContractAudit.happened_at, parse_day(date_from), parse_day(date_to))
+
+    audits = keyset_paginate(
+        q, ContractAudit.happened_at, ContractAudit.id,
+        after=request.args.get("after"), before=request.args.get("before"),
+        per_page=per_page, count=request.args.get("count", "estimate"),
+    )
+    filters = {"contract_id": contract_id, "action": action, "actor_id": actor_id,
+               "date_from": date_from, "date_to": date_to, "per_page": per_page}
+    return audits, filters
+
 
-    audits = q.order_by(desc(ContractAudit.happened_at)).paginate(page=page, per_page=per_page, error_out=False)
+@super_admin_bp.route("/contracts/audits.json", methods=["GET"], endpoint="contract_audits_json")
+@super_admin_required
+def contract_audits_json():
+    audits, _ = _contract_audit_page()
+    return keyset_json(audits, lambda a: {
+        "id": a.id,
+        "contract_id": a.contract_id,
+        "actor_id": a.actor_id,
+        "action": a.action,
+        "happened_at": a.happened_at.isoformat(),
+        "changed_keys": changed_keys(a.before, a.after),
+        "notes": a.notes,
+    })
+
+
+@super_admin_bp.route("/contracts/audits", methods=["GET"], endpoint="contract_audits_list")
+@super_admin_required
+def contract_audits_list():
+    audits, filters = _contract_audit_page()
 
     # Preload related objects for display
     contract_map: dict[int, ClientContract] = {}
@@ -67,5 +96,5 @@ def contract_audits_list():
         actor_map=actor_map,         # matches your template
         changed_by_id=changed_by_id, # matches your template
         actions=actions,
-        filters={"contract_id": contract_id, "action": action, "actor_id": actor_id, "per_page": per_page},
+        filters=filters,
     )
@@ -8,16 +8,18 @@ from typing import Any, Dict, List
 from sqlalchemy.orm import selectinload
 from flask import current_app
 
-from flask import Blueprint, request, render_template, redirect, url_for, flash, abort
+from flask import Blueprint, request, render_template, redirect, url_for, flash, abort, jsonify
 from flask_login import login_required, current_user
 
 from app.decorators import super_admin_required
 from app.extensions import db
 from app.models.client.client import Client
 from app.models.contracts import ContractTemplate, ContractTemplateVersion, ClientContract
-from app.services.contract.contracts import generate_contract_artifacts, contract_snapshot, log_contract_audit
+from app.services.contract.contracts import contract_snapshot, log_contract_audit
+from app.services.contract.render_jobs import request_contract_artifacts, render_status, batch_status
 from app.services.contract.contract_upgrades import build_upgrade_preview, apply_upgrade
 from app.services.contract.contract_audits import create_contract_audit  # ✅ unified audit helper (kept)
+from app.utils.finance.tax_rates import tax_rate_percent
 
 super_admin_contracts_bp = Blueprint(
     "super_admin_contracts", __name__, url_prefix="/super-admin/contracts"
@@ -79,7 +81,11 @@ def _ensure_minimal_data_json(contract: ClientContract):
 
     payload.setdefault("fees", {})
     if "vat_rate" not in payload["fees"]:
-        payload["fees"]["vat_rate"] = 23
+        client = contract.client
+        payload["fees"]["vat_rate"] = tax_rate_percent(
+            client.country if client else None, client.region if client else None, "VAT", contract.start_date,
+            default=23,
+        )
     if "invoice" not in payload["fees"]:
         payload["fees"]["invoice"] = {"frequency": "Monthly", "due_days": 30, "method": "Standing Order"}
     payload["fees"]["base_ex_vat"] = float(contract.contract_value or 0)
@@ -431,7 +437,7 @@ def renew(client_id: int):
             db.session.commit()
 
             # 5) Generate artifacts and continue to Step 3 with stable id
-            html_url, pdf_url = generate_contract_artifacts(client, contract)
+            html_url, pdf_url, render_job = request_contract_artifacts(client, contract, requested_by_id=current_user.id)
             contract.generated_html_path = html_url
             contract.generated_pdf_path = pdf_url
             db.session.commit()
@@ -460,7 +466,7 @@ def renew(client_id: int):
         _ensure_minimal_data_json(contract)
 
         # (Re)generate artifacts to reflect any prior changes
-        html_url, pdf_url = generate_contract_artifacts(client, contract)
+        html_url, pdf_url, render_job = request_contract_artifacts(client, contract, requested_by_id=current_user.id)
         contract.generated_html_path = html_url
         contract.generated_pdf_path = pdf_url
         db.session.commit()
@@ -481,7 +487,7 @@ def renew(client_id: int):
 
         return render_template("super_admin/contracts/renew_wizard.html",
                                step=3, client=client, tv=tv, contract=contract,
-                               html_url=html_url, pdf_url=pdf_url)
+                               html_url=html_url, pdf_url=pdf_url, render_job=render_job)
 
     # default → step 1
     return redirect(url_for(".renew", client_id=client.id, step=1))
@@ -556,7 +562,7 @@ def contracts_inline_update(contract_id: int):
     db.session.commit()
 
     # Regenerate artifacts to reflect the change
-    html_url, pdf_url = generate_contract_artifacts(client, contract)
+    html_url, pdf_url, render_job = request_contract_artifacts(client, contract, requested_by_id=current_user.id)
     contract.generated_html_path = html_url
     contract.generated_pdf_path = pdf_url
     db.session.commit()
@@ -666,7 +672,7 @@ def contracts_apply_update(contract_id: int):
     db.session.commit()
 
     # Re-generate artifacts
-    html_url, pdf_url = generate_contract_artifacts(contract.client, contract)
+    html_url, pdf_url, render_job = request_contract_artifacts(contract.client, contract, requested_by_id=current_user.id)
     contract.generated_html_path = html_url
     contract.generated_pdf_path = pdf_url
     db.session.commit()
@@ -675,6 +681,23 @@ def contracts_apply_update(contract_id: int):
     return redirect(url_for(".renew", client_id=contract.client_id, step=3, contract_id=contract.id))
 
 
+# -------------------- async PDF render status (polled by the wizard) --------------------
+
+@super_admin_contracts_bp.get("/contracts/<int:contract_id>/render-status")
+@super_admin_required
+@login_required
+def contracts_render_status(contract_id: int):
+    ClientContract.query.get_or_404(contract_id)
+    return jsonify(render_status(contract_id)), 200
+
+
+@super_admin_contracts_bp.get("/render-batches/<batch_key>")
+@super_admin_required
+@login_required
+def contracts_render_batch_status(batch_key: str):
+    return jsonify(batch_status(batch_key)), 200
+
+
 # -------------------- signature lifecycle routes (manual & webhook) --------------------
 
 @super_admin_contracts_bp.post("/contracts/<int:contract_id>/signature/signed")
@@ -0,0 +1,293 @@
+# app/services/audit_sink.py
+"""
+Buffered, batched writer for audit rows (AuditLog, ProfileChangeLog).
+
+log_audit_change() / log_profile_change() used to add a row and commit the caller's session on every
+call — an extra round-trip per audited write, and a side-effect commit of whatever the caller had half
+done. They now hand the row to the process-wide AuditSink instead:
+  • the row is appended to a local spool file first (write-ahead), then buffered in memory
+  • a background thread writes the buffer with one multi-row INSERT per table on its own connection,
+    when AUDIT_BATCH_SIZE rows are waiting, AUDIT_FLUSH_INTERVAL seconds have passed, or a request ends
+  • once the INSERT commits, the spooled segment is deleted; segments left behind by a crash (or a
+    failed flush) are replayed by the next sink that starts, or by `flask audit replay`
+
+Delivery is at-least-once: a crash between the commit and the segment's deletion replays those rows.
+Audit rows are written independently of the caller's transaction, as the old commit-per-call did.
+"""
+from __future__ import annotations
+
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover — non-POSIX dev machines: no cross-process spool locking
+    fcntl = None
+
+from flask import current_app
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FLUSH_INTERVAL = 2.0
+
+_DATETIME_KEYS = ("timestamp",)
+
+
+def _tables():
+    from app.models.audit import AuditLog, ProfileChangeLog
+
+    return {"audit": AuditLog.__table__, "profile": ProfileChangeLog.__table__}
+
+
+def _encode(kind: str, row: Dict[str, Any]) -> str:
+    return json.dumps({"k": kind, "r": row}, default=lambda v: v.isoformat() if isinstance(v, datetime) else str(v))
+
+
+def _decode(line: str):
+    rec = json.loads(line)
+    row = rec["r"]
+    for key in _DATETIME_KEYS:
+        if isinstance(row.get(key), str):
+            row[key] = datetime.fromisoformat(row[key])
+    return rec["k"], row
+
+
+def _try_lock(fh) -> bool:
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+class AuditSink:
+    """Thread-safe audit buffer with a write-ahead spool and a background flusher."""
+
+    def __init__(self, engine, spool_dir: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL, fsync: bool = False):
+        self.engine = engine
+        self.spool_dir = spool_dir
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        os.makedirs(spool_dir, exist_ok=True)
+
+        self._lock = threading.Lock()          # buffer + active segment
+        self._flush_lock = threading.Lock()    # one INSERT batch at a time
+        self._wake = threading.Event()
+        self._buffer: List[tuple] = []
+        self._segment = None
+        self._seq = 0
+        self._pid = None
+        self._thread = None
+
+        self.emitted = 0
+        self.written = 0
+        self.batches = 0
+        self.failures = 0
+        self.replayed = 0
+        self.flush_seconds = 0.0
+
+    # ---------- spool ----------
+
+    def _open_segment(self):
+        self._seq += 1
+        path = os.path.join(self.spool_dir, f"audit-{os.getpid()}-{int(time.time())}-{self._seq}.jsonl")
+        fh = open(path, "a", encoding="utf-8")
+        _try_lock(fh)  # held for the segment's lifetime, so replay in other workers skips it
+        return fh
+
+    def _ensure_started(self):
+        # Called with self._lock held. A forked worker must not share the parent's segment or thread.
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._buffer, self._segment = [], self._open_segment()
+        self._thread = threading.Thread(target=self._run, name="audit-sink", daemon=True)
+        self._thread.start()
+
+    # ---------- producers ----------
+
+    def emit(self, kind: str, row: Dict[str, Any]):
+        line = _encode(kind, row) + "\n"
+        with self._lock:
+            self._ensure_started()
+            self._segment.write(line)
+            self._segment.flush()
+            if self.fsync:
+                os.fsync(self._segment.fileno())
+            self._buffer.append((kind, row))
+            self.emitted += 1
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def kick(self):
+        """Ask the background thread to flush now (request teardown); returns immediately."""
+        if self._buffer:
+            self._wake.set()
+
+    # ---------- consumer ----------
+
+    def _run(self):
+        retry = False
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                if retry:
+                    self.replay()
+                self.flush()
+                retry = False
+            except Exception:
+                retry = True  # the rows stay in their spool segment until a later pass writes them
+
+    def _swap(self):
+        """Take the buffer and its (still locked) segment, starting a fresh segment for new events."""
+        with self._lock:
+            if not self._buffer:
+                return None, None
+            rows, segment = self._buffer, self._segment
+            self._buffer = []
+            self._segment = self._open_segment()
+        return rows, segment
+
+    def _insert(self, rows):
+        tables = _tables()
+        grouped: Dict[str, List[Dict[str, Any]]] = {}
+        for kind, row in rows:
+            grouped.setdefault(kind, []).append(row)
+        with self.engine.begin() as conn:
+            for kind, batch in grouped.items():
+                conn.execute(tables[kind].insert(), batch)
+
+    def _drain(self, fh, rows) -> int:
+        """Insert a locked segment's rows, then delete it. On failure the segment is left for replay."""
+        try:
+            if rows:
+                self._insert(rows)
+            os.remove(fh.name)
+        finally:
+            fh.close()
+        return len(rows)
+
+    def flush(self) -> int:
+        """Write everything buffered so far. Returns the number of rows written."""
+        with self._flush_lock:
+            rows, segment = self._swap()
+            if not rows:
+                return 0
+            t0 = time.perf_counter()
+            try:
+                n = self._drain(segment, rows)
+            except Exception:
+                self.failures += 1
+                raise
+            self.flush_seconds += time.perf_counter() - t0
+            self.written += n
+            self.batches += 1
+            return n
+
+    def replay(self) -> int:
+        """Write rows from spool segments no live sink holds (crashed workers, failed flushes)."""
+        active = self._segment.name if self._segment is not None else None
+        replayed = 0
+        with self._flush_lock:
+            for path in sorted(glob.glob(os.path.join(self.spool_dir, "audit-*.jsonl"))):
+                if path == active:
+                    continue
+                try:
+                    fh = open(path, "r", encoding="utf-8")
+                except FileNotFoundError:
+                    continue  # another worker replayed it first
+                if not _try_lock(fh) or not os.path.exists(path):
+                    fh.close()
+                    continue
+                replayed += self._drain(fh, [_decode(line) for line in fh if line.strip()])
+        self.replayed += replayed
+        return replayed
+
+    def close(self):
+        """Flush and remove the active segment (process exit)."""
+        self.flush()
+        with self._lock:
+            if self._segment is not None and self._pid == os.getpid() and not self._buffer:
+                self._segment.close()
+                os.remove(self._segment.name)
+                self._segment = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = len(self._buffer)
+        return {
+            "pending": pending,
+            "emitted": self.emitted,
+            "written": self.written,
+            "batches": self.batches,
+            "failures": self.failures,
+            "replayed": self.replayed,
+            "flush_ms_total": round(self.flush_seconds * 1000, 2),
+            "rows_per_batch": round(self.written / self.batches, 1) if self.batches else None,
+        }
+
+
+def _spool_dir(app) -> str:
+    return app.config.get("AUDIT_SPOOL_DIR") or os.path.join(app.instance_path, "audit_spool")
+
+
+def audit_sink() -> AuditSink:
+    sink = current_app.extensions.get("audit_sink")
+    if sink is None:
+        from app.extensions import db
+
+        cfg = current_app.config
+        sink = AuditSink(
+            db.engine,
+            _spool_dir(current_app),
+            batch_size=int(cfg.get("AUDIT_BATCH_SIZE", DEFAULT_BATCH_SIZE)),
+            flush_interval=float(cfg.get("AUDIT_FLUSH_INTERVAL", DEFAULT_FLUSH_INTERVAL)),
+            fsync=bool(cfg.get("AUDIT_SPOOL_FSYNC", False)),
+        )
+        current_app.extensions["audit_sink"] = sink
+        atexit.register(_flush_at_exit, sink)
+    return sink
+
+
+def _flush_at_exit(sink: AuditSink):
+    try:
+        sink.close()
+    except Exception:
+        pass  # still spooled; replayed on next start
+
+
+def emit_audit_row(kind: str, row: Dict[str, Any]):
+    """Queue one row for the 'audit' (AuditLog) or 'profile' (ProfileChangeLog) table."""
+    audit_sink().emit(kind, row)
+
+
+def flush_audit_log() -> int:
+    """Write buffered audit rows now (tests, CLI commands that read them back)."""
+    return audit_sink().flush()
+
+
+def init_audit_sink(app):
+    """Kick the flusher at the end of every request and replay spool segments left by a crash."""
+    @app.teardown_request
+    def _kick_audit_sink(exc):
+        sink = app.extensions.get("audit_sink")
+        if sink is not None:
+            sink.kick()
+
+    if not glob.glob(os.path.join(_spool_dir(app), "audit-*.jsonl")):
+        return
+    with app.app_context():
+        n = audit_sink().replay()
+        if n:
+            app.logger.warning(f"Replayed {n} spooled audit row(s)")
@@ -0,0 +1,119 @@
+# app/services/cache_versions.py
+"""
+Cross-process invalidation for per-worker caches (role → permission map, tax-rate index).
+
+Each cache has a row in cache_versions. watch_models(name, models, on_commit) registers one set of
+session hooks for all caches:
+  • a flush or bulk statement that writes one of `models` marks the cache dirty on the session
+  • before the commit, the dirty caches' versions are bumped in the same transaction, so no worker can
+    see the new data without also seeing the new version
+  • after the commit, on_commit drops this worker's copy at once
+Readers compare the version their copy was built at with shared_version(name). The whole (tiny) table
+is read at most once per request / app context, so the check costs one primary-key scan per request.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from flask import g, has_app_context
+from sqlalchemy import event, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.models.core.cache_version import CacheVersion
+
+_DIRTY = "cache_versions_dirty"
+
+_watched: Dict[str, Tuple[tuple, Optional[Callable[[], None]]]] = {}
+
+
+def shared_versions() -> Dict[str, int]:
+    """{cache name: version}, read once per app context."""
+    versions = g.get("_cache_versions") if has_app_context() else None
+    if versions is None:
+        versions = dict(db.session.execute(select(CacheVersion.name, CacheVersion.version)).all())
+        if has_app_context():
+            g._cache_versions = versions
+    return versions
+
+
+def shared_version(name: str) -> int:
+    return shared_versions().get(name, 0)
+
+
+def bump_versions(connection, names: Iterable[str]):
+    """Increment the named versions (creating missing rows) on `connection`'s transaction."""
+    table = CacheVersion.__table__
+    insert = pg_insert if connection.dialect.name == "postgresql" else sqlite_insert
+    now = datetime.utcnow()
+    for name in sorted(set(names)):  # fixed order: concurrent bumps can't deadlock
+        stmt = insert(table).values(name=name, version=1, updated_at=now)
+        connection.execute(stmt.on_conflict_do_update(
+            index_elements=[table.c.name],
+            set_={"version": table.c.version + 1, "updated_at": now},
+        ))
+
+
+# ----------------------------
+# Session hooks
+# ----------------------------
+
+def _mark(session, names):
+    if names:
+        session.info.setdefault(_DIRTY, set()).update(names)
+
+
+def _after_flush(session, flush_context):
+    objs = list(session.new) + list(session.dirty) + list(session.deleted)
+    _mark(session, [name for name, (models, _) in _watched.items()
+                    if any(isinstance(obj, models) for obj in objs)])
+
+
+def _do_orm_execute(state):
+    # Bulk insert/update/delete through session.execute() never reaches a flush.
+    if (state.is_insert or state.is_update or state.is_delete) and state.bind_mapper is not None:
+        cls = state.bind_mapper.class_
+        _mark(state.session, [name for name, (models, _) in _watched.items() if issubclass(cls, models)])
+
+
+def _before_commit(session):
+    session.flush()  # pending writes mark their caches in after_flush
+    names = session.info.get(_DIRTY)
+    if names:
+        bump_versions(session.connection(), names)
+
+
+def _after_commit(session):
+    names = session.info.pop(_DIRTY, None)
+    if not names:
+        return
+    if has_app_context():
+        g.pop("_cache_versions", None)
+    for name in names:
+        on_commit = _watched.get(name, ((), None))[1]
+        if on_commit is not None:
+            on_commit()
+
+
+def _after_rollback(session):
+    session.info.pop(_DIRTY, None)
+
+
+_listeners_registered = False
+
+
+def watch_models(name: str, models: Iterable[type], on_commit: Optional[Callable[[], None]] = None):
+    """Version cache `name` on writes to `models`; on_commit runs in this worker after such a commit."""
+    global _listeners_registered
+    _watched[name] = (tuple(models), on_commit)
+    if _listeners_registered:
+        return
+    event.listen(Session, "after_flush", _after_flush)
+    event.listen(Session, "do_orm_execute", _do_orm_execute)
+    event.listen(Session, "before_commit", _before_commit)
+    event.listen(Session, "after_commit", _after_commit)
+    event.listen(Session, "after_rollback", _after_rollback)
+    _listeners_registered = True
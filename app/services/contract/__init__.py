@@ -3,6 +3,7 @@ from .contract_upgrades import build_upgrade_preview, apply_upgrade
 from .contracts import generate_contract_artifacts
 from .validation import *  # only if you want global access
 from .metrics import signature_status_metrics
+from .template_cache import render_version, warm_contract_templates, template_cache_stats
 
 __all__ = [
     "create_contract_audit",
@@ -10,4 +11,7 @@ __all__ = [
     "apply_upgrade",
     "generate_contract_artifacts",
     "signature_status_metrics",
+    "render_version",
+    "warm_contract_templates",
+    "template_cache_stats",
 ]
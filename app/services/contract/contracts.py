@@ -6,9 +6,9 @@ import re
 from typing import Optional, Tuple, List
 
 from flask import current_app, url_for
-from flask import render_template_string
 
 from app.models.contracts import ClientContract, ContractTemplateVersion
+from app.services.contract.template_cache import render_version
 
 
 # ---------- small utils ----------
@@ -50,20 +50,15 @@ def _save_string_as_static_asset(content: str, rel_path: str) -> str:
 def _render_pdf_weasy(html: str, base_url: str, css_paths: Optional[List[str]] = None) -> Optional[bytes]:
     """
     Try WeasyPrint. Returns PDF bytes or None if WeasyPrint not available.
+    Uses the shared renderer (cached stylesheets, fonts and static assets).
     """
     try:
-        from weasyprint import HTML, CSS  # type: ignore
+        from app.services.pdf import get_app_pdf_renderer
+        renderer = get_app_pdf_renderer()
     except Exception:
         return None
 
-    css_objs = []
-    for css_rel in (css_paths or []):
-        css_abs = os.path.join(current_app.static_folder, css_rel)
-        if os.path.exists(css_abs):
-            css_objs.append(CSS(filename=css_abs))
-
-    pdf_bytes = HTML(string=html, base_url=base_url).write_pdf(stylesheets=css_objs)
-    return pdf_bytes
+    return renderer.render(html, stylesheets=css_paths or [], base_url=base_url)
 
 
 def _render_pdf_wkhtml(html: str, out_abs_path: str, base_url: str, css_paths: Optional[List[str]] = None) -> bool:
@@ -110,7 +105,7 @@ def render_contract_html(contract: ClientContract) -> str:
     tv: ContractTemplateVersion = contract.template_version
     data = contract.data_json or {}
     # Make sure we can resolve relative URLs for images/CSS in template (base_url = static root)
-    html = render_template_string(tv.html_template, data=data, contract=contract)
+    html = render_version(tv, data=data, contract=contract)
     return html
 
 
@@ -138,7 +133,7 @@ def generate_contract_artifacts(client, contract: ClientContract) -> Tuple[str,
     # 4) Try to create PDF (WeasyPrint first)
     base_url = current_app.static_url_path  # for resolving /static/... in CSS/images
     css_list = ["css/pdf.css"]  # you can add per-tenant CSS later
-    pdf_bytes = _render_pdf_weasy(html, base_url=base_url, css_paths=css_list)
+    pdf_bytes = _render_pdf_weasy(html, base_url=None, css_paths=css_list)  # renderer's asset origin serves /static/...
     pdf_url: Optional[str] = None
 
     if pdf_bytes:
@@ -160,9 +155,8 @@ def render_html_for_version(template_version, data: dict, contract=None) -> str:
     Render HTML string for a given ContractTemplateVersion and data_json-like dict.
     Does not persist anything.
     """
-    html_template = template_version.html_template or ""
     # give template access to "data" (preferred) and "contract" (optional)
-    return render_template_string(html_template, data=data or {}, contract=contract)
+    return render_version(template_version, data=data or {}, contract=contract)
 
 
 # ----------------------- SNAPSHOT & AUDIT HELPERS (added) -----------------------
@@ -0,0 +1,321 @@
+# app/services/contract/render_jobs.py
+"""
+Asynchronous contract PDF pipeline.
+
+The request path only renders the (cheap) HTML, writes it to static/contracts/<id>/contract-<snapshot
+hash>.html and queues a ContractRenderJob. `flask contracts render-worker` claims queued jobs and renders the PDFs in a
+process pool, off the gunicorn workers. PDFs are stored as contract-<snapshot hash>.pdf, so a contract
+whose rendered content has not changed is never rendered twice. The HTML is keyed the same way: with two
+versions of a contract in flight, each job renders from its own snapshot rather than whichever was saved last.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from flask import current_app, url_for
+
+from app.extensions import db
+from app.models.contracts import ClientContract, ContractRenderJob
+from app.services.contract.contracts import (
+    generate_contract_artifacts,
+    render_contract_html,
+    _static_rel_and_abs,
+)
+
+CSS_LIST = ["css/pdf.css"]
+DEFAULT_JOB_TIMEOUT = 10 * 60
+MAX_ATTEMPTS = 3
+
+
+# ---------- helpers ----------
+
+def _static_url(rel_path: str) -> str:
+    """Static URL without needing a request context (the worker runs from the CLI)."""
+    return f"{current_app.static_url_path}/{rel_path}".replace("//", "/")
+
+
+def _css_abs_paths() -> List[str]:
+    out = []
+    for css_rel in CSS_LIST:
+        css_abs = os.path.join(current_app.static_folder, css_rel)
+        if os.path.exists(css_abs):
+            out.append(css_abs)
+    return out
+
+
+def contract_snapshot_hash(html: str, css_abs_paths: List[str]) -> str:
+    """Content key of a render: the final HTML plus the identity (mtime/size) of the stylesheets."""
+    h = hashlib.sha256(html.encode("utf-8"))
+    for p in css_abs_paths:
+        st = os.stat(p)
+        h.update(f"|{p}:{st.st_mtime_ns}:{st.st_size}".encode("utf-8"))
+    return h.hexdigest()
+
+
+def _write_html(contract: ClientContract) -> Tuple[str, str, str]:
+    """Render + save the contract HTML. Returns (html_rel, pdf_rel, snapshot_hash)."""
+    html = render_contract_html(contract)
+    snapshot = contract_snapshot_hash(html, _css_abs_paths())
+
+    html_rel, html_abs = _static_rel_and_abs("contracts", str(contract.id), f"contract-{snapshot[:16]}.html")
+    if not os.path.exists(html_abs):
+        tmp_abs = f"{html_abs}.{os.getpid()}.tmp"
+        with open(tmp_abs, "w", encoding="utf-8") as f:
+            f.write(html)
+        os.replace(tmp_abs, html_abs)
+    pdf_rel = f"contracts/{contract.id}/contract-{snapshot[:16]}.pdf"
+    return html_rel, pdf_rel, snapshot
+
+
+def _pdf_exists(pdf_rel: str) -> bool:
+    return os.path.exists(os.path.join(current_app.static_folder, pdf_rel))
+
+
+# ---------- process-pool entry point (no Flask / DB access) ----------
+
+def render_pdf_file(html_abs: str, pdf_abs: str, static_folder: str, static_url_path: str,
+                    css_abs_paths: List[str]) -> Tuple[Optional[str], Optional[str], int]:
+    """
+    Render html_abs → pdf_abs with WeasyPrint, falling back to wkhtmltopdf.
+    Runs in a worker process; the process keeps its PdfRenderer (fonts/CSS/assets) across jobs.
+    Returns (renderer_or_None, error_or_None, elapsed_ms).
+    """
+    t0 = time.perf_counter()
+    tmp_abs = pdf_abs + ".tmp"
+    errors = []
+
+    with open(html_abs, "r", encoding="utf-8") as f:
+        html = f.read()
+
+    try:
+        from app.services.pdf import get_pdf_renderer
+        get_pdf_renderer(static_folder, static_url_path).render(html, stylesheets=css_abs_paths, target=tmp_abs)
+        os.replace(tmp_abs, pdf_abs)
+        return "weasyprint", None, int((time.perf_counter() - t0) * 1000)
+    except Exception as e:
+        errors.append(f"weasyprint: {e}")
+
+    try:
+        import pdfkit  # type: ignore
+        options = {
+            "enable-local-file-access": None,
+            "page-size": "A4",
+            "print-media-type": None,
+            "margin-top": "10mm",
+            "margin-right": "10mm",
+            "margin-bottom": "12mm",
+            "margin-left": "10mm",
+            "encoding": "UTF-8",
+        }
+        pdfkit.from_string(html, tmp_abs, options=options, css=css_abs_paths)
+        if os.path.exists(tmp_abs):
+            os.replace(tmp_abs, pdf_abs)
+            return "wkhtmltopdf", None, int((time.perf_counter() - t0) * 1000)
+        errors.append("wkhtmltopdf: no output")
+    except Exception as e:
+        errors.append(f"wkhtmltopdf: {e}")
+
+    return None, "; ".join(errors), int((time.perf_counter() - t0) * 1000)
+
+
+# ---------- enqueue (request side) ----------
+
+def enqueue_contract_render(contract: ClientContract, *, requested_by_id: Optional[int] = None,
+                            batch_key: Optional[str] = None) -> Tuple[str, Optional[str], Optional[ContractRenderJob]]:
+    """
+    Write the HTML and queue a PDF render unless a PDF for this exact content already exists.
+    Returns (html_rel, pdf_rel_if_ready, job_or_None). Does not commit.
+    """
+    html_rel, pdf_rel, snapshot = _write_html(contract)
+    if _pdf_exists(pdf_rel):
+        return html_rel, pdf_rel, None
+
+    job = (ContractRenderJob.query
+           .filter(ContractRenderJob.contract_id == contract.id,
+                   ContractRenderJob.snapshot_hash == snapshot,
+                   ContractRenderJob.status.in_([ContractRenderJob.STATUS_QUEUED, ContractRenderJob.STATUS_RUNNING]))
+           .first())
+    if job is None:
+        job = ContractRenderJob(
+            contract_id=contract.id,
+            client_id=contract.client_id,
+            snapshot_hash=snapshot,
+            batch_key=batch_key,
+            html_path=html_rel,
+            pdf_path=pdf_rel,
+            requested_by_id=requested_by_id,
+        )
+        db.session.add(job)
+        db.session.flush()
+    return html_rel, None, job
+
+
+def request_contract_artifacts(client, contract: ClientContract, *, requested_by_id: Optional[int] = None
+                               ) -> Tuple[str, Optional[str], Optional[ContractRenderJob]]:
+    """
+    What the wizard calls. With CONTRACT_PDF_ASYNC the PDF is queued and (html_url, None, job) is returned
+    until it is ready; otherwise this is generate_contract_artifacts() with job=None.
+    """
+    if not current_app.config.get("CONTRACT_PDF_ASYNC"):
+        html_url, pdf_url = generate_contract_artifacts(client, contract)
+        return html_url, pdf_url, None
+
+    html_rel, pdf_rel, job = enqueue_contract_render(contract, requested_by_id=requested_by_id)
+    return (url_for("static", filename=html_rel),
+            url_for("static", filename=pdf_rel) if pdf_rel else None,
+            job)
+
+
+def enqueue_portfolio(client_id: int, *, requested_by_id: Optional[int] = None) -> Tuple[str, int, int]:
+    """Queue every contract of a client under one batch_key. Returns (batch_key, queued, already_rendered)."""
+    batch_key = uuid.uuid4().hex
+    queued = skipped = 0
+    for contract in ClientContract.query.filter_by(client_id=client_id).order_by(ClientContract.id).all():
+        _, pdf_rel, job = enqueue_contract_render(contract, requested_by_id=requested_by_id, batch_key=batch_key)
+        if job is None:
+            contract.generated_pdf_path = _static_url(pdf_rel)
+            skipped += 1
+        else:
+            queued += 1
+    db.session.commit()
+    return batch_key, queued, skipped
+
+
+def render_status(contract_id: int) -> dict:
+    """Latest render job for a contract, shaped for the wizard's polling endpoint."""
+    job = (ContractRenderJob.query
+           .filter_by(contract_id=contract_id)
+           .order_by(ContractRenderJob.id.desc())
+           .first())
+    contract = ClientContract.query.get(contract_id)
+    if job is None:
+        return {"status": "none", "pdf_url": getattr(contract, "generated_pdf_path", None)}
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "pdf_url": _static_url(job.pdf_path) if job.status == ContractRenderJob.STATUS_DONE else None,
+        "renderer": job.renderer,
+        "error": job.error,
+        "attempts": job.attempts,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def batch_status(batch_key: str) -> dict:
+    rows = (db.session.query(ContractRenderJob.status, db.func.count(ContractRenderJob.id))
+            .filter(ContractRenderJob.batch_key == batch_key)
+            .group_by(ContractRenderJob.status).all())
+    counts = {status: int(n) for status, n in rows}
+    total = sum(counts.values())
+    finished = counts.get(ContractRenderJob.STATUS_DONE, 0) + counts.get(ContractRenderJob.STATUS_FAILED, 0)
+    return {"batch_key": batch_key, "total": total, "finished": finished, "counts": counts}
+
+
+# ---------- worker side ----------
+
+def claim_jobs(limit: int, *, batch_key: Optional[str] = None) -> List[ContractRenderJob]:
+    """
+    Atomically move up to `limit` queued jobs (or running jobs whose worker died) to running.
+    SKIP LOCKED lets several worker processes/hosts share the queue.
+    """
+    timeout = int(current_app.config.get("CONTRACT_RENDER_JOB_TIMEOUT", DEFAULT_JOB_TIMEOUT))
+    stale_before = datetime.utcnow() - timedelta(seconds=timeout)
+
+    q = ContractRenderJob.query.filter(db.or_(
+        ContractRenderJob.status == ContractRenderJob.STATUS_QUEUED,
+        db.and_(ContractRenderJob.status == ContractRenderJob.STATUS_RUNNING,
+                ContractRenderJob.started_at < stale_before),
+    ))
+    if batch_key:
+        q = q.filter(ContractRenderJob.batch_key == batch_key)
+    jobs = q.order_by(ContractRenderJob.id).limit(limit).with_for_update(skip_locked=True).all()
+
+    now = datetime.utcnow()
+    for job in jobs:
+        job.status = ContractRenderJob.STATUS_RUNNING
+        job.started_at = now
+        job.attempts = (job.attempts or 0) + 1
+    db.session.commit()
+    return jobs
+
+
+def _finish(job: ContractRenderJob, *, renderer: Optional[str], error: Optional[str], render_ms: Optional[int]):
+    job.finished_at = datetime.utcnow()
+    job.render_ms = render_ms
+    job.renderer = renderer
+    if renderer:
+        job.status = ContractRenderJob.STATUS_DONE
+        job.error = None
+        contract = job.contract
+        # Only point the contract at this PDF if no newer render was requested meanwhile.
+        newer = (ContractRenderJob.query
+                 .filter(ContractRenderJob.contract_id == job.contract_id, ContractRenderJob.id > job.id)
+                 .first())
+        if contract is not None and newer is None:
+            contract.generated_pdf_path = _static_url(job.pdf_path)
+    else:
+        job.error = error
+        job.status = (ContractRenderJob.STATUS_FAILED if job.attempts >= MAX_ATTEMPTS
+                      else ContractRenderJob.STATUS_QUEUED)
+
+
+def process_jobs(executor: ProcessPoolExecutor, *, limit: int, batch_key: Optional[str] = None) -> int:
+    """Claim up to `limit` jobs, render them in parallel on the pool, record outcomes. Returns jobs handled."""
+    jobs = claim_jobs(limit, batch_key=batch_key)
+    if not jobs:
+        return 0
+
+    static_folder = current_app.static_folder
+    static_url_path = current_app.static_url_path or "/static"
+    css_abs = _css_abs_paths()
+    futures = {}
+    for job in jobs:
+        pdf_abs = os.path.join(current_app.static_folder, job.pdf_path)
+        if os.path.exists(pdf_abs):  # another job already produced this exact content
+            _finish(job, renderer="cached", error=None, render_ms=0)
+            continue
+        html_abs = os.path.join(current_app.static_folder, job.html_path)
+        futures[executor.submit(render_pdf_file, html_abs, pdf_abs, static_folder, static_url_path, css_abs)] = job
+
+    for fut in as_completed(futures):
+        job = futures[fut]
+        try:
+            renderer, error, ms = fut.result()
+        except Exception as e:  # worker crashed / unpicklable error
+            renderer, error, ms = None, repr(e), None
+        _finish(job, renderer=renderer, error=error, render_ms=ms)
+        db.session.commit()
+
+    db.session.commit()
+    return len(jobs)
+
+
+def run_render_worker(*, workers: Optional[int] = None, batch_size: int = 16, poll_interval: float = 2.0,
+                      once: bool = False, batch_key: Optional[str] = None, log=print) -> int:
+    """
+    Main loop for `flask contracts render-worker`. Returns the total number of jobs handled.
+    With once=True it drains the queue (or the given batch) and exits.
+    """
+    workers = workers or os.cpu_count() or 2
+    handled = 0
+    # Children only render files; drop pooled connections so none are shared across the fork.
+    db.engine.dispose()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+            n = process_jobs(executor, limit=max(batch_size, workers), batch_key=batch_key)
+            handled += n
+            if n:
+                log(f"rendered batch of {n} job(s) (total {handled})")
+                continue
+            if once:
+                break
+            db.session.remove()
+            time.sleep(poll_interval)
+    return handled
@@ -0,0 +1,141 @@
+# app/services/contract/template_cache.py
+"""
+Compiled Jinja template registry for ContractTemplateVersion.html_template.
+
+render_template_string() re-parses and re-compiles the source on every call; renewal wizards render
+the same version dozens of times per session. Versions are effectively immutable once published, so
+compiled templates are cached by (template_version_id, sha256(source)) — editing a draft's HTML simply
+produces a new key — with bounded LRU eviction.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from flask import current_app
+
+DEFAULT_MAX_ENTRIES = 128
+
+
+class CompiledTemplateCache:
+    """Thread-safe LRU of compiled jinja2.Template objects with compile/render timing."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[Optional[int], str], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.compile_count = 0
+        self.compile_seconds = 0.0
+        self.render_count = 0
+        self.render_seconds = 0.0
+
+    def get_or_compile(self, env, version_id: Optional[int], source: str):
+        key = (version_id, hashlib.sha256(source.encode("utf-8")).hexdigest())
+        with self._lock:
+            tmpl = self._entries.get(key)
+            if tmpl is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return tmpl
+            self.misses += 1
+
+        # Compile outside the lock; a concurrent miss on the same key just compiles twice.
+        t0 = time.perf_counter()
+        tmpl = env.from_string(source)
+        elapsed = time.perf_counter() - t0
+
+        with self._lock:
+            self.compile_count += 1
+            self.compile_seconds += elapsed
+            self._entries[key] = tmpl
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return tmpl
+
+    def record_render(self, seconds: float):
+        with self._lock:
+            self.render_count += 1
+            self.render_seconds += seconds
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "compile_count": self.compile_count,
+                "compile_ms_total": round(self.compile_seconds * 1000, 2),
+                "compile_ms_avg": round(self.compile_seconds * 1000 / self.compile_count, 3) if self.compile_count else None,
+                "render_count": self.render_count,
+                "render_ms_total": round(self.render_seconds * 1000, 2),
+                "render_ms_avg": round(self.render_seconds * 1000 / self.render_count, 3) if self.render_count else None,
+            }
+
+
+def _cache() -> CompiledTemplateCache:
+    cache = current_app.extensions.get("contract_template_cache")
+    if cache is None:
+        cache = CompiledTemplateCache(
+            max_entries=int(current_app.config.get("CONTRACT_TEMPLATE_CACHE_SIZE", DEFAULT_MAX_ENTRIES))
+        )
+        current_app.extensions["contract_template_cache"] = cache
+    return cache
+
+
+def compiled_template_for(template_version):
+    """Compiled jinja2.Template for a ContractTemplateVersion (compiles at most once per content)."""
+    source = template_version.html_template or ""
+    return _cache().get_or_compile(current_app.jinja_env, getattr(template_version, "id", None), source)
+
+
+def render_version(template_version, **context) -> str:
+    """
+    Drop-in replacement for render_template_string(tv.html_template, **context):
+    same Jinja environment and context processors, without the per-call compile.
+    """
+    tmpl = compiled_template_for(template_version)
+    current_app.update_template_context(context)
+
+    t0 = time.perf_counter()
+    html = tmpl.render(context)
+    _cache().record_render(time.perf_counter() - t0)
+    return html
+
+
+def warm_contract_templates(jurisdictions: Optional[Iterable[str]] = None) -> int:
+    """
+    Pre-compile the latest version of every active ContractTemplate (optionally limited to some
+    jurisdictions). Returns the number of versions compiled.
+    """
+    from app.models.contracts import ContractTemplate
+
+    q = ContractTemplate.query.filter(ContractTemplate.is_active.is_(True))
+    if jurisdictions:
+        q = q.filter(ContractTemplate.jurisdiction.in_(list(jurisdictions)))
+
+    warmed = 0
+    for tpl in q.all():
+        tv = tpl.latest_version()
+        if tv is None or not tv.html_template:
+            continue
+        compiled_template_for(tv)
+        warmed += 1
+    return warmed
+
+
+def template_cache_stats() -> Dict[str, Any]:
+    return _cache().stats()
@@ -0,0 +1,104 @@
+# app/services/dashboard/compliance.py
+from __future__ import annotations
+
+from typing import Dict, FrozenSet, Iterable, Optional, Set
+
+from sqlalchemy import and_
+
+from app.models import db
+from app.models.client.client import Client
+from app.models.core.user import User
+from app.models.core.role import Role
+from app.models.client.client_compliance_document import ClientComplianceDocument
+from app.models.contractor.contractor_compliance_document import ContractorComplianceDocument
+
+# Document types every client and contractor must hold on file.
+REQUIRED_DOC_TYPES: FrozenSet[str] = frozenset({
+    "Insurance Certificate",
+    "Health & Safety Policy",
+    "Tax Clearance",
+    "Company Registration",
+})
+
+
+def _collect_gaps(rows: Iterable, required: FrozenSet[str]) -> Dict[int, FrozenSet[str]]:
+    """
+    Fold (owner_id, document_type) rows into {owner_id: missing_types}.
+    Rows come from an OUTER join, so owners with no documents arrive once with a NULL type.
+    Owners holding every required type are dropped from the result.
+    """
+    have: Dict[int, Set[str]] = {}
+    for owner_id, doc_type in rows:
+        types = have.setdefault(owner_id, set())
+        if doc_type:
+            types.add(doc_type)
+
+    gaps: Dict[int, FrozenSet[str]] = {}
+    for owner_id, types in have.items():
+        missing = required - types
+        if missing:
+            gaps[owner_id] = frozenset(missing)
+    return gaps
+
+
+def client_compliance_gaps(
+    *, company_id: Optional[int], required: FrozenSet[str] = REQUIRED_DOC_TYPES
+) -> Dict[int, FrozenSet[str]]:
+    """
+    {client_id: missing document types} for every client of the tenant, in ONE query.
+    """
+    q = (
+        db.session.query(Client.id, ClientComplianceDocument.document_type)
+        .outerjoin(
+            ClientComplianceDocument,
+            and_(
+                ClientComplianceDocument.client_id == Client.id,
+                ClientComplianceDocument.document_type.in_(required),
+            ),
+        )
+    )
+    if company_id:
+        q = q.filter(Client.company_id == company_id)
+    return _collect_gaps(q.distinct().all(), required)
+
+
+def contractor_compliance_gaps(
+    *, company_id: Optional[int], required: FrozenSet[str] = REQUIRED_DOC_TYPES
+) -> Dict[int, FrozenSet[str]]:
+    """
+    {user_id: missing document types} for every Contractor-role user of the tenant, in ONE query.
+    Documents are matched on contractor_id == users.id, as the dashboards always have.
+    """
+    q = (
+        db.session.query(User.id, ContractorComplianceDocument.document_type)
+        .join(Role, User.role_id == Role.id)
+        .outerjoin(
+            ContractorComplianceDocument,
+            and_(
+                ContractorComplianceDocument.contractor_id == User.id,
+                ContractorComplianceDocument.document_type.in_(required),
+            ),
+        )
+        .filter(Role.name == "Contractor")
+    )
+    if company_id:
+        q = q.filter(User.company_id == company_id)
+    return _collect_gaps(q.distinct().all(), required)
+
+
+def get_compliance_gaps(
+    *, company_id: Optional[int], required: FrozenSet[str] = REQUIRED_DOC_TYPES
+) -> Dict[str, Dict[int, FrozenSet[str]]]:
+    """
+    Tenant-wide compliance gaps: which owners are missing which required document types.
+    Always two queries, regardless of how many clients/contractors the tenant has.
+    """
+    return {
+        "clients": client_compliance_gaps(company_id=company_id, required=required),
+        "contractors": contractor_compliance_gaps(company_id=company_id, required=required),
+    }
+
+
+def serialize_gaps(gaps: Dict[int, FrozenSet[str]]) -> Dict[str, list]:
+    """JSON-friendly form: string keys, sorted type lists."""
+    return {str(owner_id): sorted(types) for owner_id, types in gaps.items()}
@@ -13,6 +13,7 @@ from app.models.client.client_compliance_document import ClientComplianceDocumen
 from app.models.contractor.contractor_compliance_document import ContractorComplianceDocument
 from app.models.contracts import ClientContract
 from app.services.contract import signature_status_metrics
+from app.services.dashboard.compliance import get_compliance_gaps, serialize_gaps
 
 
 def _scoped_clients_q(company_id: Optional[int]):
@@ -22,6 +23,13 @@ def _scoped_clients_q(company_id: Optional[int]):
     return q
 
 
+def _scoped_client_ids(company_id: Optional[int]):
+    sel = db.select(Client.id)
+    if company_id:
+        sel = sel.where(Client.company_id == company_id)
+    return sel
+
+
 def _scoped_users_q(company_id: Optional[int]):
     q = db.session.query(User).outerjoin(Role, User.role_id == Role.id)
     if company_id:
@@ -54,11 +62,12 @@ def get_dashboard_metrics(*, company_id: Optional[int]) -> Dict[str, Any]:
     users_q = _scoped_users_q(company_id)
     contracts_q = _scoped_contracts_q(company_id)
 
-    clients = clients_q.all()
-    users = users_q.all()
-
-    managers = [u for u in users if u.role and u.role.name == "Property Manager"]
-    contractors = [u for u in users if u.role and u.role.name == "Contractor"]
+    clients_count = clients_q.count()
+    role_counts = dict(
+        users_q.with_entities(Role.name, db.func.count(User.id)).group_by(Role.name).all()
+    )
+    managers_count = int(role_counts.get("Property Manager", 0))
+    contractors_count = int(role_counts.get("Contractor", 0))
 
     # ---- portfolio ----
     portfolio_value = (
@@ -78,18 +87,14 @@ def get_dashboard_metrics(*, company_id: Optional[int]) -> Dict[str, Any]:
     exp_90 = expiry_base.filter(ClientContract.end_date > in_60, ClientContract.end_date <= in_90).count()
 
     # ---- AGMs / compliance ----
-    client_ids = [c.id for c in clients]
-    upcoming_agm = (
-        AGM.query.filter(AGM.client_id.in_(client_ids), AGM.meeting_date >= now).count()
-        if client_ids else 0
-    )
+    client_ids = _scoped_client_ids(company_id)
+    upcoming_agm = AGM.query.filter(AGM.client_id.in_(client_ids), AGM.meeting_date >= now).count()
 
     client_docs_recent = (
         ClientComplianceDocument.query
         .filter(ClientComplianceDocument.client_id.in_(client_ids))
         .order_by(ClientComplianceDocument.uploaded_at.desc())
         .limit(5).all()
-        if client_ids else []
     )
     contractor_docs_recent = (
         ContractorComplianceDocument.query
@@ -97,15 +102,12 @@ def get_dashboard_metrics(*, company_id: Optional[int]) -> Dict[str, Any]:
         .limit(5).all()
     )
 
-    exp_client_docs = (
-        ClientComplianceDocument.query.filter(
-            ClientComplianceDocument.client_id.in_(client_ids),
-            ClientComplianceDocument.expires_at.isnot(None),
-            ClientComplianceDocument.expires_at >= today,
-            ClientComplianceDocument.expires_at <= next_30_days
-        ).count()
-        if client_ids else 0
-    )
+    exp_client_docs = ClientComplianceDocument.query.filter(
+        ClientComplianceDocument.client_id.in_(client_ids),
+        ClientComplianceDocument.expires_at.isnot(None),
+        ClientComplianceDocument.expires_at >= today,
+        ClientComplianceDocument.expires_at <= next_30_days
+    ).count()
     exp_contractor_docs = ContractorComplianceDocument.query.filter(
         ContractorComplianceDocument.expiry_date.isnot(None),
         ContractorComplianceDocument.expiry_date >= today,
@@ -113,21 +115,9 @@ def get_dashboard_metrics(*, company_id: Optional[int]) -> Dict[str, Any]:
     ).count()
     expiring_docs = exp_client_docs + exp_contractor_docs
 
-    REQUIRED = {"Insurance Certificate", "Health & Safety Policy", "Tax Clearance", "Company Registration"}
-
-    missing_client_docs = 0
-    for c in clients:
-        docs = ClientComplianceDocument.query.filter_by(client_id=c.id).all()
-        have = {d.document_type for d in docs}
-        if any(req not in have for req in REQUIRED):
-            missing_client_docs += 1
-
-    missing_contractor_docs = 0
-    for u in contractors:
-        docs = ContractorComplianceDocument.query.filter_by(contractor_id=u.id).all()
-        have = {d.document_type for d in docs}
-        if any(req not in have for req in REQUIRED):
-            missing_contractor_docs += 1
+    gaps = get_compliance_gaps(company_id=company_id)
+    missing_client_docs = len(gaps["clients"])
+    missing_contractor_docs = len(gaps["contractors"])
 
     # ---- signature metrics ----
     sig_metrics = signature_status_metrics(company_id=company_id)
@@ -138,9 +128,9 @@ def get_dashboard_metrics(*, company_id: Optional[int]) -> Dict[str, Any]:
             "company_id": company_id,
         },
         "counts": {
-            "clients": len(clients),
-            "property_managers": len(managers),
-            "contractors": len(contractors),
+            "clients": clients_count,
+            "property_managers": managers_count,
+            "contractors": contractors_count,
             "portfolio_value": float(portfolio_value),
             "contracts": {
                 "expired": exp_expired,
@@ -165,5 +155,10 @@ def get_dashboard_metrics(*, company_id: Optional[int]) -> Dict[str, Any]:
         "previews": {
             "client_docs_recent": [d.as_dict() if hasattr(d, "as_dict") else {"id": d.id, "document_type": d.document_type} for d in client_docs_recent],
             "contractor_docs_recent": [d.as_dict() if hasattr(d, "as_dict") else {"id": d.id, "document_type": d.document_type} for d in contractor_docs_recent],
-        }
+        },
+        # Per-owner missing document types, keyed by client id / contractor user id
+        "compliance_gaps": {
+            "clients": serialize_gaps(gaps["clients"]),
+            "contractors": serialize_gaps(gaps["contractors"]),
+        },
     }
@@ -0,0 +1,278 @@
+# app/services/dashboard/snapshots.py
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, time as dtime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from flask import current_app
+from sqlalchemy import case, event, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, attributes
+
+from app.models import db
+from app.models.client.client import Client
+from app.models.core.user import User
+from app.models.client.agm import AGM
+from app.models.client.client_compliance_document import ClientComplianceDocument
+from app.models.contractor.contractor_compliance_document import ContractorComplianceDocument
+from app.models.contracts import ClientContract
+from app.models.onboarding.company import Company
+from app.models.core.tenant_kpi_snapshot import TenantKpiSnapshot
+from app.services.dashboard.metrics import get_dashboard_metrics
+
+DEFAULT_MAX_AGE_SECONDS = 15 * 60
+_REBUILD_LOCK_CLASS = 0x4B5049  # PostgreSQL advisory-lock namespace ("KPI") for snapshot rebuilds
+
+# Models whose rows feed the snapshot, and how to reach their tenant.
+_CLIENT_SCOPED = (ClientContract, ClientComplianceDocument, AGM)   # via client_id → clients.company_id
+_COMPANY_SCOPED = (User, Client)                                  # company_id directly
+_GLOBAL = (ContractorComplianceDocument,)                          # counted across tenants → dirty everyone
+
+
+# ----------------------------
+# Watermarks
+# ----------------------------
+
+def _source_watermarks(company_id: int) -> Dict[str, Dict[str, Any]]:
+    """(count, max id) per source table for this tenant; lets callers tell whether a snapshot saw a given row."""
+    client_ids = db.select(Client.id).where(Client.company_id == company_id)
+    sources = {
+        "client_contracts": db.session.query(db.func.count(ClientContract.id), db.func.max(ClientContract.id))
+                            .filter(ClientContract.client_id.in_(client_ids)),
+        "client_compliance_documents": db.session.query(db.func.count(ClientComplianceDocument.id),
+                                                        db.func.max(ClientComplianceDocument.id))
+                                       .filter(ClientComplianceDocument.client_id.in_(client_ids)),
+        "agms": db.session.query(db.func.count(AGM.id), db.func.max(AGM.id))
+                .filter(AGM.client_id.in_(client_ids)),
+        "users": db.session.query(db.func.count(User.id), db.func.max(User.id))
+                 .filter(User.company_id == company_id),
+    }
+    out = {}
+    for key, q in sources.items():
+        count, max_id = q.one()
+        out[key] = {"count": int(count or 0), "max_id": max_id}
+    return out
+
+
+# ----------------------------
+# Build / read
+# ----------------------------
+
+def _fresh_after(now: datetime) -> datetime:
+    """Snapshots generated before this are stale: older than the max age, or from before today."""
+    # Expiry buckets are relative to "today" — a snapshot from yesterday is wrong even if nothing changed.
+    max_age = int(current_app.config.get("KPI_SNAPSHOT_MAX_AGE", DEFAULT_MAX_AGE_SECONDS))
+    return max(now - timedelta(seconds=max_age), datetime.combine(now.date(), dtime.min))
+
+
+def _is_fresh(snap: TenantKpiSnapshot, now: datetime) -> bool:
+    if snap.is_dirty or snap.generated_at is None:
+        return False
+    return snap.generated_at >= _fresh_after(now)
+
+
+def rebuild_snapshot(company_id: int, *, commit: bool = True) -> TenantKpiSnapshot:
+    """
+    Recompute one tenant's KPIs and upsert its snapshot row. INSERT … ON CONFLICT (company_id) DO UPDATE,
+    so two rebuilds racing on a tenant that has no snapshot yet both succeed (the later one wins).
+    """
+    started = datetime.utcnow()
+    t0 = time.perf_counter()
+
+    metrics = get_dashboard_metrics(company_id=company_id)
+    watermarks = _source_watermarks(company_id)
+    build_ms = int((time.perf_counter() - t0) * 1000)
+
+    table = TenantKpiSnapshot.__table__
+    insert = pg_insert if db.session.get_bind().dialect.name == "postgresql" else sqlite_insert
+    stmt = insert(table).values(company_id=company_id, metrics=metrics, source_watermarks=watermarks,
+                                generated_at=started, build_ms=build_ms, is_dirty=False)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=[table.c.company_id],
+        set_={
+            "metrics": stmt.excluded.metrics,
+            "source_watermarks": stmt.excluded.source_watermarks,
+            "generated_at": stmt.excluded.generated_at,
+            "build_ms": stmt.excluded.build_ms,
+            # A write that landed while we were computing keeps the row dirty for the next rebuild.
+            "is_dirty": case((table.c.dirtied_at > started, True), else_=False),
+        },
+    ))
+    if commit:
+        db.session.commit()
+    else:
+        db.session.flush()
+    return TenantKpiSnapshot.query.filter_by(company_id=company_id).populate_existing().one()
+
+
+_local_rebuilds: Set[int] = set()
+_local_rebuilds_lock = threading.Lock()
+
+
+@contextmanager
+def _rebuild_lease(company_id: int):
+    """
+    Yields True for the one caller allowed to rebuild a tenant's snapshot right now: one per process
+    (in-memory set) and, on PostgreSQL, one across processes (transaction-scoped advisory lock, released
+    by the rebuild's commit). Never waits.
+    """
+    with _local_rebuilds_lock:
+        mine = company_id not in _local_rebuilds
+        if mine:
+            _local_rebuilds.add(company_id)
+    try:
+        if mine and db.session.get_bind().dialect.name == "postgresql":
+            mine = bool(db.session.execute(
+                select(func.pg_try_advisory_xact_lock(_REBUILD_LOCK_CLASS, company_id))).scalar())
+            if not mine:
+                with _local_rebuilds_lock:
+                    _local_rebuilds.discard(company_id)
+        yield mine
+    finally:
+        if mine:
+            with _local_rebuilds_lock:
+                _local_rebuilds.discard(company_id)
+
+
+def _from_snapshot(snap: TenantKpiSnapshot, **meta) -> Dict[str, Any]:
+    data = dict(snap.metrics or {})
+    data["meta"] = dict(data.get("meta") or {}, snapshot=snap.freshness(), **meta)
+    return data
+
+
+def get_tenant_kpis(*, company_id: Optional[int]) -> Dict[str, Any]:
+    """
+    Dashboard KPIs for a tenant, served from its snapshot row (one query when fresh).
+    A stale, dirty or missing snapshot is rebuilt by the one request that wins _rebuild_lease (this
+    commits the session); requests arriving meanwhile get the previous snapshot flagged meta.stale, or
+    live metrics when there is none yet. `flask kpi worker` (Procfile `kpi`) keeps snapshots fresh ahead
+    of reads. Platform-wide views (no company) are always live.
+    """
+    if not company_id:
+        data = get_dashboard_metrics(company_id=None)
+        data["meta"]["snapshot"] = None
+        return data
+
+    snap = TenantKpiSnapshot.query.filter_by(company_id=company_id).first()
+    if snap is not None and _is_fresh(snap, datetime.utcnow()):
+        return _from_snapshot(snap)
+
+    with _rebuild_lease(company_id) as mine:
+        if mine:
+            return _from_snapshot(rebuild_snapshot(company_id))
+
+    if snap is not None:
+        return _from_snapshot(snap, stale=True)
+    data = get_dashboard_metrics(company_id=company_id)
+    data["meta"] = dict(data.get("meta") or {}, snapshot=None, live=True)
+    return data
+
+
+def stale_company_ids(now: Optional[datetime] = None) -> List[int]:
+    """Tenants whose snapshot is missing, dirty, or past its max age."""
+    now = now or datetime.utcnow()
+    q = (db.session.query(Company.id)
+         .outerjoin(TenantKpiSnapshot, TenantKpiSnapshot.company_id == Company.id)
+         .filter(db.or_(TenantKpiSnapshot.id.is_(None),
+                        TenantKpiSnapshot.is_dirty.is_(True),
+                        TenantKpiSnapshot.generated_at < _fresh_after(now)))
+         .order_by(Company.id))
+    return [cid for (cid,) in q.all()]
+
+
+def run_kpi_worker(*, poll_interval: float = 30.0, once: bool = False,
+                   log: Callable[[str], None] = print) -> int:
+    """Main loop for `flask kpi worker`: keep every tenant's snapshot fresh. Returns snapshots rebuilt."""
+    rebuilt = 0
+    while True:
+        swept = 0
+        for cid in stale_company_ids():
+            with _rebuild_lease(cid) as mine:
+                if mine:  # otherwise a dashboard request is already rebuilding it
+                    rebuild_snapshot(cid)
+                    swept += 1
+            db.session.rollback()  # ends the transaction of a lease that wasn't won
+        rebuilt += swept
+        if swept:
+            log(f"rebuilt {swept} KPI snapshot(s) (total {rebuilt})")
+        if once:
+            return rebuilt
+        db.session.remove()
+        time.sleep(poll_interval)
+
+
+def rebuild_all_snapshots(*, batch_size: int = 50, only_dirty: bool = False) -> int:
+    """Rebuild every tenant's snapshot, committing every `batch_size` tenants. Returns the number rebuilt."""
+    q = db.session.query(Company.id).order_by(Company.id)
+    if only_dirty:
+        q = q.outerjoin(TenantKpiSnapshot, TenantKpiSnapshot.company_id == Company.id).filter(
+            db.or_(TenantKpiSnapshot.id.is_(None), TenantKpiSnapshot.is_dirty.is_(True))
+        )
+    company_ids = [cid for (cid,) in q.all()]
+
+    done = 0
+    for cid in company_ids:
+        rebuild_snapshot(cid, commit=False)
+        done += 1
+        if done % batch_size == 0:
+            db.session.commit()
+    db.session.commit()
+    return done
+
+
+# ----------------------------
+# Invalidation (session events)
+# ----------------------------
+
+def _mark_dirty(connection, *, company_ids: Iterable[int] = (), client_ids: Iterable[int] = (), everyone=False):
+    table = TenantKpiSnapshot.__table__
+    stmt = update(table).values(is_dirty=True, dirtied_at=datetime.utcnow())
+    if everyone:
+        connection.execute(stmt)
+        return
+    company_ids, client_ids = set(company_ids), set(client_ids)
+    if company_ids:
+        connection.execute(stmt.where(table.c.company_id.in_(company_ids)))
+    if client_ids:
+        tenant_of_clients = db.select(Client.company_id).where(Client.id.in_(client_ids))
+        connection.execute(stmt.where(table.c.company_id.in_(tenant_of_clients)))
+
+
+def _tenant_keys(obj, key: str) -> Set[int]:
+    """The row's current tenant key, plus the previous one when this flush moved it to another tenant."""
+    keys = {getattr(obj, key, None)}
+    keys.update(attributes.get_history(obj, key, passive=attributes.PASSIVE_NO_INITIALIZE).deleted or ())
+    return {k for k in keys if k}
+
+
+def _after_flush(session, flush_context):
+    company_ids: Set[int] = set()
+    client_ids: Set[int] = set()
+    everyone = False
+
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, _CLIENT_SCOPED):
+            client_ids.update(_tenant_keys(obj, "client_id"))
+        elif isinstance(obj, _COMPANY_SCOPED):
+            company_ids.update(_tenant_keys(obj, "company_id"))
+        elif isinstance(obj, _GLOBAL):
+            everyone = True
+
+    if company_ids or client_ids or everyone:
+        _mark_dirty(session.connection(), company_ids=company_ids, client_ids=client_ids, everyone=everyone)
+
+
+_listeners_registered = False
+
+
+def register_snapshot_listeners():
+    """Hook snapshot invalidation into every ORM flush (idempotent)."""
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    event.listen(Session, "after_flush", _after_flush)
+    _listeners_registered = True
@@ -0,0 +1,161 @@
+# app/services/equipment_ids.py
+"""
+Equipment ID allocation.
+
+IDs look like EQP-00042-AB (sequence per client + client initials). The old allocator scanned every
+row of equipment.csv and parsed every ID to find the client's max, and two concurrent requests could
+get the same number. Now each client has a counter that is bumped atomically:
+  • legacy CSV flow (app.py): EquipmentIdAllocator, a small SQLite counter file shared by all gunicorn
+    workers (BEGIN IMMEDIATE serialises writers across processes)
+  • platform DB: allocate_equipment_id(), an INSERT … ON CONFLICT DO UPDATE … RETURNING on
+    equipment_sequences
+Counters are seeded from the highest existing ID the first time a client is seen.
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+from typing import Callable, Dict, Iterable, Optional
+
+ID_PREFIX = "EQP"
+
+
+def client_initials(client_name: str) -> str:
+    return ''.join(word[0] for word in (client_name or "").split() if word).upper()
+
+
+def format_equipment_id(sequence: int, client_name: str) -> str:
+    return f"{ID_PREFIX}-{str(sequence).zfill(5)}-{client_initials(client_name)}"
+
+
+def parse_sequence(equipment_id: str) -> Optional[int]:
+    """EQP-00042-AB → 42 (None for IDs that don't follow the pattern)."""
+    parts = (equipment_id or "").split('-')
+    if len(parts) < 2:
+        return None
+    try:
+        return int(parts[1])
+    except ValueError:
+        return None
+
+
+def max_sequence(equipment_ids: Iterable[str]) -> int:
+    return max((n for n in map(parse_sequence, equipment_ids) if n is not None), default=0)
+
+
+# ----------------------------
+# Legacy CSV flow (SQLite counters)
+# ----------------------------
+
+class EquipmentIdAllocator:
+    """Per-client counters in a SQLite file; safe across threads and processes."""
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS equipment_sequences ("
+            " client TEXT PRIMARY KEY, last_value INTEGER NOT NULL)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # Never reuse a connection inherited across fork (pre-forking servers, process pools)
+        if conn is None or self._local.pid != os.getpid():
+            # isolation_level=None: we issue BEGIN IMMEDIATE ourselves
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local.conn = None
+
+    def allocate_sequence(self, client: str, seed: Optional[Callable[[str], int]] = None) -> int:
+        """
+        Next sequence number for `client`. `seed(client)` returns the highest number already in use
+        and is only called (under the write lock) the first time the client is seen.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT last_value FROM equipment_sequences WHERE client = ?", (client,)).fetchone()
+            if row is None:
+                value = (seed(client) if seed else 0) + 1
+                conn.execute("INSERT INTO equipment_sequences (client, last_value) VALUES (?, ?)", (client, value))
+            else:
+                value = row[0] + 1
+                conn.execute("UPDATE equipment_sequences SET last_value = ? WHERE client = ?", (value, client))
+            conn.execute("COMMIT")
+            return value
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+    def allocate(self, client: str, seed: Optional[Callable[[str], int]] = None) -> str:
+        return format_equipment_id(self.allocate_sequence(client, seed), client)
+
+
+_allocators: Dict[str, EquipmentIdAllocator] = {}
+_registry_lock = threading.Lock()
+
+
+def get_equipment_id_allocator(path: str) -> EquipmentIdAllocator:
+    key = os.path.abspath(path)
+    with _registry_lock:
+        allocator = _allocators.get(key)
+        if allocator is None:
+            allocator = EquipmentIdAllocator(key)
+            _allocators[key] = allocator
+        return allocator
+
+
+# ----------------------------
+# Platform DB
+# ----------------------------
+
+def _seed_from_equipment(client_id: int) -> int:
+    from app.extensions import db
+    from app.models.maintenance.equipment import Equipment
+
+    ids = db.session.execute(
+        db.select(Equipment.qr_code_id).where(Equipment.client_id == client_id,
+                                              Equipment.qr_code_id.like(f"{ID_PREFIX}-%"))
+    ).scalars()
+    return max_sequence(ids)
+
+
+def allocate_equipment_sequence(client_id: int, *, commit: bool = True) -> int:
+    """Atomically bump and return the client's equipment sequence (seeded from existing IDs on first use)."""
+    from sqlalchemy.dialects.postgresql import insert as pg_insert
+    from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+    from app.extensions import db
+    from app.models.maintenance.equipment_sequence import EquipmentSequence
+
+    exists = db.session.get(EquipmentSequence, client_id) is not None
+    seed = 0 if exists else _seed_from_equipment(client_id)
+
+    insert = pg_insert if db.engine.dialect.name == "postgresql" else sqlite_insert
+    table = EquipmentSequence.__table__
+    stmt = (
+        insert(table)
+        .values(client_id=client_id, last_value=seed + 1, updated_at=db.func.now())
+        .on_conflict_do_update(index_elements=[table.c.client_id],
+                               set_={"last_value": table.c.last_value + 1, "updated_at": db.func.now()})
+        .returning(table.c.last_value)
+    )
+    value = db.session.execute(stmt).scalar_one()
+    if commit:
+        db.session.commit()
+    return value
+
+
+def allocate_equipment_id(client, *, commit: bool = True) -> str:
+    """Next EQP-xxxxx-XX ID for a Client row."""
+    return format_equipment_id(allocate_equipment_sequence(client.id, commit=commit), client.name)
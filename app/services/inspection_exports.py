@@ -0,0 +1,190 @@
+# app/services/inspection_exports.py
+"""
+Bounded-memory inspection log exports (CSV / PDF).
+
+The old export routes collected every matching row into a list, rendered one giant template and
+built the whole PDF in memory. Here:
+  • CSV is streamed row by row straight from the InspectionLogStore cursor
+  • PDF is rendered in chunks of `chunk_rows` rows (one small HTML document each), written to disk
+    part by part and concatenated; resident memory is checked after every part against a hard ceiling
+  • finished files are stored under a fingerprint of (format, filters, options, store watermark), so an
+    identical export is served from disk — the log is append-only, so the watermark only moves when
+    a new inspection is saved — and recorded in ExportedFileLog (with the exporting platform user, when
+    the legacy login matches one) when a database is available
+"""
+from __future__ import annotations
+
+import gc
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.services.pdf import merge_pdf_files
+
+DEFAULT_CHUNK_ROWS = 500
+DEFAULT_MEMORY_CEILING_BYTES = 400 * 1024 * 1024
+EXPORT_TYPE = "inspection_log"
+
+
+class ExportMemoryExceeded(RuntimeError):
+    """Resident memory went over the configured ceiling while producing an export."""
+
+
+# ----------------------------
+# Fingerprints / storage
+# ----------------------------
+
+def export_fingerprint(fmt: str, filters: Dict[str, Any], watermark: int, options: Optional[Dict[str, Any]] = None) -> str:
+    payload = json.dumps(
+        {"fmt": fmt.lower(), "filters": filters, "options": options or {}, "watermark": watermark},
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def stored_export_path(export_dir: str, fingerprint: str, fmt: str) -> str:
+    return os.path.join(export_dir, f"{fingerprint}.{fmt.lower()}")
+
+
+def find_stored_export(export_dir: str, fingerprint: str, fmt: str) -> Optional[str]:
+    path = stored_export_path(export_dir, fingerprint, fmt)
+    return path if os.path.isfile(path) else None
+
+
+# ----------------------------
+# Memory guard
+# ----------------------------
+
+def _rss_bytes() -> Optional[int]:
+    """Current resident set size (Linux /proc); None where unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        return None
+
+
+def _check_memory(ceiling: Optional[int]):
+    if not ceiling:
+        return
+    rss = _rss_bytes()
+    if rss is not None and rss > ceiling:
+        raise ExportMemoryExceeded(f"resident memory {rss // (1024 * 1024)} MB over {ceiling // (1024 * 1024)} MB ceiling")
+
+
+# ----------------------------
+# Writers
+# ----------------------------
+
+def write_csv(store, path: str, filters: Dict[str, Any]) -> int:
+    """Write a filtered slice of the log as CSV (tmp file → rename). Returns the row count."""
+    fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path) or None)
+    rows = -1  # header line
+    with os.fdopen(fd, "w", newline="", encoding="utf-8") as f:
+        for line in store.iter_csv(**filters):
+            f.write(line)
+            rows += 1
+    os.replace(tmp, path)
+    return max(rows, 0)
+
+
+def _chunks(store, filters: Dict[str, Any], chunk_rows: int):
+    batch = []
+    for row in store.iter_logs(**filters):
+        batch.append(row)
+        if len(batch) >= chunk_rows:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def write_pdf_chunked(store, path: str, filters: Dict[str, Any],
+                      render_chunk: Callable[[list, int, int], str], renderer, *,
+                      chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                      memory_ceiling: Optional[int] = DEFAULT_MEMORY_CEILING_BYTES) -> Tuple[int, int]:
+    """
+    Render matching rows to `path` in parts of `chunk_rows` rows.
+    render_chunk(rows, part_number, part_count) -> HTML for one part (part_number is 1-based).
+    Returns (rows, parts). Raises ExportMemoryExceeded if RSS crosses `memory_ceiling`.
+    """
+    total = store.count(**filters)
+    part_count = max(1, -(-total // chunk_rows))
+    workdir = tempfile.mkdtemp(prefix="inspection-export-", dir=os.path.dirname(path) or None)
+    try:
+        parts, rows = [], 0
+        for n, batch in enumerate(_chunks(store, filters, chunk_rows) if total else [[]], start=1):
+            part_path = os.path.join(workdir, f"part-{n:05d}.pdf")
+            renderer.render(render_chunk(batch, n, part_count), target=part_path)
+            parts.append(part_path)
+            rows += len(batch)
+            del batch
+            gc.collect()
+            _check_memory(memory_ceiling)
+
+        tmp = os.path.join(workdir, "combined.pdf")  # same filesystem as `path`, unique per export run
+        if len(parts) == 1:
+            shutil.move(parts[0], tmp)
+        elif not merge_pdf_files(parts, tmp):
+            # Without pypdf, lay the parts out again and combine their pages (memory grows with page count).
+            pages, doc = [], None
+            for n, batch in enumerate(_chunks(store, filters, chunk_rows), start=1):
+                doc = renderer.document(render_chunk(batch, n, part_count))
+                pages.extend(doc.pages)
+                _check_memory(memory_ceiling)
+            doc.copy(pages).write_pdf(tmp)
+        os.replace(tmp, path)
+        return rows, len(parts)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+# ----------------------------
+# ExportedFileLog
+# ----------------------------
+
+def platform_user_id(session, login: Optional[str]) -> Optional[int]:
+    """users.id for a legacy login (its email, or a platform username), or None if there's no such user."""
+    from sqlalchemy import func, or_, select
+    from app.models.core.user import User
+
+    if not login:
+        return None
+    login = login.strip()
+    return session.execute(
+        select(User.id).where(or_(func.lower(User.email) == login.lower(), User.username == login)).limit(1)
+    ).scalar()
+
+
+def record_export(*, fingerprint: str, fmt: str, path: str, file_name: str, rows: int, filters: Dict[str, Any],
+                  duration_ms: int, exported_by_id: Optional[int] = None, session=None):
+    """
+    Insert the ExportedFileLog row for a stored artifact. `session` defaults to db.session (needs an app
+    context); the legacy app passes its own session on the platform database.
+    """
+    from app.models.exports.exported_file_log import ExportedFileLog
+
+    if session is None:
+        from app.extensions import db
+        session = db.session
+    log = ExportedFileLog(
+        export_type=EXPORT_TYPE,
+        file_path=path,
+        file_format=fmt.upper(),
+        file_name=file_name,
+        visibility_scope="PM",
+        exported_by_id=exported_by_id,
+        metadata_tags={
+            "fingerprint": fingerprint,
+            "filters": filters,
+            "rows": rows,
+            "size_bytes": os.path.getsize(path),
+            "duration_ms": duration_ms,
+        },
+    )
+    session.add(log)
+    session.commit()
+    return log
@@ -0,0 +1,302 @@
+# app/services/inspection_logs.py
+"""
+Append-only inspection log store with persistent secondary indexes.
+
+The QR flow in the legacy app.py appended to inspection_logs.csv and every read path re-read and
+re-parsed the whole file. This keeps the same append semantics (rows are never updated, file order
+== insertion order via `seq`) but stores them in a SQLite file with indexes on:
+  • equipment_id + timestamp      → per-equipment history / latest next-maintenance date
+  • client (exact and normalised) → client reports, PM views
+  • timestamp                      → date-range exports
+  • next_maintenance (parsed date) → missed / upcoming maintenance
+so those queries are index seeks instead of O(total inspections) scans.
+
+Stdlib only (sqlite3); usable from app.py and from the Flask CLI. Rows come back as plain dicts with
+the CSV column names, so templates are unchanged.
+"""
+from __future__ import annotations
+
+import csv
+import itertools
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional
+
+FIELDNAMES = ['timestamp', 'equipment_id', 'name', 'client', 'inspector_pin', 'clean', 'damage', 'functional', 'notes']
+NEXT_MAINTENANCE_PREFIX = "Next Maintenance:"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS inspection_logs (
+    seq              INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp        TEXT NOT NULL DEFAULT '',
+    equipment_id     TEXT NOT NULL DEFAULT '',
+    name             TEXT NOT NULL DEFAULT '',
+    client           TEXT NOT NULL DEFAULT '',
+    client_key       TEXT NOT NULL DEFAULT '',
+    inspector_pin    TEXT NOT NULL DEFAULT '',
+    clean            TEXT NOT NULL DEFAULT '',
+    damage           TEXT NOT NULL DEFAULT '',
+    functional       TEXT NOT NULL DEFAULT '',
+    notes            TEXT NOT NULL DEFAULT '',
+    next_maintenance TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_inspection_logs_equipment_ts ON inspection_logs (equipment_id, timestamp);
+CREATE INDEX IF NOT EXISTS ix_inspection_logs_client_ts ON inspection_logs (client, timestamp);
+CREATE INDEX IF NOT EXISTS ix_inspection_logs_client_key_ts ON inspection_logs (client_key, timestamp);
+CREATE INDEX IF NOT EXISTS ix_inspection_logs_ts ON inspection_logs (timestamp);
+CREATE INDEX IF NOT EXISTS ix_inspection_logs_next_maintenance
+    ON inspection_logs (next_maintenance, equipment_id) WHERE next_maintenance IS NOT NULL;
+
+CREATE TABLE IF NOT EXISTS inspection_log_imports (
+    source      TEXT PRIMARY KEY,
+    size_bytes  INTEGER NOT NULL,
+    rows        INTEGER NOT NULL,
+    imported_at TEXT NOT NULL
+);
+"""
+
+_COLUMNS = ", ".join(FIELDNAMES)
+_INSERT_SQL = (f"INSERT INTO inspection_logs ({_COLUMNS}, client_key, next_maintenance) "
+               f"VALUES ({', '.join('?' * (len(FIELDNAMES) + 2))})")
+_IN_PROGRESS = -1  # inspection_log_imports.size_bytes of an import that hasn't finished; rows = rows done
+
+
+def parse_next_maintenance(functional: Optional[str]) -> Optional[str]:
+    """'Next Maintenance: 2024-05-01' → '2024-05-01' (ISO, sortable); anything else → None."""
+    if not functional or not functional.startswith(NEXT_MAINTENANCE_PREFIX):
+        return None
+    raw = functional.replace(NEXT_MAINTENANCE_PREFIX, "").strip()
+    try:
+        return datetime.strptime(raw, '%Y-%m-%d').date().isoformat()
+    except ValueError:
+        return None  # badly formatted dates were skipped by every reader anyway
+
+
+def _client_key(client: Optional[str]) -> str:
+    return (client or "").strip().lower()
+
+
+def _to_params(row: Dict[str, str]):
+    values = [str(row.get(f) or "") for f in FIELDNAMES]
+    return values + [_client_key(row.get('client')), parse_next_maintenance(row.get('functional'))]
+
+
+def _batches(rows: Iterable[Dict[str, str]], batch_size: int) -> Iterator[List[list]]:
+    batch = []
+    for row in rows:
+        batch.append(_to_params(row))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class InspectionLogStore:
+    """Indexed inspection log. One connection per thread; safe across processes (WAL + busy timeout)."""
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # Never reuse a connection inherited across fork (pre-forking servers, process pools)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local.conn = None
+
+    # ---------- writes ----------
+
+    def append(self, row: Dict[str, str]) -> int:
+        """Append one inspection (same fields as the CSV). Returns its sequence number."""
+        with self._conn() as conn:
+            return conn.execute(_INSERT_SQL, _to_params(row)).lastrowid
+
+    def append_many(self, rows: Iterable[Dict[str, str]], *, batch_size: int = 5000) -> int:
+        """Bulk append in batched transactions. Returns the number of rows written."""
+        conn = self._conn()
+        total = 0
+        for batch in _batches(rows, batch_size):
+            with conn:
+                conn.executemany(_INSERT_SQL, batch)
+            total += len(batch)
+        return total
+
+    def import_csv(self, csv_path: str, *, batch_size: int = 5000) -> int:
+        """
+        One-shot import of an existing inspection_logs.csv. Recorded by absolute path, so running it
+        again is a no-op. Each batch commits together with the row offset reached, so an interrupted
+        import resumes after the last committed batch instead of inserting it twice.
+        Returns the number of rows imported by this call (0 if already imported / no file).
+        """
+        if not os.path.exists(csv_path):
+            return 0
+        source = os.path.abspath(csv_path)
+        conn = self._conn()
+        marker = conn.execute("SELECT size_bytes, rows FROM inspection_log_imports WHERE source = ?",
+                              (source,)).fetchone()
+        if marker is not None and marker["size_bytes"] != _IN_PROGRESS:
+            return 0
+        done = marker["rows"] if marker is not None else 0
+        checkpoint = ("INSERT INTO inspection_log_imports (source, size_bytes, rows, imported_at) VALUES (?, ?, ?, ?) "
+                      "ON CONFLICT (source) DO UPDATE SET size_bytes = excluded.size_bytes, rows = excluded.rows, "
+                      "imported_at = excluded.imported_at")
+
+        count = 0
+        with open(csv_path, newline='', encoding='utf-8') as f:
+            rows = itertools.islice(csv.DictReader(f), done, None)
+            for batch in _batches(rows, batch_size):
+                count += len(batch)
+                with conn:
+                    conn.executemany(_INSERT_SQL, batch)
+                    conn.execute(checkpoint, (source, _IN_PROGRESS, done + count, datetime.now().isoformat()))
+        with conn:
+            conn.execute(checkpoint, (source, os.path.getsize(csv_path), done + count, datetime.now().isoformat()))
+        return count
+
+    # ---------- reads ----------
+
+    def _select(self, where: str = "", params=(), order: str = "seq") -> Iterator[Dict[str, str]]:
+        sql = f"SELECT {_COLUMNS} FROM inspection_logs"
+        if where:
+            sql += f" WHERE {where}"
+        sql += f" ORDER BY {order}"
+        for r in self._conn().execute(sql, params):
+            yield dict(r)
+
+    @staticmethod
+    def _where(*, equipment_id: Optional[str] = None, client: Optional[str] = None,
+               clients: Optional[Iterable[str]] = None, client_ci: Optional[str] = None,
+               start: Optional[str] = None, end: Optional[str] = None,
+               inspector_contains: Optional[str] = None):
+        """(where_sql, params) for the filters below, or (None, None) if nothing can match."""
+        clauses, params = [], []
+        if equipment_id is not None:
+            clauses.append("equipment_id = ?")
+            params.append(equipment_id)
+        if client is not None:
+            clauses.append("client = ?")
+            params.append(client)
+        if clients is not None:
+            clients = list(clients)
+            if not clients:
+                return None, None
+            clauses.append(f"client IN ({', '.join('?' * len(clients))})")
+            params.extend(clients)
+        if client_ci is not None:
+            clauses.append("client_key = ?")
+            params.append(_client_key(client_ci))
+        if start:
+            clauses.append("timestamp >= ?")
+            params.append(start)
+        if end:
+            clauses.append("timestamp <= ?")
+            params.append(end)
+        if inspector_contains:
+            clauses.append("instr(inspector_pin, ?) > 0")
+            params.append(inspector_contains)
+        return " AND ".join(clauses), params
+
+    def iter_logs(self, **filters) -> Iterator[Dict[str, str]]:
+        """
+        Rows in append order, filtered with the legacy semantics:
+          equipment_id  exact match          client_ci   trimmed, case-insensitive match
+          client        exact match          start/end   ISO string bounds on timestamp (inclusive)
+          clients       exact match, any of  inspector_contains  substring of inspector_pin
+        """
+        where, params = self._where(**filters)
+        if where is None:
+            return iter(())
+        return self._select(where, params)
+
+    def count(self, **filters) -> int:
+        where, params = self._where(**filters)
+        if where is None:
+            return 0
+        sql = "SELECT COUNT(*) FROM inspection_logs" + (f" WHERE {where}" if where else "")
+        return self._conn().execute(sql, params).fetchone()[0]
+
+    def watermark(self) -> int:
+        """Highest sequence number. The log is append-only, so this changes iff any row was added."""
+        return self._conn().execute("SELECT COALESCE(MAX(seq), 0) FROM inspection_logs").fetchone()[0]
+
+    def logs(self, **filters) -> List[Dict[str, str]]:
+        return list(self.iter_logs(**filters))
+
+    def latest_next_maintenance(self, equipment_id: str) -> Optional[str]:
+        """Date text of the newest 'Next Maintenance:' entry for a piece of equipment."""
+        row = self._conn().execute(
+            "SELECT functional FROM inspection_logs "
+            "WHERE equipment_id = ? AND functional LIKE 'Next Maintenance:%' "
+            "ORDER BY timestamp DESC, seq DESC LIMIT 1",
+            (equipment_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        return row["functional"].replace(NEXT_MAINTENANCE_PREFIX, "").strip()
+
+    def missed(self, today: str, *, clients: Optional[Iterable[str]] = None) -> List[Dict[str, str]]:
+        """Entries whose parsed next-maintenance date is before `today` (ISO), in append order."""
+        where, params = "next_maintenance IS NOT NULL AND next_maintenance < ?", [today]
+        if clients is not None:
+            clients = list(clients)
+            if not clients:
+                return []
+            where += f" AND client IN ({', '.join('?' * len(clients))})"
+            params.extend(clients)
+        return list(self._select(where, params))
+
+    def upcoming(self, today: str) -> List[Dict[str, str]]:
+        """
+        First (in append order) entry per equipment with a next-maintenance date on/after `today`,
+        sorted by that date. Relies on SQLite returning the MIN(seq) row's columns for bare columns.
+        """
+        rows = self._conn().execute(
+            "SELECT MIN(seq) AS seq, equipment_id, client, name, inspector_pin, next_maintenance "
+            "FROM inspection_logs WHERE next_maintenance IS NOT NULL AND next_maintenance >= ? "
+            "GROUP BY equipment_id ORDER BY next_maintenance, seq",
+            (today,),
+        )
+        return [dict(r) for r in rows]
+
+    def iter_csv(self, **filters) -> Iterator[str]:
+        """CSV text (header + rows) for a filtered slice, one line at a time."""
+        class _Line:
+            def write(self, s):
+                return s
+        writer = csv.writer(_Line())
+        yield writer.writerow(FIELDNAMES)
+        for row in self.iter_logs(**filters):
+            yield writer.writerow([row[f] for f in FIELDNAMES])
+
+
+# ---------- per-process registry ----------
+
+_stores: Dict[str, InspectionLogStore] = {}
+_registry_lock = threading.Lock()
+
+
+def get_inspection_log_store(path: str) -> InspectionLogStore:
+    """Process-wide InspectionLogStore for a database file (schema created on first use)."""
+    key = os.path.abspath(path)
+    with _registry_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = InspectionLogStore(key)
+            _stores[key] = store
+        return store
@@ -0,0 +1,300 @@
+# app/services/mail_queue.py
+"""
+Outbound mail queue.
+
+send_email() used to call mail.send() inside the request: a new SMTP connection per message, no retry,
+and a 500 if the server hiccupped. Messages are now rows in outbound_emails (one per recipient, each
+with a pending EmailLog), delivered by `flask mail worker`:
+  • a claimed batch goes out over one SMTP connection (mail.connect()), reconnecting only if it drops
+  • per-recipient-domain token buckets (MAIL_DOMAIN_RATE_LIMITS, else MAIL_DOMAIN_RATE per second)
+    hold back bursts to one provider; messages over budget wait briefly or are deferred
+  • transient failures are retried with exponential backoff (MAIL_RETRY_BASE_SECONDS doubling, capped
+    at MAIL_RETRY_MAX_SECONDS) up to MAIL_MAX_ATTEMPTS; 5xx rejections fail at once
+  • outcomes are written back in bulk: one executemany UPDATE for the queue rows and one for EmailLog
+    (delivery_status sent / failed / pending, delivery_response the server reply or error)
+
+send_email() writes its rows through a session of its own (mail_session()), so queueing mail never
+commits — or rolls back — the caller's unit of work. Unless MAIL_QUEUE_ASYNC is set it also delivers
+them before returning, through the same path, so a failure is logged and retried by the worker
+(Procfile `mail`) instead of breaking the request.
+enqueue / claim / deliver take an optional `session` (default db.session). Rate limits are per worker process.
+"""
+from __future__ import annotations
+
+import random
+import smtplib
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from flask import current_app
+from flask_mail import Message
+from sqlalchemy import and_, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.extensions import db, mail
+from app.models.audit.email_log import EmailLog
+from app.models.communication.outbound_email import OutboundEmail
+
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_DOMAIN_RATE = 50.0          # messages per second per recipient domain
+DEFAULT_MAX_ATTEMPTS = 6
+DEFAULT_RETRY_BASE = 30             # seconds; doubles per attempt
+DEFAULT_RETRY_MAX = 6 * 60 * 60
+DEFAULT_LOCK_TIMEOUT = 10 * 60      # reclaim rows a dead worker left in 'sending'
+MAX_INLINE_WAIT = 1.0               # wait this long for a domain token; longer → defer the message
+
+
+def _domain(address: str) -> str:
+    return address.rsplit("@", 1)[-1].strip().lower() if "@" in address else ""
+
+
+def parse_rate_limits(raw) -> Dict[str, float]:
+    """'gmail.com=20,outlook.com=10' (or a list of such items / a dict) → {domain: per-second rate}."""
+    if isinstance(raw, dict):
+        return {k.lower(): float(v) for k, v in raw.items()}
+    if isinstance(raw, str):
+        raw = raw.split(",")
+    limits = {}
+    for item in raw or []:
+        domain, _, rate = str(item).partition("=")
+        if domain.strip() and rate.strip():
+            limits[domain.strip().lower()] = float(rate)
+    return limits
+
+
+class DomainRateLimiter:
+    """Token bucket per recipient domain (capacity = one second's worth of messages)."""
+
+    def __init__(self, default_rate: float = DEFAULT_DOMAIN_RATE, limits: Optional[Dict[str, float]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.default_rate = default_rate
+        self.limits = limits or {}
+        self.clock = clock
+        self._buckets: Dict[str, Tuple[float, float]] = {}   # domain -> (tokens, last refill)
+
+    def acquire(self, domain: str) -> float:
+        """Take a token for `domain`; returns 0.0, or the seconds to wait before one is available."""
+        rate = self.limits.get(domain, self.default_rate)
+        if rate <= 0:
+            return 0.0
+        now = self.clock()
+        tokens, last = self._buckets.get(domain, (rate, now))
+        tokens = min(rate, tokens + (now - last) * rate)
+        if tokens >= 1:
+            self._buckets[domain] = (tokens - 1, now)
+            return 0.0
+        self._buckets[domain] = (tokens, now)
+        return (1 - tokens) / rate
+
+
+def retry_delay(attempts: int, base: float = DEFAULT_RETRY_BASE, cap: float = DEFAULT_RETRY_MAX) -> float:
+    """Exponential backoff with jitter: base·2^(attempts-1), capped, scaled by 0.5–1.0."""
+    return min(base * 2 ** max(attempts - 1, 0), cap) * random.uniform(0.5, 1.0)
+
+
+def is_permanent(exc: Exception) -> bool:
+    """5xx replies and refused recipients/senders won't succeed on retry."""
+    if isinstance(exc, (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused)):
+        return True
+    code = getattr(exc, "smtp_code", None)
+    return isinstance(code, int) and 500 <= code < 600
+
+
+def _limiter() -> DomainRateLimiter:
+    limiter = current_app.extensions.get("mail_rate_limiter")
+    if limiter is None:
+        cfg = current_app.config
+        limiter = DomainRateLimiter(float(cfg.get("MAIL_DOMAIN_RATE", DEFAULT_DOMAIN_RATE)),
+                                    parse_rate_limits(cfg.get("MAIL_DOMAIN_RATE_LIMITS")))
+        current_app.extensions["mail_rate_limiter"] = limiter
+    return limiter
+
+
+def mail_session() -> Session:
+    """A session on the app's engine, separate from the request's db.session (use as a context manager)."""
+    return Session(bind=db.engine)
+
+
+# ----------------------------
+# Enqueue (request side)
+# ----------------------------
+
+def enqueue_email(subject: str, recipients: Iterable[str], body: Optional[str] = None, html: Optional[str] = None,
+                  sender: Optional[str] = None, *, email_type: str = "generic", user_id: Optional[int] = None,
+                  context_data: Optional[dict] = None, commit: bool = True, session=None) -> List[int]:
+    """Queue one message per recipient, each with a pending EmailLog. Returns the OutboundEmail ids."""
+    session = session or db.session
+    recipients = [r.strip() for r in recipients if r and r.strip()]
+    if not recipients:
+        return []
+    sender = sender or current_app.config.get("MAIL_DEFAULT_SENDER")
+    now = datetime.utcnow()
+    log_ids = session.execute(
+        insert(EmailLog).returning(EmailLog.id, sort_by_parameter_order=True),
+        [{"user_id": user_id, "email_type": email_type, "recipient": r, "subject": subject, "timestamp": now,
+          "delivery_status": "pending", "context_data": context_data} for r in recipients],
+    ).scalars().all()
+    ids = session.execute(
+        insert(OutboundEmail).returning(OutboundEmail.id, sort_by_parameter_order=True),
+        [{"status": OutboundEmail.STATUS_QUEUED, "sender": sender, "recipient": r, "recipient_domain": _domain(r),
+          "subject": subject, "body": body, "html": html, "email_type": email_type, "user_id": user_id,
+          "email_log_id": log_id, "attempts": 0, "next_attempt_at": now, "created_at": now}
+         for r, log_id in zip(recipients, log_ids)],
+    ).scalars().all()
+    if commit:
+        session.commit()
+    return ids
+
+
+# ----------------------------
+# Delivery (worker side)
+# ----------------------------
+
+def claim_emails(limit: int, ids: Optional[Iterable[int]] = None, session=None) -> List[OutboundEmail]:
+    """
+    Due queued messages (or 'sending' ones a dead worker left behind) → sending, oldest first.
+    SKIP LOCKED lets several workers share the queue.
+    """
+    session = session or db.session
+    now = datetime.utcnow()
+    timeout = int(current_app.config.get("MAIL_LOCK_TIMEOUT", DEFAULT_LOCK_TIMEOUT))
+    q = session.query(OutboundEmail).filter(or_(
+        and_(OutboundEmail.status == OutboundEmail.STATUS_QUEUED, OutboundEmail.next_attempt_at <= now),
+        and_(OutboundEmail.status == OutboundEmail.STATUS_SENDING,
+             OutboundEmail.locked_at < now - timedelta(seconds=timeout)),
+    ))
+    if ids is not None:
+        q = q.filter(OutboundEmail.id.in_(list(ids)))
+    rows = q.order_by(OutboundEmail.next_attempt_at, OutboundEmail.id).limit(limit).with_for_update(skip_locked=True).all()
+    if rows:
+        session.execute(update(OutboundEmail), [
+            {"id": r.id, "status": OutboundEmail.STATUS_SENDING, "locked_at": now} for r in rows])
+    session.commit()
+    return rows
+
+
+def _message(row: OutboundEmail) -> Message:
+    return Message(subject=row.subject, sender=row.sender, recipients=[row.recipient], body=row.body, html=row.html)
+
+
+def deliver(rows: List[OutboundEmail], limiter: Optional[DomainRateLimiter] = None, session=None) -> Dict[str, int]:
+    """
+    Send claimed rows over one SMTP connection and write the outcomes back in bulk.
+    Returns {'sent', 'retry', 'failed', 'deferred'}.
+    """
+    session = session or db.session
+    cfg = current_app.config
+    limiter = limiter or _limiter()
+    max_attempts = int(cfg.get("MAIL_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS))
+    base = float(cfg.get("MAIL_RETRY_BASE_SECONDS", DEFAULT_RETRY_BASE))
+    cap = float(cfg.get("MAIL_RETRY_MAX_SECONDS", DEFAULT_RETRY_MAX))
+    stats = {"sent": 0, "retry": 0, "failed": 0, "deferred": 0}
+    queue_rows, log_rows = [], []
+
+    def _outcome(row, status, response, *, attempted=True, next_at=None):
+        now = datetime.utcnow()
+        attempts = row.attempts + (1 if attempted else 0)
+        queue_rows.append({"id": row.id, "status": status, "attempts": attempts, "locked_at": None,
+                           "next_attempt_at": next_at or row.next_attempt_at,
+                           "last_error": None if status == OutboundEmail.STATUS_SENT else response,
+                           "sent_at": now if status == OutboundEmail.STATUS_SENT else None})
+        if row.email_log_id and attempted:
+            log_rows.append({"id": row.email_log_id, "delivery_response": response,
+                             "delivery_status": {OutboundEmail.STATUS_SENT: "sent",
+                                                 OutboundEmail.STATUS_FAILED: "failed"}.get(status, "pending")})
+
+    def _failed(row, exc):
+        attempts = row.attempts + 1
+        if is_permanent(exc) or attempts >= max_attempts:
+            _outcome(row, OutboundEmail.STATUS_FAILED, repr(exc))
+            stats["failed"] += 1
+        else:
+            _outcome(row, OutboundEmail.STATUS_QUEUED, repr(exc),
+                     next_at=datetime.utcnow() + timedelta(seconds=retry_delay(attempts, base, cap)))
+            stats["retry"] += 1
+
+    pending = list(rows)
+    while pending:
+        try:
+            with mail.connect() as conn:
+                while pending:
+                    row = pending[0]
+                    wait = limiter.acquire(row.recipient_domain)
+                    if wait > MAX_INLINE_WAIT:
+                        _outcome(pending.pop(0), OutboundEmail.STATUS_QUEUED, None, attempted=False,
+                                 next_at=datetime.utcnow() + timedelta(seconds=wait))
+                        stats["deferred"] += 1
+                        continue
+                    if wait:
+                        time.sleep(wait)
+                        limiter.acquire(row.recipient_domain)
+                    try:
+                        conn.send(_message(row))
+                    except smtplib.SMTPServerDisconnected:
+                        raise  # reconnect below; this row is retried on the new connection
+                    except Exception as e:
+                        _failed(pending.pop(0), e)
+                        continue
+                    pending.pop(0)
+                    _outcome(row, OutboundEmail.STATUS_SENT, "accepted")
+                    stats["sent"] += 1
+        except smtplib.SMTPServerDisconnected as e:
+            # The connection dropped mid-batch: count it against the row in flight, then reconnect.
+            if pending:
+                _failed(pending.pop(0), e)
+        except Exception as e:
+            # Could not connect at all: every remaining row is a transient failure.
+            for row in pending:
+                _failed(row, e)
+            pending = []
+
+    if queue_rows:
+        session.execute(update(OutboundEmail), queue_rows)
+    if log_rows:
+        session.execute(update(EmailLog), log_rows)
+    session.commit()
+    return stats
+
+
+def process_mail_queue(batch_size: int = DEFAULT_BATCH_SIZE, ids: Optional[Iterable[int]] = None,
+                       session=None) -> Dict[str, int]:
+    """Claim one batch and deliver it. Returns the delivery stats plus 'claimed'."""
+    rows = claim_emails(batch_size, ids=ids, session=session)
+    stats = deliver(rows, session=session) if rows else {"sent": 0, "retry": 0, "failed": 0, "deferred": 0}
+    stats["claimed"] = len(rows)
+    return stats
+
+
+def deliver_now(ids: List[int], session=None) -> Dict[str, int]:
+    """Deliver specific queued messages immediately (send_email without MAIL_QUEUE_ASYNC)."""
+    return process_mail_queue(len(ids), ids=ids, session=session) if ids else {"claimed": 0}
+
+
+def run_mail_worker(*, batch_size: int = DEFAULT_BATCH_SIZE, poll_interval: float = 2.0, once: bool = False,
+                    log: Callable[[str], None] = print) -> Dict[str, int]:
+    """Main loop for `flask mail worker`. With once=True it stops when nothing is due."""
+    totals = {"claimed": 0, "sent": 0, "retry": 0, "failed": 0, "deferred": 0}
+    while True:
+        stats = process_mail_queue(batch_size)
+        for k in totals:
+            totals[k] += stats.get(k, 0)
+        if stats["claimed"]:
+            log(f"batch of {stats['claimed']}: {stats['sent']} sent, {stats['retry']} to retry, "
+                f"{stats['failed']} failed, {stats['deferred']} deferred")
+            continue
+        if once:
+            return totals
+        db.session.remove()
+        time.sleep(poll_interval)
+
+
+def queue_status() -> Dict[str, int]:
+    """Message counts by status, plus how many queued ones are due now."""
+    counts = dict(db.session.execute(
+        select(OutboundEmail.status, func.count()).group_by(OutboundEmail.status)).all())
+    counts["due"] = db.session.execute(
+        select(func.count()).select_from(OutboundEmail).where(
+            OutboundEmail.status == OutboundEmail.STATUS_QUEUED,
+            OutboundEmail.next_attempt_at <= datetime.utcnow())).scalar_one()
+    return counts
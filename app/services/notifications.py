@@ -0,0 +1,353 @@
+# app/services/notifications.py
+"""
+Notification fan-out and unread counters.
+
+notify_users() used to load every user of each role (plus all admins) and add one Notification per
+recipient through the ORM before a single commit — slow for a tenant-wide alert, and all of it inside
+the request. A fan-out is now a NotificationFanout row:
+  • recipients are resolved by one set-based query (roles, explicit users/emails, admins, scoped to a
+    company and/or a client's unit members), walked in user-id order in chunks
+  • each chunk is one executemany INSERT into notifications plus one counter upsert, committed with the
+    job's progress (last_user_id), so an interrupted fan-out resumes where it stopped
+  • a recipient who already got the same message_key within NOTIFICATION_DEDUP_WINDOW is skipped
+  • small fan-outs are delivered inline; larger ones run in a background thread of the app process, or
+    with NOTIFICATION_QUEUE_ASYNC are queued for `flask notifications worker` (Procfile `notifications`).
+    A thread that dies leaves its job 'running'; a worker reclaims it after NOTIFICATION_JOB_TIMEOUT
+
+notification_counters holds each user's unread count. The fan-out engine and mark_notifications_read()
+adjust it directly; Notification rows added/changed/deleted through the ORM are covered by a flush hook.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+
+from flask import current_app
+from sqlalchemy import and_, bindparam, case, event, exists, false, func, insert, inspect, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.models.core.notification import Notification
+from app.models.core.notification_counter import NotificationCounter
+from app.models.core.notification_fanout import NotificationFanout
+from app.models.core.role import Role
+from app.models.core.user import User
+
+CHUNK_SIZE = 2000
+DEFAULT_INLINE_MAX = 500
+DEFAULT_DEDUP_WINDOW = 60 * 60
+DEFAULT_JOB_TIMEOUT = 10 * 60
+ADMIN_ROLE = "Admin"
+
+
+def message_key_for(message: str, type: Optional[str] = None, link_url: Optional[str] = None) -> str:
+    return hashlib.sha1(f"{type or ''}|{link_url or ''}|{message}".encode("utf-8")).hexdigest()
+
+
+# ----------------------------
+# Unread counters
+# ----------------------------
+
+def _bump_counters(conn, deltas: Dict[int, int]):
+    """unread += delta per user: an upsert for increments, a clamped UPDATE for decrements (executemany each)."""
+    table = NotificationCounter.__table__
+    now = datetime.utcnow()
+    up = [{"user_id": uid, "unread": d, "updated_at": now} for uid, d in deltas.items() if d > 0]
+    down = [{"b_user_id": uid, "b_by": -d} for uid, d in deltas.items() if d < 0]
+    if up:
+        stmt = (pg_insert if conn.dialect.name == "postgresql" else sqlite_insert)(table)
+        conn.execute(stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id],
+            set_={"unread": table.c.unread + stmt.excluded.unread, "updated_at": stmt.excluded.updated_at},
+        ), up)
+    if down:
+        by = bindparam("b_by")
+        conn.execute(
+            table.update().where(table.c.user_id == bindparam("b_user_id"))
+            .values(unread=case((table.c.unread > by, table.c.unread - by), else_=0), updated_at=now),
+            down)
+
+
+def unread_count(user_id: int) -> int:
+    """Navbar badge: one primary-key read."""
+    if not user_id:
+        return 0
+    return db.session.execute(
+        select(NotificationCounter.unread).where(NotificationCounter.user_id == user_id)).scalar() or 0
+
+
+def current_user_unread_count() -> int:
+    """Jinja global for the navbar; cached on g so several badges in one page share the read."""
+    from flask import g, has_request_context
+    from flask_login import current_user
+
+    if not has_request_context() or not getattr(current_user, "is_authenticated", False):
+        return 0
+    if "unread_notifications" not in g:
+        g.unread_notifications = unread_count(current_user.id)
+    return g.unread_notifications
+
+
+def mark_notifications_read(user_id: int, notification_ids: Optional[Iterable[int]] = None, commit: bool = True) -> int:
+    """Mark the user's unread notifications (all, or the given ids) read. Returns how many changed."""
+    stmt = (update(Notification)
+            .where(Notification.recipient_id == user_id, or_(Notification.is_read.is_(None), Notification.is_read == false()))
+            .values(is_read=True)
+            .execution_options(synchronize_session=False))
+    if notification_ids is not None:
+        stmt = stmt.where(Notification.id.in_(list(notification_ids)))
+    changed = db.session.execute(stmt).rowcount or 0
+    _bump_counters(db.session.connection(), {user_id: -changed})
+    if commit:
+        db.session.commit()
+    return changed
+
+
+def rebuild_notification_counters(commit: bool = True) -> int:
+    """Recount every user's unread notifications from scratch (repair tool). Returns users counted."""
+    db.session.execute(update(NotificationCounter).values(unread=0, updated_at=datetime.utcnow()))
+    counts = db.session.execute(
+        select(Notification.recipient_id, func.count())
+        .where(or_(Notification.is_read.is_(None), Notification.is_read == false()))
+        .group_by(Notification.recipient_id)).all()
+    _bump_counters(db.session.connection(), {uid: n for uid, n in counts})
+    if commit:
+        db.session.commit()
+    return len(counts)
+
+
+def _after_flush(session, flush_context):
+    deltas = defaultdict(int)
+    for obj in session.new:
+        if isinstance(obj, Notification) and not obj.is_read:
+            deltas[obj.recipient_id] += 1
+    for obj in session.deleted:
+        if isinstance(obj, Notification):
+            # The row is gone, so only loaded values can be used; an unloaded is_read counts as read.
+            state = inspect(obj)
+            hist = state.attrs.is_read.history
+            was_read = hist.deleted[0] if hist.deleted else state.dict.get("is_read", True)
+            recipient_id = state.dict.get("recipient_id")
+            if not was_read and recipient_id is not None:
+                deltas[recipient_id] -= 1
+    for obj in session.dirty:
+        if isinstance(obj, Notification):
+            hist = inspect(obj).attrs.is_read.history
+            # Without a loaded previous value there is nothing to compare against.
+            if hist.has_changes() and hist.deleted and bool(hist.deleted[0]) != bool(obj.is_read):
+                deltas[obj.recipient_id] += -1 if obj.is_read else 1
+    if any(deltas.values()):
+        _bump_counters(session.connection(), deltas)
+
+
+_listeners_registered = False
+
+
+def register_notification_listeners():
+    """Keep notification_counters in step with Notification rows flushed through the ORM (idempotent)."""
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    event.listen(Session, "after_flush", _after_flush)
+    _listeners_registered = True
+
+
+# ----------------------------
+# Recipients
+# ----------------------------
+
+def recipients_query(job: NotificationFanout):
+    """SELECT users.id for a fan-out: one statement, whatever the mix of roles, users, emails and scope."""
+    from app.models.members.member import Member, member_units
+    from app.models.members.unit import Unit
+
+    who = []
+    roles = list(job.role_names or [])
+    if job.include_admins:
+        roles.append(ADMIN_ROLE)
+    if roles:
+        who.append(User.role_id.in_(select(Role.id).where(Role.name.in_(roles))))
+    if job.user_ids:
+        who.append(User.id.in_(list(job.user_ids)))
+    if job.emails:
+        who.append(func.lower(User.email).in_([e.strip().lower() for e in job.emails if e]))
+
+    stmt = select(User.id).where(or_(*who) if who else false(), User.is_active.isnot(False), User.deleted_at.is_(None))
+    if job.company_id is not None:
+        stmt = stmt.where(User.company_id == job.company_id)
+    if job.client_id is not None:
+        stmt = stmt.where(exists(
+            select(Member.id)
+            .join(member_units, member_units.c.member_id == Member.id)
+            .join(Unit, Unit.id == member_units.c.unit_id)
+            .where(Member.user_id == User.id, Unit.client_id == job.client_id)))
+    return stmt
+
+
+# ----------------------------
+# Delivery
+# ----------------------------
+
+def _deliver_chunk(job: NotificationFanout, chunk_size: int, dedup_since: datetime) -> bool:
+    """Deliver the next chunk of recipients. Returns False once there are none left."""
+    ids = db.session.execute(
+        recipients_query(job).where(User.id > job.last_user_id).order_by(User.id).limit(chunk_size)).scalars().all()
+    if not ids:
+        return False
+
+    seen = set(db.session.execute(
+        select(Notification.recipient_id)
+        .where(Notification.recipient_id.in_(ids), Notification.message_key == job.message_key,
+               Notification.created_at >= dedup_since)).scalars())
+    now = datetime.utcnow()
+    rows = [{"recipient_id": uid, "message": job.message, "type": job.type, "link_url": job.link_url,
+             "message_key": job.message_key, "priority_level": job.priority_level,
+             "extracted_data": job.extracted_data, "is_read": False, "created_at": now}
+            for uid in ids if uid not in seen]
+    if rows:
+        db.session.execute(insert(Notification), rows)
+        _bump_counters(db.session.connection(), {r["recipient_id"]: 1 for r in rows})
+
+    job.delivered += len(rows)
+    job.skipped += len(ids) - len(rows)
+    job.last_user_id = ids[-1]
+    return True
+
+
+def run_fanout(job: NotificationFanout, chunk_size: int = CHUNK_SIZE) -> NotificationFanout:
+    """Deliver a fan-out to completion (resuming from last_user_id), committing after each chunk."""
+    window = int(current_app.config.get("NOTIFICATION_DEDUP_WINDOW", DEFAULT_DEDUP_WINDOW))
+    dedup_since = (job.created_at or datetime.utcnow()) - timedelta(seconds=window)
+    job.status = NotificationFanout.STATUS_RUNNING
+    job.started_at = job.started_at or datetime.utcnow()
+    db.session.commit()
+    try:
+        while _deliver_chunk(job, chunk_size, dedup_since):
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        job.status = NotificationFanout.STATUS_FAILED
+        job.error = str(e)
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        raise
+    job.status = NotificationFanout.STATUS_DONE
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+    return job
+
+
+def _run_fanout_thread(app, fanout_id: int):
+    with app.app_context():
+        job = db.session.get(NotificationFanout, fanout_id)
+        try:
+            run_fanout(job)
+        except Exception as e:
+            app.logger.exception("Fan-out %s failed: %s", fanout_id, e)
+        finally:
+            db.session.remove()
+
+
+def fan_out(message: str, *, type: Optional[str] = None, link_url: Optional[str] = None,
+            role_names: Optional[Iterable[str]] = None, user_ids: Optional[Iterable[int]] = None,
+            emails: Optional[Iterable[str]] = None, company_id: Optional[int] = None,
+            client_id: Optional[int] = None, include_admins: bool = True, message_key: Optional[str] = None,
+            priority_level: str = "Normal", extracted_data: Optional[dict] = None,
+            requested_by_id: Optional[int] = None, background: Optional[bool] = None) -> NotificationFanout:
+    """
+    Send one notification to everyone matching the scope. Up to NOTIFICATION_INLINE_MAX recipients are
+    delivered before returning; above that (or with background=True) the job is delivered by a background
+    thread, or queued for the worker when NOTIFICATION_QUEUE_ASYNC is set — poll fanout_status(job.id)
+    for progress. Commits.
+    """
+    job = NotificationFanout(
+        message=message, type=type, link_url=link_url,
+        message_key=message_key or message_key_for(message, type, link_url), priority_level=priority_level,
+        role_names=list(role_names or []) or None, user_ids=list(user_ids or []) or None,
+        emails=list(emails or []) or None, company_id=company_id, client_id=client_id,
+        include_admins=include_admins, extracted_data=extracted_data, requested_by_id=requested_by_id,
+        delivered=0, skipped=0, last_user_id=0, attempts=0,
+    )
+    job.total = db.session.execute(select(func.count()).select_from(recipients_query(job).subquery())).scalar()
+    if background is None:
+        background = job.total > int(current_app.config.get("NOTIFICATION_INLINE_MAX", DEFAULT_INLINE_MAX))
+    threaded = background and not current_app.config.get("NOTIFICATION_QUEUE_ASYNC", False)
+    if threaded:
+        # Claimed up front, so a worker only picks the job up if this thread dies with it unfinished.
+        job.status = NotificationFanout.STATUS_RUNNING
+        job.started_at = datetime.utcnow()
+        job.attempts = 1
+    db.session.add(job)
+    db.session.commit()
+
+    if threaded:
+        threading.Thread(target=_run_fanout_thread, args=(current_app._get_current_object(), job.id),
+                         name=f"fanout-{job.id}", daemon=True).start()
+    elif not background:
+        run_fanout(job)
+    return job
+
+
+def fanout_status(fanout_id: int) -> dict:
+    job = db.session.get(NotificationFanout, fanout_id)
+    if job is None:
+        return {"status": "none"}
+    return {
+        "id": job.id,
+        "status": job.status,
+        "total": job.total,
+        "delivered": job.delivered,
+        "skipped": job.skipped,
+        "progress": round((job.delivered + job.skipped) / job.total, 4) if job.total else None,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+# ----------------------------
+# Worker
+# ----------------------------
+
+def claim_fanouts(limit: int = 1) -> List[NotificationFanout]:
+    """Queued fan-outs (or running ones whose worker died) → running. SKIP LOCKED lets workers share the queue."""
+    timeout = int(current_app.config.get("NOTIFICATION_JOB_TIMEOUT", DEFAULT_JOB_TIMEOUT))
+    stale_before = datetime.utcnow() - timedelta(seconds=timeout)
+    jobs = (NotificationFanout.query
+            .filter(or_(NotificationFanout.status == NotificationFanout.STATUS_QUEUED,
+                        and_(NotificationFanout.status == NotificationFanout.STATUS_RUNNING,
+                             NotificationFanout.started_at < stale_before)))
+            .order_by(NotificationFanout.id).limit(limit).with_for_update(skip_locked=True).all())
+    now = datetime.utcnow()
+    for job in jobs:
+        job.status = NotificationFanout.STATUS_RUNNING
+        job.started_at = now
+        job.attempts = (job.attempts or 0) + 1
+    db.session.commit()
+    return jobs
+
+
+def run_notification_worker(*, chunk_size: int = CHUNK_SIZE, poll_interval: float = 2.0, once: bool = False,
+                            log: Callable[[str], None] = print) -> int:
+    """Deliver queued fan-outs until the queue is empty (once=True) or forever. Returns jobs handled."""
+    handled = 0
+    while True:
+        jobs = claim_fanouts()
+        if not jobs:
+            if once:
+                return handled
+            time.sleep(poll_interval)
+            continue
+        for job in jobs:
+            try:
+                run_fanout(job, chunk_size)
+                log(f"📣 Fan-out {job.id}: {job.delivered} delivered, {job.skipped} deduplicated")
+            except Exception as e:
+                log(f"⚠️ Fan-out {job.id} failed: {e}")
+            handled += 1
@@ -0,0 +1,235 @@
+# app/services/pdf.py
+"""
+Shared WeasyPrint rendering service.
+
+Every PDF route used to build HTML(...) / CSS(filename=...) from scratch, re-parsing css/pdf.css,
+re-loading fonts and re-reading logos/branding uploads per request. A PdfRenderer keeps, per static
+folder and per process:
+  • one FontConfiguration shared by all renders
+  • parsed CSS objects, keyed by path and re-parsed only when the file changes
+  • a URL fetcher that serves /static/... assets from an in-memory, byte-bounded LRU
+    (validated against the file's mtime, so a replaced logo is picked up on the next render);
+    unknown URLs on the synthetic asset origin fail at once instead of going to the network
+
+Usable from the Flask app (get_app_pdf_renderer) and from plain processes such as the contract
+render worker or the legacy app.py (get_pdf_renderer(static_folder)).
+"""
+from __future__ import annotations
+
+import mimetypes
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+# Synthetic origin used as base_url so root-relative "/static/..." links resolve to something
+# the fetcher can recognise (WeasyPrint cannot resolve root-relative URLs without a base).
+ASSET_BASE_URL = "http://pdf-assets.local/"
+_ASSET_HOST = urlsplit(ASSET_BASE_URL).netloc
+
+DEFAULT_ASSET_CACHE_BYTES = 32 * 1024 * 1024
+
+
+class PdfRenderer:
+    def __init__(self, static_folder: str, static_url_path: str = "/static",
+                 asset_cache_bytes: int = DEFAULT_ASSET_CACHE_BYTES):
+        from weasyprint.text.fonts import FontConfiguration  # type: ignore
+
+        self.static_folder = os.path.abspath(static_folder)
+        self.static_url_path = "/" + static_url_path.strip("/")
+        self.asset_cache_bytes = asset_cache_bytes
+        self.font_config = FontConfiguration()
+
+        self._lock = threading.Lock()
+        self._css: Dict[str, Tuple[int, object]] = {}                      # abs path -> (mtime_ns, CSS)
+        self._assets: "OrderedDict[str, Tuple[int, bytes, str]]" = OrderedDict()  # abs path -> (mtime_ns, bytes, mime)
+        self._asset_bytes = 0
+
+        self.renders = 0
+        self.render_seconds = 0.0
+        self.css_parses = 0
+        self.css_hits = 0
+        self.asset_hits = 0
+        self.asset_misses = 0
+        self.asset_passthrough = 0
+        self.asset_missing = 0
+
+    # ---------- stylesheets ----------
+
+    def stylesheet(self, path: str):
+        """Parsed CSS for a file (absolute, or relative to the static folder), cached until it changes."""
+        from weasyprint import CSS  # type: ignore
+
+        abs_path = path if os.path.isabs(path) else os.path.join(self.static_folder, path)
+        mtime = os.stat(abs_path).st_mtime_ns
+        with self._lock:
+            cached = self._css.get(abs_path)
+            if cached and cached[0] == mtime:
+                self.css_hits += 1
+                return cached[1]
+
+        css = CSS(filename=abs_path, font_config=self.font_config, url_fetcher=self.url_fetcher)
+        with self._lock:
+            self._css[abs_path] = (mtime, css)
+            self.css_parses += 1
+        return css
+
+    def stylesheets(self, paths: Iterable[str]) -> List[object]:
+        out = []
+        for p in paths or []:
+            abs_path = p if os.path.isabs(p) else os.path.join(self.static_folder, p)
+            if os.path.exists(abs_path):
+                out.append(self.stylesheet(abs_path))
+        return out
+
+    # ---------- assets ----------
+
+    def _static_path_for(self, url: str) -> Optional[str]:
+        """Map a fetch URL onto a file inside the static folder, or None if it is not ours."""
+        parts = urlsplit(url)
+        if parts.scheme == "file":
+            candidate = os.path.abspath(unquote(parts.path))
+        elif parts.scheme in ("http", "https") and parts.netloc == _ASSET_HOST:
+            path = unquote(parts.path)
+            if not path.startswith(self.static_url_path + "/"):
+                return None
+            candidate = os.path.abspath(os.path.join(self.static_folder, path[len(self.static_url_path) + 1:]))
+        else:
+            return None
+        # Never serve anything outside the static folder
+        if not candidate.startswith(self.static_folder + os.sep):
+            return None
+        return candidate
+
+    def _read_asset(self, abs_path: str) -> Tuple[bytes, str]:
+        mtime = os.stat(abs_path).st_mtime_ns
+        with self._lock:
+            cached = self._assets.get(abs_path)
+            if cached and cached[0] == mtime:
+                self._assets.move_to_end(abs_path)
+                self.asset_hits += 1
+                return cached[1], cached[2]
+
+        with open(abs_path, "rb") as f:
+            data = f.read()
+        mime = mimetypes.guess_type(abs_path)[0] or "application/octet-stream"
+
+        with self._lock:
+            self.asset_misses += 1
+            old = self._assets.pop(abs_path, None)
+            if old:
+                self._asset_bytes -= len(old[1])
+            if len(data) <= self.asset_cache_bytes:
+                self._assets[abs_path] = (mtime, data, mime)
+                self._asset_bytes += len(data)
+                while self._asset_bytes > self.asset_cache_bytes:
+                    _, (_, evicted, _) = self._assets.popitem(last=False)
+                    self._asset_bytes -= len(evicted)
+        return data, mime
+
+    def url_fetcher(self, url: str, *args, **kwargs):
+        from weasyprint import default_url_fetcher  # type: ignore
+
+        abs_path = self._static_path_for(url)
+        if abs_path is None or not os.path.isfile(abs_path):
+            if urlsplit(url).netloc == _ASSET_HOST:
+                # The synthetic origin only exists here: never hand it to the network (DNS lookup, timeout).
+                # WeasyPrint logs the failed fetch and renders without the asset.
+                with self._lock:
+                    self.asset_missing += 1
+                raise ValueError(f"No static asset for {url}")
+            with self._lock:
+                self.asset_passthrough += 1
+            return default_url_fetcher(url, *args, **kwargs)
+
+        data, mime = self._read_asset(abs_path)
+        return {"string": data, "mime_type": mime, "redirected_url": url}
+
+    # ---------- rendering ----------
+
+    def render(self, html: str, *, stylesheets: Iterable[str] = (), base_url: Optional[str] = None,
+               target: Optional[str] = None) -> Optional[bytes]:
+        """
+        Render an HTML string to PDF. Returns bytes, or writes to `target` (path) and returns None.
+        base_url defaults to the asset origin so /static/... links are served from the cache.
+        """
+        from weasyprint import HTML  # type: ignore
+
+        t0 = time.perf_counter()
+        doc = HTML(string=html, base_url=base_url or ASSET_BASE_URL, url_fetcher=self.url_fetcher)
+        out = doc.write_pdf(target, stylesheets=self.stylesheets(stylesheets), font_config=self.font_config)
+        with self._lock:
+            self.renders += 1
+            self.render_seconds += time.perf_counter() - t0
+        return out
+
+    def document(self, html: str, *, stylesheets: Iterable[str] = (), base_url: Optional[str] = None):
+        """Laid-out weasyprint Document (for callers that combine pages from several renders)."""
+        from weasyprint import HTML  # type: ignore
+
+        doc = HTML(string=html, base_url=base_url or ASSET_BASE_URL, url_fetcher=self.url_fetcher)
+        return doc.render(stylesheets=self.stylesheets(stylesheets), font_config=self.font_config)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "static_folder": self.static_folder,
+                "renders": self.renders,
+                "render_ms_avg": round(self.render_seconds * 1000 / self.renders, 1) if self.renders else None,
+                "css_cached": len(self._css),
+                "css_parses": self.css_parses,
+                "css_hits": self.css_hits,
+                "assets_cached": len(self._assets),
+                "asset_cache_bytes": self._asset_bytes,
+                "asset_hits": self.asset_hits,
+                "asset_misses": self.asset_misses,
+                "asset_passthrough": self.asset_passthrough,
+            }
+
+
+# ---------- multi-part documents ----------
+
+def merge_pdf_files(parts: Iterable[str], path: str) -> bool:
+    """Concatenate PDF files into `path` with pypdf. Returns False (writes nothing) if pypdf is missing."""
+    try:
+        from pypdf import PdfWriter  # type: ignore
+    except Exception:
+        return False
+    writer = PdfWriter()
+    for part in parts:
+        writer.append(part)
+    with open(path, "wb") as f:
+        writer.write(f)
+    writer.close()
+    return True
+
+
+# ---------- per-process registry ----------
+
+_renderers: Dict[Tuple[str, str], PdfRenderer] = {}
+_registry_lock = threading.Lock()
+
+
+def get_pdf_renderer(static_folder: str, static_url_path: str = "/static",
+                     asset_cache_bytes: int = DEFAULT_ASSET_CACHE_BYTES) -> PdfRenderer:
+    """Process-wide PdfRenderer for a static folder (created on first use)."""
+    key = (os.path.abspath(static_folder), static_url_path)
+    with _registry_lock:
+        renderer = _renderers.get(key)
+        if renderer is None:
+            renderer = PdfRenderer(static_folder, static_url_path, asset_cache_bytes)
+            _renderers[key] = renderer
+        return renderer
+
+
+def get_app_pdf_renderer() -> PdfRenderer:
+    """PdfRenderer bound to the current Flask app's static folder."""
+    from flask import current_app
+
+    return get_pdf_renderer(
+        current_app.static_folder,
+        current_app.static_url_path or "/static",
+        int(current_app.config.get("PDF_ASSET_CACHE_BYTES", DEFAULT_ASSET_CACHE_BYTES)),
+    )
@@ -0,0 +1,135 @@
+# app/services/permissions.py
+"""
+Process-wide role → permission map for has_permission().
+
+The decorator used to query Role and RolePermission on every decorated request. The whole map is
+small, so it is loaded once per worker into {role name: frozenset of permission names} and checked
+in memory:
+  • a RolePermission row for context "Users" grants create_users / view_users / edit_users /
+    delete_users / approve_users / submit_users / gar_users for each flag set, and manage_users
+    when create, view, edit and delete are all set
+  • Role.permissions_matrix adds named permissions: the truthy keys of a dict, or the items of a list
+  • the map is versioned through cache_versions ('permissions'): a transaction that writes Role /
+    RolePermission rows bumps it as it commits, and every worker reloads on its next request — a revoked
+    permission stops being granted everywhere at once. PERMISSION_CACHE_TTL is only a backstop.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Iterable, Mapping, Optional
+
+from flask import current_app
+from sqlalchemy import select
+
+from app.services.cache_versions import shared_version, watch_models
+
+DEFAULT_TTL_SECONDS = 300
+SUPER_ADMIN = "Super Admin"
+
+_FLAG_ACTIONS = (
+    ("can_create", "create"), ("can_view", "view"), ("can_edit", "edit"), ("can_delete", "delete"),
+    ("can_approve", "approve"), ("can_submit", "submit"), ("gar_enabled", "gar"),
+)
+_MANAGE_ACTIONS = {"create", "view", "edit", "delete"}
+
+CACHE_NAME = "permissions"
+
+_load_lock = threading.Lock()
+
+
+def _slug(context: str) -> str:
+    return "_".join((context or "").strip().lower().split())
+
+
+def permissions_for_row(context: str, flags: Mapping[str, Optional[bool]]) -> FrozenSet[str]:
+    """Permission names granted by one RolePermission row."""
+    slug = _slug(context)
+    actions = {action for flag, action in _FLAG_ACTIONS if flags.get(flag)}
+    if _MANAGE_ACTIONS <= actions:
+        actions.add("manage")
+    return frozenset(f"{action}_{slug}" for action in actions)
+
+
+def _matrix_permissions(matrix) -> Iterable[str]:
+    if isinstance(matrix, dict):
+        return [k for k, v in matrix.items() if v]
+    if isinstance(matrix, (list, tuple)):
+        return [p for p in matrix if isinstance(p, str)]
+    return []
+
+
+class PermissionMap:
+    """Immutable {role name: frozenset(permission names)} with the version it was loaded at."""
+    __slots__ = ("roles", "version", "loaded_at")
+
+    def __init__(self, roles: Mapping[str, FrozenSet[str]], version: int):
+        self.roles = MappingProxyType(dict(roles))
+        self.version = version
+        self.loaded_at = time.monotonic()
+
+    @classmethod
+    def load(cls, version: int) -> "PermissionMap":
+        from app.extensions import db
+        from app.models.core.role import Role
+        from app.models.core.role_permissions import RolePermission
+
+        grants: Dict[int, set] = {}
+        names: Dict[int, str] = {}
+        for role_id, name, matrix in db.session.execute(select(Role.id, Role.name, Role.permissions_matrix)):
+            names[role_id] = name
+            grants[role_id] = set(_matrix_permissions(matrix))
+        flag_cols = [getattr(RolePermission, flag) for flag, _ in _FLAG_ACTIONS]
+        for row in db.session.execute(select(RolePermission.role_id, RolePermission.context, *flag_cols)):
+            if row.role_id in grants:
+                grants[row.role_id] |= permissions_for_row(row.context, row._mapping)
+        return cls({names[rid]: frozenset(perms) for rid, perms in grants.items()}, version)
+
+    def permissions(self, role_name: str) -> Optional[FrozenSet[str]]:
+        return self.roles.get(role_name)
+
+
+def permission_map() -> PermissionMap:
+    """This worker's map, reloaded when the shared version moves on or it's older than the TTL."""
+    ttl = int(current_app.config.get("PERMISSION_CACHE_TTL", DEFAULT_TTL_SECONDS))
+    version = shared_version(CACHE_NAME)  # read before loading: a concurrent change can only force a reload
+    current = current_app.extensions.get("permission_map")
+    if current is None or current.version != version or time.monotonic() - current.loaded_at > ttl:
+        with _load_lock:
+            current = current_app.extensions.get("permission_map")
+            if current is None or current.version != version or time.monotonic() - current.loaded_at > ttl:
+                current = PermissionMap.load(version)
+                current_app.extensions["permission_map"] = current
+    return current
+
+
+def role_exists(role_name: str) -> bool:
+    return role_name == SUPER_ADMIN or permission_map().permissions(role_name) is not None
+
+
+def role_has_permissions(role_name: str, *required: str, require_all: bool = True) -> bool:
+    """
+    True if the role holds all (or, with require_all=False, any) of the permissions.
+    Super Admin holds every permission; an unknown role holds none.
+    """
+    if role_name == SUPER_ADMIN:
+        return True
+    granted = permission_map().permissions(role_name)
+    if granted is None:
+        return False
+    check = all if require_all else any
+    return check(p in granted for p in required)
+
+
+def invalidate_permission_map():
+    """Drop this worker's map (runs after a local Role/RolePermission commit)."""
+    current_app.extensions.pop("permission_map", None)
+
+
+def register_permission_listeners():
+    """Version the permission map on Role/RolePermission writes (idempotent)."""
+    from app.models.core.role import Role
+    from app.models.core.role_permissions import RolePermission
+
+    watch_models(CACHE_NAME, (Role, RolePermission), invalidate_permission_map)
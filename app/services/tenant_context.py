@@ -0,0 +1,282 @@
+# app/services/tenant_context.py
+"""
+Per-company branding/theme context, resolved once and cached process-locally.
+
+The old before_request hook ran CompanySettings/Company queries on every request (login, /healthz,
+JSON endpoints...) and the context processor recomputed the theme on every render. Now:
+  • nothing is loaded until a template actually renders (or code asks via current_tenant_context())
+  • the resolved context is an immutable TenantContext, cached per company in an LRU with a TTL
+  • branding saves call invalidate_tenant_context() so edits show up immediately on this worker
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional
+
+from flask import current_app, g, has_request_context, session, url_for
+
+DEFAULT_TTL_SECONDS = 300
+DEFAULT_MAX_ENTRIES = 256
+
+# Attributes copied off the ORM rows. Templates read these as S.<attr> / C.<attr>.
+_SETTINGS_FIELDS = ("primary_hex", "secondary_hex", "accent_hex", "sidebar_hex", "rounded",
+                    "logo_path", "company_name")
+_COMPANY_FIELDS = ("id", "name", "brand_primary_color", "brand_secondary_color", "brand_color", "logo_path")
+
+
+class BrandingRecord:
+    """Read-only attribute bag detached from the session (safe to share across requests/threads)."""
+    __slots__ = ("_data",)
+
+    def __init__(self, row, fields):
+        object.__setattr__(self, "_data", MappingProxyType({f: getattr(row, f, None) for f in fields}))
+
+    def __getattr__(self, name):
+        try:
+            return self._data[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name, value):
+        raise AttributeError("BrandingRecord is read-only")
+
+    def __bool__(self):
+        return True
+
+    def __repr__(self):
+        return f"<BrandingRecord {dict(self._data)!r}>"
+
+
+class TenantContext:
+    """Immutable, fully resolved branding for one company key."""
+    __slots__ = ("settings", "company", "theme", "is_configured", "loaded_at")
+
+    def __init__(self, *, settings, company, theme: Mapping[str, Any], is_configured: bool):
+        object.__setattr__(self, "settings", settings)
+        object.__setattr__(self, "company", company)
+        object.__setattr__(self, "theme", MappingProxyType(dict(theme)))
+        object.__setattr__(self, "is_configured", is_configured)
+        object.__setattr__(self, "loaded_at", time.monotonic())
+
+    def __setattr__(self, name, value):
+        raise AttributeError("TenantContext is immutable")
+
+
+# ----------------------------
+# Cache
+# ----------------------------
+
+class TenantContextCache:
+    """Thread-safe LRU with per-entry TTL and hit/miss counters."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Any, TenantContext]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            ctx = self._entries.get(key)
+            if ctx is None:
+                self.misses += 1
+                return None
+            if time.monotonic() - ctx.loaded_at > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return ctx
+
+    def put(self, key, ctx: TenantContext):
+        with self._lock:
+            self._entries[key] = ctx
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key=None, *, everything: bool = False):
+        with self._lock:
+            if everything:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+                return
+            # The None key falls back to "first company", which may be the one that just changed.
+            for k in (key, None):
+                if self._entries.pop(k, None) is not None:
+                    self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+def _cache() -> TenantContextCache:
+    cache = current_app.extensions.get("tenant_context_cache")
+    if cache is None:
+        cache = TenantContextCache(
+            max_entries=int(current_app.config.get("TENANT_CONTEXT_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+            ttl=float(current_app.config.get("TENANT_CONTEXT_TTL", DEFAULT_TTL_SECONDS)),
+        )
+        current_app.extensions["tenant_context_cache"] = cache
+    return cache
+
+
+# ----------------------------
+# Resolution
+# ----------------------------
+
+def _norm_hex(h, default_hex):
+    if not h:
+        return default_hex
+    s = str(h).strip()
+    if not s.startswith("#"):
+        s = "#" + s
+    return s
+
+
+def _load_rows(company_id: Optional[int]):
+    """The two queries the old before_request hook ran on every request."""
+    try:
+        from app.models.org.company_settings import CompanySettings  # type: ignore
+    except Exception:
+        CompanySettings = None  # type: ignore
+    try:
+        from app.models.onboarding.company import Company  # type: ignore
+    except Exception:
+        Company = None  # type: ignore
+
+    settings = None
+    if CompanySettings is not None:
+        try:
+            settings = CompanySettings.query.first()
+        except Exception as e:
+            current_app.logger.debug(f"CompanySettings load skipped: {e}")
+
+    company = None
+    if Company is not None:
+        try:
+            q = Company.query
+            company = q.get(company_id) if company_id else None
+            if company is None:
+                company = q.first()
+        except Exception as e:
+            current_app.logger.debug(f"Branding fallback load skipped: {e}")
+
+    return (
+        BrandingRecord(settings, _SETTINGS_FIELDS) if settings is not None else None,
+        BrandingRecord(company, _COMPANY_FIELDS) if company is not None else None,
+    )
+
+
+def _build_context(company_id: Optional[int]) -> TenantContext:
+    S, C = _load_rows(company_id)
+
+    primary   = _norm_hex(getattr(S, "primary_hex", None) if S else None,
+                          _norm_hex(getattr(C, "brand_primary_color", None) if C else None, "#2152ff"))
+    secondary = _norm_hex(getattr(S, "secondary_hex", None) if S else None,
+                          _norm_hex(getattr(C, "brand_secondary_color", None) if C else None, "#2dce89"))
+    accent    = _norm_hex(getattr(S, "accent_hex", None) if S else None,
+                          _norm_hex(getattr(C, "brand_color", None) if C else None, "#f5365c"))
+    sidebar   = getattr(S, "sidebar_hex", None) if S and getattr(S, "sidebar_hex", None) else "#1f283e"
+    rounded   = bool(getattr(S, "rounded", True)) if S else True
+
+    # Logo URL resolve
+    if S and getattr(S, "logo_path", None):
+        logo_path = S.logo_path
+    elif C and getattr(C, "logo_path", None):
+        logo_path = C.logo_path
+    else:
+        logo_path = current_app.config.get("BRAND_LOGO_PATH", "assets/img/logo-ct-dark.png")
+
+    filename = str(logo_path).lstrip("/")
+    if filename.startswith("static/"):
+        filename = filename[len("static/"):]
+    try:
+        logo_url = url_for("static", filename=filename)
+    except Exception:
+        logo_url = f"/static/{filename}".replace("//", "/")
+
+    company_name = (getattr(C, "name", None)
+                    or getattr(S, "company_name", None)
+                    or current_app.config.get("BRAND_COMPANY_NAME", "LogixPM"))
+
+    name_ok = bool(company_name and company_name.strip().lower() != "new company")
+    has_logo = bool((S and getattr(S, "logo_path", None)) or (C and getattr(C, "logo_path", None)))
+    has_primary = bool((S and getattr(S, "primary_hex", None)) or (C and getattr(C, "brand_primary_color", None)))
+
+    theme = dict(
+        # Theme vars
+        THEME_PRIMARY=primary,
+        THEME_SECONDARY=secondary,
+        THEME_ACCENT=accent,
+        THEME_SIDEBAR=sidebar,
+        THEME_ROUNDED=rounded,
+
+        # Branding vars (aliases for auth/public templates)
+        BRAND_PRIMARY_COLOR=primary,
+        BRAND_SECONDARY_COLOR=secondary,
+        BRAND_ACCENT_COLOR=accent,
+        BRAND_LOGO_URL=logo_url,
+        BRAND_COMPANY_NAME=company_name,
+
+        # Read-only snapshots of the source rows (if anyone needs them)
+        COMPANY_SETTINGS=S,
+        COMPANY_BRANDING=C,
+    )
+    return TenantContext(settings=S, company=C, theme=theme,
+                         is_configured=name_ok and (has_logo or has_primary))
+
+
+def get_tenant_context(company_id: Optional[int] = None) -> TenantContext:
+    """Cached TenantContext for a company key (None = platform default / first company)."""
+    cache = _cache()
+    ctx = cache.get(company_id)
+    if ctx is None:
+        ctx = _build_context(company_id)
+        cache.put(company_id, ctx)
+    return ctx
+
+
+def current_tenant_context() -> TenantContext:
+    """TenantContext for this request, memoized on g (at most one cache lookup per request)."""
+    ctx = getattr(g, "_tenant_context", None)
+    if ctx is None:
+        company_id = session.get("onboarding_company_id") if has_request_context() else None
+        ctx = get_tenant_context(company_id)
+        g._tenant_context = ctx
+        # Back-compat for templates that read g.company_settings / g.branding_fallback directly
+        g.company_settings = ctx.settings
+        g.branding_fallback = ctx.company
+    return ctx
+
+
+def invalidate_tenant_context(company_id: Optional[int] = None, *, everything: bool = False) -> None:
+    """Drop cached branding after a save (company_id) or a platform-wide settings change (everything=True)."""
+    _cache().invalidate(company_id, everything=everything)
+
+
+def tenant_context_stats() -> Dict[str, Any]:
+    return _cache().stats()
@@ -3,6 +3,8 @@ from app.models.audit import ProfileChangeLog
 from flask_login import current_user
 from datetime import datetime
 
+from app.services.audit_sink import emit_audit_row
+
 
 def log_profile_change(
     user_id,
@@ -34,7 +36,8 @@ def log_profile_change(
     try:
         actor_id = changed_by or (getattr(current_user, 'id', None))
 
-        log = ProfileChangeLog(
+        # Buffered and written in batches on a separate connection: no commit of the caller's session.
+        emit_audit_row("profile", dict(
             user_id=user_id,
             changed_by=actor_id,
             field_name=field_name,
@@ -43,15 +46,11 @@ def log_profile_change(
             change_reason=change_reason,
             parsed_summary=parsed_summary,
             timestamp=datetime.utcnow()
-        )
-
-        db.session.add(log)
-        db.session.commit()
+        ))
 
         print(f"🔍 Profile change logged: {field_name} from '{old_value}' to '{new_value}' for user {user_id}")
 
     except Exception as e:
-        db.session.rollback()
         print(f"⚠️ Error logging profile change for user {user_id}: {e}")
 
 def log_change(user, field, old, new):
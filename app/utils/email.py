@@ -1,14 +1,33 @@
 # 📍 app/utils/email.py
 
-from flask import url_for, current_app
-from flask_mail import Message
-from app.extensions import mail, serializer
+from flask import url_for, current_app, render_template
+from app.extensions import serializer
+from app.services.mail_queue import deliver_now, enqueue_email, mail_session
 
 # ✅ Generic email sender for any purpose
-def send_email(subject, recipients, body, html=None, sender=None):
-    sender = sender or current_app.config['MAIL_DEFAULT_SENDER']
-    msg = Message(subject=subject, sender=sender, recipients=recipients, body=body, html=html)
-    mail.send(msg)
+# Queues one message per recipient (see app/services/mail_queue.py) in its own session, so the caller's
+# session is never committed here. Unless MAIL_QUEUE_ASYNC is set the messages are delivered before
+# returning; a failed delivery is logged and retried by `flask mail worker` (Procfile `mail`).
+# Accepts either recipients=[...] / body=... or to=... / template=... / context={...}.
+def send_email(subject, recipients=None, body=None, html=None, sender=None, *,
+               to=None, template=None, context=None, email_type='generic', user_id=None):
+    recipients = list(recipients or [])
+    if to:
+        recipients += [to] if isinstance(to, str) else list(to)
+    if template:
+        html = render_template(template, **(context or {}))
+    if user_id is None:
+        user_id = getattr((context or {}).get('user'), 'id', None)
+
+    with mail_session() as session:
+        ids = enqueue_email(subject, recipients, body=body, html=html, sender=sender,
+                            email_type=email_type, user_id=user_id, session=session)
+        if not current_app.config.get('MAIL_QUEUE_ASYNC'):
+            stats = deliver_now(ids, session=session)
+            if stats.get('sent', 0) < len(ids):
+                current_app.logger.warning("send_email %r: %s of %s delivered inline, rest left for the mail worker (%s)",
+                                           subject, stats.get('sent', 0), len(ids), stats)
+    return ids
 
 # ✅ Reset-password-specific email (uses the generic sender)
 def send_reset_email(user):
@@ -32,4 +51,5 @@ Thanks,
 The LogixPM Team
 """
 
-    send_email(subject=subject, recipients=[recipient], body=body)
+    send_email(subject=subject, recipients=[recipient], body=body,
+               email_type='password_reset', user_id=user.id)
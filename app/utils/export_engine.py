@@ -1,12 +1,572 @@
 # app/utils/export_engine.py
+"""
+Export engine: SQLAlchemy query → file on disk → ExportedFileLog.
+
+    log = generate_export(AgedDebtor.query.filter_by(client_id=7), format="XLSX",
+                          metadata={"export_type": "aged_debtors", "user_id": current_user.id,
+                                    "columns": ["unit_id", "current_due", "total_outstanding"]})
+
+  • queries are consumed as server-side cursors (yield_per), never loaded into a list
+  • writers (CSV / XLSX / PDF) write rows incrementally to a temp file, renamed into place when done
+  • each export is fingerprinted by (compiled SQL, bind params, columns, data watermark); an identical
+    export whose file still exists is returned from ExportedFileLog instead of being rebuilt. Only sources
+    with a change timestamp (updated_at / last_updated / modified_at) are deduplicated: without one an
+    edited row would leave the watermark unchanged, so those exports are always rebuilt
+  • files live outside the static folder (EXPORT_DIR, default <instance>/exports) and are only served by
+    the exports.download route, which checks can_download() against visibility_scope / is_sensitive
+  • named finance/compliance reports are registered in REPORTS and run via export_report()
+"""
+from __future__ import annotations
+
+import csv
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from xml.sax.saxutils import escape
+
+from flask import current_app, has_request_context, render_template, url_for
+from sqlalchemy import func, select
+from sqlalchemy.orm import Query
+from sqlalchemy.sql import Select
+
+from app.extensions import db
+
+DEFAULT_YIELD_PER = 1000
+DEFAULT_PDF_CHUNK_ROWS = 500
+
+# Columns that move whenever a row is edited; the first one a model has feeds the data watermark.
+# (created_at / uploaded_at don't: an edit leaves them alone.)
+_WATERMARK_COLUMNS = ("updated_at", "last_updated", "modified_at")
+
+SUPER_ADMIN_ROLE = "Super Admin"
+# visibility_scope → roles that may download (Super Admins always may; owners/residents their own files)
+SCOPE_ROLES = {
+    "Admin": ("Admin",),
+    "PM": ("Admin", "Property Manager"),
+    "Director": ("Admin", "Property Manager", "Director"),
+    "MemberOwner": ("Admin", "Property Manager"),
+    "ResidentTenant": ("Admin", "Property Manager"),
+}
+SENSITIVE_ROLES = ("Admin",)
+
+
+# ----------------------------
+# Columns
+# ----------------------------
+
+def _normalize_columns(columns) -> List[Tuple[str, Callable[[Any], Any]]]:
+    """
+    Column spec → [(header, getter)]. Accepts attribute/key names, (header, name) or (header, callable).
+    """
+    out = []
+    for col in columns:
+        if isinstance(col, str):
+            header, source = col, col
+        else:
+            header, source = col
+        if callable(source):
+            out.append((header, source))
+        else:
+            out.append((header, lambda row, _k=source: row.get(_k) if isinstance(row, dict) else getattr(row, _k, None)))
+    return out
+
+
+def _default_columns(stmt) -> List[str]:
+    """Every mapped column of the query's primary entity, or the selected column names."""
+    descs = stmt.column_descriptions
+    if len(descs) == 1 and descs[0].get("entity") is not None and descs[0].get("type") is descs[0]["entity"]:
+        return [c.key for c in descs[0]["entity"].__table__.columns]
+    return [d["name"] for d in descs]
+
+
+# ----------------------------
+# Sources
+# ----------------------------
+
+def _as_select(data) -> Optional[Select]:
+    if isinstance(data, Query):
+        return data.statement
+    if isinstance(data, Select):
+        return data
+    return None
+
+
+def _iter_rows(data, yield_per: int) -> Iterator[Any]:
+    """Stream rows: ORM entities for single-entity queries, Row objects (attr access) otherwise."""
+    if isinstance(data, Query):
+        yield from data.yield_per(yield_per)
+        return
+    if isinstance(data, Select):
+        result = db.session.execute(data.execution_options(yield_per=yield_per))
+        descs = data.column_descriptions
+        single_entity = len(descs) == 1 and descs[0].get("entity") is not None and descs[0].get("type") is descs[0]["entity"]
+        yield from (result.scalars() if single_entity else result)
+        return
+    yield from data
+
+
+def data_watermark(data) -> Dict[str, Any]:
+    """
+    (count, max pk, max change timestamp) of the result set; changes when rows are added, removed or edited.
+    'tracks_edits' is False when the source has no change timestamp — the watermark then can't see edits.
+    """
+    stmt = _as_select(data)
+    if stmt is None:
+        return {"tracks_edits": False}
+    sub = stmt.order_by(None).subquery()
+    cols = [func.count()]
+    names = ["count"]
+    if "id" in sub.c:
+        cols.append(func.max(sub.c.id))
+        names.append("max_id")
+    change_col = next((name for name in _WATERMARK_COLUMNS if name in sub.c), None)
+    if change_col is not None:
+        cols.append(func.max(sub.c[change_col]))
+        names.append(f"max_{change_col}")
+    row = db.session.execute(select(*cols).select_from(sub)).one()
+    out = {k: (v.isoformat() if isinstance(v, (datetime, date)) else v) for k, v in zip(names, row)}
+    out["tracks_edits"] = change_col is not None
+    return out
+
+
+def export_fingerprint(data, fmt: str, columns: Sequence[str], watermark: Dict[str, Any],
+                       extra: Optional[Dict[str, Any]] = None) -> str:
+    stmt = _as_select(data)
+    if stmt is not None:
+        compiled = stmt.compile(dialect=db.engine.dialect)
+        query_sig = {"sql": str(compiled), "params": compiled.params}
+    else:
+        query_sig = {"sql": None, "params": None}
+    payload = json.dumps({"query": query_sig, "fmt": fmt, "columns": list(columns),
+                          "watermark": watermark, "extra": extra or {}}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ----------------------------
+# Writers
+# ----------------------------
+
+WRITERS: Dict[str, type] = {}
+
+
+def register_writer(fmt: str):
+    def deco(cls):
+        WRITERS[fmt.upper()] = cls
+        cls.format = fmt.upper()
+        return cls
+    return deco
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return value
+
+
+class ExportWriter:
+    """Incremental writer: open(path) → write_row(values)* → close(). Subclasses set `extension`."""
+    extension = "bin"
+    format = None
+
+    def __init__(self, path: str, headers: List[str], title: str = ""):
+        self.path = path
+        self.headers = headers
+        self.title = title
+        self.rows = 0
+
+    def write_row(self, values: List[Any]):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+@register_writer("CSV")
+class CsvExportWriter(ExportWriter):
+    extension = "csv"
+
+    def __init__(self, path, headers, title=""):
+        super().__init__(path, headers, title)
+        self._f = open(path, "w", newline="", encoding="utf-8")
+        self._w = csv.writer(self._f)
+        self._w.writerow(headers)
+
+    def write_row(self, values):
+        self._w.writerow([_cell(v) for v in values])
+        self.rows += 1
+
+    def close(self):
+        self._f.close()
+
+
+@register_writer("XLSX")
+class XlsxExportWriter(ExportWriter):
+    """Minimal single-sheet XLSX streamed into the zip (inline strings, no shared-strings table)."""
+    extension = "xlsx"
+
+    _CONTENT_TYPES = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    )
+    _RELS = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    )
+    _WORKBOOK_RELS = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    )
+
+    def __init__(self, path, headers, title=""):
+        super().__init__(path, headers, title)
+        sheet_name = escape((title or "Export")[:31].replace("/", "-"), {'"': "&quot;"})
+        self._zip = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED)
+        self._zip.writestr("[Content_Types].xml", self._CONTENT_TYPES)
+        self._zip.writestr("_rels/.rels", self._RELS)
+        self._zip.writestr("xl/_rels/workbook.xml.rels", self._WORKBOOK_RELS)
+        self._zip.writestr(
+            "xl/workbook.xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{sheet_name}" sheetId="1" r:id="rId1"/></sheets></workbook>',
+        )
+        self._sheet = self._zip.open("xl/worksheets/sheet1.xml", "w", force_zip64=True)
+        self._put('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                  '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+        self._put_row(headers)
+
+    def _put(self, s: str):
+        self._sheet.write(s.encode("utf-8"))
+
+    def _put_row(self, values):
+        cells = []
+        for v in values:
+            v = _cell(v)
+            if isinstance(v, bool):
+                cells.append(f'<c t="b"><v>{int(v)}</v></c>')
+            elif isinstance(v, (int, float, Decimal)):
+                cells.append(f'<c><v>{v}</v></c>')
+            else:
+                cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">{escape(str(v))}</t></is></c>')
+        self._put(f"<row>{''.join(cells)}</row>")
+
+    def write_row(self, values):
+        self._put_row(values)
+        self.rows += 1
+
+    def close(self):
+        self._put("</sheetData></worksheet>")
+        self._sheet.close()
+        self._zip.close()
+
+
+@register_writer("PDF")
+class PdfExportWriter(ExportWriter):
+    """HTML table rendered in parts of `chunk_rows` rows through the shared PdfRenderer, then concatenated."""
+    extension = "pdf"
+
+    def __init__(self, path, headers, title=""):
+        super().__init__(path, headers, title)
+        from app.services.pdf import get_app_pdf_renderer
+
+        self._renderer = get_app_pdf_renderer()
+        self._chunk_rows = int(current_app.config.get("EXPORT_PDF_CHUNK_ROWS", DEFAULT_PDF_CHUNK_ROWS))
+        self._workdir = tempfile.mkdtemp(prefix="export-pdf-", dir=os.path.dirname(path))
+        self._parts: List[str] = []
+        self._batch: List[List[Any]] = []
+        self._generated_at = datetime.utcnow()
+
+    def _flush(self):
+        part_path = os.path.join(self._workdir, f"part-{len(self._parts) + 1:05d}.pdf")
+        html = render_template("exports/table_pdf.html", title=self.title, headers=self.headers,
+                               rows=self._batch, part=len(self._parts) + 1, generated_at=self._generated_at)
+        self._renderer.render(html, target=part_path)
+        self._parts.append(part_path)
+        self._batch = []
+
+    def write_row(self, values):
+        self._batch.append([_cell(v) for v in values])
+        self.rows += 1
+        if len(self._batch) >= self._chunk_rows:
+            self._flush()
+
+    def close(self):
+        from app.services.pdf import merge_pdf_files
+
+        try:
+            if self._batch or not self._parts:
+                self._flush()
+            if len(self._parts) == 1:
+                shutil.move(self._parts[0], self.path)
+            elif not merge_pdf_files(self._parts, self.path):
+                raise RuntimeError("pypdf is required to combine multi-part PDF exports")
+        finally:
+            shutil.rmtree(self._workdir, ignore_errors=True)
+
+
+# ----------------------------
+# ExportedFileLog
+# ----------------------------
+
+def _export_root() -> str:
+    return os.path.abspath(current_app.config.get("EXPORT_DIR") or os.path.join(current_app.instance_path, "exports"))
+
+
+def _find_existing(export_type: str, fingerprint: str):
+    from app.models.exports.exported_file_log import ExportedFileLog
+
+    log = (ExportedFileLog.query
+           .filter(ExportedFileLog.export_type == export_type,
+                   ExportedFileLog.metadata_tags["fingerprint"].astext == fingerprint)
+           .order_by(ExportedFileLog.exported_at.desc())
+           .first())
+    # Files left in an old (e.g. public static) location are rebuilt rather than handed out again
+    if log is None or not os.path.isfile(log.file_path) \
+            or not os.path.abspath(log.file_path).startswith(_export_root() + os.sep):
+        return None
+    return log
+
+
+def _export_dir(export_type: str) -> str:
+    path = os.path.join(_export_root(), export_type)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _download_url(log_id: int) -> str:
+    if has_request_context():
+        return url_for("exports.download", log_id=log_id)
+    with current_app.test_request_context():  # CLI / workers: a relative URL needs no SERVER_NAME
+        return url_for("exports.download", log_id=log_id)
+
+
+def _company_of(log) -> Optional[int]:
+    from app.models.client.client import Client
+
+    if log.client_id is not None:
+        client = db.session.get(Client, log.client_id)
+        return client.company_id if client is not None else None
+    return log.exported_by.company_id if log.exported_by is not None else None
+
+
+def can_download(log, user) -> bool:
+    """
+    Whether `user` may fetch an ExportedFileLog's file: Super Admins always; otherwise the file must
+    belong to the user's company, and the user's role must be allowed by visibility_scope (sensitive
+    exports: SENSITIVE_ROLES only). The exporting user may always fetch their own file.
+    """
+    if user is None or not getattr(user, "is_authenticated", False):
+        return False
+    role = user.role_name
+    if role == SUPER_ADMIN_ROLE:
+        return True
+    if log.exported_by_id is not None and log.exported_by_id == user.id:
+        return True
+    if _company_of(log) != user.company_id:
+        return False
+    if log.is_sensitive:
+        return role in SENSITIVE_ROLES
+    if user.id in (log.owner_id, log.resident_id):
+        return True
+    return role in SCOPE_ROLES.get(log.visibility_scope or "Admin", ())
+
+
+# ----------------------------
+# Entry point
+# ----------------------------
 
 def generate_export(data, format='PDF', metadata=None):
     """
     Converts data into a downloadable file and logs it in ExportedFileLog.
-    :param data: raw query results or pre-formatted
-    :param format: PDF, CSV, XLS
-    :param metadata: dict with 'export_type', 'user_id', 'related_model', etc.
+    :param data: SQLAlchemy Query / Select (streamed with yield_per) or any iterable of rows/dicts
+    :param format: PDF, CSV, XLSX (XLS is accepted as XLSX)
+    :param metadata: dict with 'export_type', 'user_id', 'related_model', 'related_id', 'client_id',
+                     'columns', 'title', 'file_name', 'visibility_scope', 'is_sensitive', 'force'
+    :return: ExportedFileLog (metadata_tags carries fingerprint, rows, size_bytes, duration_ms);
+             `.reused` is True when an identical stored export was returned instead of a new one
     """
-    # Placeholder: you will later plug in WeasyPrint, pandas, or ReportLab, etc.
-    # Save file to /static/exports/ and create ExportedFileLog record
-    pass
+    from app.models.exports.exported_file_log import ExportedFileLog
+
+    metadata = dict(metadata or {})
+    fmt = (format or "PDF").upper()
+    if fmt == "XLS":
+        fmt = "XLSX"
+    writer_cls = WRITERS.get(fmt)
+    if writer_cls is None:
+        raise ValueError(f"Unsupported export format: {format}")
+
+    export_type = metadata.get("export_type") or "export"
+    stmt = _as_select(data)
+    columns = metadata.get("columns") or (_default_columns(stmt) if stmt is not None else None)
+    if not columns:
+        raise ValueError("columns are required when exporting a plain iterable")
+    spec = _normalize_columns(columns)
+    headers = [h for h, _ in spec]
+
+    watermark = metadata.get("watermark") or data_watermark(data)
+    fingerprint = export_fingerprint(data, fmt, headers, watermark, extra={"title": metadata.get("title")})
+
+    # A caller-supplied watermark is trusted to move on edits; a derived one only if it has a change column.
+    reusable = bool(metadata.get("watermark")) or watermark.get("tracks_edits", False)
+    if not metadata.get("force") and stmt is not None and reusable:
+        existing = _find_existing(export_type, fingerprint)
+        if existing is not None:
+            existing.reused = True
+            return existing
+
+    out_dir = _export_dir(export_type)
+    path = os.path.join(out_dir, f"{fingerprint}.{writer_cls.extension}")
+    fd, tmp = tempfile.mkstemp(suffix=f".{writer_cls.extension}.tmp", dir=out_dir)
+    os.close(fd)
+
+    started = time.perf_counter()
+    writer = writer_cls(tmp, headers, title=metadata.get("title") or export_type.replace("_", " ").title())
+    try:
+        for row in _iter_rows(data, int(current_app.config.get("EXPORT_YIELD_PER", DEFAULT_YIELD_PER))):
+            writer.write_row([getter(row) for _, getter in spec])
+        writer.close()
+        os.replace(tmp, path)
+    except Exception:
+        try:
+            writer.close()
+        except Exception:
+            pass
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    duration_ms = int((time.perf_counter() - started) * 1000)
+
+    file_name = metadata.get("file_name") or f"{export_type}_{datetime.utcnow():%Y%m%d_%H%M%S}.{writer_cls.extension}"
+    log = ExportedFileLog(
+        export_type=export_type,
+        related_model=metadata.get("related_model"),
+        related_id=metadata.get("related_id"),
+        file_path=path,
+        file_format=fmt,
+        file_name=file_name,
+        visibility_scope=metadata.get("visibility_scope", "Admin"),
+        is_sensitive=bool(metadata.get("is_sensitive", False)),
+        client_id=metadata.get("client_id"),
+        exported_by_id=metadata.get("user_id"),
+        metadata_tags={
+            "fingerprint": fingerprint,
+            "watermark": watermark,
+            "rows": writer.rows,
+            "size_bytes": os.path.getsize(path),
+            "duration_ms": duration_ms,
+        },
+    )
+    db.session.add(log)
+    db.session.flush()
+    log.download_url = _download_url(log.id)
+    db.session.commit()
+    log.reused = False
+    return log
+
+
+# ----------------------------
+# Named reports
+# ----------------------------
+
+def _aged_debtors(client_id=None, report_date=None):
+    from app.models.finance.aged_debtor import AgedDebtor
+    q = AgedDebtor.query
+    if client_id:
+        q = q.filter(AgedDebtor.client_id == client_id)
+    if report_date:
+        q = q.filter(AgedDebtor.report_date == report_date)
+    return q.order_by(AgedDebtor.client_id, AgedDebtor.unit_id, AgedDebtor.id), [
+        ("Client", "client_id"), ("Unit", "unit_id"), ("Report Date", "report_date"),
+        ("Current", "current_due"), ("30 Days", "due_30_days"), ("60 Days", "due_60_days"),
+        ("90 Days", "due_90_days"), ("120+ Days", "due_120_days_plus"), ("Total Outstanding", "total_outstanding"),
+    ]
+
+
+def _trial_balance(client_id=None, report_date=None):
+    from app.models.finance.trial_balance import TrialBalance
+    q = TrialBalance.query
+    if client_id:
+        q = q.filter(TrialBalance.client_id == client_id)
+    if report_date:
+        q = q.filter(TrialBalance.report_date == report_date)
+    return q.order_by(TrialBalance.client_id, TrialBalance.report_date, TrialBalance.id), [
+        ("Client", "client_id"), ("Report Date", "report_date"), ("Total Debits", "total_debits"),
+        ("Total Credits", "total_credits"), ("Balanced", "is_balanced"), ("Accounts", "account_summaries"),
+    ]
+
+
+def _arrears(client_id=None, report_date=None):
+    from app.models.finance.arrears import Arrears
+    q = Arrears.query.filter(Arrears.status != "Paid")
+    if client_id:
+        q = q.filter(Arrears.client_id == client_id)
+    if report_date:
+        q = q.filter(Arrears.due_date <= report_date)
+    return q.order_by(Arrears.client_id, Arrears.due_date, Arrears.id), [
+        ("Client", "client_id"), ("Unit", "unit_id"), ("Invoice", "invoice_id"), ("Type", "arrears_type"),
+        ("Due Date", "due_date"), ("Days Overdue", "days_overdue"), ("Amount Due", "amount_due"),
+        ("Late Fees", "late_fee_accrued"), ("Interest", "interest_accrued"), ("Status", "status"),
+    ]
+
+
+def _compliance_documents(client_id=None, report_date=None):
+    from app.models.client.client_compliance_document import ClientComplianceDocument
+    q = ClientComplianceDocument.query
+    if client_id:
+        q = q.filter(ClientComplianceDocument.client_id == client_id)
+    if report_date:
+        q = q.filter(ClientComplianceDocument.expires_at <= report_date)
+    return q.order_by(ClientComplianceDocument.client_id, ClientComplianceDocument.expires_at,
+                      ClientComplianceDocument.id), [
+        ("Client", "client_id"), ("Document", "document_name"), ("Type", "document_type"),
+        ("Version", "version"), ("Uploaded", "uploaded_at"), ("Expires", "expires_at"),
+    ]
+
+
+# name -> builder(client_id=None, report_date=None) -> (query, columns)
+REPORTS: Dict[str, Callable[..., Tuple[Any, List[Any]]]] = {
+    "aged_debtors": _aged_debtors,
+    "trial_balance": _trial_balance,
+    "arrears": _arrears,
+    "compliance_documents": _compliance_documents,
+}
+
+
+def export_report(name: str, format: str = "PDF", *, client_id: Optional[int] = None, report_date=None,
+                  user_id: Optional[int] = None, force: bool = False):
+    """Run a named report from REPORTS through generate_export(). Returns the ExportedFileLog."""
+    builder = REPORTS.get(name)
+    if builder is None:
+        raise ValueError(f"Unknown report: {name}")
+    query, columns = builder(client_id=client_id, report_date=report_date)
+    return generate_export(query, format, {
+        "export_type": name,
+        "columns": columns,
+        "client_id": client_id,
+        "user_id": user_id,
+        "title": name.replace("_", " ").title(),
+        "visibility_scope": "Admin",
+        "is_sensitive": name in ("arrears", "aged_debtors"),
+        "force": force,
+    })
@@ -0,0 +1,364 @@
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from sqlalchemy import and_, case, func, insert, or_, select, union, union_all, update
+
+from app.extensions import db
+from app.models.client.client import Client
+from app.models.finance.aged_creditor import AgedCreditor
+from app.models.finance.aged_creditor_summary import AgedCreditorSummary
+from app.models.finance.aged_debtor import AgedDebtor
+from app.models.finance.aged_debtor_summary import AgedDebtorSummary
+from app.models.finance.arrears import Arrears
+from app.models.finance.invoice import Invoice
+from app.models.finance.levy import Levy
+from app.models.finance.levy_payment import LevyPayment
+from app.models.finance.service_charge import ServiceCharge
+from app.models.finance.service_charge_payment import ServiceChargePayment
+from app.models.members.unit import Unit
+
+# Bucket name → (min days overdue, max days overdue exclusive); "current" also holds items not yet due.
+BUCKETS = (
+    ('current', None, 30),
+    ('days_30', 30, 60),
+    ('days_60', 60, 90),
+    ('days_90', 90, 120),
+    ('days_120_plus', 120, None),
+)
+SETTLED_ARREARS = ('Paid', 'Written Off')
+CLOSED_INVOICES = ('Paid', 'Rejected')
+ZERO = Decimal('0.00')
+
+
+def _end_of(day):
+    return datetime.combine(day, time.max)
+
+
+def _bucket_columns(due_date, amount, as_of):
+    """SUM(CASE …) per bucket. Day thresholds become date bounds, so the SQL has no date arithmetic."""
+    columns = []
+    for name, lo, hi in BUCKETS:
+        conditions = []
+        if lo is not None:
+            conditions.append(due_date <= as_of - timedelta(days=lo))
+        if hi is not None:
+            conditions.append(due_date > as_of - timedelta(days=hi))
+        columns.append(func.coalesce(func.sum(case((and_(*conditions), amount), else_=0)), 0).label(name))
+    columns.append(func.coalesce(func.sum(amount), 0).label('total_outstanding'))
+    return columns
+
+
+def _scope(stmt, client_col, unit_col, client_ids, unit_ids):
+    if client_ids is not None:
+        stmt = stmt.where(client_col.in_(client_ids))
+    if unit_ids is not None:
+        clauses = [unit_col.in_([u for u in unit_ids if u is not None])]
+        if None in unit_ids:
+            clauses.append(unit_col.is_(None))
+        stmt = stmt.where(or_(*clauses))
+    return stmt
+
+
+# ----------------------------
+# Receivables (debtors)
+# ----------------------------
+
+def _debtor_sources(as_of, historical, client_ids=None, unit_ids=None):
+    """
+    (client_id, unit_id, due_date, outstanding) rows from service charges, levies and arrears penalties.
+    Arrears principal mirrors the underlying charge, so only accrued late fees / interest are added from it.
+    Current aging uses the amount_paid columns; historical aging (as_of in the past) re-derives what was
+    paid by then from the payment rows.
+    """
+    SC, LV, AR = ServiceCharge, Levy, Arrears
+    as_of_end = _end_of(as_of)
+
+    if historical:
+        sc_paid = (select(ServiceChargePayment.service_charge_id.label('charge_id'),
+                          func.sum(ServiceChargePayment.amount_paid).label('paid'))
+                   .where(ServiceChargePayment.payment_date <= as_of_end,
+                          ServiceChargePayment.is_reversed.is_not(True))
+                   .group_by(ServiceChargePayment.service_charge_id).subquery())
+        lv_paid = (select(LevyPayment.levy_id.label('levy_id'), func.sum(LevyPayment.amount).label('paid'))
+                   .where(LevyPayment.payment_date <= as_of_end, LevyPayment.is_reversed.is_not(True))
+                   .group_by(LevyPayment.levy_id).subquery())
+        charges = (select(SC.client_id, SC.unit_id, SC.due_date,
+                          (SC.amount_due - func.coalesce(sc_paid.c.paid, 0)).label('outstanding'))
+                   .outerjoin(sc_paid, sc_paid.c.charge_id == SC.id)
+                   .where(SC.charge_date <= as_of_end))
+        levies = (select(LV.client_id, LV.unit_id, LV.due_date,
+                         (LV.amount_due - func.coalesce(lv_paid.c.paid, 0)).label('outstanding'))
+                  .outerjoin(lv_paid, lv_paid.c.levy_id == LV.id)
+                  .where(LV.issued_date <= as_of_end))
+    else:
+        charges = (select(SC.client_id, SC.unit_id, SC.due_date,
+                          (SC.amount_due - func.coalesce(SC.amount_paid, 0)).label('outstanding'))
+                   .where(SC.status != 'Paid'))
+        levies = (select(LV.client_id, LV.unit_id, LV.due_date,
+                         (LV.amount_due - func.coalesce(LV.amount_paid, 0)).label('outstanding'))
+                  .where(LV.status != 'Paid'))
+
+    penalties = (select(AR.client_id, AR.unit_id, AR.due_date,
+                        (func.coalesce(AR.late_fee_accrued, 0)
+                         + case((AR.interest_waived.is_(True), 0), else_=func.coalesce(AR.interest_accrued, 0))
+                         ).label('outstanding'))
+                 .where(AR.status.notin_(SETTLED_ARREARS), AR.created_at <= as_of_end))
+
+    return union_all(
+        _scope(charges, SC.client_id, SC.unit_id, client_ids, unit_ids),
+        _scope(levies, LV.client_id, LV.unit_id, client_ids, unit_ids),
+        _scope(penalties, AR.client_id, AR.unit_id, client_ids, unit_ids),
+    ).subquery()
+
+
+def compute_debtor_aging(client_ids=None, as_of=None, unit_ids=None):
+    """
+    Aged receivables per (client_id, unit_id) as of a date (today by default), in one grouped query.
+    Returns [{'client_id', 'unit_id', 'current', 'days_30', …, 'total_outstanding'}].
+    """
+    today = date.today()
+    as_of = as_of or today
+    src = _debtor_sources(as_of, as_of < today, client_ids, unit_ids)
+    stmt = (select(src.c.client_id, src.c.unit_id, *_bucket_columns(src.c.due_date, src.c.outstanding, as_of))
+            .where(src.c.outstanding != 0, src.c.due_date.is_not(None))
+            .group_by(src.c.client_id, src.c.unit_id))
+    return [dict(r._mapping) for r in db.session.execute(stmt)]
+
+
+def _crossed_bucket(due_date, since, today):
+    """
+    Items that moved into an older bucket between the refresh at `since` and today without any write:
+    due_date + N days fell in (since's day, today] for some bucket threshold N.
+    """
+    since_day = since.date()
+    return or_(*[and_(due_date > since_day - timedelta(days=lo), due_date <= today - timedelta(days=lo))
+                 for _, lo, _ in BUCKETS if lo is not None])
+
+
+def _changed_debtor_keys(client_ids, since):
+    """
+    (client_id, unit_id) pairs whose charges, levies, arrears or payments changed at/after `since`, or
+    whose open items crossed a bucket threshold since then.
+    """
+    SC, LV, AR = ServiceCharge, Levy, Arrears
+    SCP, LP = ServiceChargePayment, LevyPayment
+    today = date.today()
+    stmts = [
+        select(SC.client_id, SC.unit_id).where(func.coalesce(SC.updated_at, SC.created_at) >= since),
+        select(LV.client_id, LV.unit_id).where(func.coalesce(LV.updated_at, LV.created_at) >= since),
+        select(AR.client_id, AR.unit_id).where(func.coalesce(AR.updated_at, AR.created_at) >= since),
+        select(SC.client_id, SC.unit_id).join(SCP, SCP.service_charge_id == SC.id)
+        .where(func.coalesce(SCP.modified_at, SCP.created_at) >= since),
+        select(LV.client_id, LV.unit_id).join(LP, LP.levy_id == LV.id)
+        .where(func.coalesce(LP.updated_at, LP.created_at) >= since),
+        select(SC.client_id, SC.unit_id).where(SC.status != 'Paid', _crossed_bucket(SC.due_date, since, today)),
+        select(LV.client_id, LV.unit_id).where(LV.status != 'Paid', _crossed_bucket(LV.due_date, since, today)),
+        select(AR.client_id, AR.unit_id).where(AR.status.notin_(SETTLED_ARREARS),
+                                               _crossed_bucket(AR.due_date, since, today)),
+    ]
+    models = (SC, LV, AR, SC, LV, SC, LV, AR)
+    stmts = [s.where(m.client_id.in_(client_ids)) for s, m in zip(stmts, models)]
+    return {(r[0], r[1]) for r in db.session.execute(union(*stmts))}
+
+
+# ----------------------------
+# Payables (creditors)
+# ----------------------------
+
+def compute_creditor_aging(client_ids=None, as_of=None, contractor_ids=None):
+    """
+    Aged payables per (client_id, contractor_id) from contractor invoices. The client comes from the
+    invoice's unit; invoices without a unit or contractor can't be attributed and are left out.
+    """
+    today = date.today()
+    as_of = as_of or today
+    as_of_end = _end_of(as_of)
+    amount = func.coalesce(Invoice.total_amount, Invoice.amount)
+    due = func.coalesce(Invoice.due_date, Invoice.invoice_date)
+
+    stmt = (select(Unit.client_id.label('client_id'), Invoice.contractor_id.label('contractor_id'),
+                   *_bucket_columns(due, amount, as_of))
+            .join(Unit, Unit.id == Invoice.unit_id)
+            .where(Invoice.contractor_id.is_not(None), due.is_not(None)))
+    if as_of < today:
+        stmt = stmt.where(Invoice.invoice_date <= as_of, Invoice.status != 'Rejected',
+                          or_(Invoice.paid_at.is_(None), Invoice.paid_at > as_of_end))
+    else:
+        stmt = stmt.where(Invoice.status.notin_(CLOSED_INVOICES), Invoice.paid_at.is_(None))
+    if client_ids is not None:
+        stmt = stmt.where(Unit.client_id.in_(client_ids))
+    if contractor_ids is not None:
+        stmt = stmt.where(Invoice.contractor_id.in_(contractor_ids))
+    stmt = stmt.group_by(Unit.client_id, Invoice.contractor_id)
+    return [dict(r._mapping) for r in db.session.execute(stmt)]
+
+
+def _changed_creditor_keys(client_ids, since):
+    due = func.coalesce(Invoice.due_date, Invoice.invoice_date)
+    open_and_aged = and_(Invoice.status.notin_(CLOSED_INVOICES), Invoice.paid_at.is_(None),
+                         _crossed_bucket(due, since, date.today()))
+    stmt = (select(Unit.client_id, Invoice.contractor_id).distinct()
+            .join(Unit, Unit.id == Invoice.unit_id)
+            .where(Unit.client_id.in_(client_ids), Invoice.contractor_id.is_not(None),
+                   or_(func.coalesce(Invoice.updated_at, Invoice.created_at) >= since, open_and_aged)))
+    return {(r[0], r[1]) for r in db.session.execute(stmt)}
+
+
+# ----------------------------
+# Materialisation
+# ----------------------------
+
+def _client_scope(client_ids=None, company_id=None):
+    if client_ids is not None:
+        return list(client_ids)
+    stmt = select(Client.id)
+    if company_id is not None:
+        stmt = stmt.where(Client.company_id == company_id)
+    return list(db.session.execute(stmt).scalars())
+
+
+def _upsert(model, key_names, rows, client_ids, stamp, keys=None, updated_by_id=None):
+    """
+    Write computed rows into a summary table: one SELECT of existing (key → id), then executemany
+    UPDATE by primary key and executemany INSERT. Existing rows in scope that no longer have a balance
+    are zeroed. `keys` limits the scope to those key tuples (incremental refresh).
+    """
+    key_cols = [getattr(model, k) for k in key_names]
+    stmt = select(model.id, *key_cols).where(model.client_id.in_(client_ids)).order_by(model.id)
+    existing = {}
+    for r in db.session.execute(stmt):
+        existing.setdefault(tuple(r[1:]), r[0])  # oldest row wins if duplicates ever crept in
+
+    buckets = [name for name, _, _ in BUCKETS] + ['total_outstanding']
+    computed = {tuple(r[k] for k in key_names): r for r in rows}
+    scope = keys if keys is not None else set(existing) | set(computed)
+
+    updates, inserts = [], []
+    for key in scope:
+        row = computed.get(key)
+        values = {b: (row[b] if row else ZERO) for b in buckets}
+        values.update(last_updated=stamp, updated_by_id=updated_by_id)
+        if key in existing:
+            updates.append(dict(values, id=existing[key]))
+        elif row is not None:
+            inserts.append(dict(values, **dict(zip(key_names, key))))
+    if updates:
+        db.session.execute(update(model), updates)
+    if inserts:
+        db.session.execute(insert(model), inserts)
+    return len(updates), len(inserts)
+
+
+def _since(model, client_ids):
+    """Oldest refresh stamp across the scope, and the clients that have never been refreshed."""
+    stamps = dict(db.session.execute(
+        select(model.client_id, func.min(model.last_updated)).where(model.client_id.in_(client_ids))
+        .group_by(model.client_id)
+    ).all())
+    fresh = [c for c in client_ids if stamps.get(c) is None]
+    known = [s for s in stamps.values() if s is not None]
+    return (min(known) if known else None), fresh
+
+
+def refresh_aged_debtor_summaries(client_ids=None, company_id=None, incremental=False, updated_by_id=None,
+                                  commit=True):
+    """
+    Recompute AgedDebtorSummary for every unit of the given clients (or all clients of a company).
+
+    incremental=True only recomputes units whose charges, levies, arrears or payments changed since the
+    scope's last refresh, plus units with an open item that aged into an older bucket since then (clients
+    never refreshed get a full pass). Deletions of source rows aren't
+    detected incrementally — run a full refresh periodically.
+    Returns {'clients', 'units', 'updated', 'inserted'}.
+    """
+    clients = scope = _client_scope(client_ids, company_id)
+    if not scope:
+        return {'clients': 0, 'units': 0, 'updated': 0, 'inserted': 0}
+    stamp = datetime.utcnow()  # taken before reading, so changes made during the run are picked up next time
+
+    updated = inserted = units = 0
+    if incremental:
+        since, fresh = _since(AgedDebtorSummary, clients)
+        known = [c for c in clients if c not in fresh]
+        if known and since is not None:
+            keys = _changed_debtor_keys(known, since)
+            if keys:
+                rows = compute_debtor_aging(sorted({c for c, _ in keys}), unit_ids={u for _, u in keys})
+                rows = [r for r in rows if (r['client_id'], r['unit_id']) in keys]
+                u, i = _upsert(AgedDebtorSummary, ('client_id', 'unit_id'), rows, known, stamp, keys, updated_by_id)
+                updated, inserted, units = updated + u, inserted + i, units + len(keys)
+        clients = fresh
+
+    if clients:
+        rows = compute_debtor_aging(clients)
+        u, i = _upsert(AgedDebtorSummary, ('client_id', 'unit_id'), rows, clients, stamp, None, updated_by_id)
+        updated, inserted, units = updated + u, inserted + i, units + len(rows)
+
+    if commit:
+        db.session.commit()
+    return {'clients': len(scope), 'units': units,
+            'updated': updated, 'inserted': inserted}
+
+
+def refresh_aged_creditor_summaries(client_ids=None, company_id=None, incremental=False, updated_by_id=None,
+                                    commit=True):
+    """AgedCreditorSummary per (client, contractor); same refresh semantics as the debtor side."""
+    clients = scope = _client_scope(client_ids, company_id)
+    if not scope:
+        return {'clients': 0, 'contractors': 0, 'updated': 0, 'inserted': 0}
+    stamp = datetime.utcnow()
+
+    updated = inserted = pairs = 0
+    if incremental:
+        since, fresh = _since(AgedCreditorSummary, clients)
+        known = [c for c in clients if c not in fresh]
+        if known and since is not None:
+            keys = _changed_creditor_keys(known, since)
+            if keys:
+                rows = compute_creditor_aging(sorted({c for c, _ in keys}), contractor_ids={k for _, k in keys})
+                rows = [r for r in rows if (r['client_id'], r['contractor_id']) in keys]
+                u, i = _upsert(AgedCreditorSummary, ('client_id', 'contractor_id'), rows, known, stamp, keys,
+                               updated_by_id)
+                updated, inserted, pairs = updated + u, inserted + i, pairs + len(keys)
+        clients = fresh
+
+    if clients:
+        rows = compute_creditor_aging(clients)
+        u, i = _upsert(AgedCreditorSummary, ('client_id', 'contractor_id'), rows, clients, stamp, None, updated_by_id)
+        updated, inserted, pairs = updated + u, inserted + i, pairs + len(rows)
+
+    if commit:
+        db.session.commit()
+    return {'clients': len(scope), 'contractors': pairs,
+            'updated': updated, 'inserted': inserted}
+
+
+def snapshot_aging(as_of, client_ids=None, company_id=None, label=None, commit=True):
+    """
+    Dated AgedDebtor / AgedCreditor report rows for `as_of` (historical aging). Re-running for the same
+    date replaces that date's rows. Debtor rows without a unit (client-level charges) are skipped, as
+    AgedDebtor requires a unit.
+    """
+    clients = _client_scope(client_ids, company_id)
+    if not clients:
+        return {'debtors': 0, 'creditors': 0}
+
+    def rename(row):
+        return {'current_due': row['current'], 'due_30_days': row['days_30'], 'due_60_days': row['days_60'],
+                'due_90_days': row['days_90'], 'due_120_days_plus': row['days_120_plus'],
+                'total_outstanding': row['total_outstanding'], 'report_date': as_of}
+
+    debtors = [dict(rename(r), client_id=r['client_id'], unit_id=r['unit_id'], snapshot_label=label)
+               for r in compute_debtor_aging(clients, as_of) if r['unit_id'] is not None]
+    creditors = [dict(rename(r), client_id=r['client_id'], contractor_id=r['contractor_id'])
+                 for r in compute_creditor_aging(clients, as_of)]
+
+    for model in (AgedDebtor, AgedCreditor):
+        db.session.execute(model.__table__.delete().where(model.client_id.in_(clients), model.report_date == as_of))
+    if debtors:
+        db.session.execute(insert(AgedDebtor), debtors)
+    if creditors:
+        db.session.execute(insert(AgedCreditor), creditors)
+    if commit:
+        db.session.commit()
+    return {'debtors': len(debtors), 'creditors': len(creditors)}
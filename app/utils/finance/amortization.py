@@ -0,0 +1,279 @@
+from bisect import bisect_right
+from calendar import monthrange
+from collections import defaultdict, namedtuple
+from datetime import date, datetime
+from decimal import Decimal, ROUND_HALF_UP
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.extensions import db
+from app.models.finance.loan import Loan
+from app.models.finance.loan_interest_rate_history import LoanInterestRateHistory
+from app.models.finance.loan_repayment_schedule import LoanRepaymentSchedule
+
+PERIOD_MONTHS = {
+    'Monthly': 1, 'Quarterly': 3, 'Semi-Annually': 6, 'Semi-Annual': 6, 'Bi-Annually': 6,
+    'Annually': 12, 'Annual': 12, 'Yearly': 12,
+}
+FROZEN_STATUSES = ('Paid', 'Partial', 'Reversed')
+CHUNK_SIZE = 500
+CENT = Decimal('0.01')
+ZERO = Decimal('0.00')
+
+Instalment = namedtuple('Instalment', 'number due_date payment principal interest balance')
+
+
+class AmortizationError(ValueError):
+    """A loan's terms don't define a schedule (no end date, unknown frequency, …)."""
+
+
+def _money(value):
+    return Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def add_months(day, months):
+    """Same day-of-month `months` later, clamped to the month's end (31 Jan + 1 → 28/29 Feb)."""
+    month0 = day.month - 1 + months
+    year, month = day.year + month0 // 12, month0 % 12 + 1
+    return date(year, month, min(day.day, monthrange(year, month)[1]))
+
+
+def period_months(frequency):
+    months = PERIOD_MONTHS.get((frequency or 'Monthly').strip().title())
+    if months is None:
+        raise AmortizationError(f"Unsupported repayment frequency '{frequency}'")
+    return months
+
+
+def due_dates(start, end, months):
+    """Instalment dates every `months` months from start (anchored on its day); the last one is `end`."""
+    if end is None or end <= start:
+        raise AmortizationError('Loan needs an end_date after its start_date')
+    dates, i = [], 1
+    while True:
+        day = add_months(start, months * i)
+        if day >= end:
+            break
+        dates.append(day)
+        i += 1
+    dates.append(end)
+    return dates
+
+
+def annuity_payment(balance, period_rate, remaining, balloon=ZERO):
+    """Level payment that takes `balance` down to `balloon` over `remaining` periods, rounded to the cent."""
+    if remaining <= 0:
+        return balance
+    if period_rate == 0:
+        return _money((balance - balloon) / remaining)
+    factor = (1 + period_rate) ** remaining
+    return _money((balance * factor - balloon) * period_rate / (factor - 1))
+
+
+class RateTimeline:
+    """
+    Annual rate (percent) in force on a date: the rate before the first recorded change (its old_rate,
+    else Loan.interest_rate), then each LoanInterestRateHistory.new_rate from its effective_date.
+    """
+
+    def __init__(self, base_rate, changes=()):
+        changes = sorted(changes, key=lambda c: c[0])
+        initial = changes[0][1] if changes and changes[0][1] is not None else base_rate
+        self.dates = [c[0] for c in changes]
+        self.rates = [Decimal(str(initial or 0))] + [Decimal(str(c[2])) for c in changes]
+
+    def on(self, day):
+        return self.rates[bisect_right(self.dates, day)]
+
+
+def amortize(principal, start, dates, rates, months, *, interest_only=False, grace_until=None, balloon=ZERO,
+             first=1, opening_balance=None):
+    """
+    Instalments `first`..len(dates) as [Instalment].
+
+    Interest for each period is charged on the opening balance at the rate in force at the start of the
+    period, rounded half-up to the cent. Amortising instalments use the level (annuity) payment for the
+    remaining term, recomputed whenever the rate changes; instalments inside the grace period and all
+    instalments of an interest-only loan repay no principal. The last instalment clears whatever is left
+    (the balloon, if any), so principal always sums exactly to the opening balance.
+    """
+    per_year = Decimal(12 // months)
+    balance = _money(opening_balance if opening_balance is not None else principal)
+    balloon = min(_money(balloon or 0), balance)
+    previous = dates[first - 2] if first > 1 else start
+    n = len(dates)
+    payment = payment_rate = None
+
+    out = []
+    for number in range(first, n + 1):
+        due = dates[number - 1]
+        annual = rates.on(previous)
+        period_rate = annual / 100 / per_year
+        interest = _money(balance * period_rate)
+        if number == n:
+            repaid = balance
+        elif interest_only or (grace_until is not None and due <= grace_until):
+            repaid = ZERO
+        else:
+            if payment is None or annual != payment_rate:
+                payment = annuity_payment(balance, period_rate, n - number + 1, balloon)
+                payment_rate = annual
+            repaid = min(max(payment - interest, ZERO), balance)
+        balance -= repaid
+        out.append(Instalment(number, due, repaid + interest, repaid, interest, balance))
+        previous = due
+    return out
+
+
+def _terms(loan):
+    """(due dates, months per period, grace end, interest_only, balloon) for a loan row."""
+    months = period_months(loan.repayment_frequency)
+    dates = due_dates(loan.start_date, loan.end_date, months)
+    grace_until = add_months(loan.start_date, loan.grace_period_months) if loan.grace_period_months else None
+    balloon = ZERO
+    interest_only = bool(loan.is_interest_only)
+    if loan.balloon_payment_due:
+        amount = (loan.extracted_data or {}).get('balloon_amount')
+        if amount is None:
+            interest_only = True  # balloon of the whole principal
+        else:
+            balloon = _money(amount)
+    return dates, months, grace_until, interest_only, balloon
+
+
+def build_schedule(loan, rate_changes=()):
+    """Full schedule for a Loan (or loan row) from its terms; rate_changes are (effective_date, old, new)."""
+    dates, months, grace_until, interest_only, balloon = _terms(loan)
+    return amortize(loan.loan_amount, loan.start_date, dates, RateTimeline(loan.interest_rate, rate_changes), months,
+                    interest_only=interest_only, grace_until=grace_until, balloon=balloon)
+
+
+# ----------------------------
+# Persistence
+# ----------------------------
+
+LOAN_COLUMNS = ('id', 'company_id', 'client_id', 'unit_id', 'loan_amount', 'interest_rate', 'start_date', 'end_date',
+                'repayment_frequency', 'is_interest_only', 'balloon_payment_due', 'grace_period_months',
+                'extracted_data')
+UPSERT_COLUMNS = ('due_date', 'payment_amount', 'principal_amount', 'interest_amount', 'balance_after',
+                  'last_modified_at', 'last_modified_by_id')
+
+
+def _frozen(row, as_of):
+    """Instalments that are paid/part-paid or already due are history and never regenerated."""
+    return row.status in FROZEN_STATUSES or (row.paid_amount or 0) > 0 or row.due_date < as_of
+
+
+def _plan(loan, changes, rows, as_of):
+    """(instalments to write, ids of existing rows to delete) for one loan."""
+    dates, months, grace_until, interest_only, balloon = _terms(loan)
+    rates = RateTimeline(loan.interest_rate, changes)
+    kwargs = dict(interest_only=interest_only, grace_until=grace_until, balloon=balloon)
+
+    # Anchor on the end of the unbroken frozen run from the start: a prepaid later instalment mustn't
+    # pull the anchor past earlier unpaid ones. Frozen rows after a gap are left as they are.
+    ordered = sorted(rows, key=lambda r: (r.due_date, r.instalment_number or 0))
+    run = 0
+    while run < len(ordered) and _frozen(ordered[run], as_of):
+        run += 1
+    first, opening = 1, None
+    if run:
+        last = ordered[run - 1]
+        first = last.instalment_number + 1 if last.instalment_number else bisect_right(dates, last.due_date) + 1
+        opening = last.balance_after
+        if opening is None and 1 < first <= len(dates):
+            full = amortize(loan.loan_amount, loan.start_date, dates, rates, months, **kwargs)
+            opening = full[first - 2].balance
+
+    instalments = []
+    if first <= len(dates):
+        instalments = amortize(loan.loan_amount, loan.start_date, dates, rates, months, first=first,
+                               opening_balance=opening, **kwargs)
+    kept = {r.instalment_number for r in ordered[run:] if _frozen(r, as_of)}
+    instalments = [i for i in instalments if i.number not in kept]
+    numbers = {i.number for i in instalments}
+    stale = [r.id for r in rows if not _frozen(r, as_of) and r.instalment_number not in numbers]
+    return instalments, stale
+
+
+def _regenerate_chunk(loans, as_of, modified_by_id, stats):
+    S, H = LoanRepaymentSchedule, LoanInterestRateHistory
+    ids = [loan.id for loan in loans]
+    changes = defaultdict(list)
+    for loan_id, effective, old, new in db.session.execute(
+            select(H.loan_id, H.effective_date, H.old_rate, H.new_rate).where(H.loan_id.in_(ids))):
+        changes[loan_id].append((effective, old, new))
+    existing = defaultdict(list)
+    for row in db.session.execute(
+            select(S.id, S.loan_id, S.instalment_number, S.due_date, S.status, S.paid_amount, S.balance_after)
+            .where(S.loan_id.in_(ids))):
+        existing[row.loan_id].append(row)
+
+    now = datetime.utcnow()
+    upserts, stale = [], []
+    for loan in loans:
+        try:
+            instalments, drop = _plan(loan, changes[loan.id], existing[loan.id], as_of)
+        except AmortizationError as e:
+            stats['skipped'][loan.id] = str(e)
+            continue
+        stats['loans'] += 1
+        stale.extend(drop)
+        upserts.extend({
+            'company_id': loan.company_id, 'client_id': loan.client_id, 'unit_id': loan.unit_id, 'loan_id': loan.id,
+            'instalment_number': i.number, 'due_date': i.due_date, 'payment_amount': i.payment,
+            'principal_amount': i.principal, 'interest_amount': i.interest, 'balance_after': i.balance,
+            'paid_amount': ZERO, 'status': 'Pending', 'is_overdue': False, 'created_at': now,
+            'created_by_id': modified_by_id, 'last_modified_at': now, 'last_modified_by_id': modified_by_id,
+        } for i in instalments)
+
+    if stale:
+        db.session.execute(delete(S).where(S.id.in_(stale)), execution_options={'synchronize_session': False})
+    if upserts:
+        table = S.__table__
+        stmt = (pg_insert if db.engine.dialect.name == "postgresql" else sqlite_insert)(table)
+        stmt = stmt.on_conflict_do_update(index_elements=[table.c.loan_id, table.c.instalment_number],
+                                          set_={c: stmt.excluded[c] for c in UPSERT_COLUMNS})
+        db.session.execute(stmt, upserts)
+    stats['instalments'] += len(upserts)
+    stats['deleted'] += len(stale)
+
+
+def regenerate_schedules(company_id=None, loan_ids=None, as_of=None, modified_by_id=None, chunk_size=CHUNK_SIZE,
+                         commit=True):
+    """
+    (Re)generate repayment schedules for every loan of a company, or the given loans — e.g. after a rate
+    reset has been recorded in LoanInterestRateHistory.
+
+    Instalments that are paid, part-paid or due before `as_of` (default today) are kept as they are; the
+    schedule is recalculated from the balance after the last of the unbroken run of them from the first
+    instalment (a later prepaid instalment is kept but doesn't move that anchor), upserted on (loan_id,
+    instalment_number), and leftover unpaid rows beyond the new term are removed. Loans are processed in
+    chunks with one query per table to read and one executemany to write; each chunk commits on its own.
+    Returns {'loans', 'instalments', 'deleted', 'skipped': {loan_id: reason}}.
+    """
+    if company_id is None and loan_ids is None:
+        raise ValueError('company_id or loan_ids is required')
+    as_of = as_of or date.today()
+    stats = {'loans': 0, 'instalments': 0, 'deleted': 0, 'skipped': {}}
+
+    stmt = select(*(getattr(Loan, c) for c in LOAN_COLUMNS)).order_by(Loan.id)
+    if company_id is not None:
+        stmt = stmt.where(Loan.company_id == company_id)
+    if loan_ids is not None:
+        stmt = stmt.where(Loan.id.in_(list(loan_ids)))
+    loans = db.session.execute(stmt).all()
+
+    for start in range(0, len(loans), chunk_size):
+        _regenerate_chunk(loans[start:start + chunk_size], as_of, modified_by_id, stats)
+        if commit:
+            db.session.commit()
+        else:
+            db.session.flush()
+    return stats
+
+
+def regenerate_loan_schedule(loan_id, as_of=None, modified_by_id=None, commit=True):
+    return regenerate_schedules(loan_ids=[loan_id], as_of=as_of, modified_by_id=modified_by_id, commit=commit)
@@ -0,0 +1,211 @@
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+
+from sqlalchemy import insert, select
+
+from app.extensions import db
+from app.models.finance.lease_apportionment_schedule import LeaseApportionmentSchedule
+from app.models.finance.apportionment_audit_log import ApportionmentAuditLog
+from app.models.members.unit import Unit
+
+METHODS = ('Equal', 'Percentage', 'UnitSize')
+WEIGHT_SCALE = 10_000  # 4 dp: matches Numeric(6, 4) percentages, exact for Numeric(10, 2) areas
+CENT = Decimal('0.01')
+
+
+def to_cents(amount):
+    return int((Decimal(str(amount)).quantize(CENT, rounding=ROUND_HALF_UP) * 100))
+
+
+def _scaled(value):
+    """Decimal/float/None → non-negative integer in 1/WEIGHT_SCALE units (None for missing/negative)."""
+    if value is None:
+        return None
+    scaled = int((Decimal(str(value)) * WEIGHT_SCALE).to_integral_value(rounding=ROUND_HALF_UP))
+    return scaled if scaled >= 0 else None
+
+
+def unit_size_area(area_m2, square_meters):
+    """
+    UnitSize basis for a schedule: the area recorded on the lease schedule, else the unit's floor area.
+    Shared by every apportionment engine so the same schedule always splits the same way.
+    """
+    return area_m2 if area_m2 is not None else square_meters
+
+
+def allocate_cents(total_cents, weights):
+    """
+    Split `total_cents` across integer `weights` with the largest-remainder method.
+    The result always sums to `total_cents` when any weight is positive (all zeros otherwise);
+    ties on the remainder go to the earlier position, so the split is deterministic.
+    """
+    weight_total = sum(weights)
+    if weight_total <= 0:
+        return [0] * len(weights)
+
+    shares, remainders = [], []
+    for i, w in enumerate(weights):
+        share, rem = divmod(total_cents * w, weight_total)
+        shares.append(share)
+        remainders.append((-rem, i))
+
+    for _, i in sorted(remainders)[:total_cents - sum(shares)]:
+        shares[i] += 1
+    return shares
+
+
+class BatchApportionmentEngine:
+    """
+    Budget apportionment for many clients at once (e.g. the year-end re-run).
+
+    Schedules and their units come back in a single joined query, shares are computed in integer
+    cents per client and rounded with largest-remainder, so each client's allocations sum exactly
+    to its budget. Each schedule's share matches ApportionmentEngine's proportion for its method
+    (1/n, % / total %, size / total size); clients mixing methods are normalised so the parts still
+    add up to the budget.
+
+    UnitSize uses the schedule's area_m2, falling back to the unit's square_meters (unit_size_area).
+    """
+
+    def __init__(self, budgets, year=None, active_only=True):
+        """
+        :param budgets: {client_id: budget_amount}
+        :param year: restrict to schedules for this year (all years if None)
+        """
+        self.budgets = {client_id: to_cents(amount) for client_id, amount in budgets.items()}
+        self.year = year
+        self.active_only = active_only
+        self.schedules = self._load()
+        self.allocations = {}
+        self.ai_audit = []
+
+    def _load(self):
+        S = LeaseApportionmentSchedule
+        stmt = (
+            select(S.client_id, S.unit_id, S.method, S.percentage, S.area_m2,
+                   Unit.id.label('found_unit_id'), Unit.square_meters)
+            .outerjoin(Unit, Unit.id == S.unit_id)
+            .where(S.client_id.in_(list(self.budgets)))
+            .order_by(S.client_id, S.id)
+        )
+        if self.year is not None:
+            stmt = stmt.where(S.year == self.year)
+        if self.active_only:
+            stmt = stmt.where(S.is_active.is_not(False))
+
+        by_client = defaultdict(list)
+        for row in db.session.execute(stmt):
+            by_client[row.client_id].append(row)
+        return by_client
+
+    @staticmethod
+    def _basis(row):
+        """(scaled basis, gar note) for one schedule row."""
+        if row.found_unit_id is None:
+            return None, 'Missing unit for apportionment schedule.'
+        if row.method == 'Equal':
+            return WEIGHT_SCALE, ''
+        if row.method == 'Percentage':
+            basis = _scaled(row.percentage)
+            return basis, '' if basis is not None else 'Missing or negative percentage on lease schedule.'
+        if row.method == 'UnitSize':
+            basis = _scaled(unit_size_area(row.area_m2, row.square_meters))
+            return basis, '' if basis is not None else 'Missing or negative unit size.'
+        return None, 'Unrecognized apportionment method. Please review lease schedule.'
+
+    def _allocate_client(self, client_id, rows):
+        budget_cents = self.budgets[client_id]
+        bases, notes = zip(*(self._basis(r) for r in rows)) if rows else ((), ())
+
+        # Per-method totals; weight = basis / method_total, brought to a common integer denominator.
+        method_totals = defaultdict(int)
+        for r, b in zip(rows, bases):
+            if b:
+                method_totals[r.method] += b
+        denominators = {m: 1 for m in method_totals}
+        for m in method_totals:
+            for other, total in method_totals.items():
+                if other != m:
+                    denominators[m] *= total
+        weights = [b * denominators[r.method] if b else 0 for r, b in zip(rows, bases)]
+        cents = allocate_cents(budget_cents, weights)
+
+        allocations = []
+        for r, basis, note, amount_cents in zip(rows, bases, notes, cents):
+            amount = Decimal(amount_cents).scaleb(-2)
+            if r.found_unit_id is None:
+                reason = 'Unit not found'
+            elif r.method not in METHODS:
+                reason = f"Unknown method '{r.method}' - skipped"
+            elif note:
+                reason = 'Invalid basis - skipped'
+            elif r.method == 'Equal':
+                reason = 'Equally divided among all units'
+            elif r.method == 'Percentage':
+                reason = f'{r.percentage}% of budget as per lease'
+            else:
+                reason = f'Based on unit size: {Decimal(basis) / WEIGHT_SCALE} sqm'
+
+            gar_notes = note
+            if r.method == 'Percentage' and basis and basis > 100 * WEIGHT_SCALE:
+                gar_notes = f'Percentage value exceeds standard cap: {r.percentage}%'
+
+            allocations.append({
+                'unit_id': r.unit_id,
+                'amount': amount,
+                'method': r.method,
+                'reason': reason,
+            })
+            self.ai_audit.append({
+                'client_id': client_id,
+                'unit_id': r.unit_id,
+                'method': r.method,
+                'amount': amount,
+                'basis_value': r.percentage if r.method == 'Percentage' else None,
+                'unit_size': Decimal(basis) / WEIGHT_SCALE if r.method == 'UnitSize' and basis is not None else None,
+                'ai_reasoning': reason,
+                'gar_flagged': bool(gar_notes),
+                'gar_notes': gar_notes,
+            })
+
+        if budget_cents and not any(weights):
+            self.ai_audit.append({
+                'client_id': client_id,
+                'unit_id': None,
+                'method': 'Unallocated',
+                'amount': Decimal(budget_cents).scaleb(-2),
+                'basis_value': None,
+                'unit_size': None,
+                'ai_reasoning': 'No schedule with a usable basis - budget not allocated',
+                'gar_flagged': True,
+                'gar_notes': 'Client has a budget but no valid apportionment schedules.',
+            })
+        return allocations
+
+    def run_allocation(self):
+        """
+        Allocate every client's budget. Returns {client_id: [{unit_id, amount, method, reason}, ...]}.
+        """
+        self.ai_audit = []
+        self.allocations = {
+            client_id: self._allocate_client(client_id, self.schedules.get(client_id, []))
+            for client_id in self.budgets
+        }
+        return self.allocations
+
+    def get_gar_audit(self):
+        return self.ai_audit
+
+    def save_gar_audit_to_db(self, batch_size=5000, commit=True):
+        """
+        Persists the audit rows with executemany INSERTs (no ORM objects). Returns the row count.
+        """
+        now = datetime.utcnow()
+        table = ApportionmentAuditLog.__table__
+        rows = [dict(entry, created_at=now) for entry in self.ai_audit]
+        for start in range(0, len(rows), batch_size):
+            db.session.execute(insert(table), rows[start:start + batch_size])
+        if commit:
+            db.session.commit()
+        return len(rows)
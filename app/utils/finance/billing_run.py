@@ -0,0 +1,259 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.extensions import db
+from app.models.client.client import Client
+from app.models.finance.budget import Budget
+from app.models.finance.finance_batch import FinanceBatch
+from app.models.finance.invoice import Invoice
+from app.models.finance.invoice_sequence import InvoiceSequence
+from app.models.finance.levy import Levy
+from app.models.finance.service_charge import ServiceCharge
+from app.utils.finance.amortization import add_months
+from app.utils.finance.batch_apportionment import BatchApportionmentEngine, allocate_cents, to_cents
+from app.utils.finance.tax_rates import resolve_tax_rates
+
+BILLING_PERIODS = {'Annual': 12, 'Half-Yearly': 6, 'Quarterly': 3, 'Monthly': 1}
+CHARGE_TYPES = {
+    # batch_type: (model, Invoice FK column, Invoice.charge_type label)
+    'service_charge': (ServiceCharge, 'service_charge_id', 'Service Charge'),
+    'levy': (Levy, 'levy_id', 'Levy'),
+}
+INVOICE_NUMBER_FORMAT = "INV-{company_id}-{number:07d}"
+CHUNK_SIZE = 2000
+
+
+class BillingRunError(ValueError):
+    """A billing run can't be started or rolled back as asked."""
+
+
+def allocate_invoice_numbers(company_id, count):
+    """
+    Reserve `count` consecutive numbers from the company's sequence; returns the first one.
+    The counter row stays locked until the caller's transaction ends, so numbers are only consumed
+    if the invoices using them are committed (no gaps, at the cost of serialising a company's runs).
+    """
+    table = InvoiceSequence.__table__
+    upsert = pg_insert if db.engine.dialect.name == "postgresql" else sqlite_insert
+    stmt = (
+        upsert(table)
+        .values(company_id=company_id, last_value=count, updated_at=func.now())
+        .on_conflict_do_update(index_elements=[table.c.company_id],
+                               set_={'last_value': table.c.last_value + count, 'updated_at': func.now()})
+        .returning(table.c.last_value)
+    )
+    return db.session.execute(stmt).scalar_one() - count + 1
+
+
+def billing_window(fiscal_year_start, billing_period, period_number):
+    """(period_start, period_end) of the Nth billing period of a fiscal year."""
+    months = BILLING_PERIODS.get(billing_period)
+    if months is None:
+        raise BillingRunError(f"Unknown billing period '{billing_period}'")
+    if not 1 <= period_number <= 12 // months:
+        raise BillingRunError(f"{billing_period} billing has periods 1–{12 // months}")
+    start = add_months(fiscal_year_start, months * (period_number - 1))
+    return start, add_months(fiscal_year_start, months * period_number) - timedelta(days=1)
+
+
+def period_share(annual_cents, billing_period, period_number):
+    """This period's slice of an annual amount; the slices of a year add up to it exactly."""
+    periods = 12 // BILLING_PERIODS[billing_period]
+    return allocate_cents(annual_cents, [1] * periods)[period_number - 1]
+
+
+def fiscal_year_budgets(client_ids, fiscal_year):
+    """{client_id: total budgeted_amount} for development-level budget lines of a fiscal year."""
+    rows = db.session.execute(
+        select(Budget.client_id, func.sum(Budget.budgeted_amount))
+        .where(Budget.client_id.in_(client_ids), Budget.fiscal_year == fiscal_year, Budget.unit_id.is_(None))
+        .group_by(Budget.client_id)
+    )
+    return {client_id: total for client_id, total in rows if total}
+
+
+def _batch_name(charge_label, fiscal_year, billing_period, period_number):
+    if billing_period == 'Annual':
+        return f"{charge_label} {fiscal_year}"
+    prefix = {'Half-Yearly': 'H', 'Quarterly': 'Q', 'Monthly': 'M'}[billing_period]
+    return f"{prefix}{period_number} {charge_label} {fiscal_year}"
+
+
+def _run_batch(client_id, batch_type, window, name, created_by_id):
+    """The client's FinanceBatch for this period: an unfinished one is resumed, a finished one skipped."""
+    batch = (FinanceBatch.query
+             .filter(FinanceBatch.client_id == client_id, FinanceBatch.batch_type == batch_type,
+                     FinanceBatch.period_start == window[0], FinanceBatch.period_end == window[1],
+                     FinanceBatch.status.in_(('draft', 'posted')))
+             .order_by(FinanceBatch.id.desc()).first())
+    if batch is None:
+        batch = FinanceBatch(client_id=client_id, batch_type=batch_type, batch_name=name, status='draft',
+                             period_start=window[0], period_end=window[1], created_by_id=created_by_id,
+                             extracted_data={})
+        db.session.add(batch)
+        db.session.flush()
+    return batch
+
+
+def run_billing(client_ids, fiscal_year, billing_period='Annual', period_number=1, batch_type='service_charge',
+                budgets=None, fiscal_year_start=None, schedule_year=None, due_days=30, tax_type=None,
+                created_by_id=None, chunk_size=CHUNK_SIZE):
+    """
+    Issue one charge + invoice per unit for a billing period across many developments.
+
+    Each client's annual budget (given, or summed from its Budget lines for `fiscal_year`) is apportioned
+    with BatchApportionmentEngine; each unit is billed its exact share for the period. Rows are written
+    in chunks — ServiceCharge/Levy rows, then their Invoices numbered from the company's gap-free
+    sequence — and every chunk commits together with the progress recorded on the client's FinanceBatch.
+    Running the same period again resumes an unfinished batch (units already invoiced are skipped) and
+    leaves finished ones alone; rollback_billing_run() undoes a batch as a whole.
+
+    Charges are billed untaxed unless `tax_type` (e.g. 'VAT') is given, in which case each invoice carries
+    the rate in force for its development's country/region at the start of the period.
+
+    Returns {client_id: {'batch_id', 'status', 'units', 'billed', 'skipped', 'amount'}}.
+    """
+    if batch_type not in CHARGE_TYPES:
+        raise BillingRunError(f"Unknown batch type '{batch_type}'")
+    model, invoice_fk, charge_label = CHARGE_TYPES[batch_type]
+    first_year = int(str(fiscal_year)[:4])
+    fiscal_year_start = fiscal_year_start or date(first_year, 1, 1)
+    window = billing_window(fiscal_year_start, billing_period, period_number)
+    due_date = window[0] + timedelta(days=due_days)
+    name = _batch_name(charge_label, fiscal_year, billing_period, period_number)
+
+    client_ids = list(client_ids)
+    budgets = budgets if budgets is not None else fiscal_year_budgets(client_ids, fiscal_year)
+    clients = {c.id: c for c in db.session.execute(
+        select(Client.id, Client.company_id, Client.country, Client.region).where(Client.id.in_(client_ids)))}
+    tax_rates = {}
+    if tax_type:
+        ids = list(clients)
+        rates = resolve_tax_rates([(clients[c].country, clients[c].region, tax_type, window[0]) for c in ids])
+        tax_rates = {c: rate.rate for c, rate in zip(ids, rates) if rate is not None}
+    engine = BatchApportionmentEngine({c: budgets[c] for c in client_ids if c in budgets},
+                                      year=schedule_year or first_year)
+    allocations = engine.run_allocation()
+
+    results = {}
+    for client_id in client_ids:
+        if client_id not in allocations:
+            results[client_id] = {'batch_id': None, 'status': 'no budget', 'units': 0, 'billed': 0, 'skipped': 0,
+                                  'amount': Decimal('0.00')}
+            continue
+        batch = _run_batch(client_id, batch_type, window, name, created_by_id)
+        result = results[client_id] = {'batch_id': batch.id, 'status': batch.status, 'units': 0, 'billed': 0,
+                                       'skipped': 0, 'amount': Decimal('0.00')}
+        if batch.status == 'posted':
+            db.session.commit()
+            continue
+
+        already = set(db.session.execute(
+            select(Invoice.unit_id).where(Invoice.finance_batch_id == batch.id)).scalars())
+        # One line per unit (a unit with several schedule rows is billed once, for its total share).
+        per_unit = defaultdict(int)
+        for a in allocations[client_id]:
+            if a['unit_id'] is not None:
+                per_unit[a['unit_id']] += to_cents(a['amount'])
+        lines = []
+        for unit_id in sorted(per_unit):
+            cents = period_share(per_unit[unit_id], billing_period, period_number)
+            if unit_id in already or cents <= 0:
+                result['skipped'] += 1
+                continue
+            lines.append((unit_id, Decimal(cents).scaleb(-2)))
+        result['units'] = len(per_unit)
+
+        for start in range(0, len(lines), chunk_size):
+            chunk = lines[start:start + chunk_size]
+            _bill_chunk(batch, clients[client_id].company_id, chunk, model, invoice_fk, charge_label, name,
+                        fiscal_year, billing_period, period_number, first_year, due_date, tax_rates.get(client_id, 0.0),
+                        created_by_id)
+            result['billed'] += len(chunk)
+            result['amount'] += sum(amount for _, amount in chunk)
+            db.session.commit()
+
+        batch.status = result['status'] = 'posted'
+        batch.posted_at = datetime.utcnow()
+        db.session.commit()
+    return results
+
+
+def _with_tax(amount, rate):
+    return amount + (amount * Decimal(str(rate)) / 100).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def _bill_chunk(batch, company_id, chunk, model, invoice_fk, charge_label, name, fiscal_year, billing_period,
+                period_number, first_year, due_date, tax_rate, created_by_id):
+    now = datetime.utcnow()
+    first_number = allocate_invoice_numbers(company_id, len(chunk))
+    numbers = [INVOICE_NUMBER_FORMAT.format(company_id=company_id, number=first_number + i) for i in range(len(chunk))]
+
+    if model is ServiceCharge:
+        rows = [{'client_id': batch.client_id, 'unit_id': unit_id, 'created_by_id': created_by_id, 'year': first_year,
+                 'billing_period': billing_period, 'charge_date': now, 'due_date': due_date,
+                 'charge_cycle_code': f"{fiscal_year}:{billing_period}:{period_number}", 'amount_due': amount,
+                 'amount_paid': Decimal('0.00'), 'status': 'Unpaid', 'reference': number, 'description': name,
+                 'created_at': now, 'updated_at': now}
+                for (unit_id, amount), number in zip(chunk, numbers)]
+    else:
+        rows = [{'client_id': batch.client_id, 'unit_id': unit_id, 'created_by_id': created_by_id, 'title': name,
+                 'amount_due': amount, 'amount_paid': Decimal('0.00'), 'due_date': due_date, 'issued_date': now,
+                 'status': 'Unpaid', 'is_finalised': True, 'reference_code': number, 'created_at': now}
+                for (unit_id, amount), number in zip(chunk, numbers)]
+    charge_ids = db.session.execute(
+        insert(model).returning(model.id, sort_by_parameter_order=True), rows).scalars().all()
+
+    db.session.execute(insert(Invoice), [
+        {invoice_fk: charge_id, 'unit_id': unit_id, 'company_id': company_id, 'finance_batch_id': batch.id,
+         'invoice_number': number, 'description': name, 'amount': amount, 'tax_rate': tax_rate,
+         'total_amount': _with_tax(amount, tax_rate),
+         'invoice_date': now.date(), 'due_date': due_date, 'status': 'Issued', 'charge_type': charge_label,
+         'created_at': now}
+        for (unit_id, amount), number, charge_id in zip(chunk, numbers, charge_ids)
+    ])
+
+    progress = dict(batch.extracted_data or {})
+    progress['units_billed'] = progress.get('units_billed', 0) + len(chunk)
+    progress.setdefault('first_invoice_number', numbers[0])
+    progress['last_invoice_number'] = numbers[-1]
+    batch.extracted_data = progress
+
+
+def rollback_billing_run(batch_id, modified_by_id=None, commit=True):
+    """
+    Undo a billing batch as a unit: its ServiceCharge/Levy rows are deleted and its invoices cancelled
+    (numbers are kept, so the sequence stays gap-free). Refused once anything has been paid.
+    Returns the number of charges removed.
+    """
+    batch = db.session.get(FinanceBatch, batch_id)
+    if batch is None or batch.batch_type not in CHARGE_TYPES:
+        raise BillingRunError(f"Finance batch {batch_id} is not a billing run")
+    if batch.status == 'rolled_back':
+        return 0
+    model, invoice_fk, _ = CHARGE_TYPES[batch.batch_type]
+    fk = getattr(Invoice, invoice_fk)
+
+    charge_ids = list(db.session.execute(
+        select(fk).where(Invoice.finance_batch_id == batch.id, fk.is_not(None))).scalars())
+    paid = db.session.execute(
+        select(func.count()).select_from(model).where(model.id.in_(charge_ids), model.amount_paid > 0)).scalar()
+    if paid:
+        raise BillingRunError(f"{paid} charge(s) in batch {batch_id} already have payments")
+
+    db.session.execute(update(Invoice).where(Invoice.finance_batch_id == batch.id)
+                       .values({invoice_fk: None, 'status': 'Cancelled', 'updated_at': datetime.utcnow()}),
+                       execution_options={'synchronize_session': False})
+    for start in range(0, len(charge_ids), CHUNK_SIZE):
+        db.session.execute(delete(model).where(model.id.in_(charge_ids[start:start + CHUNK_SIZE])),
+                           execution_options={'synchronize_session': False})
+    batch.status = 'rolled_back'
+    batch.last_modified_by_id = modified_by_id
+    if commit:
+        db.session.commit()
+    return len(charge_ids)
@@ -1,6 +1,7 @@
 from decimal import Decimal
 from app.models.finance.lease_apportionment_schedule import LeaseApportionmentSchedule
 from app.models.members.unit import Unit
+from app.utils.finance.batch_apportionment import unit_size_area
 from app.extensions import db
 from datetime import datetime
 
@@ -23,12 +24,22 @@ class BudgetCalculator:
 
         schedules = LeaseApportionmentSchedule.query.filter_by(client_id=client_id).all()
 
-        percentage_total = sum(s.value for s in schedules if s.method == 'Percentage')
-        unit_size_total = sum((Unit.query.get(s.unit_id).size or 0) for s in schedules if s.method == 'UnitSize')
+        percentage_total = sum((s.percentage or 0) for s in schedules if s.method == 'Percentage')
+        # One query for every UnitSize unit's floor area (the fallback basis) instead of per-schedule gets
+        size_unit_ids = {s.unit_id for s in schedules if s.method == 'UnitSize'}
+        unit_sizes = dict(
+            Unit.query.with_entities(Unit.id, Unit.square_meters).filter(Unit.id.in_(size_unit_ids)).all()
+        ) if size_unit_ids else {}
+
+        def _size(s):
+            # Same basis as the batch engine: the schedule's area, else the unit's floor area
+            return float(unit_size_area(s.area_m2, unit_sizes.get(s.unit_id)) or 0)
+
+        unit_size_total = sum(_size(s) for s in schedules if s.method == 'UnitSize')
 
         for schedule in schedules:
             method = schedule.method
-            value = schedule.value or 0
+            value = (schedule.percentage or 0) if method == 'Percentage' else (schedule.area_m2 or 0)
             unit_id = schedule.unit_id
             amount = Decimal('0.00')
             ai_flag = None
@@ -49,8 +60,8 @@ class BudgetCalculator:
                     gar_reason = f"Percentage value exceeds standard cap: {value}%"
 
             elif method == 'UnitSize':
-                unit = Unit.query.get(unit_id)
-                size = unit.size or 0
+                size = _size(schedule)
+                value = size
                 proportion = size / unit_size_total if unit_size_total > 0 else 0
                 amount = round(budget_amount * Decimal(proportion), 2)
                 gar_reason = f"Proportional to unit size: {size} sqm"
@@ -0,0 +1,247 @@
+from bisect import bisect_right
+from collections import defaultdict, namedtuple
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from sqlalchemy import delete, func, insert, select, update
+
+from app.extensions import db
+from app.models.client.client import Client
+from app.models.finance.arrears import Arrears
+from app.models.finance.late_fee_interest_policy import LateFeeAndInterestPolicy
+from app.models.finance.late_fee_transaction_log import LateFeeTransactionLog
+
+PERIODS_PER_YEAR = {'Daily': 365, 'Monthly': 12, 'Annually': 1}
+SETTLED_ARREARS = ('Paid', 'Written Off')
+ANY_TYPE = 'Both'
+CHUNK_SIZE = 5000
+
+Policy = namedtuple('Policy', 'id client_id applies_to area_type_id effective_date grace_period_days fixed_fee '
+                              'interest_rate_percent interest_frequency compound_interest maximum_fee '
+                              'min_fee_trigger_amount')
+Accrual = namedtuple('Accrual', 'fee interest')
+
+
+def _cents(value):
+    return int((Decimal(str(value or 0)) * 100).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def _months_between(start, end):
+    """Whole calendar months from start to end (0 if end is before start)."""
+    months = (end.year - start.year) * 12 + end.month - start.month - (end.day < start.day)
+    return max(months, 0)
+
+
+class PolicyIndex:
+    """
+    In-memory lookup of the effective LateFeeAndInterestPolicy for (client, applies_to, area_type, date).
+
+    The most specific scope wins: exact item type before 'Both', exact area type before client-wide
+    (area_type_id NULL); within a scope the latest effective_date on or before the date applies.
+    Resolutions are memoised, so a run resolves each key once however many items share it.
+    """
+
+    def __init__(self, policies):
+        grouped = defaultdict(list)
+        for p in policies:
+            grouped[(p.client_id, p.applies_to, p.area_type_id)].append(p)
+        self._scopes = {}
+        for key, rows in grouped.items():
+            rows.sort(key=lambda p: (p.effective_date, p.id))
+            self._scopes[key] = ([p.effective_date for p in rows], rows)
+        self._memo = {}
+
+    @classmethod
+    def load(cls, client_ids, as_of):
+        P = LateFeeAndInterestPolicy
+        stmt = select(*(getattr(P, f) for f in Policy._fields)).where(P.effective_date <= as_of)
+        if client_ids is not None:
+            stmt = stmt.where(P.client_id.in_(client_ids))
+        return cls(Policy(*row) for row in db.session.execute(stmt))
+
+    def _effective(self, key, on):
+        scope = self._scopes.get(key)
+        if scope is None:
+            return None
+        i = bisect_right(scope[0], on)
+        return scope[1][i - 1] if i else None
+
+    def resolve(self, client_id, applies_to, area_type_id, on):
+        memo_key = (client_id, applies_to, area_type_id, on)
+        if memo_key not in self._memo:
+            candidates = [(client_id, applies_to, area_type_id), (client_id, applies_to, None),
+                          (client_id, ANY_TYPE, area_type_id), (client_id, ANY_TYPE, None)]
+            found = None
+            for key in dict.fromkeys(candidates):
+                found = self._effective(key, on)
+                if found is not None:
+                    break
+            self._memo[memo_key] = found
+        return self._memo[memo_key]
+
+
+class AccrualCalculator:
+    """
+    Cumulative penalty for an overdue amount under a policy, as of a date, in integer cents.
+
+    Accrual starts once the grace period has passed: the fixed fee is charged once, and interest
+    accrues for each whole period (day / calendar month / year) since then. interest_rate_percent is
+    the annual rate, applied per period as rate / periods-per-year, either simple or compounded.
+    Fee plus interest never exceeds maximum_fee; amounts below min_fee_trigger_amount accrue nothing.
+    Interest factors are cached per (policy, periods), so a chunk costs one multiply per item.
+    """
+
+    def __init__(self):
+        self._factors = {}
+
+    def _factor(self, policy, periods):
+        key = (policy.id, periods)
+        factor = self._factors.get(key)
+        if factor is None:
+            per_year = PERIODS_PER_YEAR.get(policy.interest_frequency or 'Monthly', 12)
+            rate = Decimal(str(policy.interest_rate_percent or 0)) / 100 / per_year
+            factor = ((1 + rate) ** periods - 1) if policy.compound_interest else rate * periods
+            self._factors[key] = factor
+        return factor
+
+    @staticmethod
+    def periods(policy, start, as_of):
+        if policy.interest_frequency == 'Daily':
+            return (as_of - start).days
+        months = _months_between(start, as_of)
+        return months // 12 if policy.interest_frequency == 'Annually' else months
+
+    def accrue(self, policy, principal_cents, due_date, as_of, waive_interest=False):
+        days_late = (as_of - due_date).days - (policy.grace_period_days or 0)
+        if days_late <= 0 or principal_cents <= 0 or principal_cents < _cents(policy.min_fee_trigger_amount):
+            return Accrual(0, 0)
+
+        fee = _cents(policy.fixed_fee)
+        interest = 0
+        if policy.interest_rate_percent and not waive_interest:
+            start = due_date + timedelta(days=policy.grace_period_days or 0)
+            periods = self.periods(policy, start, as_of)
+            if periods > 0:
+                interest = int((principal_cents * self._factor(policy, periods)).to_integral_value(ROUND_HALF_UP))
+
+        if policy.maximum_fee is not None:
+            cap = _cents(policy.maximum_fee)
+            fee = min(fee, cap)
+            interest = min(interest, cap - fee)
+        return Accrual(fee, interest)
+
+
+def _policy_label(policy):
+    return f"{policy.applies_to} policy #{policy.id} ({policy.effective_date})"
+
+
+def _open_arrears(client_ids, as_of, after_id, limit):
+    A = Arrears
+    stmt = (select(A.id, A.client_id, A.unit_id, A.invoice_id, A.arrears_type, A.amount_due, A.due_date,
+                   A.days_overdue, A.late_fee_accrued, A.interest_accrued, A.interest_waived,
+                   A.penalty_policy_applied)
+            .where(A.id > after_id, A.status.notin_(SETTLED_ARREARS), A.due_date < as_of)
+            .order_by(A.id).limit(limit))
+    if client_ids is not None:
+        stmt = stmt.where(A.client_id.in_(client_ids))
+    return db.session.execute(stmt).all()
+
+
+def accrue_late_fees(as_of=None, client_ids=None, company_id=None, chunk_size=CHUNK_SIZE, created_by_id=None,
+                     commit=True):
+    """
+    Nightly late-fee / interest accrual over open Arrears.
+
+    For each overdue item the cumulative fee and interest as of `as_of` are computed from the effective
+    policy; Arrears.late_fee_accrued / interest_accrued are set to those totals and the difference from
+    what was already accrued is written as a LateFeeTransactionLog row dated `as_of`.
+
+    Idempotent per date: the run first takes back that date's existing log rows for the item, so running
+    the same date again leaves the same state (and rewrites nothing when the result hasn't changed).
+    Items are processed in id-ordered chunks, each written with executemany statements and committed on
+    its own, so an interrupted run can simply be started again.
+
+    Arrears carry no area type, so only client-wide (area_type_id NULL) policies can match.
+    Returns a stats dict.
+    """
+    as_of = as_of or date.today()
+    applied_on = datetime.combine(as_of, time.min)
+    if client_ids is None and company_id is not None:
+        client_ids = list(db.session.execute(select(Client.id).where(Client.company_id == company_id)).scalars())
+
+    policies = PolicyIndex.load(client_ids, as_of)
+    calc = AccrualCalculator()
+    stats = {'as_of': as_of, 'scanned': 0, 'accrued': 0, 'no_policy': 0, 'updated': 0, 'logs': 0,
+             'fees': Decimal('0.00'), 'interest': Decimal('0.00')}
+    L = LateFeeTransactionLog
+    now = datetime.utcnow()
+
+    last_id = 0
+    while True:
+        rows = _open_arrears(client_ids, as_of, last_id, chunk_size)
+        if not rows:
+            break
+        last_id = rows[-1].id
+        stats['scanned'] += len(rows)
+
+        ids = [r.id for r in rows]
+        same_day = {r.arrears_id: (_cents(r.fee), _cents(r.interest)) for r in db.session.execute(
+            select(L.arrears_id, func.coalesce(func.sum(L.fee_amount), 0).label('fee'),
+                   func.coalesce(func.sum(L.interest_amount), 0).label('interest'))
+            .where(L.arrears_id.in_(ids), L.applied_on == applied_on).group_by(L.arrears_id))}
+
+        updates, logs, replaced = [], [], []
+        for r in rows:
+            policy = policies.resolve(r.client_id, r.arrears_type or ANY_TYPE, None, as_of)
+            if policy is None:
+                stats['no_policy'] += 1
+                continue
+            target = calc.accrue(policy, _cents(r.amount_due), r.due_date, as_of, waive_interest=bool(r.interest_waived))
+            fee_now, interest_now = _cents(r.late_fee_accrued), _cents(r.interest_accrued)
+            logged = same_day.get(r.id, (0, 0))
+            # What had accrued before this date's run; the log for this date carries target - baseline.
+            fee_delta = target.fee - (fee_now - logged[0])
+            interest_delta = target.interest - (interest_now - logged[1])
+            if target.fee or target.interest:
+                stats['accrued'] += 1
+
+            if (fee_delta, interest_delta) != logged:
+                if r.id in same_day:
+                    replaced.append(r.id)
+                if fee_delta or interest_delta:
+                    logs.append({
+                        'policy_id': policy.id, 'arrears_id': r.id, 'invoice_id': r.invoice_id,
+                        'unit_id': r.unit_id, 'client_id': r.client_id,
+                        'fee_amount': Decimal(fee_delta).scaleb(-2),
+                        'interest_amount': Decimal(interest_delta).scaleb(-2),
+                        'total_penalty': Decimal(fee_delta + interest_delta).scaleb(-2),
+                        'compounded': bool(policy.compound_interest), 'waived': bool(r.interest_waived),
+                        'policy_name_snapshot': _policy_label(policy), 'applied_on': applied_on,
+                        'created_by_id': created_by_id, 'created_at': now, 'updated_at': now,
+                    })
+                    stats['fees'] += Decimal(fee_delta).scaleb(-2)
+                    stats['interest'] += Decimal(interest_delta).scaleb(-2)
+
+            days_overdue = (as_of - r.due_date).days
+            label = _policy_label(policy)
+            if (target.fee, target.interest) != (fee_now, interest_now) or r.days_overdue != days_overdue \
+                    or r.penalty_policy_applied != label:
+                updates.append({'id': r.id, 'late_fee_accrued': Decimal(target.fee).scaleb(-2),
+                                'interest_accrued': Decimal(target.interest).scaleb(-2),
+                                'days_overdue': days_overdue, 'penalty_policy_applied': label})
+
+        if replaced:
+            db.session.execute(delete(L).where(L.arrears_id.in_(replaced), L.applied_on == applied_on),
+                               execution_options={'synchronize_session': False})
+        if logs:
+            db.session.execute(insert(L), logs)
+        if updates:
+            db.session.execute(update(Arrears), updates)
+        stats['updated'] += len(updates)
+        stats['logs'] += len(logs)
+
+        if commit:
+            db.session.commit()
+        else:
+            db.session.flush()
+    return stats
@@ -0,0 +1,305 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from sqlalchemy import cast, delete, event, func, insert, inspect, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.models.finance.account import Account
+from app.models.finance.account_period_balance import AccountPeriodBalance
+from app.models.finance.balance_sheet import BalanceSheet
+from app.models.finance.general_ledger_entry import GeneralLedgerEntry
+from app.models.finance.income_statement import IncomeStatement
+from app.models.finance.trial_balance import TrialBalance
+
+ZERO = Decimal('0.00')
+DEBIT_NORMAL = ('asset', 'expense')
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def _period_of(entry_date):
+    return month_start(entry_date.date() if isinstance(entry_date, datetime) else entry_date)
+
+
+# ----------------------------
+# Rollup maintenance
+# ----------------------------
+
+def _apply_deltas(connection, deltas):
+    """
+    Add {(account_id, period_start): [debit, credit, count]} onto account_period_balances with one
+    executemany INSERT … ON CONFLICT DO UPDATE (rows sorted so concurrent posters lock in the same order).
+    """
+    rows = [{'account_id': a, 'period_start': p, 'debit_total': d, 'credit_total': c, 'entry_count': n,
+             'updated_at': datetime.utcnow()}
+            for (a, p), (d, c, n) in sorted(deltas.items()) if d or c or n]
+    if not rows:
+        return 0
+    table = AccountPeriodBalance.__table__
+    upsert = pg_insert if connection.dialect.name == "postgresql" else sqlite_insert
+    stmt = upsert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.account_id, table.c.period_start],
+        set_={'debit_total': table.c.debit_total + stmt.excluded.debit_total,
+              'credit_total': table.c.credit_total + stmt.excluded.credit_total,
+              'entry_count': table.c.entry_count + stmt.excluded.entry_count,
+              'updated_at': stmt.excluded.updated_at},
+    )
+    connection.execute(stmt, rows)
+    return len(rows)
+
+
+def _add(deltas, account_id, entry_date, debit, credit, sign):
+    if account_id is None or entry_date is None:
+        return
+    bucket = deltas[(account_id, _period_of(entry_date))]
+    bucket[0] += sign * Decimal(str(debit or 0))
+    bucket[1] += sign * Decimal(str(credit or 0))
+    bucket[2] += sign
+
+
+def _before_values(obj):
+    """(account_id, entry_date, debit, credit) as they were before this flush."""
+    state = inspect(obj)
+    values = []
+    for name in ('account_id', 'entry_date', 'debit_amount', 'credit_amount'):
+        history = state.attrs[name].history
+        values.append(history.deleted[0] if history.deleted else getattr(obj, name))
+    return values
+
+
+def _after_flush(session, flush_context):
+    deltas = defaultdict(lambda: [ZERO, ZERO, 0])
+    for obj in session.new:
+        if isinstance(obj, GeneralLedgerEntry):
+            _add(deltas, obj.account_id, obj.entry_date, obj.debit_amount, obj.credit_amount, 1)
+    for obj in session.deleted:
+        if isinstance(obj, GeneralLedgerEntry):
+            _add(deltas, *_before_values(obj), -1)
+    for obj in session.dirty:
+        if isinstance(obj, GeneralLedgerEntry) and session.is_modified(obj, include_collections=False):
+            _add(deltas, *_before_values(obj), -1)
+            _add(deltas, obj.account_id, obj.entry_date, obj.debit_amount, obj.credit_amount, 1)
+    if deltas:
+        _apply_deltas(session.connection(), deltas)
+
+
+_listeners_registered = False
+
+
+def register_period_balance_listeners():
+    """Keep account_period_balances in step with GeneralLedgerEntry rows flushed through the ORM (idempotent)."""
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    event.listen(Session, "after_flush", _after_flush)
+    _listeners_registered = True
+
+
+def post_ledger_entries(rows, commit=True):
+    """
+    Bulk-post GeneralLedgerEntry rows (dicts) with an executemany INSERT and roll them into the period
+    balances in the same transaction. Use this rather than add_all() for large postings.
+    """
+    now = datetime.utcnow()
+    deltas = defaultdict(lambda: [ZERO, ZERO, 0])
+    prepared = []
+    for row in rows:
+        row = dict(row)
+        row.setdefault('entry_date', now)
+        row.setdefault('debit_amount', ZERO)
+        row.setdefault('credit_amount', ZERO)
+        row.setdefault('created_at', now)
+        _add(deltas, row['account_id'], row['entry_date'], row['debit_amount'], row['credit_amount'], 1)
+        prepared.append(row)
+    if prepared:
+        db.session.execute(insert(GeneralLedgerEntry), prepared)
+        _apply_deltas(db.session.connection(), deltas)
+    if commit:
+        db.session.commit()
+    return len(prepared)
+
+
+def _client_accounts(client_id):
+    return select(Account.id).where(Account.client_id == client_id)
+
+
+def rebuild_period_balances(client_id=None, commit=True):
+    """Recompute the rollup from the raw ledger (all accounts, or one client's). Returns the row count."""
+    G, B = GeneralLedgerEntry, AccountPeriodBalance
+    if db.engine.dialect.name == "postgresql":
+        period = cast(func.date_trunc('month', G.entry_date), db.Date)
+    else:
+        period = func.date(G.entry_date, 'start of month')
+
+    stmt = (select(G.account_id, period.label('period_start'), func.sum(G.debit_amount), func.sum(G.credit_amount),
+                   func.count(), func.now())
+            .group_by(G.account_id, period))
+    wipe = delete(B)
+    if client_id is not None:
+        stmt = stmt.where(G.account_id.in_(_client_accounts(client_id)))
+        wipe = wipe.where(B.account_id.in_(_client_accounts(client_id)))
+
+    db.session.execute(wipe)
+    result = db.session.execute(
+        insert(B).from_select(['account_id', 'period_start', 'debit_total', 'credit_total', 'entry_count',
+                               'updated_at'], stmt)
+    )
+    if commit:
+        db.session.commit()
+    return result.rowcount
+
+
+# ----------------------------
+# Balances & statements
+# ----------------------------
+
+def account_balances(client_id, as_of):
+    """
+    {account_id: (debit_total, credit_total)} for everything posted up to the end of `as_of`.
+
+    Months before as_of's month come from the rollup; only the open month is read from the raw ledger
+    (an index range scan on (account_id, entry_date)).
+    """
+    G, B = GeneralLedgerEntry, AccountPeriodBalance
+    cutoff = month_start(as_of)
+    accounts = _client_accounts(client_id)
+
+    totals = defaultdict(lambda: [ZERO, ZERO])
+    closed = (select(B.account_id, func.sum(B.debit_total), func.sum(B.credit_total))
+              .where(B.account_id.in_(accounts), B.period_start < cutoff)
+              .group_by(B.account_id))
+    open_period = (select(G.account_id, func.sum(G.debit_amount), func.sum(G.credit_amount))
+                   .where(G.account_id.in_(accounts),
+                          G.entry_date >= datetime.combine(cutoff, time.min),
+                          G.entry_date < datetime.combine(as_of + timedelta(days=1), time.min))
+                   .group_by(G.account_id))
+    for stmt in (closed, open_period):
+        for account_id, debit, credit in db.session.execute(stmt):
+            totals[account_id][0] += Decimal(debit or 0)
+            totals[account_id][1] += Decimal(credit or 0)
+    return {k: (v[0], v[1]) for k, v in totals.items()}
+
+
+def _accounts(client_id):
+    return db.session.execute(
+        select(Account.id, Account.account_name, Account.account_type)
+        .where(Account.client_id == client_id).order_by(Account.account_type, Account.account_name, Account.id)
+    ).all()
+
+
+def trial_balance(client_id, as_of):
+    """
+    Trial balance rows as of a date: each account's net balance in the debit or credit column.
+    Returns {'report_date', 'accounts': [...], 'total_debits', 'total_credits', 'is_balanced'}.
+    """
+    balances = account_balances(client_id, as_of)
+    rows, total_debits, total_credits = [], ZERO, ZERO
+    for account_id, name, account_type in _accounts(client_id):
+        debit, credit = balances.get(account_id, (ZERO, ZERO))
+        net = debit - credit
+        if not debit and not credit:
+            continue
+        rows.append({
+            'account_id': account_id, 'account_name': name, 'account_type': account_type,
+            'debit': net if net > 0 else ZERO, 'credit': -net if net < 0 else ZERO,
+        })
+        total_debits += max(net, ZERO)
+        total_credits += max(-net, ZERO)
+    return {'report_date': as_of, 'accounts': rows, 'total_debits': total_debits,
+            'total_credits': total_credits, 'is_balanced': total_debits == total_credits}
+
+
+def _json_rows(rows):
+    return [{k: float(v) if isinstance(v, Decimal) else v for k, v in row.items()} for row in rows]
+
+
+def generate_trial_balance(client_id, as_of, created_by_id=None, commit=True):
+    """Save the trial balance as a TrialBalance row (replacing that client's row for the same date)."""
+    tb = trial_balance(client_id, as_of)
+    record = TrialBalance.query.filter_by(client_id=client_id, report_date=as_of, unit_id=None).first()
+    if record is None:
+        record = TrialBalance(client_id=client_id, report_date=as_of)
+        db.session.add(record)
+    record.created_by_id = created_by_id or record.created_by_id
+    record.total_debits = tb['total_debits']
+    record.total_credits = tb['total_credits']
+    record.is_balanced = tb['is_balanced']
+    record.account_summaries = _json_rows(tb['accounts'])
+    if commit:
+        db.session.commit()
+    return record
+
+
+def generate_balance_sheet(client_id, as_of, created_by_id=None, commit=True):
+    """
+    BalanceSheet as of a date from the same balances. Income less expenses to date is carried in equity
+    as 'Accumulated Surplus', so assets = liabilities + equity whenever the ledger balances.
+    """
+    balances = account_balances(client_id, as_of)
+    breakdown = {'asset': {}, 'liability': {}, 'equity': {}}
+    surplus = ZERO
+    for account_id, name, account_type in _accounts(client_id):
+        debit, credit = balances.get(account_id, (ZERO, ZERO))
+        kind = (account_type or '').lower()
+        if kind in ('income', 'expense'):
+            surplus += credit - debit
+        elif kind in breakdown and (debit or credit):
+            amount = debit - credit if kind in DEBIT_NORMAL else credit - debit
+            breakdown[kind][name] = breakdown[kind].get(name, ZERO) + amount
+    if surplus:
+        breakdown['equity']['Accumulated Surplus'] = breakdown['equity'].get('Accumulated Surplus', ZERO) + surplus
+
+    record = BalanceSheet.query.filter_by(client_id=client_id, report_date=as_of, unit_id=None).first()
+    if record is None:
+        record = BalanceSheet(client_id=client_id, report_date=as_of)
+        db.session.add(record)
+    record.created_by_id = created_by_id or record.created_by_id
+    record.total_assets = sum(breakdown['asset'].values(), ZERO)
+    record.total_liabilities = sum(breakdown['liability'].values(), ZERO)
+    record.total_equity = sum(breakdown['equity'].values(), ZERO)
+    record.asset_breakdown = {k: float(v) for k, v in breakdown['asset'].items()}
+    record.liability_breakdown = {k: float(v) for k, v in breakdown['liability'].items()}
+    record.equity_breakdown = {k: float(v) for k, v in breakdown['equity'].items()}
+    if commit:
+        db.session.commit()
+    return record
+
+
+def generate_income_statement(client_id, period_start, period_end, created_by_id=None, commit=True):
+    """IncomeStatement for [period_start, period_end]: balances at the end less balances the day before the start."""
+    end = account_balances(client_id, period_end)
+    before = account_balances(client_id, period_start - timedelta(days=1))
+    income, expenses = {}, {}
+    for account_id, name, account_type in _accounts(client_id):
+        kind = (account_type or '').lower()
+        if kind not in ('income', 'expense'):
+            continue
+        d1, c1 = end.get(account_id, (ZERO, ZERO))
+        d0, c0 = before.get(account_id, (ZERO, ZERO))
+        movement = (d1 - d0) - (c1 - c0)
+        if not movement:
+            continue
+        target = expenses if kind == 'expense' else income
+        target[name] = target.get(name, ZERO) + (movement if kind == 'expense' else -movement)
+
+    record = IncomeStatement.query.filter_by(client_id=client_id, period_start=period_start,
+                                             period_end=period_end, unit_id=None).first()
+    if record is None:
+        record = IncomeStatement(client_id=client_id, period_start=period_start, period_end=period_end)
+        db.session.add(record)
+    record.created_by_id = created_by_id or record.created_by_id
+    record.total_income = sum(income.values(), ZERO)
+    record.total_expenses = sum(expenses.values(), ZERO)
+    record.net_surplus = record.total_income - record.total_expenses
+    record.income_breakdown = {k: float(v) for k, v in income.items()}
+    record.expense_breakdown = {k: float(v) for k, v in expenses.items()}
+    if commit:
+        db.session.commit()
+    return record
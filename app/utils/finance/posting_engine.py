@@ -1,13 +1,74 @@
+from collections import Counter
 from datetime import datetime, timedelta
+from decimal import Decimal
 from app.extensions import db
 from app.models.finance.ledger_entry import LedgerEntry
 from app.models.finance.ledger_journal import LedgerJournal
 from app.models.finance.account import Account
 from app.models.core.user import User
+from sqlalchemy import func, insert, select, update
 from sqlalchemy.exc import SQLAlchemyError
-from app.models.audit.audit_log import log_audit_change  # 🧠 future hook
+from app.models.audit.audit_log import AuditLog, log_audit_change  # 🧠 future hook
 import logging
 
+RECURRING_IMBALANCE_DAYS = 30
+RECURRING_IMBALANCE_THRESHOLD = 3
+ENTRY_CHUNK_SIZE = 1000
+
+
+def journal_lines(journal):
+    """
+    Draft lines of a journal: [{'account_id', 'type': 'debit'|'credit', 'amount', 'description', ...}].
+    Read from `journal.entries` when present, else from extracted_data['entries'].
+    """
+    lines = getattr(journal, 'entries', None)
+    if lines is None:
+        lines = (journal.extracted_data or {}).get('entries')
+    return lines or []
+
+
+def journal_totals(lines):
+    debits = sum(Decimal(str(e['amount'])) for e in lines if e['type'] == 'debit')
+    credits = sum(Decimal(str(e['amount'])) for e in lines if e['type'] == 'credit')
+    return round(debits, 2), round(credits, 2)
+
+
+def ledger_entry_rows(journal, lines, created_by_id, now):
+    """
+    Pair a balanced journal's debit and credit lines into double-entry LedgerEntry rows
+    (one row per debit/credit overlap, walked in line order), as plain dicts for bulk insert.
+    """
+    debits = [[e, Decimal(str(e['amount']))] for e in lines if e['type'] == 'debit']
+    credits = [[e, Decimal(str(e['amount']))] for e in lines if e['type'] == 'credit']
+    rows, d, c = [], 0, 0
+    while d < len(debits) and c < len(credits):
+        debit, credit = debits[d], credits[c]
+        amount = min(debit[1], credit[1])
+        if amount > 0:
+            rows.append({
+                'ledger_journal_id': journal.id,
+                'debit_account_id': debit[0]['account_id'],
+                'credit_account_id': credit[0]['account_id'],
+                'amount': amount,
+                'entry_type': journal.journal_type,
+                'memo': debit[0].get('description') or credit[0].get('description'),
+                'reference': debit[0].get('external_reference_id') or credit[0].get('external_reference_id'),
+                'external_system': debit[0].get('external_system_name') or credit[0].get('external_system_name'),
+                'sync_status': debit[0].get('sync_status', 'Pending'),
+                'gar_context_reference': journal.gar_context_reference,
+                'created_by_id': created_by_id,
+                'timestamp': now,
+                'created_at': now,
+            })
+        debit[1] -= amount
+        credit[1] -= amount
+        if debit[1] <= 0:
+            d += 1
+        if credit[1] <= 0:
+            c += 1
+    return rows
+
+
 class PostingEngine:
     def __init__(self, journal_id, created_by_id, preview_mode=False):
         self.journal_id = journal_id
@@ -18,17 +79,16 @@ class PostingEngine:
         self.entries_preview = []
 
     def validate_journal(self):
-        total_debits = sum(e['amount'] for e in self.journal.entries if e['type'] == 'debit')
-        total_credits = sum(e['amount'] for e in self.journal.entries if e['type'] == 'credit')
-        return round(total_debits, 2) == round(total_credits, 2)
+        total_debits, total_credits = journal_totals(journal_lines(self.journal))
+        return total_debits == total_credits
 
     def detect_recurring_imbalance(self):
         recent_flagged = LedgerJournal.query.filter(
             LedgerJournal.created_by_id == self.created_by_id,
             LedgerJournal.flagged_by_gar == True,
-            LedgerJournal.created_at >= datetime.utcnow() - timedelta(days=30)
+            LedgerJournal.created_at >= datetime.utcnow() - timedelta(days=RECURRING_IMBALANCE_DAYS)
         ).count()
-        return recent_flagged >= 3
+        return recent_flagged >= RECURRING_IMBALANCE_THRESHOLD
 
     def post(self):
         if not self.journal:
@@ -50,20 +110,9 @@ class PostingEngine:
             return False
 
         try:
-            for entry_data in self.journal.entries:
-                entry = LedgerEntry(
-                    journal_id=self.journal.id,
-                    account_id=entry_data['account_id'],
-                    entry_type=entry_data['type'],
-                    amount=entry_data['amount'],
-                    entry_description=entry_data.get('description'),
-                    created_by_id=self.created_by_id,
-                    created_at=datetime.utcnow(),
-                    gar_context_reference=self.journal.gar_context_reference,
-                    external_reference_id=entry_data.get('external_reference_id'),
-                    external_system_name=entry_data.get('external_system_name'),
-                    sync_status=entry_data.get('sync_status', 'Pending')
-                )
+            rows = ledger_entry_rows(self.journal, journal_lines(self.journal), self.created_by_id, datetime.utcnow())
+            for row in rows:
+                entry = LedgerEntry(**row)
 
                 if self.preview_mode:
                     self.entries_preview.append(entry)
@@ -85,11 +134,11 @@ class PostingEngine:
 
             # 🧠 Optional: audit log
             log_audit_change(
-                user_id=self.created_by_id,
+                entity_type='LedgerJournal',
+                entity_id=self.journal.id,
                 action='journal_posted',
-                context='PostingEngine',
-                object_id=self.journal.id,
-                details={'entries_count': len(self.journal.entries)}
+                reason=f"{len(rows)} ledger entries posted by PostingEngine",
+                performed_by_id=self.created_by_id,
             )
 
             return True
@@ -102,3 +151,107 @@ class PostingEngine:
 
     def get_errors(self):
         return self.errors
+
+
+def post_journals(journal_ids, posted_by_id, chunk_size=ENTRY_CHUNK_SIZE, commit=True):
+    """
+    Batch posting for month-end closes. Validates and posts many journals in one transaction:
+      • journals are locked with SELECT … FOR UPDATE SKIP LOCKED, so two workers given overlapping
+        lists never post the same journal twice (the loser reports it as locked)
+      • one grouped query fetches the recent imbalance history of every creator involved
+      • ledger entries, journal updates and audit rows are written with chunked executemany statements
+
+    With commit=False the work is flushed but left in the caller's transaction.
+
+    Returns one result per requested id, in request order:
+        {'journal_id', 'status': 'posted' | 'flagged' | 'failed', 'entries', 'error'}
+    """
+    journal_ids = list(dict.fromkeys(journal_ids))
+    results = {jid: {'journal_id': jid, 'status': 'failed', 'entries': 0, 'error': None} for jid in journal_ids}
+    if not journal_ids:
+        return []
+    now = datetime.utcnow()
+
+    try:
+        locked = db.session.execute(
+            select(LedgerJournal)
+            .where(LedgerJournal.id.in_(journal_ids))
+            .order_by(LedgerJournal.id)
+            .with_for_update(skip_locked=True)
+            .execution_options(populate_existing=True)  # re-read status under the lock
+        ).scalars().all()
+        locked_ids = {j.id for j in locked}
+        existing = set(db.session.execute(
+            select(LedgerJournal.id).where(LedgerJournal.id.in_(set(journal_ids) - locked_ids))
+        ).scalars()) if len(locked_ids) < len(journal_ids) else set()
+        for jid in set(journal_ids) - locked_ids:
+            results[jid]['error'] = "Journal locked by another posting run." if jid in existing else "Journal not found."
+
+        to_post, to_flag = [], []
+        for journal in locked:
+            if journal.status == 'Posted':
+                results[journal.id]['error'] = "Journal already posted."
+                continue
+            lines = journal_lines(journal)
+            if not lines:
+                results[journal.id]['error'] = "Journal has no entries."
+                continue
+            total_debits, total_credits = journal_totals(lines)
+            if total_debits != total_credits:
+                to_flag.append(journal)
+            else:
+                to_post.append((journal, lines))
+
+        # 🤖 GAR: imbalance history for every creator in one grouped query (+ this batch's flags)
+        if to_flag:
+            creator_of = {j.id: j.created_by_id or posted_by_id for j in to_flag}
+            history = dict(db.session.execute(
+                select(LedgerJournal.created_by_id, func.count())
+                .where(LedgerJournal.created_by_id.in_(set(creator_of.values())),
+                       LedgerJournal.flagged_by_gar == True,
+                       LedgerJournal.created_at >= now - timedelta(days=RECURRING_IMBALANCE_DAYS))
+                .group_by(LedgerJournal.created_by_id)
+            ).all())
+            history = Counter(history) + Counter(
+                creator_of[j.id] for j in to_flag if not j.flagged_by_gar
+            )
+            flag_updates = []
+            for journal in to_flag:
+                notes = "Imbalance detected in journal."
+                if history[creator_of[journal.id]] >= RECURRING_IMBALANCE_THRESHOLD:
+                    notes += " Recurring imbalance pattern detected by AI."
+                flag_updates.append({'id': journal.id, 'flagged_by_gar': True, 'gar_notes': notes, 'updated_at': now})
+                results[journal.id].update(status='flagged', error="Debits and credits do not balance.")
+            db.session.execute(update(LedgerJournal), flag_updates)
+
+        entry_rows, post_updates, audit_rows = [], [], []
+        for journal, lines in to_post:
+            rows = ledger_entry_rows(journal, lines, posted_by_id, now)
+            entry_rows.extend(rows)
+            post_updates.append({'id': journal.id, 'status': 'Posted', 'posted_at': now,
+                                 'posted_by_id': posted_by_id, 'updated_at': now})
+            audit_rows.append({'entity_type': 'LedgerJournal', 'entity_id': journal.id, 'action': 'journal_posted',
+                               'reason': f"{len(rows)} ledger entries posted by PostingEngine (batch)",
+                               'performed_by_id': posted_by_id, 'gar_flagged': False,
+                               'gar_chat_ready': False, 'timestamp': now})
+            results[journal.id].update(status='posted', entries=len(rows))
+
+        for start in range(0, len(entry_rows), chunk_size):
+            db.session.execute(insert(LedgerEntry), entry_rows[start:start + chunk_size])
+        if post_updates:
+            db.session.execute(update(LedgerJournal), post_updates)
+        if audit_rows:
+            db.session.execute(insert(AuditLog), audit_rows)
+
+        if commit:
+            db.session.commit()
+        else:
+            db.session.flush()
+
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logging.exception("PostingEngine batch DB error:")
+        for result in results.values():
+            result.update(status='failed', entries=0, error=str(e))
+
+    return [results[jid] for jid in journal_ids]
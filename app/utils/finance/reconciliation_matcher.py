@@ -0,0 +1,373 @@
+import bisect
+import re
+from collections import defaultdict, namedtuple
+from datetime import datetime
+from decimal import Decimal
+from difflib import SequenceMatcher
+
+from sqlalchemy import exists, select, update
+
+from app.extensions import db
+from app.models.finance.bank_transaction import BankTransaction
+from app.models.finance.invoice import Invoice
+from app.models.finance.levy_payment import LevyPayment
+from app.models.finance.service_charge_payment import ServiceChargePayment
+from app.models.members.unit import Unit
+
+# One bank statement line / one open ledger item, reduced to what matching needs.
+# `day` is a date ordinal; amounts are positive integer cents; `direction` is 'Credit' (money in) or 'Debit'.
+StatementLine = namedtuple('StatementLine', 'id day amount_cents direction description reference')
+OpenItem = namedtuple('OpenItem', 'kind id day amount_cents direction description reference')
+Match = namedtuple('Match', 'line item confidence match_pass')
+
+# Which side of the statement each open item type shows up on
+ITEM_DIRECTIONS = {
+    'invoice': 'Debit',                  # contractor invoices are paid out
+    'service_charge_payment': 'Credit',  # owner payments come in
+    'levy_payment': 'Credit',
+}
+# BankTransaction FK column written for a confirmed match
+ITEM_LINK_COLUMNS = {
+    'invoice': 'invoice_id',
+    'service_charge_payment': 'service_charge_payment_id',
+    'levy_payment': 'levy_payment_id',
+}
+# ReconciliationEngine.matching_method → passes to run
+METHOD_PASSES = {
+    'Exact': ('reference',),
+    'Tolerance': ('reference', 'amount_date'),
+    'Fuzzy': ('reference', 'amount_date', 'fuzzy'),
+    'AI': ('reference', 'amount_date', 'fuzzy'),
+    'Multi-Pass AI': ('reference', 'amount_date', 'fuzzy'),
+    'Manual': (),
+}
+
+MIN_REFERENCE_TOKEN = 4
+FUZZY_WINDOW_MULTIPLIER = 10  # fuzzy pass looks this many times further in time than the date window
+FUZZY_MAX_CANDIDATES = 50
+FUZZY_MIN_SIMILARITY = 0.6
+_NON_ALNUM = re.compile(r'[^A-Z0-9]+')
+
+
+def normalise_reference(value):
+    return _NON_ALNUM.sub('', (value or '').upper())
+
+
+def reference_tokens(*texts):
+    """
+    Candidate reference tokens from free text: the whole normalised value, each word and each pair of
+    adjacent words (so 'PAYMENT INV-0042' and 'INV 0042' both yield 'INV0042').
+    """
+    tokens = set()
+    for text in texts:
+        if not text:
+            continue
+        words = [normalise_reference(w) for w in text.split()]
+        words = [w for w in words if w]
+        candidates = [''.join(words)] + words + [a + b for a, b in zip(words, words[1:])]
+        tokens.update(t for t in candidates if len(t) >= MIN_REFERENCE_TOKEN)
+    return tokens
+
+
+def to_cents(amount):
+    return int((Decimal(str(amount or 0)) * 100).to_integral_value())
+
+
+def _day(value):
+    return value.toordinal() if value else None
+
+
+class ReconciliationMatcher:
+    """
+    Multi-pass matcher between statement lines and open items.
+
+      reference    line reference/description token == item reference (hash index), amount within tolerance
+      amount_date  same amount (or within tolerance) and date within ±tolerance_days; items are kept in
+                   per-direction amount buckets, each sorted by date, so a line costs a few bisects
+      fuzzy        remaining lines vs the nearest-in-time items within amount tolerance, scored by
+                   description similarity
+
+    Every item is used at most once. Lines are processed in date order; each pass only sees what the
+    previous passes left. Cost is O((n + m) log m) plus bounded per-line candidate scans.
+    """
+
+    def __init__(self, amount_tolerance_cents=100, tolerance_days=3, passes=METHOD_PASSES['Multi-Pass AI'],
+                 fuzzy_min_similarity=FUZZY_MIN_SIMILARITY):
+        self.amount_tolerance = max(0, int(amount_tolerance_cents or 0))
+        self.tolerance_days = max(0, int(tolerance_days or 0))
+        self.passes = tuple(passes)
+        self.fuzzy_min_similarity = fuzzy_min_similarity
+
+    # ---------- indexes ----------
+
+    def _build(self, items):
+        self.items = items
+        self.used = [False] * len(items)
+        self.by_reference = defaultdict(list)
+        self.buckets = defaultdict(list)          # (direction, cents) → [(day, idx)] sorted
+        for idx, item in enumerate(items):
+            ref = normalise_reference(item.reference)
+            if len(ref) >= MIN_REFERENCE_TOKEN:
+                self.by_reference[ref].append(idx)
+            self.buckets[(item.direction, item.amount_cents)].append((item.day or 0, idx))
+        for bucket in self.buckets.values():
+            bucket.sort()
+        self.amounts = defaultdict(list)          # direction → sorted distinct amounts
+        for direction, cents in self.buckets:
+            self.amounts[direction].append(cents)
+        for values in self.amounts.values():
+            values.sort()
+
+    def _amounts_near(self, line, tolerance):
+        """Bucket amounts within ±tolerance of the line, closest first."""
+        values = self.amounts.get(line.direction, ())
+        lo = bisect.bisect_left(values, line.amount_cents - tolerance)
+        hi = bisect.bisect_right(values, line.amount_cents + tolerance)
+        return sorted(values[lo:hi], key=lambda a: abs(a - line.amount_cents))
+
+    def _in_window(self, line, cents, days):
+        """Unused items of one amount bucket dated within ±days of the line."""
+        bucket = self.buckets[(line.direction, cents)]
+        day = line.day or 0
+        lo = bisect.bisect_left(bucket, (day - days, -1))
+        hi = bisect.bisect_right(bucket, (day + days, len(self.items)))
+        return [idx for _, idx in bucket[lo:hi] if not self.used[idx]]
+
+    # ---------- passes ----------
+
+    def _reference_pass(self, line):
+        best = None
+        for token in reference_tokens(line.reference, line.description):
+            for idx in self.by_reference.get(token, ()):
+                item = self.items[idx]
+                if self.used[idx] or item.direction != line.direction:
+                    continue
+                diff = abs(item.amount_cents - line.amount_cents)
+                if diff > self.amount_tolerance:
+                    continue
+                key = (diff, abs((item.day or 0) - (line.day or 0)))
+                if best is None or key < best[0]:
+                    best = (key, idx)
+        if best is None:
+            return None
+        confidence = 1.0 if best[0][0] == 0 else 0.95
+        return best[1], confidence
+
+    def _amount_date_pass(self, line):
+        window = self.tolerance_days or 1
+        for cents in self._amounts_near(line, self.amount_tolerance):
+            candidates = self._in_window(line, cents, self.tolerance_days)
+            if not candidates:
+                continue
+            idx = min(candidates, key=lambda i: (abs((self.items[i].day or 0) - (line.day or 0)), i))
+            days_off = abs((self.items[idx].day or 0) - (line.day or 0))
+            base = 0.9 if cents == line.amount_cents else 0.75
+            return idx, round(base - 0.1 * days_off / window, 4)
+        return None
+
+    def _fuzzy_pass(self, line):
+        text = (line.description or '').lower()
+        if not text:
+            return None
+        days = max(self.tolerance_days, 1) * FUZZY_WINDOW_MULTIPLIER
+        candidates = []
+        for cents in self._amounts_near(line, self.amount_tolerance):
+            candidates.extend(self._in_window(line, cents, days))
+            if len(candidates) >= FUZZY_MAX_CANDIDATES:
+                break
+        candidates.sort(key=lambda i: abs((self.items[i].day or 0) - (line.day or 0)))
+
+        best = None
+        matcher = SequenceMatcher(None, '', text, autojunk=False)
+        for idx in candidates[:FUZZY_MAX_CANDIDATES]:
+            item = self.items[idx]
+            matcher.set_seq1(f"{item.description or ''} {item.reference or ''}".lower())
+            if matcher.real_quick_ratio() < self.fuzzy_min_similarity or matcher.quick_ratio() < self.fuzzy_min_similarity:
+                continue
+            score = matcher.ratio()
+            if score >= self.fuzzy_min_similarity and (best is None or score > best[1]):
+                best = (idx, score)
+        if best is None:
+            return None
+        return best[0], round(0.8 * best[1], 4)
+
+    # ---------- driver ----------
+
+    def match(self, lines, items):
+        """
+        Returns (matches, unmatched_lines). `matches` are Match(line, item, confidence, match_pass).
+        """
+        self._build(items)
+        remaining = sorted(lines, key=lambda l: (l.day or 0, l.id))
+        matches = []
+        run = {'reference': self._reference_pass, 'amount_date': self._amount_date_pass, 'fuzzy': self._fuzzy_pass}
+        for name in self.passes:
+            left = []
+            for line in remaining:
+                found = run[name](line)
+                if found is None:
+                    left.append(line)
+                    continue
+                idx, confidence = found
+                self.used[idx] = True
+                matches.append(Match(line, self.items[idx], confidence, name))
+            remaining = left
+        return matches, remaining
+
+
+# ----------------------------
+# Database integration
+# ----------------------------
+
+def _load_lines(engine, batch):
+    stmt = select(BankTransaction.id, BankTransaction.transaction_date, BankTransaction.amount,
+                  BankTransaction.transaction_type, BankTransaction.description, BankTransaction.external_ref) \
+        .where(BankTransaction.bank_account_id == engine.bank_account_id,
+               BankTransaction.is_reconciled.is_not(True))
+    if batch is not None:
+        stmt = stmt.where(BankTransaction.transaction_date >= batch.statement_period_start,
+                          BankTransaction.transaction_date < datetime.combine(batch.statement_period_end, datetime.max.time()))
+    lines = []
+    for row in db.session.execute(stmt):
+        cents = to_cents(row.amount)
+        direction = (row.transaction_type or '').capitalize() or ('Credit' if cents >= 0 else 'Debit')
+        lines.append(StatementLine(row.id, _day(row.transaction_date), abs(cents), direction,
+                                   row.description, row.external_ref))
+    return lines
+
+
+def _load_open_items(engine):
+    """Unlinked invoices and unreconciled owner payments (scoped to the engine's client/unit when set)."""
+    items = []
+
+    inv = select(Invoice.id, Invoice.due_date, Invoice.invoice_date, Invoice.total_amount, Invoice.amount,
+                 Invoice.description, Invoice.invoice_number) \
+        .where(Invoice.status != 'Paid',
+               ~exists().where(BankTransaction.invoice_id == Invoice.id))
+    scp = select(ServiceChargePayment.id, ServiceChargePayment.payment_date, ServiceChargePayment.amount_paid,
+                 ServiceChargePayment.allocation_notes, ServiceChargePayment.transaction_reference,
+                 ServiceChargePayment.receipt_reference) \
+        .where(ServiceChargePayment.is_reconciled.is_not(True),
+               ServiceChargePayment.is_reversed.is_not(True),
+               ~exists().where(BankTransaction.service_charge_payment_id == ServiceChargePayment.id))
+    levy = select(LevyPayment.id, LevyPayment.payment_date, LevyPayment.amount, LevyPayment.payment_method,
+                  LevyPayment.payment_reference, LevyPayment.external_payment_id) \
+        .where(LevyPayment.is_reversed.is_not(True),
+               ~exists().where(BankTransaction.levy_payment_id == LevyPayment.id))
+
+    if engine.unit_id:
+        inv = inv.where(Invoice.unit_id == engine.unit_id)
+        scp = scp.where(ServiceChargePayment.unit_id == engine.unit_id)
+        levy = levy.where(LevyPayment.unit_id == engine.unit_id)
+    elif engine.client_id:
+        client_units = select(Unit.id).where(Unit.client_id == engine.client_id)
+        inv = inv.where(Invoice.unit_id.in_(client_units))
+        scp = scp.where(ServiceChargePayment.unit_id.in_(client_units))
+        levy = levy.where(LevyPayment.unit_id.in_(client_units))
+
+    for r in db.session.execute(inv):
+        items.append(OpenItem('invoice', r.id, _day(r.due_date or r.invoice_date),
+                              to_cents(r.total_amount if r.total_amount is not None else r.amount),
+                              ITEM_DIRECTIONS['invoice'], r.description, r.invoice_number))
+    for r in db.session.execute(scp):
+        items.append(OpenItem('service_charge_payment', r.id, _day(r.payment_date), to_cents(r.amount_paid),
+                              ITEM_DIRECTIONS['service_charge_payment'], r.allocation_notes,
+                              r.transaction_reference or r.receipt_reference))
+    for r in db.session.execute(levy):
+        items.append(OpenItem('levy_payment', r.id, _day(r.payment_date), to_cents(r.amount),
+                              ITEM_DIRECTIONS['levy_payment'], r.payment_method,
+                              r.payment_reference or r.external_payment_id))
+    return items
+
+
+def run_reconciliation(engine, performed_by_id=None, commit=True):
+    """
+    Match the engine's bank account statement lines against open items using the engine's settings,
+    then write back in bulk:
+      • confirmed matches (confidence ≥ ai_confidence_threshold, when auto_confirm_high_confidence) set
+        BankTransaction.is_reconciled + the invoice/payment link; service charge payments are marked reconciled
+      • lower-confidence matches are recorded as suggestions (confidence score only)
+      • ReconciliationBatch.matched_transactions / unmatched_transactions and the engine's outcome counters
+    Returns a summary dict.
+    """
+    batch = engine.reconciliation_batch
+    matcher = ReconciliationMatcher(
+        amount_tolerance_cents=engine.amount_tolerance_cents,
+        tolerance_days=engine.match_tolerance_days,
+        passes=METHOD_PASSES.get(engine.matching_method, METHOD_PASSES['Multi-Pass AI']),
+    )
+    lines = _load_lines(engine, batch)
+    matches, unmatched = matcher.match(lines, _load_open_items(engine))
+
+    now = datetime.utcnow()
+    threshold = engine.ai_confidence_threshold if engine.ai_confidence_threshold is not None else 0.85
+    auto_confirm = engine.auto_confirm_high_confidence is not False
+
+    txn_updates, scp_updates, matched_json = [], [], []
+    for m in matches:
+        confirmed = auto_confirm and m.confidence >= threshold
+        row = {'id': m.line.id, 'ai_confidence_score': m.confidence, 'reconciliation_engine_id': engine.id}
+        if confirmed:
+            row.update({'is_reconciled': True, 'reconciled_at': now, 'reconciled_by_id': performed_by_id,
+                        ITEM_LINK_COLUMNS[m.item.kind]: m.item.id})
+            if m.item.kind == 'service_charge_payment':
+                scp_updates.append({'id': m.item.id, 'is_reconciled': True,
+                                    'reconciliation_batch_id': batch.id if batch is not None else None})
+        txn_updates.append(row)
+        matched_json.append({
+            'transaction_id': m.line.id,
+            'amount': m.line.amount_cents / 100,
+            'confidence': m.confidence,
+            'matched_type': m.item.kind,
+            'matched_id': m.item.id,
+            'pass': m.match_pass,
+            'confirmed': confirmed,
+        })
+
+    unmatched_json = [{
+        'transaction_id': line.id,
+        'reason': 'No open item within tolerance',
+        'reference': line.reference or line.description,
+        'amount': line.amount_cents / 100,
+        'suggested_action': 'Manual review',
+    } for line in unmatched]
+
+    # Uniform key sets per executemany batch
+    by_keys = defaultdict(list)
+    for row in txn_updates:
+        by_keys[tuple(sorted(row))].append(row)
+    for rows in by_keys.values():
+        db.session.execute(update(BankTransaction), rows)
+    if scp_updates:
+        db.session.execute(update(ServiceChargePayment), scp_updates)
+
+    confirmed_count = sum(1 for m in matched_json if m['confirmed'])
+    total = len(lines)
+    engine.total_entries_matched = len(matches)
+    engine.total_unmatched_entries = len(unmatched)
+    engine.success_rate = round(len(matches) / total, 4) if total else 0.0
+    engine.requires_human_review = bool(unmatched) or confirmed_count < len(matches)
+    engine.final_status = 'In Review' if engine.requires_human_review else 'Completed'
+    engine.reconciliation_status = 'Reconciled' if not engine.requires_human_review else 'Partially Reconciled'
+    engine.reconciled_at = now
+
+    if batch is not None:
+        batch.matched_transactions = matched_json
+        batch.unmatched_transactions = unmatched_json
+        batch.is_reconciled = not engine.requires_human_review
+        batch.reconciliation_status = 'Reconciled' if batch.is_reconciled else 'In Progress'
+        batch.requires_human_review = engine.requires_human_review
+
+    if commit:
+        db.session.commit()
+    else:
+        db.session.flush()
+
+    return {
+        'lines': total,
+        'matched': len(matches),
+        'confirmed': confirmed_count,
+        'unmatched': len(unmatched),
+        'success_rate': engine.success_rate,
+        'by_pass': {name: sum(1 for m in matches if m.match_pass == name) for name in matcher.passes},
+    }
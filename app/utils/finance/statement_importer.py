@@ -0,0 +1,337 @@
+import csv
+import hashlib
+import os
+import re
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from app.extensions import db
+from app.models.finance.bank_statement_import import BankStatementImport
+from app.models.finance.bank_transaction import BankTransaction
+
+# One parsed statement line. `amount` is a signed Decimal (money in > 0), quantised to cents.
+StatementRow = namedtuple('StatementRow', 'date amount description reference balance')
+
+FORMATS = ('CSV', 'CAMT053', 'OFX')
+DEFAULT_CHUNK_SIZE = 2000
+CENT = Decimal('0.01')
+
+CSV_COLUMNS = {
+    'date': ('date', 'transaction date', 'booking date', 'posted date', 'posting date', 'value date'),
+    'amount': ('amount', 'value', 'transaction amount'),
+    'debit': ('debit', 'paid out', 'withdrawal', 'withdrawals', 'money out'),
+    'credit': ('credit', 'paid in', 'deposit', 'deposits', 'money in'),
+    'description': ('description', 'details', 'narrative', 'memo', 'payee', 'transaction details'),
+    'reference': ('reference', 'ref', 'transaction id', 'transaction reference', 'fitid', 'id'),
+    'balance': ('balance', 'running balance', 'balance after'),
+}
+CSV_DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y', '%Y/%m/%d', '%d %b %Y', '%d/%m/%y')
+
+
+class StatementFormatError(ValueError):
+    """The statement file could not be recognised or a line could not be parsed."""
+
+
+# ----------------------------
+# Normalisation
+# ----------------------------
+
+def parse_amount(raw):
+    """'1,234.50' / '-12.00' / '(12.00)' / '€ 12.00' → Decimal quantised to cents (None if blank)."""
+    if raw is None:
+        return None
+    text = str(raw).strip()
+    if not text:
+        return None
+    negative = text.startswith('(') and text.endswith(')')
+    text = re.sub(r'[^0-9.,\-+]', '', text)
+    if ',' in text and '.' in text:
+        text = text.replace(',', '')                                 # 1,234.50
+    elif ',' in text and len(text.rsplit(',', 1)[1]) == 2:
+        text = text.replace(',', '.')                                # 12,50 (decimal comma)
+    else:
+        text = text.replace(',', '')
+    try:
+        value = Decimal(text).quantize(CENT)
+    except InvalidOperation:
+        raise StatementFormatError(f"Unparseable amount: {raw!r}")
+    return -value if negative else value
+
+
+def parse_date(raw, formats=CSV_DATE_FORMATS):
+    text = (raw or '').strip()
+    if len(text) == 10 and '%Y-%m-%d' in formats:
+        try:
+            return date.fromisoformat(text)  # fast path for ISO dates (CAMT, most CSV exports)
+        except ValueError:
+            pass
+    for fmt in formats:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    raise StatementFormatError(f"Unparseable date: {raw!r}")
+
+
+# ----------------------------
+# Streaming parsers (one row at a time, constant memory)
+# ----------------------------
+
+def iter_csv_statement(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if not header:
+            return
+        lowered = [h.strip().lower() for h in header]
+        cols = {}
+        for key, names in CSV_COLUMNS.items():
+            cols[key] = next((lowered.index(n) for n in names if n in lowered), None)
+        if cols['date'] is None or (cols['amount'] is None and cols['debit'] is None and cols['credit'] is None):
+            raise StatementFormatError(f"CSV header needs a date and an amount (or debit/credit) column: {header}")
+
+        def cell(row, key):
+            i = cols[key]
+            return row[i] if i is not None and i < len(row) else None
+
+        for row in reader:
+            if not any(c.strip() for c in row):
+                continue
+            if cols['amount'] is not None:
+                amount = parse_amount(cell(row, 'amount'))
+            else:
+                amount = (parse_amount(cell(row, 'credit')) or Decimal('0.00')) - \
+                         abs(parse_amount(cell(row, 'debit')) or Decimal('0.00'))
+            yield StatementRow(parse_date(cell(row, 'date')), amount, (cell(row, 'description') or '').strip(),
+                               (cell(row, 'reference') or '').strip() or None, parse_amount(cell(row, 'balance')))
+
+
+def _text(elem, path):
+    found = elem.find(path)
+    return found.text.strip() if found is not None and found.text else None
+
+
+_CAMT_PATHS = {
+    'amount': 'Amt', 'indicator': 'CdtDbtInd',
+    'booked': 'BookgDt/Dt', 'booked_at': 'BookgDt/DtTm', 'value_date': 'ValDt/Dt',
+    'ref': 'AcctSvcrRef', 'end_to_end': 'NtryDtls/TxDtls/Refs/EndToEndId',
+    'tx_ref': 'NtryDtls/TxDtls/Refs/AcctSvcrRef',
+    'info': 'AddtlNtryInf', 'remittance': 'NtryDtls/TxDtls/RmtInf/Ustrd', 'tx_info': 'NtryDtls/TxDtls/AddtlTxInf',
+}
+
+
+def iter_camt053(path):
+    """ISO 20022 camt.053 <Ntry> elements via iterparse; each entry is detached from the tree once read."""
+    open_elems, paths = [], None
+    for event, elem in ET.iterparse(path, events=('start', 'end')):
+        if event == 'start':
+            if paths is None:  # namespace from the root element; explicit paths are much faster than {*}
+                ns = elem.tag[:elem.tag.index('}') + 1] if elem.tag.startswith('{') else ''
+                paths = {k: '/'.join(ns + part for part in v.split('/')) for k, v in _CAMT_PATHS.items()}
+            open_elems.append(elem)
+            continue
+        open_elems.pop()
+        if elem.tag.rsplit('}', 1)[-1] != 'Ntry':
+            continue
+        amount = parse_amount(_text(elem, paths['amount']))
+        if (_text(elem, paths['indicator']) or 'CRDT').upper() == 'DBIT':
+            amount = -amount
+        when = _text(elem, paths['booked']) or (_text(elem, paths['booked_at']) or '')[:10] \
+            or _text(elem, paths['value_date'])
+        reference = (_text(elem, paths['ref']) or _text(elem, paths['end_to_end']) or _text(elem, paths['tx_ref']))
+        if reference == 'NOTPROVIDED':
+            reference = None
+        description = (_text(elem, paths['info']) or _text(elem, paths['remittance'])
+                       or _text(elem, paths['tx_info']) or '')
+        yield StatementRow(parse_date(when, ('%Y-%m-%d',)), amount, description, reference, None)
+        if open_elems:
+            open_elems[-1].remove(elem)  # the parent <Stmt> must not accumulate processed entries
+
+
+_OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<\r\n]*)')
+_OFX_LIST_END = ('BANKTRANLIST', 'LEDGERBAL', 'AVAILBAL')
+
+
+def iter_ofx(path):
+    """OFX 1.x (SGML) and 2.x (XML) <STMTTRN> blocks, tokenised line by line."""
+    current = None
+    with open(path, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            for closing, tag, value in _OFX_TAG.findall(line):
+                tag = tag.upper()
+                if tag == 'STMTTRN':
+                    if current:
+                        yield _ofx_row(current)
+                    current = None if closing else {}
+                elif tag in _OFX_LIST_END and current:
+                    yield _ofx_row(current)  # SGML without </STMTTRN>: the list/balance ends the last one
+                    current = None
+                elif current is not None and not closing:
+                    current[tag] = value.strip()
+        if current:
+            yield _ofx_row(current)
+
+
+def _ofx_row(fields):
+    if 'DTPOSTED' not in fields or 'TRNAMT' not in fields:
+        raise StatementFormatError(f"OFX transaction missing DTPOSTED/TRNAMT: {fields}")
+    description = ' '.join(v for v in (fields.get('NAME'), fields.get('MEMO')) if v)
+    return StatementRow(parse_date(fields['DTPOSTED'][:8], ('%Y%m%d',)), parse_amount(fields['TRNAMT']),
+                        description, fields.get('FITID') or fields.get('CHECKNUM') or fields.get('REFNUM'), None)
+
+
+PARSERS = {'CSV': iter_csv_statement, 'CAMT053': iter_camt053, 'OFX': iter_ofx}
+
+
+def detect_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.ofx', '.qfx'):
+        return 'OFX'
+    if ext == '.csv':
+        return 'CSV'
+    with open(path, 'rb') as f:
+        head = f.read(4096).upper()
+    if b'OFXHEADER' in head or b'<OFX>' in head:
+        return 'OFX'
+    if b'CAMT.053' in head or b'<BKTOCSTMR' in head:
+        return 'CAMT053'
+    if ext == '.xml':
+        return 'CAMT053'
+    return 'CSV'
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# ----------------------------
+# Fingerprints
+# ----------------------------
+
+def _reference_key(row):
+    return ' '.join((row.reference or row.description or '').upper().split())
+
+
+def fingerprinted(rows, bank_account_id):
+    """
+    (fingerprint, row) pairs. The fingerprint hashes (account, date, amount, reference) plus the row's
+    occurrence number among identical rows on the same date, so two genuine identical transactions on
+    one day stay distinct. Statements are date-ordered, so the occurrence counter is reset at every
+    new date and memory stays bounded by one day's lines.
+    """
+    seen, current_date = {}, None
+    for row in rows:
+        if row.date != current_date:
+            seen, current_date = {}, row.date
+        base = f"{bank_account_id}|{row.date.isoformat()}|{row.amount}|{_reference_key(row)}"
+        n = seen.get(base, 0)
+        seen[base] = n + 1
+        yield hashlib.sha256(f"{base}|{n}".encode('utf-8')).hexdigest(), row
+
+
+# ----------------------------
+# Import pipeline
+# ----------------------------
+
+def _insert_chunk(statement_import, chunk, created_by_id):
+    """INSERT … ON CONFLICT DO NOTHING on (bank_account_id, statement_fingerprint); returns rows inserted."""
+    from sqlalchemy.dialects.postgresql import insert as pg_insert
+    from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+    insert = pg_insert if db.engine.dialect.name == 'postgresql' else sqlite_insert
+    table = BankTransaction.__table__
+    now = datetime.utcnow()
+    values = [{
+        'bank_account_id': statement_import.bank_account_id,
+        'transaction_date': datetime.combine(row.date, datetime.min.time()),
+        'description': (row.description or row.reference or 'Statement line')[:255],
+        'transaction_type': 'Credit' if row.amount >= 0 else 'Debit',
+        'amount': abs(row.amount),
+        'balance_after': row.balance,
+        'external_ref': (row.reference or '')[:150] or None,
+        'integration_status': 'Imported',
+        'statement_fingerprint': fingerprint,
+        'statement_import_id': statement_import.id,
+        'reconciliation_engine_id': statement_import.reconciliation_engine_id,
+        'is_reconciled': False,
+        'created_by_id': created_by_id,
+        'created_at': now,
+    } for fingerprint, row in chunk]
+    stmt = (insert(table).values(values)
+            .on_conflict_do_nothing(index_elements=[table.c.bank_account_id, table.c.statement_fingerprint])
+            .returning(table.c.id))
+    return len(db.session.execute(stmt).all())
+
+
+def import_statement(path, bank_account_id, file_format=None, engine=None, imported_by_id=None,
+                     chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Stream a statement file into bank_transactions and return its BankStatementImport.
+
+    Each chunk of `chunk_size` lines is inserted and the import's `rows_processed` checkpoint advanced
+    in one transaction. Re-running the same file (same sha256) for the same account resumes after the
+    last committed chunk, and is a no-op once the import is Completed. Lines already present — from an
+    overlapping statement or a manual re-upload — are skipped by the unique fingerprint index, so
+    nothing is ever inserted twice.
+    """
+    file_format = (file_format or detect_format(path)).upper()
+    if file_format not in PARSERS:
+        raise StatementFormatError(f"Unsupported statement format: {file_format}")
+    sha = file_sha256(path)
+
+    statement_import = BankStatementImport.query.filter_by(bank_account_id=bank_account_id, file_sha256=sha).first()
+    if statement_import is None:
+        statement_import = BankStatementImport(
+            bank_account_id=bank_account_id, file_sha256=sha, file_name=os.path.basename(path),
+            file_format=file_format, imported_by_id=imported_by_id,
+            reconciliation_engine_id=engine.id if engine is not None else None,
+            status='Running', rows_processed=0, rows_inserted=0, rows_duplicate=0,
+        )
+        db.session.add(statement_import)
+        db.session.commit()
+    elif statement_import.status == 'Completed':
+        return statement_import
+
+    if engine is not None:
+        engine.imported_statement_file = statement_import.file_name
+        engine.imported_by_system = f"statement_import:{file_format}"
+
+    statement_import.status, statement_import.last_error = 'Running', None
+    skip = statement_import.rows_processed or 0
+    chunk = []
+
+    def flush():
+        inserted = _insert_chunk(statement_import, chunk, imported_by_id)
+        statement_import.rows_processed += len(chunk)
+        statement_import.rows_inserted += inserted
+        statement_import.rows_duplicate += len(chunk) - inserted
+        statement_import.updated_at = datetime.utcnow()
+        db.session.commit()  # chunk + checkpoint are atomic
+        chunk.clear()
+
+    try:
+        for n, pair in enumerate(fingerprinted(PARSERS[file_format](path), bank_account_id)):
+            if n < skip:
+                continue
+            chunk.append(pair)
+            if len(chunk) >= chunk_size:
+                flush()
+        if chunk:
+            flush()
+    except Exception as e:
+        db.session.rollback()
+        statement_import.status, statement_import.last_error = 'Failed', str(e)[:2000]
+        db.session.commit()
+        raise
+
+    statement_import.status = 'Completed'
+    statement_import.finished_at = datetime.utcnow()
+    db.session.commit()
+    return statement_import
+
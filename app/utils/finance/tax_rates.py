@@ -0,0 +1,139 @@
+import threading
+import time
+from bisect import bisect_right
+from collections import defaultdict, namedtuple
+from datetime import date, datetime
+
+from flask import current_app, has_app_context
+from sqlalchemy import select
+
+from app.extensions import db
+from app.models.finance.tax_rate import TaxRate
+from app.services.cache_versions import shared_version, watch_models
+
+DEFAULT_TAX_TYPE = 'VAT'
+DEFAULT_TTL_SECONDS = 300
+CACHE_NAME = 'tax_rates'
+
+Rate = namedtuple('Rate', 'id name rate tax_type country region effective_from effective_to')
+
+
+def _norm(value):
+    return (value or '').strip().casefold() or None
+
+
+def _day(on):
+    if on is None:
+        return date.today()
+    return on.date() if isinstance(on, datetime) else on
+
+
+class TaxRateIndex:
+    """
+    In-memory interval index over every TaxRate row.
+
+    Rates are grouped by (country, region, tax_type) — compared case-insensitively — and sorted by
+    effective_from, so the rate in force on a date is one bisect: the latest row starting on or before
+    it, provided its effective_to (inclusive, open-ended when NULL) hasn't passed. A regional lookup
+    falls back to the country-wide rate (region NULL) when the region has no rate of its own.
+    """
+
+    def __init__(self, rates, version=0):
+        grouped = defaultdict(list)
+        for r in rates:
+            grouped[(_norm(r.country), _norm(r.region), _norm(r.tax_type or DEFAULT_TAX_TYPE))].append(r)
+        self._scopes = {}
+        for key, rows in grouped.items():
+            rows.sort(key=lambda r: (r.effective_from, r.id))
+            self._scopes[key] = ([r.effective_from for r in rows], rows)
+        self.size = sum(len(rows) for _, rows in self._scopes.values())
+        self.version = version
+        self.loaded_at = time.monotonic()
+
+    @classmethod
+    def load(cls, version=0):
+        rows = db.session.execute(select(*(getattr(TaxRate, f) for f in Rate._fields)))
+        return cls((Rate(*row) for row in rows), version)
+
+    def _in_scope(self, key, on):
+        scope = self._scopes.get(key)
+        if scope is None:
+            return None
+        i = bisect_right(scope[0], on)
+        if not i:
+            return None
+        rate = scope[1][i - 1]
+        return rate if rate.effective_to is None or on <= rate.effective_to else None
+
+    def lookup(self, country, region=None, tax_type=DEFAULT_TAX_TYPE, on=None):
+        """The Rate in force on `on` (default today), or None."""
+        country, region, tax_type, on = _norm(country), _norm(region), _norm(tax_type or DEFAULT_TAX_TYPE), _day(on)
+        found = None
+        if region is not None:
+            found = self._in_scope((country, region, tax_type), on)
+        return found or self._in_scope((country, None, tax_type), on)
+
+
+# ----------------------------
+# Process-wide index
+# ----------------------------
+
+_lock = threading.Lock()
+
+
+def _index():
+    """
+    The current worker's index, (re)loaded when missing, when the shared 'tax_rates' version has moved on
+    (a TaxRate write committed on any worker), or once older than TAX_RATE_CACHE_TTL.
+    """
+    ttl = int(current_app.config.get('TAX_RATE_CACHE_TTL', DEFAULT_TTL_SECONDS))
+    version = shared_version(CACHE_NAME)
+    index = current_app.extensions.get('tax_rate_index')
+    if index is None or index.version != version or time.monotonic() - index.loaded_at > ttl:
+        with _lock:
+            index = current_app.extensions.get('tax_rate_index')
+            if index is None or index.version != version or time.monotonic() - index.loaded_at > ttl:
+                index = TaxRateIndex.load(version)
+                current_app.extensions['tax_rate_index'] = index
+    return index
+
+
+def invalidate_tax_rates():
+    """Drop this worker's index; the next lookup reloads it. Other workers reload on the version bump."""
+    if has_app_context():
+        current_app.extensions.pop('tax_rate_index', None)
+
+
+def resolve_tax_rate(country, region=None, tax_type=DEFAULT_TAX_TYPE, on=None):
+    """The TaxRate (as a Rate tuple) in force for a jurisdiction on a date, or None."""
+    return _index().lookup(country, region, tax_type, on)
+
+
+def resolve_tax_rates(keys):
+    """
+    Bulk form of resolve_tax_rate for (country, region, tax_type, on) tuples: returns a list of Rate /
+    None in the same order, resolving each distinct key once against a single index.
+    """
+    index = _index()
+    found = {}
+    out = []
+    for key in keys:
+        if key not in found:
+            found[key] = index.lookup(*key)
+        out.append(found[key])
+    return out
+
+
+def tax_rate_percent(country, region=None, tax_type=DEFAULT_TAX_TYPE, on=None, default=None):
+    """Rate in percent (e.g. 23.0) for a jurisdiction and date, or `default` when none is on file."""
+    rate = resolve_tax_rate(country, region, tax_type, on)
+    return rate.rate if rate is not None else default
+
+
+# ----------------------------
+# Invalidation
+# ----------------------------
+
+def register_tax_rate_listeners():
+    """Version the index on TaxRate writes and drop this worker's copy on commit (idempotent)."""
+    watch_models(CACHE_NAME, (TaxRate,), invalidate_tax_rates)
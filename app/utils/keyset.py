@@ -0,0 +1,183 @@
+# app/utils/keyset.py
+"""
+Keyset (seek) pagination for append-mostly log tables, newest first.
+
+    page = keyset_paginate(EmailLog.query.filter_by(user_id=7), EmailLog.timestamp, EmailLog.id,
+                           after=request.args.get("after"), per_page=50, count="estimate")
+    page.items, page.next_cursor, page.prev_cursor, page.total
+
+Pages are addressed by an opaque cursor encoding the (timestamp, id) of the last / first row shown,
+so page N costs one index range scan of per_page+1 rows — OFFSET would read and discard every earlier
+row, and `.all()` read the whole table. Back the ordering with a (timestamp, id) index, prefixed by
+any equality filter the screen pushes down (e.g. (user_id, timestamp, id)). The timestamp must be
+non-NULL for every row paged over (filter NULLs out where the column allows them).
+
+Totals are optional: count="exact" runs COUNT(*), count="estimate" asks the PostgreSQL planner
+(EXPLAIN rows) and elsewhere counts up to ESTIMATE_CAP rows; count=None skips it.
+"""
+from __future__ import annotations
+
+import base64
+import json
+from datetime import date, datetime, time, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from flask import jsonify
+from sqlalchemy import func, select, tuple_
+
+from app.extensions import db
+
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 200
+ESTIMATE_CAP = 10000
+
+
+def encode_cursor(ts: datetime, row_id: int) -> str:
+    raw = json.dumps([ts.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    """(timestamp, id) from a cursor, or None when it's missing or malformed (→ first page)."""
+    if not cursor:
+        return None
+    try:
+        ts, row_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(ts), int(row_id)
+    except (ValueError, TypeError):
+        return None
+
+
+def _older_than(ts_col, id_col, key):
+    # Row-value comparison, so the database can seek straight into the (ts, id) index.
+    return tuple_(ts_col, id_col) < tuple_(*key)
+
+
+def _newer_than(ts_col, id_col, key):
+    return tuple_(ts_col, id_col) > tuple_(*key)
+
+
+class KeysetPage:
+    """One page of rows plus the cursors around it."""
+
+    def __init__(self, items: List[Any], per_page: int, next_cursor: Optional[str], prev_cursor: Optional[str],
+                 total: Optional[int] = None, total_is_estimate: bool = False):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+        self.total_is_estimate = total_is_estimate
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self) -> bool:
+        return self.prev_cursor is not None
+
+    def to_dict(self, serialize: Callable[[Any], Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "items": [serialize(item) for item in self.items],
+            "per_page": self.per_page,
+            "next_cursor": self.next_cursor,
+            "prev_cursor": self.prev_cursor,
+            "total": self.total,
+            "total_is_estimate": self.total_is_estimate,
+        }
+
+
+def per_page_arg(value: Optional[int], default: int = DEFAULT_PER_PAGE) -> int:
+    return max(1, min(value or default, MAX_PER_PAGE))
+
+
+def keyset_paginate(query, ts_col, id_col, *, after: Optional[str] = None, before: Optional[str] = None,
+                    per_page: int = DEFAULT_PER_PAGE, count: Optional[str] = None) -> KeysetPage:
+    """
+    Newest-first page of `query` (a Model.query with filters applied, no ordering).
+    `after` → the page following that cursor (older rows); `before` → the page preceding it.
+    """
+    per_page = per_page_arg(per_page)
+    after_key, before_key = decode_cursor(after), decode_cursor(before)
+
+    if before_key is not None:
+        rows = (query.filter(_newer_than(ts_col, id_col, before_key))
+                .order_by(ts_col.asc(), id_col.asc()).limit(per_page + 1).all())
+        more_newer = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        has_next, has_prev = True, more_newer
+    else:
+        q = query.filter(_older_than(ts_col, id_col, after_key)) if after_key is not None else query
+        rows = q.order_by(ts_col.desc(), id_col.desc()).limit(per_page + 1).all()
+        items = rows[:per_page]
+        has_next, has_prev = len(rows) > per_page, after_key is not None
+
+    def _key(row):
+        return encode_cursor(getattr(row, ts_col.key), getattr(row, id_col.key))
+
+    total, estimated = None, False
+    if count == "exact":
+        total = exact_count(query)
+    elif count == "estimate":
+        total, estimated = estimate_count(query)
+
+    return KeysetPage(
+        items,
+        per_page,
+        next_cursor=_key(items[-1]) if items and has_next else None,
+        prev_cursor=_key(items[0]) if items and has_prev else None,
+        total=total,
+        total_is_estimate=estimated,
+    )
+
+
+# ----------------------------
+# Totals
+# ----------------------------
+
+def exact_count(query) -> int:
+    return db.session.execute(select(func.count()).select_from(query.order_by(None).subquery())).scalar_one()
+
+
+def estimate_count(query) -> Tuple[int, bool]:
+    """
+    (count, is_estimate). PostgreSQL: the planner's row estimate for the filtered query, no scan.
+    Other dialects: an exact count of at most ESTIMATE_CAP + 1 rows (estimate when it hits the cap).
+    """
+    stmt = query.order_by(None).statement
+    bind = db.session.get_bind()
+    if bind.dialect.name == "postgresql":
+        compiled = stmt.compile(dialect=bind.dialect)
+        plan = db.session.connection().exec_driver_sql(
+            "EXPLAIN (FORMAT JSON) " + compiled.string, compiled.params).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"]), True
+    capped = db.session.execute(
+        select(func.count()).select_from(stmt.limit(ESTIMATE_CAP + 1).subquery())).scalar_one()
+    return capped, capped > ESTIMATE_CAP
+
+
+# ----------------------------
+# Filters and responses
+# ----------------------------
+
+def parse_day(value: Optional[str]) -> Optional[date]:
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def filter_date_range(query, column, date_from: Optional[date] = None, date_to: Optional[date] = None):
+    """Restrict to [date_from 00:00, date_to + 1 day) so the range stays sargable on `column`."""
+    if date_from:
+        query = query.filter(column >= datetime.combine(date_from, time.min))
+    if date_to:
+        query = query.filter(column < datetime.combine(date_to + timedelta(days=1), time.min))
+    return query
+
+
+def keyset_json(page: KeysetPage, serialize: Callable[[Any], Dict[str, Any]]):
+    return jsonify(page.to_dict(serialize))
@@ -0,0 +1,34 @@
+"""Add instalment number and principal/interest split to loan_repayment_schedules
+
+Revision ID: a8d4e6f1c3b5
+Revises: f7b3c5d9e2a1
+Create Date: 2026-10-18 17:42:09.305117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8d4e6f1c3b5'
+down_revision = 'f7b3c5d9e2a1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('loan_repayment_schedules', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('instalment_number', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('principal_amount', sa.Numeric(precision=12, scale=2), nullable=True))
+        batch_op.add_column(sa.Column('interest_amount', sa.Numeric(precision=12, scale=2), nullable=True))
+        batch_op.add_column(sa.Column('balance_after', sa.Numeric(precision=12, scale=2), nullable=True))
+        batch_op.create_unique_constraint('uq_loan_repayment_schedules_loan_instalment', ['loan_id', 'instalment_number'])
+
+
+def downgrade():
+    with op.batch_alter_table('loan_repayment_schedules', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_loan_repayment_schedules_loan_instalment', type_='unique')
+        batch_op.drop_column('balance_after')
+        batch_op.drop_column('interest_amount')
+        batch_op.drop_column('principal_amount')
+        batch_op.drop_column('instalment_number')
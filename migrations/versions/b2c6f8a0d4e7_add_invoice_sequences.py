@@ -0,0 +1,30 @@
+"""Add invoice_sequences (gap-free per-company invoice numbers)
+
+Revision ID: b2c6f8a0d4e7
+Revises: a8d4e6f1c3b5
+Create Date: 2026-10-18 19:03:27.640512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2c6f8a0d4e7'
+down_revision = 'a8d4e6f1c3b5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('invoice_sequences',
+    sa.Column('company_id', sa.Integer(), nullable=False),
+    sa.Column('last_value', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('company_id')
+    )
+
+
+def downgrade():
+    op.drop_table('invoice_sequences')
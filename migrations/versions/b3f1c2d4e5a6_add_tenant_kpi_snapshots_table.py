@@ -0,0 +1,42 @@
+"""Add tenant_kpi_snapshots table
+
+Revision ID: b3f1c2d4e5a6
+Revises: 23226e81973a
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3f1c2d4e5a6'
+down_revision = '23226e81973a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('tenant_kpi_snapshots',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('company_id', sa.Integer(), nullable=False),
+    sa.Column('metrics', sa.JSON(), nullable=False),
+    sa.Column('generated_at', sa.DateTime(), nullable=False),
+    sa.Column('build_ms', sa.Integer(), nullable=True),
+    sa.Column('source_watermarks', sa.JSON(), nullable=True),
+    sa.Column('is_dirty', sa.Boolean(), nullable=False),
+    sa.Column('dirtied_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('tenant_kpi_snapshots', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_tenant_kpi_snapshots_company_id'), ['company_id'], unique=True)
+        batch_op.create_index(batch_op.f('ix_tenant_kpi_snapshots_is_dirty'), ['is_dirty'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('tenant_kpi_snapshots', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_tenant_kpi_snapshots_is_dirty'))
+        batch_op.drop_index(batch_op.f('ix_tenant_kpi_snapshots_company_id'))
+
+    op.drop_table('tenant_kpi_snapshots')
@@ -0,0 +1,90 @@
+"""Add notification fan-out jobs, unread counters and notifications.message_key
+
+Revision ID: c3d7e9f1a5b8
+Revises: b2c6f8a0d4e7
+Create Date: 2026-10-18 21:14:52.318406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3d7e9f1a5b8'
+down_revision = 'b2c6f8a0d4e7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('notification_fanouts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('message', sa.Text(), nullable=False),
+    sa.Column('type', sa.String(length=50), nullable=True),
+    sa.Column('link_url', sa.String(length=255), nullable=True),
+    sa.Column('message_key', sa.String(length=128), nullable=False),
+    sa.Column('priority_level', sa.String(length=20), nullable=True),
+    sa.Column('extracted_data', sa.JSON(), nullable=True),
+    sa.Column('company_id', sa.Integer(), nullable=True),
+    sa.Column('client_id', sa.Integer(), nullable=True),
+    sa.Column('role_names', sa.JSON(), nullable=True),
+    sa.Column('user_ids', sa.JSON(), nullable=True),
+    sa.Column('emails', sa.JSON(), nullable=True),
+    sa.Column('include_admins', sa.Boolean(), nullable=True),
+    sa.Column('total', sa.Integer(), nullable=True),
+    sa.Column('delivered', sa.Integer(), nullable=False),
+    sa.Column('skipped', sa.Integer(), nullable=False),
+    sa.Column('last_user_id', sa.Integer(), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('requested_by_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['client_id'], ['clients.id'], ),
+    sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ),
+    sa.ForeignKeyConstraint(['requested_by_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('notification_fanouts', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_notification_fanouts_status'), ['status'], unique=False)
+        batch_op.create_index(batch_op.f('ix_notification_fanouts_company_id'), ['company_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_notification_fanouts_client_id'), ['client_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_notification_fanouts_created_at'), ['created_at'], unique=False)
+
+    op.create_table('notification_counters',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('unread', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('message_key', sa.String(length=128), nullable=True))
+        batch_op.create_index('ix_notifications_recipient_message_key', ['recipient_id', 'message_key', 'created_at'],
+                              unique=False)
+
+    # Start the counters from what is unread today.
+    op.execute(
+        "INSERT INTO notification_counters (user_id, unread, updated_at) "
+        "SELECT recipient_id, COUNT(*), CURRENT_TIMESTAMP FROM notifications "
+        "WHERE is_read IS NOT TRUE GROUP BY recipient_id"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        batch_op.drop_index('ix_notifications_recipient_message_key')
+        batch_op.drop_column('message_key')
+
+    op.drop_table('notification_counters')
+
+    with op.batch_alter_table('notification_fanouts', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_notification_fanouts_created_at'))
+        batch_op.drop_index(batch_op.f('ix_notification_fanouts_client_id'))
+        batch_op.drop_index(batch_op.f('ix_notification_fanouts_company_id'))
+        batch_op.drop_index(batch_op.f('ix_notification_fanouts_status'))
+
+    op.drop_table('notification_fanouts')
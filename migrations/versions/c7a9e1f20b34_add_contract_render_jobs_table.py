@@ -0,0 +1,60 @@
+"""Add contract_render_jobs table
+
+Revision ID: c7a9e1f20b34
+Revises: b3f1c2d4e5a6
+Create Date: 2026-10-18 10:03:17.552871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7a9e1f20b34'
+down_revision = 'b3f1c2d4e5a6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('contract_render_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('contract_id', sa.Integer(), nullable=False),
+    sa.Column('client_id', sa.Integer(), nullable=True),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('snapshot_hash', sa.String(length=64), nullable=False),
+    sa.Column('batch_key', sa.String(length=64), nullable=True),
+    sa.Column('html_path', sa.String(length=500), nullable=True),
+    sa.Column('pdf_path', sa.String(length=500), nullable=True),
+    sa.Column('renderer', sa.String(length=32), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('requested_by_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('render_ms', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['client_id'], ['clients.id'], ),
+    sa.ForeignKeyConstraint(['contract_id'], ['client_contracts.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['requested_by_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('contract_render_jobs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_contract_render_jobs_batch_key'), ['batch_key'], unique=False)
+        batch_op.create_index(batch_op.f('ix_contract_render_jobs_client_id'), ['client_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_contract_render_jobs_contract_id'), ['contract_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_contract_render_jobs_created_at'), ['created_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_contract_render_jobs_snapshot_hash'), ['snapshot_hash'], unique=False)
+        batch_op.create_index(batch_op.f('ix_contract_render_jobs_status'), ['status'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('contract_render_jobs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_contract_render_jobs_status'))
+        batch_op.drop_index(batch_op.f('ix_contract_render_jobs_snapshot_hash'))
+        batch_op.drop_index(batch_op.f('ix_contract_render_jobs_created_at'))
+        batch_op.drop_index(batch_op.f('ix_contract_render_jobs_contract_id'))
+        batch_op.drop_index(batch_op.f('ix_contract_render_jobs_client_id'))
+        batch_op.drop_index(batch_op.f('ix_contract_render_jobs_batch_key'))
+
+    op.drop_table('contract_render_jobs')
@@ -0,0 +1,30 @@
+"""Add equipment_sequences table
+
+Revision ID: d2e8b5a7c913
+Revises: c7a9e1f20b34
+Create Date: 2026-10-18 11:20:41.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2e8b5a7c913'
+down_revision = 'c7a9e1f20b34'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('equipment_sequences',
+    sa.Column('client_id', sa.Integer(), nullable=False),
+    sa.Column('last_value', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['client_id'], ['clients.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('client_id')
+    )
+
+
+def downgrade():
+    op.drop_table('equipment_sequences')
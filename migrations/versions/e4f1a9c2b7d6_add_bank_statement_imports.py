@@ -0,0 +1,62 @@
+"""Add bank_statement_imports and statement fingerprints on bank_transactions
+
+Revision ID: e4f1a9c2b7d6
+Revises: d2e8b5a7c913
+Create Date: 2026-10-18 14:05:12.530871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4f1a9c2b7d6'
+down_revision = 'd2e8b5a7c913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('bank_statement_imports',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('bank_account_id', sa.Integer(), nullable=False),
+    sa.Column('reconciliation_engine_id', sa.Integer(), nullable=True),
+    sa.Column('imported_by_id', sa.Integer(), nullable=True),
+    sa.Column('file_name', sa.String(length=255), nullable=False),
+    sa.Column('file_sha256', sa.String(length=64), nullable=False),
+    sa.Column('file_format', sa.String(length=20), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('rows_processed', sa.Integer(), nullable=False),
+    sa.Column('rows_inserted', sa.Integer(), nullable=False),
+    sa.Column('rows_duplicate', sa.Integer(), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['bank_account_id'], ['bank_accounts.id'], ),
+    sa.ForeignKeyConstraint(['imported_by_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['reconciliation_engine_id'], ['reconciliation_engine.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('bank_account_id', 'file_sha256', name='uq_bank_statement_import_file')
+    )
+    with op.batch_alter_table('bank_statement_imports', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_bank_statement_imports_bank_account_id'), ['bank_account_id'], unique=False)
+
+    with op.batch_alter_table('bank_transactions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('statement_fingerprint', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('statement_import_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_bank_transactions_statement_import', 'bank_statement_imports', ['statement_import_id'], ['id'])
+        batch_op.create_index('uq_bank_transactions_statement_fingerprint', ['bank_account_id', 'statement_fingerprint'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('bank_transactions', schema=None) as batch_op:
+        batch_op.drop_index('uq_bank_transactions_statement_fingerprint')
+        batch_op.drop_constraint('fk_bank_transactions_statement_import', type_='foreignkey')
+        batch_op.drop_column('statement_import_id')
+        batch_op.drop_column('statement_fingerprint')
+
+    with op.batch_alter_table('bank_statement_imports', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_bank_statement_imports_bank_account_id'))
+
+    op.drop_table('bank_statement_imports')
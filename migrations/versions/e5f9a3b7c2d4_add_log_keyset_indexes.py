@@ -0,0 +1,42 @@
+"""Add (timestamp, id) composite indexes backing keyset pagination of the log viewers
+
+Revision ID: e5f9a3b7c2d4
+Revises: d4e8f2a6b9c1
+Create Date: 2026-10-18 23:41:07.552913
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5f9a3b7c2d4'
+down_revision = 'd4e8f2a6b9c1'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_email_logs_timestamp_id', 'email_logs', ['timestamp', 'id']),
+    ('ix_email_logs_user_timestamp_id', 'email_logs', ['user_id', 'timestamp', 'id']),
+    ('ix_email_logs_status_timestamp_id', 'email_logs', ['delivery_status', 'timestamp', 'id']),
+    ('ix_password_change_logs_timestamp_id', 'password_change_logs', ['timestamp', 'id']),
+    ('ix_password_change_logs_user_timestamp_id', 'password_change_logs', ['user_id', 'timestamp', 'id']),
+    ('ix_audit_logs_timestamp_id', 'audit_logs', ['timestamp', 'id']),
+    ('ix_audit_logs_entity_timestamp_id', 'audit_logs', ['entity_type', 'entity_id', 'timestamp', 'id']),
+    ('ix_audit_logs_performed_by_timestamp_id', 'audit_logs', ['performed_by_id', 'timestamp', 'id']),
+    ('ix_contract_audits_happened_at_id', 'contract_audits', ['happened_at', 'id']),
+    ('ix_contract_audits_action_happened_at_id', 'contract_audits', ['action', 'happened_at', 'id']),
+]
+
+
+def upgrade():
+    # These tables can hold millions of rows: on PostgreSQL build the indexes without blocking writes.
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
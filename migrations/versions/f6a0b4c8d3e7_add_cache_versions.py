@@ -0,0 +1,33 @@
+"""Add cache_versions: shared invalidation counters for per-worker caches
+
+Revision ID: f6a0b4c8d3e7
+Revises: e5f9a3b7c2d4
+Create Date: 2026-10-19 10:12:36.204719
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6a0b4c8d3e7'
+down_revision = 'e5f9a3b7c2d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    cache_versions = op.create_table('cache_versions',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(cache_versions, [
+        {'name': 'permissions', 'version': 0},
+        {'name': 'tax_rates', 'version': 0},
+    ])
+
+
+def downgrade():
+    op.drop_table('cache_versions')
@@ -0,0 +1,48 @@
+"""Add account_period_balances rollup and (account_id, entry_date) ledger index
+
+Revision ID: f7b3c5d9e2a1
+Revises: e4f1a9c2b7d6
+Create Date: 2026-10-18 16:20:41.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7b3c5d9e2a1'
+down_revision = 'e4f1a9c2b7d6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('account_period_balances',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('account_id', sa.Integer(), nullable=False),
+    sa.Column('period_start', sa.Date(), nullable=False),
+    sa.Column('debit_total', sa.Numeric(precision=16, scale=2), nullable=False),
+    sa.Column('credit_total', sa.Numeric(precision=16, scale=2), nullable=False),
+    sa.Column('entry_count', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['account_id'], ['accounts.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('account_id', 'period_start', name='uq_account_period_balances_account_period')
+    )
+
+    with op.batch_alter_table('general_ledger_entries', schema=None) as batch_op:
+        batch_op.create_index('ix_general_ledger_entries_account_entry_date', ['account_id', 'entry_date'], unique=False)
+
+    # Seed the rollup from the existing ledger.
+    op.execute(
+        "INSERT INTO account_period_balances (account_id, period_start, debit_total, credit_total, entry_count, updated_at) "
+        "SELECT account_id, CAST(date_trunc('month', entry_date) AS date), SUM(debit_amount), SUM(credit_amount), "
+        "COUNT(*), now() FROM general_ledger_entries GROUP BY account_id, CAST(date_trunc('month', entry_date) AS date)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('general_ledger_entries', schema=None) as batch_op:
+        batch_op.drop_index('ix_general_ledger_entries_account_entry_date')
+
+    op.drop_table('account_period_balances')